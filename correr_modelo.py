@@ -14,6 +14,7 @@ USO DIRECTO:
     python correr_modelo.py --site MLB --player "Mercado Pago" --q1 25Q3 --q2 25Q4
     python correr_modelo.py --site MLA --player "Ualá" --q1 25Q3 --q2 25Q4
     python correr_modelo.py  # Usa valores del config.yaml
+    python correr_modelo.py --site MLA --player "Ualá" --q2 25Q4 --window 5  # Trayectoria de 5 quarters
 
 SITES DISPONIBLES:
     - MLB: Brasil 🇧🇷
@@ -89,6 +90,9 @@ Ejemplos:
   python correr_modelo.py --site MLB --player "Mercado Pago" --q1 25Q3 --q2 25Q4
   python correr_modelo.py --site MLA --player "Ualá"
   python correr_modelo.py  # Usa config.yaml actual
+  python correr_modelo.py --fallback-clusters  # Reporte provisorio sin esperar el análisis semántico
+  python correr_modelo.py --fragmentar  # Un prompt por motivo (análisis en paralelo)
+  python correr_modelo.py --q2 25Q4 --window 5  # Drivers en cada par de quarters de la ventana
         """
     )
     
@@ -104,8 +108,18 @@ Ejemplos:
                         help='Mostrar detalles de ejecución (por defecto: silencioso)')
     parser.add_argument('--no-browser', action='store_true',
                         help='No abrir HTML en navegador al finalizar')
+    parser.add_argument('--graficos', type=str, choices=['js', 'png'],
+                        help='Modo de gráficos: js (Chart.js embebido, default) o png (matplotlib)')
+    parser.add_argument('--fallback-clusters', action='store_true',
+                        help='Si falta el JSON semántico, generar el reporte con los temas pre-agrupados localmente (provisorio)')
+    parser.add_argument('--fragmentar', action='store_true',
+                        help='Escribir un prompt semántico por motivo (+ manifest) para analizarlos en paralelo')
+    parser.add_argument('--window', type=int, metavar='N',
+                        help='Ventana de N quarters hasta q2: NPS, waterfall, productos, principalidad y seguridad por par adyacente')
     
     args = parser.parse_args()
+    if args.window is not None and args.window < 2:
+        parser.error('--window necesita al menos 2 quarters')
     
     # Modo silencioso: solo muestra inicio y resultado final
     if args.verbose:
@@ -121,7 +135,11 @@ Ejemplos:
         site=args.site,
         player=args.player,
         q1=args.q1,
-        q2=args.q2
+        q2=args.q2,
+        modo_graficos=args.graficos,
+        fallback_clusters=args.fallback_clusters,
+        fragmentar_prompts=args.fragmentar,
+        ventana=args.window
     )
     
     # ══════════════════════════════════════════════════════════════════════
@@ -150,6 +168,12 @@ Ejemplos:
         print(f"   3. Guardar el JSON en: {json_destino}")
         print(f"   4. Re-ejecutar: python correr_modelo.py (mismos args)")
         print(f"")
+        pendientes = resultados.get('fragmentos_pendientes', [])
+        if pendientes:
+            print(f"   MODO FRAGMENTADO: {len(pendientes)} fragmento(s) pendiente(s) (se unen solos al re-ejecutar):")
+            for frag in pendientes:
+                print(f"   - {frag['motivo']}: {frag.get('prompt', '')} -> {frag['json']}")
+            print(f"")
         print("=" * 80)
         
         # Salir con código 42 = "necesita causas raíz"
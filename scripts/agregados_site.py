@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════════════
+AGREGADOS POR SITE PERSISTIDOS (PRINCIPALIDAD / SEGURIDAD)
+═══════════════════════════════════════════════════════════════════════════════
+
+Principalidad y seguridad se agregan una vez por site para TODAS las marcas
+y quarters (conteos por OLA × MARCA × respuesta y por motivo). Cada corrida
+de player solo filtra esos conteos (top players + últimos 5 quarters) y
+arma sus tablas y gráficos.
+
+Los agregados se guardan junto a la base, keyed por la huella del CSV de
+origen (config['huella_datos'], ver decodificacion_respuestas.huella_archivo):
+
+    data/cache/agregados/{nombre}_{site}_{clave}.pkl    (data/cache/ está en .gitignore)
+
+Sin huella (ej. DataFrames armados a mano) se calculan en memoria sin persistir.
+
+Uso:
+    from agregados_site import agregados_persistidos
+    agregados = agregados_persistidos('principalidad', site, huella, [len(df), col_flag],
+                                      lambda: agregados_principalidad_site(df, col_flag, col_motivo))
+"""
+
+import hashlib
+import pickle
+from pathlib import Path
+
+import pandas as pd
+
+RAIZ_PROYECTO = Path(__file__).resolve().parent.parent
+VERSION_AGREGADOS = 1   # Subir si cambia el cálculo de algún agregado (invalida los .pkl)
+
+_MEMORIA = {}
+
+
+def _dir_agregados(raiz=None):
+    return (Path(raiz) if raiz else RAIZ_PROYECTO) / 'data' / 'cache' / 'agregados'
+
+
+def clave_agregados(nombre, site, huella, partes_clave=()):
+    """Clave estable de un agregado: versión, nombre, site, huella y lo que define la base."""
+    texto = '\x1f'.join(str(p) for p in [VERSION_AGREGADOS, nombre, site, huella, *partes_clave])
+    return hashlib.blake2b(texto.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def agregados_persistidos(nombre, site, huella, partes_clave, calcular, raiz=None, verbose=False):
+    """
+    Devuelve el agregado del site: memoria → .pkl → calcular() (y lo guarda).
+
+    Args:
+        nombre: 'principalidad' / 'seguridad'
+        huella: config['huella_datos']; None = sin persistencia
+        partes_clave: lo que distingue la base dentro del mismo archivo
+            (ej. cantidad de filas y columnas detectadas)
+        calcular: función sin argumentos que arma el agregado (dict)
+
+    Returns:
+        dict: el agregado
+    """
+    if not huella:
+        return calcular()
+
+    clave = clave_agregados(nombre, site, huella, partes_clave)
+    if clave in _MEMORIA:
+        return _MEMORIA[clave]
+
+    path = _dir_agregados(raiz) / f'{nombre}_{site}_{clave}.pkl'
+    agregados = None
+    if path.exists():
+        try:
+            agregados = pd.read_pickle(path)
+            if verbose:
+                print(f"   ♻️ Agregados de {nombre} reutilizados ({path.name})")
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            agregados = None
+
+    if agregados is None:
+        agregados = calcular()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Se descartan los agregados de versiones anteriores del archivo
+        for viejo in path.parent.glob(f'{nombre}_{site}_*.pkl'):
+            viejo.unlink()
+        pd.to_pickle(agregados, path)
+
+    _MEMORIA[clave] = agregados
+    return agregados
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════════════
+ALMACÉN LOCAL DE CORRIDAS (SQLite)
+═══════════════════════════════════════════════════════════════════════════════
+
+Cada corrida completa guarda sus resultados estructurados en una base SQLite
+local, keyed por site / player / quarter (q_act, con su q_ant):
+
+    data/almacen/corridas.sqlite    (data/almacen/ está en .gitignore)
+
+    corridas       una fila por (site, player, q_ant, q_act): NPS, Δ, SE / z,
+                   principalidad y seguridad del player
+    waterfall      motivo × corrida (impacto actual / anterior, Δ, z)
+    productos      producto × corrida (share, NPS usuario, lift, efectos, z)
+    promotores     motivo de promoción × corrida (% q_ant / q_act, Δ)
+    noticias       noticias usadas en la triangulación (título, url, queja)
+
+Re-correr el mismo site / player / par de quarters reemplaza la corrida.
+
+El contexto "vs quarter anterior" sale de acá (contexto_quarter_anterior, mismo
+formato que parsear_presentacion.cargar_quarter_anterior) antes de parsear el
+PDF de la presentación, y las tendencias son una consulta (serie_corridas,
+tendencia): milisegundos, sin volver a correr el modelo. ejecutar_modelo pasa
+tendencia('waterfall') a parte6 (evolución de quejas) y tendencia('productos')
+a parte8 (histórico de productos clave): los quarters anteriores al par actual
+salen del almacén y solo se recalculan desde la base los que no tienen corrida.
+
+Uso:
+    from almacen_corridas import guardar_corrida, serie_corridas, tendencia
+    guardar_corrida(resultados)
+    serie_corridas('MLA', 'Mercado Pago')                 # NPS / principalidad / seguridad por quarter
+    tendencia('waterfall', 'MLA', 'Mercado Pago')          # motivo × quarter
+"""
+
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from utils_quarters import numeric_to_quarter, quarter_to_numeric
+
+RAIZ_PROYECTO = Path(__file__).resolve().parent.parent
+RUTA_ALMACEN = RAIZ_PROYECTO / 'data' / 'almacen' / 'corridas.sqlite'
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS corridas (
+    id INTEGER PRIMARY KEY,
+    site TEXT NOT NULL,
+    player TEXT NOT NULL,
+    q_ant TEXT NOT NULL,
+    q_act TEXT NOT NULL,
+    orden_q INTEGER NOT NULL,
+    ejecutado_en TEXT NOT NULL,
+    huella_datos TEXT,
+    nps_ant REAL,
+    nps_act REAL,
+    delta_nps REAL,
+    se_delta_nps REAL,
+    z_delta_nps REAL,
+    principalidad_ant REAL,
+    principalidad_act REAL,
+    seguridad_ant REAL,
+    seguridad_act REAL,
+    UNIQUE (site, player, q_ant, q_act)
+);
+CREATE INDEX IF NOT EXISTS idx_corridas_player ON corridas (site, player, orden_q);
+CREATE TABLE IF NOT EXISTS waterfall (
+    corrida_id INTEGER NOT NULL REFERENCES corridas (id) ON DELETE CASCADE,
+    motivo TEXT NOT NULL,
+    impacto_anterior REAL,
+    impacto_actual REAL,
+    delta REAL,
+    z REAL,
+    significativo INTEGER
+);
+CREATE TABLE IF NOT EXISTS productos (
+    corrida_id INTEGER NOT NULL REFERENCES corridas (id) ON DELETE CASCADE,
+    producto TEXT NOT NULL,
+    share_ant REAL,
+    share_act REAL,
+    nps_usuario_ant REAL,
+    nps_usuario_act REAL,
+    lift_act REAL,
+    mix_effect REAL,
+    nps_effect REAL,
+    total_effect REAL,
+    z REAL,
+    significativo INTEGER
+);
+CREATE TABLE IF NOT EXISTS promotores (
+    corrida_id INTEGER NOT NULL REFERENCES corridas (id) ON DELETE CASCADE,
+    motivo TEXT NOT NULL,
+    pct_ant REAL,
+    pct_act REAL,
+    delta REAL,
+    z REAL,
+    significativo INTEGER
+);
+CREATE TABLE IF NOT EXISTS noticias (
+    corrida_id INTEGER NOT NULL REFERENCES corridas (id) ON DELETE CASCADE,
+    titulo TEXT,
+    url TEXT,
+    fuente TEXT,
+    fecha TEXT,
+    queja_relacionada TEXT,
+    delta_queja REAL
+);
+CREATE INDEX IF NOT EXISTS idx_waterfall ON waterfall (corrida_id);
+CREATE INDEX IF NOT EXISTS idx_productos ON productos (corrida_id);
+CREATE INDEX IF NOT EXISTS idx_promotores ON promotores (corrida_id);
+CREATE INDEX IF NOT EXISTS idx_noticias ON noticias (corrida_id);
+"""
+
+# Tablas de detalle (una fila por driver / noticia y corrida)
+TABLAS_DETALLE = ('waterfall', 'productos', 'promotores', 'noticias')
+
+
+# ==============================================================================
+# CONEXIÓN
+# ==============================================================================
+
+def conectar(ruta=None):
+    """Conexión a la base (la crea con el esquema si no existe)."""
+    ruta = Path(ruta) if ruta else RUTA_ALMACEN
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    conexion = sqlite3.connect(ruta)
+    conexion.execute('PRAGMA foreign_keys = ON')
+    conexion.executescript(ESQUEMA)
+    return conexion
+
+
+def _num(valor):
+    """float o None (NaN / vacío → NULL)."""
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return None if valor != valor else valor
+
+
+def _bool(valor):
+    return None if valor is None else int(bool(valor))
+
+
+# ==============================================================================
+# ESCRITURA
+# ==============================================================================
+
+def _filas_corrida(resultados):
+    """Extrae de resultados las filas de cada tabla (sin ids)."""
+    config = resultados['config']
+    q_ant, q_act = config['periodo_1'], config['periodo_2']
+    nps = (resultados.get('waterfall') or {}).get('nps_comparativo') or {}
+    princ = (resultados.get('principalidad') or {}).get('player_principalidad') or {}
+    seg = (resultados.get('seguridad') or {}).get('player_seguridad') or {}
+
+    corrida = {
+        'site': config['site'], 'player': config['player'], 'q_ant': q_ant, 'q_act': q_act,
+        'orden_q': quarter_to_numeric(q_act),
+        'ejecutado_en': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'huella_datos': config.get('huella_datos'),
+        'nps_ant': _num(nps.get(q_ant)), 'nps_act': _num(nps.get(q_act)),
+        'delta_nps': _num(nps.get('delta')), 'se_delta_nps': _num(nps.get('se_delta')),
+        'z_delta_nps': _num(nps.get('z')),
+        'principalidad_ant': _num(princ.get('princ_q1')), 'principalidad_act': _num(princ.get('princ_q2')),
+        'seguridad_ant': _num(seg.get('seg_q1')), 'seguridad_act': _num(seg.get('seg_q2')),
+    }
+
+    waterfall = []
+    df_wf = (resultados.get('waterfall') or {}).get('waterfall_data_comparativo')
+    if df_wf is not None and len(df_wf):
+        for r in df_wf.to_dict('records'):
+            waterfall.append((r['Motivo'], _num(r.get('Impacto_Anterior')), _num(r.get('Impacto_Actual')),
+                              _num(r.get('Delta')), _num(r.get('Z')), _bool(r.get('Significativo'))))
+
+    productos = [
+        (p['nombre_original'], _num(p.get('share_q1')), _num(p.get('share_q2')), _num(p.get('nps_usuario_q1')),
+         _num(p.get('nps_usuario_q2')), _num(p.get('lift_q2')), _num(p.get('mix_effect')),
+         _num(p.get('nps_effect')), _num(p.get('total_effect')), _num(p.get('z_total_effect')),
+         _bool(p.get('significativo')))
+        for p in (resultados.get('productos') or {}).get('productos_todos') or []
+    ]
+
+    promotores = [
+        (m.get('motivo'), _num(m.get('pct_q1')), _num(m.get('pct_q2')), _num(m.get('delta')),
+         _num(m.get('z')), _bool(m.get('significativo')))
+        for m in (resultados.get('promotores') or {}).get('promotores_data') or []
+    ]
+
+    noticias = [
+        (n.get('titulo'), n.get('url'), n.get('fuente'), n.get('fecha'), n.get('queja_relacionada'),
+         _num(n.get('delta_queja')))
+        for n in resultados.get('noticias') or []
+    ]
+    return corrida, {'waterfall': waterfall, 'productos': productos, 'promotores': promotores,
+                     'noticias': noticias}
+
+
+def guardar_corrida(resultados, ruta=None):
+    """
+    Guarda (o reemplaza) la corrida en el almacén.
+
+    Args:
+        resultados: dict de ejecutar_modelo_completo (corrida completa)
+        ruta: Base SQLite; por defecto data/almacen/corridas.sqlite
+
+    Returns:
+        int: id de la corrida
+    """
+    corrida, detalle = _filas_corrida(resultados)
+    with closing(conectar(ruta)) as conexion, conexion:
+        conexion.execute('DELETE FROM corridas WHERE site = ? AND player = ? AND q_ant = ? AND q_act = ?',
+                         (corrida['site'], corrida['player'], corrida['q_ant'], corrida['q_act']))
+        columnas = ', '.join(corrida)
+        cursor = conexion.execute(f'INSERT INTO corridas ({columnas}) VALUES ({", ".join("?" * len(corrida))})',
+                                  list(corrida.values()))
+        corrida_id = cursor.lastrowid
+        for tabla, filas in detalle.items():
+            if filas:
+                marcadores = ', '.join('?' * (len(filas[0]) + 1))
+                conexion.executemany(f'INSERT INTO {tabla} VALUES ({marcadores})',
+                                     [(corrida_id, *fila) for fila in filas])
+    return corrida_id
+
+
+# ==============================================================================
+# CONSULTAS
+# ==============================================================================
+
+def serie_corridas(site, player, ruta=None):
+    """
+    Una fila por quarter (q_act) del player, en orden: NPS, Δ, z,
+    principalidad y seguridad. Si hay varias corridas con el mismo q_act
+    (distinto q_ant), queda la comparación contra el quarter inmediato anterior
+    o, si no existe, la más reciente.
+
+    Returns:
+        DataFrame (vacío si no hay corridas o no existe la base)
+    """
+    if not Path(ruta or RUTA_ALMACEN).exists():
+        return pd.DataFrame()
+    with closing(conectar(ruta)) as conexion:
+        serie = pd.read_sql_query(
+            'SELECT * FROM corridas WHERE site = ? AND player = ? ORDER BY orden_q, ejecutado_en',
+            conexion, params=(site, player))
+    if serie.empty:
+        return serie
+    consecutiva = serie['q_ant'].map(quarter_to_numeric) == serie['orden_q'] - 1
+    serie = serie.assign(_consecutiva=consecutiva).sort_values(['orden_q', '_consecutiva', 'ejecutado_en'])
+    return serie.drop_duplicates('q_act', keep='last').drop(columns='_consecutiva').reset_index(drop=True)
+
+
+def tendencia(tabla, site, player, ruta=None):
+    """
+    Detalle de una tabla (waterfall, productos, promotores, noticias) a lo
+    largo de los quarters del player, una corrida por quarter (la de
+    serie_corridas).
+
+    Returns:
+        DataFrame largo con q_ant, q_act y las columnas de la tabla
+    """
+    if tabla not in TABLAS_DETALLE:
+        raise ValueError(f"Tabla desconocida: {tabla}. Opciones: {', '.join(TABLAS_DETALLE)}")
+    serie = serie_corridas(site, player, ruta)
+    if serie.empty:
+        return pd.DataFrame()
+    ids = serie['id'].tolist()
+    with closing(conectar(ruta)) as conexion:
+        detalle = pd.read_sql_query(
+            f'SELECT c.q_ant, c.q_act, c.orden_q, t.* FROM {tabla} t JOIN corridas c ON c.id = t.corrida_id '
+            f'WHERE t.corrida_id IN ({", ".join("?" * len(ids))}) ORDER BY c.orden_q',
+            conexion, params=ids)
+    return detalle.drop(columns=['corrida_id', 'orden_q'])
+
+
+def contexto_quarter_anterior(site, player, quarter_actual, ruta=None):
+    """
+    Resultados del player en el quarter anterior desde el almacén, en el
+    formato de parsear_presentacion.cargar_quarter_anterior (lo que usa la
+    sección de contexto del HTML).
+
+    Returns:
+        dict o None si no hay corrida de ese quarter
+    """
+    if not Path(ruta or RUTA_ALMACEN).exists():
+        return None
+    q_anterior = numeric_to_quarter(quarter_to_numeric(quarter_actual) - 1)
+    serie = serie_corridas(site, player, ruta)
+    fila = serie[serie['q_act'] == q_anterior]
+    if fila.empty:
+        return None
+    c = fila.iloc[0]
+    with closing(conectar(ruta)) as conexion:
+        wf = pd.read_sql_query('SELECT * FROM waterfall WHERE corrida_id = ? ORDER BY impacto_actual DESC',
+                               conexion, params=(int(c['id']),))
+
+    def _delta(ant, act):
+        return None if pd.isna(ant) or pd.isna(act) else float(act - ant)
+
+    # Drivers = motivos con Δ significativo (o sin marca), en el formato efecto / detalle de la presentación
+    drivers = [
+        {'efecto': f"{-r['delta']:+.1f}p.p.", 'detalle': f"{r['motivo']} ({'más' if r['delta'] > 0 else 'menos'} quejas)"}
+        for r in wf.sort_values('delta', key=abs, ascending=False).to_dict('records')
+        if pd.notna(r['delta']) and abs(r['delta']) >= 0.5 and r['significativo'] != 0
+    ]
+    return {
+        'quarter': q_anterior,
+        'source_pdf': f"Almacén de corridas ({c['q_ant']} vs {c['q_act']}, ejecutada {c['ejecutado_en'][:10]})",
+        'fuente': 'almacen',
+        'resumen_general': '',
+        'nps_delta': None if pd.isna(c['delta_nps']) else float(c['delta_nps']),
+        'drivers': drivers,
+        'waterfall_quejas': {r['motivo']: float(r['impacto_actual']) for r in wf.to_dict('records')
+                             if pd.notna(r['impacto_actual'])},
+        'principalidad': {'valor': None if pd.isna(c['principalidad_act']) else float(c['principalidad_act']),
+                          'delta': _delta(c['principalidad_ant'], c['principalidad_act'])},
+        'seguridad': {'valor': None if pd.isna(c['seguridad_act']) else float(c['seguridad_act']),
+                      'delta': _delta(c['seguridad_ant'], c['seguridad_act'])},
+        'conclusiones': [],
+    }
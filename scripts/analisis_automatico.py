@@ -27,6 +27,16 @@ from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 from html.parser import HTMLParser
+from functools import lru_cache
+
+import numpy as np
+
+from indice_comentarios import (
+    normalizar_texto, construir_indice_comentarios, ids_de_textos,
+    top_keywords, textos_normalizados, compilar_keywords, presencia_keywords,
+)
+from reuso_semantico import semilla_estable
+from significancia import es_significativo
 
 
 # ==============================================================================
@@ -173,6 +183,49 @@ def cargar_causas_raiz_semanticas_promotores(player: str, q_act: str, data_dir:
         return {}
 
 
+def cargar_causas_raiz_clusters(player: str, q_act: str, data_dir: str = None, site: str = None,
+                                promotores: bool = False) -> Dict:
+    """
+    Carga el JSON de respaldo con temas pre-agrupados localmente (TF-IDF + NMF).
+
+    Lo genera preparar_analisis_semantico[_promotores] con el mismo esquema que
+    el JSON semántico, así que sirve de reemplazo provisorio cuando el análisis
+    LLM todavía no existe. Misma carga estricta (player + site + quarter).
+
+    Formato del archivo: causas_raiz_clusters[_promotores]_{player}_{site}_{q_act}.json
+
+    Returns:
+        Dict con estructura {motivo: {...causas...}} o {} si no existe
+    """
+    if data_dir is None:
+        data_dir = Path(__file__).resolve().parent.parent / 'data'
+    else:
+        data_dir = Path(data_dir)
+
+    if not site:
+        print(f"[WARN] cargar_causas_raiz_clusters: site no especificado para {player}/{q_act}")
+        return {}
+
+    sufijo = '_promotores' if promotores else ''
+    archivo = data_dir / f"causas_raiz_clusters{sufijo}_{player}_{site}_{q_act}.json"
+    if not archivo.exists():
+        return {}
+
+    try:
+        with open(archivo, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        metadata = data.get('metadata', {})
+        esperado = {'quarter': q_act, 'site': site, 'player': player}
+        for campo, valor in esperado.items():
+            if metadata.get(campo) and metadata[campo] != valor:
+                print(f"[ERROR] causas_raiz_clusters JSON tiene {campo} '{metadata[campo]}' pero se esperaba '{valor}' - IGNORANDO archivo")
+                return {}
+        return data.get('causas_por_motivo', {})
+    except Exception as e:
+        print(f"[ERROR] Error al cargar causas_raiz_clusters: {e}")
+        return {}
+
+
 def _limpiar_texto_para_keywords(texto: str) -> str:
     """Limpia un texto para extracción de keywords (quita paréntesis, %, números)."""
     limpio = re.sub(r'\([^)]*\)', '', texto)
@@ -793,238 +846,271 @@ PATRONES_SUBCAUSAS = {
 # ANÁLISIS DE SUBCAUSAS AUTOMÁTICO
 # ==============================================================================
 
-def generar_subcausas_automatico(comentarios: List[str], categoria: str) -> List[Dict]:
+# Nombres amigables para subcausas (ESPAÑOL, legibles para C-level)
+NOMBRES_DISPLAY_SUBCAUSAS = {
+    # Financiamiento
+    'limite_bajo': 'Límite de crédito insuficiente',
+    'rechazo_credito': 'Rechazo de solicitud de crédito',
+    'tasas_altas': 'Tasas/intereses altos',
+    'proceso_lento': 'Proceso de solicitud difícil',
+    'cuotas_problema': 'Problemas con cuotas/pagos',
+    'demora_credito': 'Demora en acreditación',
+    
+    # Seguridad - EXPANDIDOS
+    'fraude_conta_invadida': 'Fraude/cuenta invadida',
+    'tarjeta_clonada': 'Tarjeta clonada',
+    'golpe_phishing': 'Phishing/estafa digital',
+    'conta_bloqueada': 'Cuenta bloqueada sin explicación',
+    'problemas_autenticacion': 'Problemas de autenticación',
+    'problemas_contraseña': 'Problemas con contraseña',
+    'transaccion_no_reconocida': 'Transacción no reconocida',
+    'inseguridad_general': 'Percepción de inseguridad',
+    # legacy
+    'fraude_robo': 'Fraude/robo de cuenta',
+    'phishing_estafa': 'Phishing/estafa',
+    'cuenta_bloqueada': 'Cuenta bloqueada',
+    'falta_proteccion': 'Falta de protección',
+    'autenticacao_insuficiente': 'Autenticación insuficiente',
+    'senha_acesso': 'Problemas con contraseña',
+    'transacao_nao_reconhecida': 'Transacción no reconocida',
+    'medo_inseguranca': 'Percepción de inseguridad',
+    'conta_bloqueada_restricao': 'Cuenta bloqueada/restringida',
+    
+    # Atención - EXPANDIDOS
+    'demora_respuesta': 'Demora en atención al cliente',
+    'no_resuelve': 'No resuelven el problema',
+    'atencion_robot': 'Atención automatizada/robot',
+    'dificil_contactar': 'Difícil contactar soporte',
+    'mala_atencion': 'Mal trato en atención',
+    'problema_ticket': 'Reclamo sin resolver',
+    # legacy
+    'robot_no_humano': 'Atención robot/no humano',
+    'canal_dificil': 'Difícil contactar soporte',
+    
+    # Complejidad - EXPANDIDOS
+    'app_dificil': 'App difícil de usar',
+    'proceso_largo': 'Proceso muy largo/burocrático',
+    'bugs_errores': 'Errores técnicos en la app',
+    'interfaz_confusa': 'Interfaz confusa/cambió layout',
+    'funcionalidad_faltante': 'Funcionalidad básica faltante',
+    
+    # Promociones - EXPANDIDOS
+    'cashback_no_acreditado': 'Cashback no acreditado',
+    'promocion_limitada': 'Promoción con muchas restricciones',
+    'beneficio_reducido': 'Beneficios reducidos vs antes',
+    'cupon_invalido': 'Cupón/código no funciona',
+    'peor_que_competencia': 'Menos beneficios que competencia',
+    'promocion_confusa': 'Promoción confusa/engañosa',
+    'pocos_beneficios': 'Pocos beneficios disponibles',
+    # legacy
+    'cashback_problema': 'Cashback no acreditado',
+    'comparacao_concorrencia': 'Mejor en competencia',
+    'promocao_confusa': 'Promoción confusa',
+    'promocion_enganosa': 'Promoción engañosa',
+    'beneficio_cancelado': 'Beneficio cancelado',
+    'condiciones_ocultas': 'Condiciones ocultas',
+    
+    # Funcionalidades - EXPANDIDOS
+    'pix_problemas': 'Problemas con Pix',
+    'tarjeta_virtual': 'Problemas con tarjeta virtual',
+    'pagos_servicios': 'Problemas pagando servicios',
+    'limite_transferencia': 'Límite de transferencia bajo',
+    'funcion_basica_faltante': 'Función básica faltante',
+    'notificaciones': 'Problemas con notificaciones',
+    'extrato_comprobante': 'No puede exportar extracto',
+    'personalizacion': 'Falta personalización',
+    # legacy
+    'cartao_virtual': 'Tarjeta virtual',
+    'pagamentos_boletos': 'Pagos/boletos',
+    'transferencia_limitada': 'Límite de transferencia',
+    'funcao_basica_falta': 'Falta función básica',
+    'notificacoes': 'Notificaciones',
+    'exportar_dados': 'Exportar datos/extracto',
+    'personalizacao': 'Personalización',
+    'falta_funcion': 'Falta funcionalidad',
+    'funcion_limitada': 'Función limitada',
+    'funcion_incompleta': 'Función incompleta',
+    
+    # Tarifas - EXPANDIDOS
+    'cobros_indebidos': 'Cobros indebidos/inesperados',
+    'comisiones_altas': 'Comisiones muy altas',
+    'costo_oculto': 'Costos ocultos/sorpresa',
+    'intereses_altos': 'Intereses muy altos',
+    
+    # Rendimientos - EXPANDIDOS
+    'rendimiento_bajo': 'Tasa de rendimiento baja',
+    'rendimiento_peor_competencia': 'Rendimiento menor que competencia',
+    'cdi_insuficiente': 'CDI/tasa menor al prometido',
+    'demora_rendimiento': 'Demora en acreditar rendimiento',
+    # legacy
+    'tasa_baja': 'Tasa de rendimiento baja',
+    'comparacion_competencia': 'Mejor en competencia',
+    'calculo_confuso': 'Cálculo confuso',
+    
+    # Genéricos
+    'experiencia_general': 'Experiencia general negativa',
+    'expectativa_frustrada': 'Expectativa no cumplida',
+    'sin_razon_especifica': 'Sin razón específica',
+    'recomendacion_parcial': 'Recomendación parcial',
+    'insatisfaccion_general': 'Insatisfacción general',
+    'insatisfaccion_grave': 'Insatisfacción grave',
+    'comparar_competencia': 'Comparación negativa con competencia',
+}
+
+
+@lru_cache(maxsize=None)
+def _clave_patrones_subcausas(categoria: str) -> Optional[str]:
+    """Clave de PATRONES_SUBCAUSAS para una categoría (exacta, match parcial o '_default')."""
+    if PATRONES_SUBCAUSAS.get(categoria):
+        return categoria
+    for key in PATRONES_SUBCAUSAS:
+        if key.lower() in categoria.lower() or categoria.lower() in key.lower():
+            if PATRONES_SUBCAUSAS[key]:
+                return key
+            break
+    return '_default' if PATRONES_SUBCAUSAS.get('_default') else None
+
+
+@lru_cache(maxsize=None)
+def _compilar_subcausas():
     """
-    Analiza comentarios REALES y clasifica cada uno en UNA subcausa.
-    Retorna distribución que suma ~100% sobre los comentarios analizados.
+    Compila TODAS las keywords de PATRONES_SUBCAUSAS (todas las categorías)
+    en un único regex-trie (indice_comentarios.compilar_keywords).
     
-    ⚠️ IMPORTANTE: Esta función NUNCA genera ni inventa comentarios.
-    Solo CLASIFICA los comentarios reales que recibe del DataFrame.
-    Los comentarios vienen de: parte7_causas_raiz.py -> exportar_comentarios_para_cursor()
-    que los extrae directamente de df_q[col_comentario].dropna().astype(str).tolist()
+    Returns:
+        tuple: (regex compilado, dict keyword normalizada → número de columna,
+                dict keyword → columnas de las keywords que son prefijo suyo)
+    """
+    return compilar_keywords(
+        normalizar_texto(kw)
+        for patrones in PATRONES_SUBCAUSAS.values()
+        for keywords in patrones.values()
+        for kw in keywords
+    )
+
+
+@lru_cache(maxsize=None)
+def _matriz_patrones(clave: Optional[str]):
+    """
+    Matriz keyword → subcausa para un set de patrones.
     
-    Args:
-        comentarios: Lista de comentarios REALES del dataset (NUNCA inventados)
-        categoria: Categoría del motivo (Financiamiento, Rendimientos, etc.)
-        
     Returns:
-        Lista de subcausas con porcentaje sobre total (suma ~100%)
+        tuple: (nombres de subcausa, columnas del regex por keyword,
+                matriz pertenencia keyword × subcausa, largos de keyword)
     """
-    if not comentarios or len(comentarios) < 2:
-        return []
+    patrones = PATRONES_SUBCAUSAS.get(clave, {}) if clave else {}
+    _, columnas, _ = _compilar_subcausas()
+    nombres = list(patrones)
+    keywords = [normalizar_texto(kw) for kws in patrones.values() for kw in kws]
+    pertenece = np.zeros((len(keywords), len(nombres)))
+    subcausa_de_kw = np.repeat(np.arange(len(nombres)), [len(kws) for kws in patrones.values()])
+    pertenece[np.arange(len(keywords)), subcausa_de_kw] = 1
+    cols = np.array([columnas[kw] for kw in keywords], dtype=np.int64)
+    largos = np.array([len(kw) for kw in keywords], dtype=float)
+    return nombres, cols, pertenece, largos
+
+
+def presencia_keywords_subcausas(indice: Dict) -> np.ndarray:
+    """
+    Matriz booleana texto único × keyword (todas las categorías), cacheada en el índice.
     
-    # Obtener patrones para la categoría (con fallback)
-    patrones = PATRONES_SUBCAUSAS.get(categoria)
-    if not patrones:
-        # Intentar match parcial
-        for key in PATRONES_SUBCAUSAS:
-            if key.lower() in categoria.lower() or categoria.lower() in key.lower():
-                patrones = PATRONES_SUBCAUSAS[key]
-                break
-    if not patrones:
-        patrones = PATRONES_SUBCAUSAS.get('_default', {})
-    
-    # Nombres amigables para subcausas (ESPAÑOL, legibles para C-level)
-    NOMBRES_DISPLAY = {
-        # Financiamiento
-        'limite_bajo': 'Límite de crédito insuficiente',
-        'rechazo_credito': 'Rechazo de solicitud de crédito',
-        'tasas_altas': 'Tasas/intereses altos',
-        'proceso_lento': 'Proceso de solicitud difícil',
-        'cuotas_problema': 'Problemas con cuotas/pagos',
-        'demora_credito': 'Demora en acreditación',
-        
-        # Seguridad - EXPANDIDOS
-        'fraude_conta_invadida': 'Fraude/cuenta invadida',
-        'tarjeta_clonada': 'Tarjeta clonada',
-        'golpe_phishing': 'Phishing/estafa digital',
-        'conta_bloqueada': 'Cuenta bloqueada sin explicación',
-        'problemas_autenticacion': 'Problemas de autenticación',
-        'problemas_contraseña': 'Problemas con contraseña',
-        'transaccion_no_reconocida': 'Transacción no reconocida',
-        'inseguridad_general': 'Percepción de inseguridad',
-        # legacy
-        'fraude_robo': 'Fraude/robo de cuenta',
-        'phishing_estafa': 'Phishing/estafa',
-        'cuenta_bloqueada': 'Cuenta bloqueada',
-        'falta_proteccion': 'Falta de protección',
-        'autenticacao_insuficiente': 'Autenticación insuficiente',
-        'senha_acesso': 'Problemas con contraseña',
-        'transacao_nao_reconhecida': 'Transacción no reconocida',
-        'medo_inseguranca': 'Percepción de inseguridad',
-        'conta_bloqueada_restricao': 'Cuenta bloqueada/restringida',
-        
-        # Atención - EXPANDIDOS
-        'demora_respuesta': 'Demora en atención al cliente',
-        'no_resuelve': 'No resuelven el problema',
-        'atencion_robot': 'Atención automatizada/robot',
-        'dificil_contactar': 'Difícil contactar soporte',
-        'mala_atencion': 'Mal trato en atención',
-        'problema_ticket': 'Reclamo sin resolver',
-        # legacy
-        'robot_no_humano': 'Atención robot/no humano',
-        'canal_dificil': 'Difícil contactar soporte',
-        
-        # Complejidad - EXPANDIDOS
-        'app_dificil': 'App difícil de usar',
-        'proceso_largo': 'Proceso muy largo/burocrático',
-        'bugs_errores': 'Errores técnicos en la app',
-        'interfaz_confusa': 'Interfaz confusa/cambió layout',
-        'funcionalidad_faltante': 'Funcionalidad básica faltante',
-        
-        # Promociones - EXPANDIDOS
-        'cashback_no_acreditado': 'Cashback no acreditado',
-        'promocion_limitada': 'Promoción con muchas restricciones',
-        'beneficio_reducido': 'Beneficios reducidos vs antes',
-        'cupon_invalido': 'Cupón/código no funciona',
-        'peor_que_competencia': 'Menos beneficios que competencia',
-        'promocion_confusa': 'Promoción confusa/engañosa',
-        'pocos_beneficios': 'Pocos beneficios disponibles',
-        # legacy
-        'cashback_problema': 'Cashback no acreditado',
-        'comparacao_concorrencia': 'Mejor en competencia',
-        'promocao_confusa': 'Promoción confusa',
-        'promocion_enganosa': 'Promoción engañosa',
-        'beneficio_cancelado': 'Beneficio cancelado',
-        'condiciones_ocultas': 'Condiciones ocultas',
-        
-        # Funcionalidades - EXPANDIDOS
-        'pix_problemas': 'Problemas con Pix',
-        'tarjeta_virtual': 'Problemas con tarjeta virtual',
-        'pagos_servicios': 'Problemas pagando servicios',
-        'limite_transferencia': 'Límite de transferencia bajo',
-        'funcion_basica_faltante': 'Función básica faltante',
-        'notificaciones': 'Problemas con notificaciones',
-        'extrato_comprobante': 'No puede exportar extracto',
-        'personalizacion': 'Falta personalización',
-        # legacy
-        'cartao_virtual': 'Tarjeta virtual',
-        'pagamentos_boletos': 'Pagos/boletos',
-        'transferencia_limitada': 'Límite de transferencia',
-        'funcao_basica_falta': 'Falta función básica',
-        'notificacoes': 'Notificaciones',
-        'exportar_dados': 'Exportar datos/extracto',
-        'personalizacao': 'Personalización',
-        'falta_funcion': 'Falta funcionalidad',
-        'funcion_limitada': 'Función limitada',
-        'funcion_incompleta': 'Función incompleta',
-        
-        # Tarifas - EXPANDIDOS
-        'cobros_indebidos': 'Cobros indebidos/inesperados',
-        'comisiones_altas': 'Comisiones muy altas',
-        'costo_oculto': 'Costos ocultos/sorpresa',
-        'intereses_altos': 'Intereses muy altos',
-        
-        # Rendimientos - EXPANDIDOS
-        'rendimiento_bajo': 'Tasa de rendimiento baja',
-        'rendimiento_peor_competencia': 'Rendimiento menor que competencia',
-        'cdi_insuficiente': 'CDI/tasa menor al prometido',
-        'demora_rendimiento': 'Demora en acreditar rendimiento',
-        # legacy
-        'tasa_baja': 'Tasa de rendimiento baja',
-        'comparacion_competencia': 'Mejor en competencia',
-        'calculo_confuso': 'Cálculo confuso',
-        
-        # Genéricos
-        'experiencia_general': 'Experiencia general negativa',
-        'expectativa_frustrada': 'Expectativa no cumplida',
-        'sin_razon_especifica': 'Sin razón específica',
-        'recomendacion_parcial': 'Recomendación parcial',
-        'insatisfaccion_general': 'Insatisfacción general',
-        'insatisfaccion_grave': 'Insatisfacción grave',
-        'comparar_competencia': 'Comparación negativa con competencia',
-    }
+    Es el único escaneo de texto de la clasificación de subcausas.
+    """
+    cache = indice['_cache']
+    if 'presencia_subcausas' not in cache:
+        cache['presencia_subcausas'] = presencia_keywords(textos_normalizados(indice, 'plano'), *_compilar_subcausas())
+    return cache['presencia_subcausas']
+
+
+def _mejor_subcausa(presencia: np.ndarray, clave: Optional[str]):
+    """
+    Best-match por comentario: la subcausa con más keywords presentes.
+    Desempata por especificidad (largo promedio de keywords matcheados) y
+    luego por orden en el dict. Retorna (nombres, índice de subcausa o -1).
+    """
+    nombres, cols, pertenece, largos = _matriz_patrones(clave)
+    if not len(cols) or len(presencia) == 0:
+        return nombres, np.full(len(presencia), -1)
+    presentes = presencia[:, cols]
+    hits = presentes @ pertenece
+    largo_total = presentes @ (pertenece * largos[:, None])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        especificidad = np.where(hits > 0, largo_total / hits, -np.inf)
+    
+    candidatos = (hits == hits.max(axis=1, keepdims=True)) & (hits > 0)
+    especificidad = np.where(candidatos, especificidad, -np.inf)
+    mejores = candidatos & (especificidad == especificidad.max(axis=1, keepdims=True))
+    elegido = mejores.argmax(axis=1)
+    elegido[~candidatos.any(axis=1)] = -1
+    return nombres, elegido
+
+
+def clasificar_subcausas(indice: Dict, ids: np.ndarray, categoria: str) -> np.ndarray:
+    """
+    Asigna UNA subcausa a cada comentario de la selección (vectorizado).
     
-    # Obtener también patrones _default para fallback
-    patrones_default = PATRONES_SUBCAUSAS.get('_default', {})
-    
-    # Clasificar CADA comentario en UNA sola subcausa
-    clasificaciones = {subcausa: {'count': 0, 'ejemplos': []} for subcausa in patrones}
-    # Agregar patrones default al clasificador
-    for subcausa in patrones_default:
-        if subcausa not in clasificaciones:
-            clasificaciones[subcausa] = {'count': 0, 'ejemplos': []}
-    clasificaciones['otros_temas'] = {'count': 0, 'ejemplos': []}
-    
-    total_clasificados = 0
-    
-    def normalizar_texto(texto):
-        """Normaliza el texto para búsqueda"""
-        texto = texto.lower()
-        # Normalizar encoding
-        texto = texto.replace('ã', 'a').replace('õ', 'o').replace('ç', 'c')
-        texto = texto.replace('á', 'a').replace('é', 'e').replace('í', 'i')
-        texto = texto.replace('ó', 'o').replace('ú', 'u').replace('ñ', 'n')
-        texto = texto.replace('à', 'a').replace('è', 'e').replace('ì', 'i')
-        texto = texto.replace('ò', 'o').replace('ù', 'u')
-        return texto
-    
-    def buscar_match(texto, patrones_dict):
-        """Busca best-match: la subcausa con más keywords que aparecen en el texto.
-        Desempata por especificidad (largo promedio de keywords matcheados)."""
-        mejor_subcausa = None
-        mejor_hits = 0
-        mejor_especificidad = 0  # largo promedio de keywords matcheados (más largo = más específico)
-        
-        for subcausa, keywords in patrones_dict.items():
-            hits = 0
-            largo_total = 0
-            for kw in keywords:
-                kw_norm = normalizar_texto(kw)
-                if kw_norm in texto:
-                    hits += 1
-                    largo_total += len(kw_norm)
-            
-            if hits > 0:
-                especificidad = largo_total / hits  # largo promedio del keyword
-                # Gana la subcausa con más hits; si empatan, la más específica
-                if (hits > mejor_hits) or (hits == mejor_hits and especificidad > mejor_especificidad):
-                    mejor_subcausa = subcausa
-                    mejor_hits = hits
-                    mejor_especificidad = especificidad
-        
-        return mejor_subcausa
+    1. Patrones de la categoría, 2. patrones '_default', 3. 'otros_temas'.
+    """
+    presencia = presencia_keywords_subcausas(indice)[np.asarray(ids, dtype=np.int64)]
+    asignacion = np.full(len(presencia), 'otros_temas', dtype=object)
     
-    for comentario in comentarios:
-        texto = normalizar_texto(comentario)
-        
-        clasificado = False
+    nombres, elegido = _mejor_subcausa(presencia, _clave_patrones_subcausas(categoria))
+    asignacion[elegido >= 0] = np.array(nombres, dtype=object)[elegido[elegido >= 0]]
+    
+    sin_match = np.flatnonzero(elegido < 0)
+    nombres, elegido = _mejor_subcausa(presencia[sin_match], '_default')
+    asignacion[sin_match[elegido >= 0]] = np.array(nombres, dtype=object)[elegido[elegido >= 0]]
+    return asignacion
+
+
+def tabla_subcausas(indice: Dict, selecciones: Dict, max_muestras: int = 5):
+    """
+    Tabla dispersa motivo × subcausa para varias selecciones en una pasada.
+    
+    Args:
+        indice: Índice de comentarios compartido
+        selecciones: {clave: (ids, categoria)} (clave = motivo o posición)
+        max_muestras: Cantidad de índices de muestra por celda
         
-        # 1. Primero intentar con patrones de la categoría específica
-        match = buscar_match(texto, patrones)
-        if match:
-            clasificaciones[match]['count'] += 1
-            # Guardar hasta 5 ejemplos REALES (truncados a 150 chars para legibilidad)
-            if len(clasificaciones[match]['ejemplos']) < 5:
-                clasificaciones[match]['ejemplos'].append(comentario[:150])
-            clasificado = True
-            total_clasificados += 1
-        
-        # 2. Si no encontró, intentar con patrones _default
-        if not clasificado:
-            match = buscar_match(texto, patrones_default)
-            if match:
-                clasificaciones[match]['count'] += 1
-                if len(clasificaciones[match]['ejemplos']) < 5:
-                    clasificaciones[match]['ejemplos'].append(comentario[:150])
-                clasificado = True
-                total_clasificados += 1
-        
-        # 3. Solo si no matchea nada, va a "otros"
-        if not clasificado:
-            clasificaciones['otros_temas']['count'] += 1
-            if len(clasificaciones['otros_temas']['ejemplos']) < 5:
-                clasificaciones['otros_temas']['ejemplos'].append(comentario[:150])
-            total_clasificados += 1
-    
-    # Total de comentarios analizados
-    total = total_clasificados if total_clasificados > 0 else 1
+    Returns:
+        dict {clave: {subcausa: {'count': n, 'muestras': [posiciones en la selección]}}}
+        solo con celdas no vacías
+    """
+    presencia_keywords_subcausas(indice)  # escaneo único para todas las selecciones
+    tabla = {}
+    for clave, (ids, categoria) in selecciones.items():
+        asignacion = clasificar_subcausas(indice, ids, categoria)
+        celdas = {}
+        for posicion, subcausa in enumerate(asignacion):
+            celda = celdas.setdefault(subcausa, {'count': 0, 'muestras': []})
+            celda['count'] += 1
+            if len(celda['muestras']) < max_muestras:
+                celda['muestras'].append(posicion)
+        tabla[clave] = celdas
+    return tabla
+
+
+def _orden_subcausas(categoria: str) -> List[str]:
+    """Orden de las subcausas para la salida: categoría, '_default' y 'otros_temas'."""
+    orden = list(PATRONES_SUBCAUSAS.get(_clave_patrones_subcausas(categoria), {}))
+    orden += [s for s in PATRONES_SUBCAUSAS.get('_default', {}) if s not in orden]
+    return orden + ['otros_temas']
+
+
+def formatear_subcausas(celdas: Dict, comentarios: List[str], categoria: str) -> List[Dict]:
+    """
+    Distribución de subcausas (suma ~100%) a partir de una fila de tabla_subcausas.
+    
+    Las evidencias son SIEMPRE comentarios reales (truncados a 150 chars).
+    """
+    total = len(comentarios) if comentarios else 1
     
     # Construir lista de subcausas
     subcausas = []
-    for nombre, datos in clasificaciones.items():
-        if datos['count'] > 0:
-            nombre_display = NOMBRES_DISPLAY.get(nombre, nombre.replace('_', ' ').title())
+    for nombre in _orden_subcausas(categoria):
+        datos = celdas.get(nombre)
+        if datos and datos['count'] > 0:
+            nombre_display = NOMBRES_DISPLAY_SUBCAUSAS.get(nombre, nombre.replace('_', ' ').title())
             if nombre == 'otros_temas':
                 nombre_display = 'Otros temas'
             
@@ -1035,7 +1121,7 @@ def generar_subcausas_automatico(comentarios: List[str], categoria: str) -> List
                 'nombre': nombre,
                 'porcentaje': pct,  # % sobre total de comentarios
                 'menciones': datos['count'],
-                'evidencia': datos['ejemplos']
+                'evidencia': [comentarios[i][:150] for i in datos['muestras']]
             })
     
     # Ordenar por porcentaje y tomar top (pero incluir todos los significativos)
@@ -1065,7 +1151,36 @@ def generar_subcausas_automatico(comentarios: List[str], categoria: str) -> List
     return subcausas_filtradas
 
 
-def extraer_tema_especifico(comentarios: List[str], motivo: str, max_sample: int = 50) -> str:
+def generar_subcausas_automatico(comentarios: List[str], categoria: str, indice: Dict = None) -> List[Dict]:
+    """
+    Analiza comentarios REALES y clasifica cada uno en UNA subcausa.
+    Retorna distribución que suma ~100% sobre los comentarios analizados.
+    
+    ⚠️ IMPORTANTE: Esta función NUNCA genera ni inventa comentarios.
+    Solo CLASIFICA los comentarios reales que recibe del DataFrame.
+    Los comentarios vienen de: parte7_causas_raiz.py -> exportar_comentarios_para_cursor()
+    que los extrae directamente de df_q[col_comentario].dropna().astype(str).tolist()
+    
+    Args:
+        comentarios: Lista de comentarios REALES del dataset (NUNCA inventados)
+        categoria: Categoría del motivo (Financiamiento, Rendimientos, etc.)
+        indice: Índice de comentarios compartido (indice_comentarios); si es None
+                se construye uno para esta lista
+        
+    Returns:
+        Lista de subcausas con porcentaje sobre total (suma ~100%)
+    """
+    if not comentarios or len(comentarios) < 2:
+        return []
+    
+    if indice is None:
+        indice = construir_indice_comentarios(comentarios)
+    tabla = tabla_subcausas(indice, {categoria: (ids_de_textos(indice, comentarios), categoria)})
+    return formatear_subcausas(tabla[categoria], comentarios, categoria)
+
+
+def extraer_tema_especifico(comentarios: List[str], motivo: str, max_sample: int = 50,
+                            indice: Dict = None) -> str:
     """
     Extrae un tema ESPECÍFICO y DESCRIPTIVO de los comentarios reales.
     
@@ -1083,7 +1198,13 @@ def extraer_tema_especifico(comentarios: List[str], motivo: str, max_sample: int
     
     # Muestrear más comentarios para mejor análisis
     sample_size = min(max_sample, len(comentarios))
-    sample = random.sample(comentarios, sample_size) if len(comentarios) > sample_size else comentarios
+    sample = (random.Random(semilla_estable(motivo, len(comentarios))).sample(comentarios, sample_size)
+              if len(comentarios) > sample_size else comentarios)
+    
+    # Textos normalizados (minúsculas, sin acentos) desde el índice compartido
+    if indice is None:
+        indice = construir_indice_comentarios(sample)
+    normalizados = textos_normalizados(indice, 'acordeones').to_numpy()[ids_de_textos(indice, sample)]
     
     # COMPETIDORES conocidos (para detectar comparaciones)
     COMPETIDORES = {
@@ -1120,13 +1241,7 @@ def extraer_tema_especifico(comentarios: List[str], motivo: str, max_sample: int
     ejemplos_competencia = []
     ejemplos_problemas = []
     
-    for comentario in sample:
-        texto = comentario.lower()
-        # Normalizar
-        texto_norm = texto.replace('ã', 'a').replace('õ', 'o').replace('ç', 'c')
-        texto_norm = texto_norm.replace('á', 'a').replace('é', 'e').replace('í', 'i')
-        texto_norm = texto_norm.replace('ó', 'o').replace('ú', 'u').replace('ñ', 'n')
-        
+    for comentario, texto_norm in zip(sample, normalizados):
         # Buscar menciones de competencia
         for competidor in COMPETIDORES:
             if competidor in texto_norm:
@@ -1179,61 +1294,18 @@ def extraer_tema_especifico(comentarios: List[str], motivo: str, max_sample: int
     return tema
 
 
-def extraer_keywords_avanzado(comentarios: List[str], top_n: int = 10) -> Dict[str, int]:
+def extraer_keywords_avanzado(comentarios: List[str], top_n: int = 10, indice: Dict = None) -> Dict[str, int]:
     """
     Extrae keywords más frecuentes de los comentarios.
-    Excluye stopwords y palabras muy genéricas de fintech.
-    """
-    stopwords = {
-        # Portugués básico
-        'de', 'a', 'o', 'que', 'e', 'do', 'da', 'em', 'um', 'para', 'é', 'com',
-        'não', 'uma', 'os', 'no', 'se', 'na', 'por', 'mais', 'as', 'dos', 'como',
-        'mas', 'foi', 'ao', 'ele', 'das', 'tem', 'à', 'seu', 'sua', 'ou', 'ser',
-        'nao', 'voce', 'você', 'eles', 'elas', 'nos', 'essa', 'esse', 'isso',
-        # Español básico
-        'la', 'el', 'en', 'los', 'del', 'las', 'al', 'lo', 'pero', 'sus', 'le',
-        'ya', 'fue', 'este', 'ha', 'sí', 'porque', 'muy', 'bien', 'mal', 'todo',
-        'usar', 'uso', 'ter', 'fazer', 'sempre', 'siempre', 'ainda', 'todavía',
-        'quando', 'cuando', 'onde', 'donde', 'como', 'muito', 'mucho', 'poco',
-        'pouco', 'nada', 'tudo', 'isso', 'eso', 'esto', 'aqui', 'aquí', 'ali',
-        'ahí', 'mesmo', 'mismo', 'gosto', 'gusto', 'gosta', 'gusta', 'acho',
-        'creo', 'pienso', 'penso', 'esta', 'este', 'esos', 'esas',
-        # Marcas y genéricos de fintech (NO informativos)
-        'app', 'mercado', 'pago', 'libre', 'nubank', 'banco', 'bank', 'conta',
-        'cuenta', 'aplicativo', 'aplicacion', 'dinheiro', 'dinero', 'plata',
-        'gente', 'pessoa', 'personas', 'usuario', 'cliente', 'clientes',
-        'coisa', 'cosa', 'cosas', 'forma', 'manera', 'parte', 'lugar',
-        'tempo', 'tiempo', 'vezes', 'veces', 'dias', 'anos', 'meses',
-        'alguns', 'algunas', 'varios', 'outras', 'otros', 'otras', 'outro',
-        'seria', 'poderia', 'podria', 'deveria', 'deberia', 'fazer', 'hacer',
-        'sendo', 'siendo', 'tendo', 'teniendo', 'pode', 'puede', 'podem',
-        'precisa', 'necesita', 'quero', 'quiero', 'quer', 'quiere',
-        'bom', 'bueno', 'ruim', 'malo', 'melhor', 'mejor', 'pior', 'peor',
-        'recomendo', 'recomiendo', 'gostaria', 'gustaria', 'ainda', 'todavia',
-        'sobre', 'entre', 'desde', 'hasta', 'cada', 'toda', 'todas', 'todos',
-        # Palabras genéricas adicionales (NO informativas)
-        'algumas', 'alguma', 'algum', 'algo', 'algun', 'alguno', 'alguna',
-        'muitas', 'muita', 'muitos', 'muchas', 'muchos', 'mucha',
-        'sempre', 'nunca', 'tambem', 'también', 'porem', 'porém',
-        'apenas', 'somente', 'apenas', 'solo', 'solamente', 'apenas',
-        'agora', 'ahora', 'depois', 'despues', 'antes', 'logo',
-        'assim', 'entao', 'entonces', 'portanto', 'pois', 'porque',
-        'sendo', 'sido', 'estar', 'estou', 'estoy', 'estava', 'estaba'
-    }
-    
+    Excluye stopwords y palabras muy genéricas de fintech
+    (perfil 'acordeones' de indice_comentarios).
+    """
     if not comentarios:
         return {}
     
-    texto = ' '.join(comentarios).lower()
-    # Normalizar
-    texto = texto.replace('ã', 'a').replace('õ', 'o').replace('ç', 'c')
-    texto = texto.replace('á', 'a').replace('é', 'e').replace('í', 'i')
-    texto = texto.replace('ó', 'o').replace('ú', 'u').replace('ñ', 'n')
-    
-    palabras = re.findall(r'\b[a-z]{4,15}\b', texto)
-    palabras_filtradas = [p for p in palabras if p not in stopwords]
-    
-    return dict(Counter(palabras_filtradas).most_common(top_n))
+    if indice is None:
+        indice = construir_indice_comentarios(comentarios)
+    return top_keywords(indice, ids_de_textos(indice, comentarios), top_n=top_n, perfil='acordeones')
 
 
 # ==============================================================================
@@ -1499,15 +1571,20 @@ def enriquecer_waterfall_para_acordeones(causas_waterfall: List[Dict],
         if queja:
             triang_por_queja[queja] = t
     
-    causas_enriquecidas = []
-    
+    # Índice compartido: todos los comentarios (motivo × quarter) se tokenizan una vez
+    textos, motivos_idx, quarters_idx = [], [], []
+    for motivo_key, datos in comentarios_por_motivo.items():
+        for q in ('q1', 'q2'):
+            comms = datos.get(q, []) if isinstance(datos, dict) else []
+            textos.extend(comms)
+            motivos_idx.extend([motivo_key] * len(comms))
+            quarters_idx.extend([q] * len(comms))
+    indice = construir_indice_comentarios(textos, motivo=motivos_idx, ola=quarters_idx)
+    
+    # Comentarios de cada causa (con fuzzy matching)
+    comentarios_causas = []
     for causa in causas_waterfall:
         motivo = causa.get('motivo', '')
-        delta = causa.get('delta', 0)
-        pct_q1 = causa.get('pct_q1', causa.get('impacto_anterior', 0))
-        pct_q2 = causa.get('pct_q2', causa.get('impacto_actual', 0))
-        
-        # Obtener comentarios (con fuzzy matching)
         comentarios_motivo = _buscar_comentarios_fuzzy(motivo, comentarios_por_motivo)
         comms_q1 = comentarios_motivo.get('q1', [])
         comms_q2 = comentarios_motivo.get('q2', [])
@@ -1521,12 +1598,29 @@ def enriquecer_waterfall_para_acordeones(causas_waterfall: List[Dict],
                     comms_q1 = val.get('q1', [])
                     if comms_q2:
                         break
+        comentarios_causas.append((comms_q1, comms_q2))
+    
+    # Subcausas de todas las causas: un solo escaneo (tabla motivo × subcausa)
+    tabla = tabla_subcausas(indice, {
+        i: (ids_de_textos(indice, comms_q2), causa.get('motivo', ''))
+        for i, (causa, (_, comms_q2)) in enumerate(zip(causas_waterfall, comentarios_causas))
+        if len(comms_q2) >= 2
+    })
+    
+    causas_enriquecidas = []
+    
+    for i, causa in enumerate(causas_waterfall):
+        motivo = causa.get('motivo', '')
+        delta = causa.get('delta', 0)
+        pct_q1 = causa.get('pct_q1', causa.get('impacto_anterior', 0))
+        pct_q2 = causa.get('pct_q2', causa.get('impacto_actual', 0))
+        comms_q1, comms_q2 = comentarios_causas[i]
         
         # Generar subcausas automáticamente
-        subcausas = generar_subcausas_automatico(comms_q2, motivo)
+        subcausas = formatear_subcausas(tabla[i], comms_q2, motivo) if i in tabla else []
         
         # Extraer keywords
-        keywords = extraer_keywords_avanzado(comms_q2)
+        keywords = extraer_keywords_avanzado(comms_q2, indice=indice)
         
         # Obtener triangulación (también con fuzzy)
         triangulacion = triang_por_queja.get(motivo)
@@ -1541,10 +1635,10 @@ def enriquecer_waterfall_para_acordeones(causas_waterfall: List[Dict],
         ejemplos_q1 = []
         ejemplos_q2 = []
         if comms_q1:
-            sample_q1 = random.sample(comms_q1, min(5, len(comms_q1)))
+            sample_q1 = random.Random(semilla_estable(motivo, 'q1')).sample(comms_q1, min(5, len(comms_q1)))
             ejemplos_q1 = [c[:150] + '...' if len(c) > 150 else c for c in sample_q1]
         if comms_q2:
-            sample_q2 = random.sample(comms_q2, min(5, len(comms_q2)))
+            sample_q2 = random.Random(semilla_estable(motivo, 'q2')).sample(comms_q2, min(5, len(comms_q2)))
             ejemplos_q2 = [c[:150] + '...' if len(c) > 150 else c for c in sample_q2]
         
         # Combinar para compatibilidad (los más recientes primero)
@@ -1560,7 +1654,7 @@ def enriquecer_waterfall_para_acordeones(causas_waterfall: List[Dict],
         # 1. PRIMERO: Intentar extraer tema ESPECÍFICO de los comentarios (análisis profundo)
         # Esto busca menciones de competencia, problemas concretos, etc.
         if comms_q2 and len(comms_q2) >= 3:
-            tema_especifico = extraer_tema_especifico(comms_q2, motivo, max_sample=50)
+            tema_especifico = extraer_tema_especifico(comms_q2, motivo, max_sample=50, indice=indice)
             if tema_especifico:
                 tema_principal = tema_especifico
         
@@ -1660,7 +1754,8 @@ def buscar_noticias_por_drivers(
         player: Nombre del player
         site: Codigo del site (MLB, MLA, MLM)
         drivers_waterfall: Lista de drivers del waterfall con sus deltas
-        productos_clave: Lista de productos con mayor impacto
+            (los que traen significativo=False se omiten)
+        productos_clave: Lista de productos con mayor impacto (idem)
         delta_seguridad: Variacion de la metrica de seguridad
         delta_principalidad: Variacion de principalidad
         año: Año para busqueda
@@ -1751,6 +1846,10 @@ def buscar_noticias_por_drivers(
     
     queries = []
     
+    # Drivers / productos cuyo Δ no es distinguible del ruido muestral no generan queries
+    drivers_waterfall = [d for d in drivers_waterfall or [] if es_significativo(d)]
+    productos_clave = [p for p in productos_clave or [] if es_significativo(p)]
+    
     # 1. Construir queries basadas en TOP DRIVERS del waterfall (deterioros Y mejoras)
     if drivers_waterfall:
         # Ordenar por delta descendente (delta > 0 = deterioro = más quejas)
@@ -2974,7 +3073,8 @@ def generar_sugerencias_busqueda(
     Args:
         player: Nombre del player
         site: Código del site
-        drivers_waterfall: Lista de drivers con deltas
+        drivers_waterfall: Lista de drivers con deltas (los que traen
+            significativo=False se omiten)
         delta_seguridad: Variación de seguridad
         delta_principalidad: Variación de principalidad
         noticias_actuales: Noticias ya en cache
@@ -3003,12 +3103,14 @@ def generar_sugerencias_busqueda(
         'gaps_sin_noticia': [],
         'busquedas_sugeridas': [],
         'busquedas_causa_raiz': [],
+        'drivers_no_significativos': [d.get('motivo', '') for d in drivers_waterfall if not es_significativo(d)],
         'resumen': ''
     }
     
-    # Ordenar drivers por impacto (valor absoluto del delta)
+    # Ordenar drivers por impacto (valor absoluto del delta); los no significativos
+    # (Δ dentro del ruido muestral, ver significancia.py) no generan búsquedas
     drivers_ordenados = sorted(
-        drivers_waterfall, 
+        [d for d in drivers_waterfall if es_significativo(d)], 
         key=lambda x: abs(x.get('delta', 0)), 
         reverse=True
     )
@@ -3036,6 +3138,7 @@ def generar_sugerencias_busqueda(
             'motivo': motivo,
             'delta': round(delta, 2),
             'direccion': direccion,
+            'z': driver.get('z'),
             'causa_raiz_top': causa_top or '',
             'terminos_dominio': terminos_dominio[:2]
         })
@@ -3099,6 +3202,8 @@ def generar_sugerencias_busqueda(
     
     # Agregar búsquedas adicionales basadas en causas raíz (2da causa + términos dominio)
     for motivo, datos in causas_semanticas.items():
+        if motivo in sugerencias['drivers_no_significativos']:
+            continue
         causas = datos.get('causas_raiz', [])
         if len(causas) >= 2:
             segunda_causa = causas[1]
@@ -3173,6 +3278,9 @@ def mostrar_sugerencias_busqueda(sugerencias: Dict) -> str:
         td_txt = f" [terminos: {', '.join(d['terminos_dominio'])}]" if d.get('terminos_dominio') else ""
         lines.append(f"   {emoji} {d['motivo']}: {d['delta']:+.2f}pp ({d['direccion']}){causa_txt}{td_txt}")
     
+    if sugerencias.get('drivers_no_significativos'):
+        lines.append(f"   ⚪ Sin cambio significativo (omitidos): {', '.join(sugerencias['drivers_no_significativos'])}")
+    
     if sugerencias['gaps_sin_noticia']:
         lines.append("\n" + "-" * 50)
         lines.append("!! GAPS SIN NOTICIA:")
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════════════
+BENCHMARK: CASCADA DE CATEGORIZACIÓN (PARTE 4, MODO IA)
+═══════════════════════════════════════════════════════════════════════════════
+
+Compara la cascada vectorizada (parte4.resolver_cascada_ia) contra la
+implementación fila a fila anterior (referencia incluida abajo) sobre datos
+sintéticos, y verifica que MOTIVO_IA y los conteos sean idénticos.
+
+Uso:
+    python scripts/benchmark_categorizacion.py                 # 1M filas
+    python scripts/benchmark_categorizacion.py --filas 200000
+    python scripts/benchmark_categorizacion.py --sin-referencia  # solo la versión nueva
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from parte4_categorizacion import hash_comentario, resolver_cascada_ia
+
+OTROS = 'Otros'
+
+# ==============================================================================
+# DATOS SINTÉTICOS
+# ==============================================================================
+
+def generar_datos_sinteticos(n_filas=1_000_000, seed=42):
+    """
+    Genera comentarios de neutros/detractores y los índices de BigQuery.
+
+    Mezcla: ~50% por clave compuesta, ~10% solo por ID, ~10% por hash,
+    ~15% por motivo declarado y el resto cae en OTROS. Los comentarios se
+    repiten (vocabulario limitado) como en las encuestas reales.
+
+    Returns:
+        tuple: (df, bq_por_clave, bq_por_id, bq_por_hash)
+    """
+    rng = np.random.default_rng(seed)
+    olas = np.array(['25Q1', '25Q2', '25Q3', '25Q4', '26Q1'])
+    marcas = np.array(['Mercado Pago', 'Nubank'])
+    motivos = np.array(['Tasas', 'Atención', 'Seguridad', 'Funcionalidades', 'Promociones'])
+    declarados = np.array(['Tasas', ' Atención ', 'Otros', 'otra razón', '', None, 'Seguridad'], dtype=object)
+
+    n_textos = max(1000, n_filas // 20)
+    textos = np.array([f'comentario número {i} con Acentuación  ÁÉÍ' for i in range(n_textos)], dtype=object)
+
+    df = pd.DataFrame({
+        'ID': np.arange(n_filas, dtype=np.int64) + 10_000_000,
+        'OLA': rng.choice(olas, n_filas),
+        'MARCA': rng.choice(marcas, n_filas),
+        'NPS': rng.choice([-1, 0], n_filas),
+        'COMENTARIO': textos[rng.integers(0, n_textos, n_filas)],
+        'MOTIVO_DETRA': rng.choice(declarados, n_filas),
+        'MOTIVO_NEUTRO': rng.choice(declarados, n_filas),
+    })
+
+    grupo = rng.random(n_filas)
+    ids_str = df['ID'].astype(str).to_numpy()
+    motivo_bq = rng.choice(motivos, n_filas)
+
+    por_clave = grupo < 0.5
+    bq_por_clave = dict(zip(
+        (df.loc[por_clave, 'ID'].astype(str) + '|' + df.loc[por_clave, 'OLA'] + '|' + df.loc[por_clave, 'MARCA']),
+        motivo_bq[por_clave]
+    ))
+    por_id = (grupo >= 0.45) & (grupo < 0.6)
+    bq_por_id = dict(zip(ids_str[por_id], motivo_bq[por_id]))
+
+    textos_hash = textos[: n_textos // 3]
+    bq_por_hash = {hash_comentario(t): motivos[i % len(motivos)] for i, t in enumerate(textos_hash)}
+
+    return df, bq_por_clave, bq_por_id, bq_por_hash
+
+
+# ==============================================================================
+# IMPLEMENTACIÓN DE REFERENCIA (versión fila a fila anterior)
+# ==============================================================================
+
+def cascada_referencia(df_con_comentarios, col_id, col_comentarios, col_motivo_detra, col_motivo_neutro,
+                       bq_por_clave, bq_por_id, bq_por_hash, bq_disponible, otros,
+                       col_nps='NPS', col_ola='OLA', col_marca='MARCA'):
+    """Cascada original de categorizar_comentarios (sin prints)."""
+    df_con_comentarios = df_con_comentarios.copy()
+    desde_bigquery = 0
+
+    if len(df_con_comentarios) > 0 and col_id:
+        df_con_comentarios['_id_str'] = df_con_comentarios[col_id].astype(str)
+        if col_marca in df_con_comentarios.columns and col_ola in df_con_comentarios.columns:
+            df_con_comentarios['_clave_compuesta'] = (
+                df_con_comentarios[col_id].astype(str) + '|' +
+                df_con_comentarios[col_ola].astype(str) + '|' +
+                df_con_comentarios[col_marca].astype(str)
+            )
+            df_con_comentarios['MOTIVO_IA'] = df_con_comentarios['_clave_compuesta'].map(bq_por_clave)
+            encontrados_clave = df_con_comentarios['MOTIVO_IA'].notna().sum()
+            if encontrados_clave < len(df_con_comentarios):
+                mask_sin_match = df_con_comentarios['MOTIVO_IA'].isna()
+                df_con_comentarios.loc[mask_sin_match, 'MOTIVO_IA'] = \
+                    df_con_comentarios.loc[mask_sin_match, '_id_str'].map(bq_por_id)
+        else:
+            df_con_comentarios['MOTIVO_IA'] = df_con_comentarios['_id_str'].map(bq_por_id)
+        desde_bigquery = df_con_comentarios['MOTIVO_IA'].notna().sum()
+
+    df_sin_match = df_con_comentarios[df_con_comentarios['MOTIVO_IA'].isna()].copy() if 'MOTIVO_IA' in df_con_comentarios.columns else df_con_comentarios.copy()
+    if len(df_sin_match) > 0 and bq_disponible and len(bq_por_hash) > 0 and col_comentarios:
+        df_sin_match['_hash'] = df_sin_match[col_comentarios].apply(lambda x: hash_comentario(str(x)))
+        df_sin_match['_motivo_hash'] = df_sin_match['_hash'].map(bq_por_hash)
+        encontrados_hash = df_sin_match['_motivo_hash'].notna().sum()
+        if encontrados_hash > 0:
+            df_con_comentarios.loc[df_sin_match.index, 'MOTIVO_IA'] = df_sin_match['_motivo_hash']
+            desde_bigquery += encontrados_hash
+
+    df_sin_match_2 = df_con_comentarios[df_con_comentarios['MOTIVO_IA'].isna()].copy() if 'MOTIVO_IA' in df_con_comentarios.columns else pd.DataFrame()
+    desde_declarado = 0
+    if len(df_sin_match_2) > 0 and (col_motivo_detra or col_motivo_neutro):
+        VALORES_OTROS = {'otros', 'otro', 'outra', 'outras', 'outras razões',
+                         'otra razón', 'otras razones', '', 'nan', 'none', '.', ' '}
+
+        def get_motivo_declarado_valido(row):
+            motivo = None
+            if col_motivo_detra and row[col_nps] == -1:
+                motivo = row.get(col_motivo_detra, None)
+            elif col_motivo_neutro and row[col_nps] == 0:
+                motivo = row.get(col_motivo_neutro, None)
+            if pd.isna(motivo):
+                return None
+            motivo_str = str(motivo).strip()
+            if motivo_str.lower() in VALORES_OTROS:
+                return None
+            return motivo_str
+
+        df_sin_match_2['_motivo_declarado'] = df_sin_match_2.apply(get_motivo_declarado_valido, axis=1)
+        encontrados_declarado = df_sin_match_2['_motivo_declarado'].notna().sum()
+        if encontrados_declarado > 0:
+            mask_validos = df_sin_match_2['_motivo_declarado'].notna()
+            df_con_comentarios.loc[df_sin_match_2[mask_validos].index, 'MOTIVO_IA'] = \
+                df_sin_match_2.loc[mask_validos, '_motivo_declarado']
+            desde_declarado = encontrados_declarado
+
+    df_necesitan_ia = df_con_comentarios[df_con_comentarios['MOTIVO_IA'].isna()] if 'MOTIVO_IA' in df_con_comentarios.columns else pd.DataFrame()
+    desde_ia = 0
+    if len(df_necesitan_ia) > 0:
+        df_con_comentarios.loc[df_necesitan_ia.index, 'MOTIVO_IA'] = otros
+        desde_ia = len(df_necesitan_ia)
+
+    cols_temp = ['_id_str', '_clave_compuesta', '_hash', '_motivo_hash', '_motivo_declarado']
+    df_con_comentarios = df_con_comentarios.drop(columns=[c for c in cols_temp if c in df_con_comentarios.columns], errors='ignore')
+    return df_con_comentarios, {'desde_bigquery': int(desde_bigquery), 'desde_declarado': int(desde_declarado),
+                                'desde_ia': int(desde_ia)}
+
+
+# ==============================================================================
+# BENCHMARK
+# ==============================================================================
+
+def ejecutar_benchmark(n_filas=1_000_000, con_referencia=True, seed=42):
+    """
+    Corre la cascada vectorizada (y opcionalmente la de referencia) y compara.
+
+    Returns:
+        dict: tiempos en segundos, conteos y si el resultado es idéntico
+    """
+    print(f"🧪 Generando {n_filas:,} filas sintéticas...")
+    df, bq_por_clave, bq_por_id, bq_por_hash = generar_datos_sinteticos(n_filas, seed)
+    args = ('ID', 'COMENTARIO', 'MOTIVO_DETRA', 'MOTIVO_NEUTRO', bq_por_clave, bq_por_id, bq_por_hash, True, OTROS)
+
+    t0 = time.perf_counter()
+    df_nuevo, conteos_nuevo = resolver_cascada_ia(df, *args, verbose=False)
+    t_nuevo = time.perf_counter() - t0
+    print(f"   ⚡ Vectorizado: {t_nuevo:.2f}s  {conteos_nuevo}")
+
+    resultado = {'filas': n_filas, 't_vectorizado': t_nuevo, 'conteos': conteos_nuevo}
+
+    if con_referencia:
+        t0 = time.perf_counter()
+        df_ref, conteos_ref = cascada_referencia(df, *args)
+        t_ref = time.perf_counter() - t0
+        identico = (conteos_ref == conteos_nuevo
+                    and list(df_ref.columns) == list(df_nuevo.columns)
+                    and df_ref['MOTIVO_IA'].astype(object).equals(df_nuevo['MOTIVO_IA'].astype(object)))
+        print(f"   🐢 Referencia:  {t_ref:.2f}s  {conteos_ref}")
+        print(f"   {'✅' if identico else '❌'} Resultado idéntico: {identico}  (speedup x{t_ref / max(t_nuevo, 1e-9):.1f})")
+        resultado.update({'t_referencia': t_ref, 'identico': identico})
+
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark de la cascada de categorización (PARTE 4)')
+    parser.add_argument('--filas', type=int, default=1_000_000, help='Cantidad de comentarios sintéticos')
+    parser.add_argument('--sin-referencia', action='store_true', help='No correr la implementación anterior')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    res = ejecutar_benchmark(args.filas, con_referencia=not args.sin_referencia, seed=args.seed)
+    if res.get('identico') is False:
+        sys.exit(1)
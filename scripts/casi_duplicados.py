@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════════════
+COMENTARIOS CASI DUPLICADOS (MINHASH) Y MUESTREO POR PRESUPUESTO DE TOKENS
+═══════════════════════════════════════════════════════════════════════════════
+
+Antes de armar los prompts semánticos (parte7 / parte7b) colapsa los
+comentarios casi idénticos ("limite baixo", "limite muito baixo"...) en un
+representante con su cantidad, y muestrea los grupos ponderando por tamaño
+hasta llenar un presupuesto de tokens.
+
+    - agrupar_casi_duplicados   → grupos [{representante, cantidad, indices}]
+    - muestrear_por_presupuesto → grupos elegidos (ponderados por cantidad)
+    - preparar_muestra_prompt   → ambos pasos, listo para el prompt
+    - formatear_comentarios_prompt → líneas numeradas con marca [×N]
+
+Similitud: Jaccard sobre el conjunto de palabras normalizadas (sin acentos ni
+puntuación). MinHash + LSH (bandas) solo generan candidatos; cada par
+candidato se confirma con el Jaccard exacto contra el líder del grupo, así que
+no hay falsos positivos.
+"""
+
+import re
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from indice_comentarios import normalizar_texto
+
+# ==============================================================================
+# PARÁMETROS
+# ==============================================================================
+
+PRESUPUESTO_TOKENS_MOTIVO = 3000  # ≈ los 100 comentarios por motivo que se muestreaban antes
+UMBRAL_JACCARD = 0.6       # Similitud mínima para considerar dos comentarios casi iguales
+N_HASHES = 60              # Largo de la firma MinHash
+N_BANDAS = 20              # Bandas LSH (3 filas c/u → candidatos desde Jaccard ~0.35)
+LARGO_MAX_PROMPT = 250     # Mismo recorte que los prompts semánticos
+CHARS_POR_TOKEN = 4        # Estimación gruesa de tokens (≈ 4 caracteres por token)
+TOKENS_POR_LINEA = 6       # Numeración, comillas, marca [×N] y salto de línea
+
+_PRIMO = np.uint64(4294967311)  # Primo > 2^32 para la familia (a·x + b) mod p
+_PALABRA = re.compile(r'\w+')
+
+
+def _palabras(texto):
+    """Conjunto de palabras del texto normalizado (sin acentos, sin puntuación)."""
+    return frozenset(_PALABRA.findall(normalizar_texto(texto)))
+
+
+def _jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+# ==============================================================================
+# MINHASH + LSH
+# ==============================================================================
+
+def firmas_minhash(conjuntos, n_hashes=N_HASHES, semilla=1):
+    """
+    Firma MinHash (n_conjuntos × n_hashes, uint64) de cada conjunto de palabras.
+
+    Los conjuntos se concatenan en un solo array y el mínimo por conjunto sale
+    de np.minimum.reduceat, una pasada por función de hash.
+    """
+    n = len(conjuntos)
+    if n == 0:
+        return np.empty((0, n_hashes), dtype=np.uint64)
+
+    # Conjuntos vacíos → un elemento centinela (todos iguales entre sí)
+    elementos = [sorted(c) if c else [''] for c in conjuntos]
+    largos = np.fromiter((len(e) for e in elementos), dtype=np.int64, count=n)
+    inicios = np.concatenate(([0], np.cumsum(largos)[:-1]))
+    valores = np.fromiter((zlib.crc32(p.encode('utf-8')) for e in elementos for p in e),
+                          dtype=np.uint64, count=int(largos.sum()))
+
+    rng = np.random.default_rng(semilla)
+    a = rng.integers(1, 2 ** 31, size=n_hashes, dtype=np.uint64)
+    b = rng.integers(0, 2 ** 32, size=n_hashes, dtype=np.uint64)
+
+    firmas = np.empty((n, n_hashes), dtype=np.uint64)
+    for h in range(n_hashes):
+        firmas[:, h] = np.minimum.reduceat((a[h] * valores + b[h]) % _PRIMO, inicios)
+    return firmas
+
+
+def _cubetas_lsh(firmas, n_bandas=N_BANDAS):
+    """
+    Cubetas LSH por banda: (cubeta de cada conjunto, miembros de cada cubeta).
+
+    Dos conjuntos son candidatos si comparten cubeta en al menos una banda.
+    """
+    n, n_hashes = firmas.shape
+    filas = n_hashes // n_bandas
+    bandas = []
+    for banda in range(n_bandas):
+        bloque = np.ascontiguousarray(firmas[:, banda * filas:(banda + 1) * filas])
+        _, cubeta = np.unique(bloque, axis=0, return_inverse=True)
+        cubeta = cubeta.ravel()
+        orden = np.argsort(cubeta, kind='stable')
+        cortes = np.flatnonzero(np.diff(cubeta[orden])) + 1
+        bandas.append((cubeta, np.split(orden, cortes)))
+    return bandas
+
+
+# ==============================================================================
+# AGRUPAMIENTO
+# ==============================================================================
+
+def agrupar_casi_duplicados(comentarios, umbral=UMBRAL_JACCARD, n_hashes=N_HASHES, n_bandas=N_BANDAS):
+    """
+    Agrupa comentarios casi idénticos (Jaccard de palabras ≥ umbral).
+
+    Los duplicados exactos (tras normalizar) se colapsan antes del MinHash.
+    Después, en orden de frecuencia, cada comentario libre pasa a ser líder de
+    un grupo y absorbe a sus candidatos LSH libres cuyo Jaccard exacto contra
+    el líder supera el umbral (todo miembro se parece al líder).
+
+    Args:
+        comentarios: lista de textos
+        umbral: Jaccard mínimo entre dos comentarios para unirlos
+
+    Returns:
+        list de dicts {'representante', 'cantidad', 'indices'} ordenada por
+        cantidad desc (empates: primera aparición). El representante es el
+        texto más repetido del grupo (empates: el que aparece primero).
+    """
+    if not comentarios:
+        return []
+
+    conjuntos_doc = [_palabras(c) for c in comentarios]
+    claves = pd.Series([' '.join(sorted(c)) for c in conjuntos_doc], dtype=object)
+    doc_unico, _ = pd.factorize(claves)
+    n_unicos = int(doc_unico.max()) + 1
+    primer_doc = np.full(n_unicos, len(comentarios), dtype=np.int64)
+    np.minimum.at(primer_doc, doc_unico, np.arange(len(comentarios)))
+    conjuntos = [conjuntos_doc[i] for i in primer_doc]
+
+    # Líderes en orden de frecuencia: cada uno absorbe a los candidatos libres
+    # con Jaccard ≥ umbral contra él (sin encadenar A~B~C como single-linkage)
+    frecuencia = np.bincount(doc_unico, minlength=n_unicos)
+    orden = np.lexsort((primer_doc, -frecuencia))
+    grupo_unico = np.full(n_unicos, -1, dtype=np.int64)
+    bandas = _cubetas_lsh(firmas_minhash(conjuntos, n_hashes), n_bandas) if n_unicos > 1 else []
+    for lider in orden:
+        if grupo_unico[lider] >= 0:
+            continue
+        grupo_unico[lider] = lider
+        if not bandas:
+            continue
+        candidatos = np.unique(np.concatenate([miembros[cubeta[lider]] for cubeta, miembros in bandas]))
+        for otro in candidatos[grupo_unico[candidatos] < 0]:
+            if _jaccard(conjuntos[lider], conjuntos[otro]) >= umbral:
+                grupo_unico[otro] = lider
+    grupo_doc = grupo_unico[doc_unico]
+
+    # Representante: texto exacto más repetido del grupo (empate → primero)
+    textos = pd.Series(list(comentarios), dtype=object)
+    df = pd.DataFrame({'grupo': grupo_doc, 'texto': pd.factorize(textos)[0],
+                       'doc': np.arange(len(comentarios))})
+    por_texto = df.groupby(['grupo', 'texto'], sort=False)['doc'].agg(['size', 'min'])
+    por_texto = por_texto.sort_values(['size', 'min'], ascending=[False, True], kind='stable')
+    representante = por_texto.reset_index().drop_duplicates('grupo').set_index('grupo')['min']
+
+    grupos = []
+    orden_docs = np.argsort(grupo_doc, kind='stable')
+    cortes = np.flatnonzero(np.diff(grupo_doc[orden_docs])) + 1
+    for miembros in np.split(orden_docs, cortes):
+        g = int(grupo_doc[miembros[0]])
+        grupos.append({
+            'representante': comentarios[int(representante[g])],
+            'cantidad': len(miembros),
+            'indices': miembros.tolist(),
+        })
+    grupos.sort(key=lambda x: (-x['cantidad'], x['indices'][0]))
+    return grupos
+
+
+# ==============================================================================
+# MUESTREO PONDERADO POR PRESUPUESTO DE TOKENS
+# ==============================================================================
+
+def recortar_para_prompt(texto, largo_max=LARGO_MAX_PROMPT):
+    """Mismo recorte que usaban los prompts semánticos."""
+    return texto[:largo_max] + '...' if len(texto) > largo_max else texto
+
+
+def estimar_tokens(texto, largo_max=LARGO_MAX_PROMPT):
+    """Tokens aproximados que ocupa un comentario como línea del prompt."""
+    return -(-len(recortar_para_prompt(texto, largo_max)) // CHARS_POR_TOKEN) + TOKENS_POR_LINEA
+
+
+def muestrear_por_presupuesto(grupos, presupuesto_tokens, semilla=None, largo_max=LARGO_MAX_PROMPT):
+    """
+    Elige grupos ponderando por cantidad hasta llenar el presupuesto de tokens.
+
+    Muestreo ponderado sin reemplazo (Efraimidis-Spirakis: clave u^(1/cantidad)),
+    recorrido en orden de clave: cada grupo entra si todavía cabe en el
+    presupuesto. Siempre entra al menos un grupo. Si todo cabe, entra todo.
+
+    Returns:
+        list de grupos elegidos, ordenada por cantidad desc (como en grupos)
+    """
+    if not grupos:
+        return []
+    rng = np.random.default_rng(semilla)
+    pesos = np.array([g['cantidad'] for g in grupos], dtype=float)
+    claves = rng.random(len(grupos)) ** (1.0 / pesos)
+    costos = [estimar_tokens(g['representante'], largo_max) for g in grupos]
+
+    elegidos, usados = [], 0
+    for i in np.argsort(-claves, kind='stable'):
+        if usados + costos[i] <= presupuesto_tokens or not elegidos:
+            elegidos.append(int(i))
+            usados += costos[i]
+    return [grupos[i] for i in sorted(elegidos)]
+
+
+def preparar_muestra_prompt(comentarios, presupuesto_tokens, umbral=UMBRAL_JACCARD, semilla=None,
+                            largo_max=LARGO_MAX_PROMPT):
+    """
+    Colapsa casi duplicados y muestrea por presupuesto (paso previo al prompt).
+
+    Returns:
+        dict con:
+            - comentarios: representantes elegidos
+            - pesos: cantidad de comentarios que representa cada uno
+            - cubiertos: comentarios originales cubiertos por la muestra
+            - grupos: total de grupos distintos
+            - tokens: tokens estimados de la muestra
+    """
+    grupos = agrupar_casi_duplicados(comentarios, umbral=umbral)
+    elegidos = muestrear_por_presupuesto(grupos, presupuesto_tokens, semilla=semilla, largo_max=largo_max)
+    return {
+        'comentarios': [g['representante'] for g in elegidos],
+        'pesos': [g['cantidad'] for g in elegidos],
+        'cubiertos': sum(g['cantidad'] for g in elegidos),
+        'grupos': len(grupos),
+        'tokens': sum(estimar_tokens(g['representante'], largo_max) for g in elegidos),
+    }
+
+
+def formatear_comentarios_prompt(comentarios, pesos=None, largo_max=LARGO_MAX_PROMPT):
+    """Líneas numeradas para el prompt; los grupos de más de uno llevan [×N]."""
+    pesos = pesos or [1] * len(comentarios)
+    lineas = []
+    for i, (c, n) in enumerate(zip(comentarios, pesos), 1):
+        marca = f'[×{n}] ' if n > 1 else ''
+        lineas.append(f'{i}. {marca}"{recortar_para_prompt(c, largo_max)}"\n\n')
+    return ''.join(lineas)
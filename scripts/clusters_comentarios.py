@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════════════
+PRE-AGRUPAMIENTO LOCAL DE COMENTARIOS EN TEMAS CANDIDATOS (TF-IDF + NMF)
+═══════════════════════════════════════════════════════════════════════════════
+
+Agrupa los comentarios de un motivo (q_act + q_ant) en 2-4 temas candidatos
+sin red ni GPU: TF-IDF sobre el índice compartido (perfil 'acordeones') y
+factorización NMF con actualizaciones multiplicativas en numpy.
+
+Cada tema lleva tamaño por quarter, términos principales y ejemplos. Se usa:
+    - dentro del prompt semántico (el LLM valida/renombra en vez de partir de cero)
+    - como JSON de respaldo (causas_raiz_clusters_*.json, mismo esquema que
+      causas_raiz_semantico_*.json) para tener un reporte antes del análisis LLM
+
+Uso:
+    from clusters_comentarios import agrupar_temas, formatear_temas_prompt
+    temas = agrupar_temas(comms_q2, comms_q1)
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from indice_comentarios import construir_indice_comentarios, matriz_terminos
+from casi_duplicados import recortar_para_prompt
+
+# ==============================================================================
+# PARÁMETROS
+# ==============================================================================
+
+K_MIN = 2                  # Mismo rango que pide el prompt (2-4 causas por motivo)
+K_MAX = 4
+MIN_COMENTARIOS = 5        # Por debajo no se agrupa
+MAX_TERMINOS = 1500        # Vocabulario máximo (por frecuencia documental)
+MIN_DF = 2                 # Un término debe aparecer en ≥ 2 textos distintos
+ITERACIONES_NMF = 150
+_EPS = 1e-9
+
+
+# ==============================================================================
+# TF-IDF + NMF
+# ==============================================================================
+
+def _tfidf(indice, perfil='acordeones', max_terminos=MAX_TERMINOS, min_df=MIN_DF):
+    """
+    Matriz TF-IDF densa (textos únicos × términos), filas con norma L2 = 1.
+
+    tf sublineal (1 + log), idf suavizado. Las filas sin términos quedan en 0.
+    """
+    csr = matriz_terminos(indice, perfil)
+    n_textos = len(indice['textos'])
+    texto_de_token = np.repeat(np.arange(n_textos), np.diff(csr['indptr']))
+    n_vocab = len(csr['vocabulario'])
+
+    # Conteo (texto, término) y frecuencia documental
+    pares = texto_de_token * max(n_vocab, 1) + csr['terminos']
+    pares, conteo = np.unique(pares, return_counts=True)
+    fila, termino = pares // max(n_vocab, 1), pares % max(n_vocab, 1)
+    df = np.bincount(termino, minlength=n_vocab)
+
+    candidatos = np.flatnonzero(df >= min_df)
+    candidatos = candidatos[np.argsort(-df[candidatos], kind='stable')][:max_terminos]
+    columna = np.full(n_vocab, -1, dtype=np.int64)
+    columna[candidatos] = np.arange(len(candidatos))
+
+    X = np.zeros((n_textos, len(candidatos)), dtype=np.float64)
+    usar = columna[termino] >= 0
+    idf = np.log((1 + n_textos) / (1 + df[candidatos])) + 1
+    X[fila[usar], columna[termino[usar]]] = (1 + np.log(conteo[usar])) * idf[columna[termino[usar]]]
+    normas = np.linalg.norm(X, axis=1, keepdims=True)
+    np.divide(X, normas, out=X, where=normas > 0)
+    return X, csr['vocabulario'][candidatos]
+
+
+def nmf(X, k, pesos=None, iteraciones=ITERACIONES_NMF, semilla=0):
+    """
+    NMF (norma de Frobenius, actualizaciones multiplicativas de Lee-Seung).
+
+    pesos: multiplicidad de cada fila (textos repetidos pesan más al estimar H).
+
+    Returns:
+        (W, H): W textos × k, H k × términos
+    """
+    rng = np.random.default_rng(semilla)
+    escala = np.sqrt(max(X.mean(), _EPS) / k)
+    W = rng.random((X.shape[0], k)) * escala
+    H = rng.random((k, X.shape[1])) * escala
+    M = (np.ones(X.shape[0]) if pesos is None else np.asarray(pesos, dtype=float))[:, None]
+    MX = M * X
+    for _ in range(iteraciones):
+        H *= (W.T @ MX) / (W.T @ (M * (W @ H)) + _EPS)
+        W *= (X @ H.T) / (W @ (H @ H.T) + _EPS)
+    return W, H
+
+
+def silueta_simplificada(X, asignado, pesos):
+    """
+    Silueta simplificada por coseno contra los centroides: (a - b) / max(a, b),
+    con a = similitud al centroide propio y b = al mejor centroide ajeno.
+    Promedio ponderado por repeticiones; sirve para elegir k.
+    """
+    k = int(asignado.max()) + 1
+    C = np.zeros((k, X.shape[1]))
+    np.add.at(C, asignado, X * pesos[:, None])
+    normas = np.linalg.norm(C, axis=1, keepdims=True)
+    np.divide(C, normas, out=C, where=normas > 0)
+    sim = X @ C.T
+    filas = np.arange(len(asignado))
+    a = sim[filas, asignado]
+    sim[filas, asignado] = -np.inf
+    b = sim.max(axis=1)
+    s = (a - b) / np.maximum(np.maximum(a, b), _EPS)
+    return float(np.average(s, weights=pesos))
+
+
+# ==============================================================================
+# TEMAS CANDIDATOS
+# ==============================================================================
+
+def agrupar_temas(comentarios_act, comentarios_ant=(), k=None, n_terminos=6, n_ejemplos=3,
+                  perfil='acordeones', semilla=0):
+    """
+    Agrupa los comentarios de un motivo en temas candidatos.
+
+    Se factoriza sobre los textos únicos de ambos quarters (ponderados por
+    repeticiones) para que los temas sean comparables entre q_ant y q_act.
+    Cada texto va al tema de mayor peso en W; los textos sin términos útiles
+    quedan "sin tema".
+
+    Args:
+        comentarios_act: comentarios del quarter actual
+        comentarios_ant: comentarios del quarter anterior
+        k: cantidad de temas (None → el de mejor silueta entre K_MIN y K_MAX)
+
+    Returns:
+        dict con temas (list de dicts ordenada por n_act desc: tema, titulo,
+        terminos, n_act, n_ant, pct_act, pct_ant, delta_pp, ejemplos),
+        n_act, n_ant, sin_tema_act, sin_tema_ant y k.
+        Sin comentarios suficientes: temas = [].
+    """
+    comentarios_act, comentarios_ant = list(comentarios_act), list(comentarios_ant)
+    n_act, n_ant = len(comentarios_act), len(comentarios_ant)
+    vacio = {'temas': [], 'n_act': n_act, 'n_ant': n_ant,
+             'sin_tema_act': n_act, 'sin_tema_ant': n_ant, 'k': 0}
+    if n_act < MIN_COMENTARIOS:
+        return vacio
+
+    indice = construir_indice_comentarios(comentarios_act + comentarios_ant,
+                                          ola=['act'] * n_act + ['ant'] * n_ant)
+    X, vocabulario = _tfidf(indice, perfil)
+    n_textos = X.shape[0]
+    con_terminos = X.any(axis=1)
+    if con_terminos.sum() < K_MIN or X.shape[1] < K_MIN:
+        return vacio
+
+    # Repeticiones de cada texto único por quarter
+    doc_texto = indice['doc_texto']
+    es_act = np.arange(len(doc_texto)) < n_act
+    rep_act = np.bincount(doc_texto[es_act], minlength=n_textos)
+    rep_ant = np.bincount(doc_texto[~es_act], minlength=n_textos)
+
+    # k fijo, o el de mejor silueta en [K_MIN, K_MAX] (empate → menos temas)
+    Xc, pesos = X[con_terminos], (rep_act + rep_ant)[con_terminos].astype(float)
+    tope = min(int(con_terminos.sum()), X.shape[1])
+    mejor = None
+    for k_prueba in ([min(k, tope)] if k else range(K_MIN, min(K_MAX, tope) + 1)):
+        W, H = nmf(Xc, k_prueba, pesos=pesos, semilla=semilla)
+        etiquetas = W.argmax(axis=1)
+        puntaje = silueta_simplificada(Xc, etiquetas, pesos) if len(np.unique(etiquetas)) > 1 else -1.0
+        if mejor is None or puntaje > mejor[0] + 1e-6:
+            mejor = (puntaje, k_prueba, W, H)
+    _, k, W, H = mejor
+
+    asignado = np.full(n_textos, -1, dtype=np.int64)
+    asignado[con_terminos] = W.argmax(axis=1)
+    afinidad = np.zeros(n_textos)
+    afinidad[con_terminos] = W.max(axis=1) / (W.sum(axis=1) + _EPS)
+
+    temas = []
+    for t in range(k):
+        miembros = np.flatnonzero(asignado == t)
+        t_act, t_ant = int(rep_act[miembros].sum()), int(rep_ant[miembros].sum())
+        if t_act + t_ant == 0:
+            continue
+        terminos = [str(vocabulario[j]) for j in np.argsort(-H[t], kind='stable')[:n_terminos] if H[t, j] > 0]
+        # Ejemplos: textos del quarter actual más "puros" del tema (empate → más repetidos)
+        en_act = miembros[rep_act[miembros] > 0]
+        orden = en_act[np.lexsort((-rep_act[en_act], -afinidad[en_act]))]
+        pct_act = round(100 * t_act / n_act, 1)
+        pct_ant = round(100 * t_ant / n_ant, 1) if n_ant else 0.0
+        temas.append({
+            'titulo': ' · '.join(terminos[:3]),
+            'terminos': terminos,
+            'n_act': t_act,
+            'n_ant': t_ant,
+            'pct_act': pct_act,
+            'pct_ant': pct_ant,
+            'delta_pp': round(pct_act - pct_ant, 1),
+            'ejemplos': [recortar_para_prompt(str(indice['textos'][i])) for i in orden[:n_ejemplos]],
+        })
+    temas.sort(key=lambda x: (-x['n_act'], -x['n_ant']))
+    for i, tema in enumerate(temas, 1):
+        tema['tema'] = i
+
+    sin_tema = ~con_terminos
+    return {
+        'temas': temas,
+        'n_act': n_act,
+        'n_ant': n_ant,
+        'sin_tema_act': int(rep_act[sin_tema].sum()),
+        'sin_tema_ant': int(rep_ant[sin_tema].sum()),
+        'k': k,
+    }
+
+
+def formatear_temas_prompt(resultado, q_ant, q_act):
+    """Bloque markdown con los temas candidatos de un motivo (vacío si no hay)."""
+    if not resultado or not resultado.get('temas'):
+        return ''
+    texto = (f"**Temas candidatos** (pre-agrupados localmente; validar, renombrar, "
+             f"fusionar o descartar):\n\n")
+    for tema in resultado['temas']:
+        texto += (f"- T{tema['tema']} `{tema['titulo']}`: {tema['pct_act']:.0f}% en {q_act} "
+                  f"({tema['n_act']}) vs {tema['pct_ant']:.0f}% en {q_ant} ({tema['n_ant']})"
+                  f" · términos: {', '.join(tema['terminos'])}\n")
+        for ejemplo in tema['ejemplos'][:2]:
+            texto += f'    - "{ejemplo}"\n'
+    return texto + "\n"
+
+
+# ==============================================================================
+# JSON DE RESPALDO (mismo esquema que el análisis semántico)
+# ==============================================================================
+
+def causas_desde_temas(datos_por_motivo, player, site, q_act, clave_causas='causas_raiz'):
+    """
+    Arma el JSON de causas (esquema de causas_raiz_semantico_*.json) a partir
+    de los temas candidatos de cada motivo (datos['temas_candidatos']).
+    """
+    causas_por_motivo = {}
+    for motivo, datos in datos_por_motivo.items():
+        resultado = datos.get('temas_candidatos') or {}
+        if not resultado.get('temas'):
+            continue
+        causas_por_motivo[motivo] = {
+            'total_comentarios_analizados': resultado['n_act'],
+            'delta_pp': round(float(datos.get('delta', 0)), 2),
+            clave_causas: [
+                {
+                    'titulo': f"Tema: {', '.join(tema['terminos'][:3])}",
+                    'descripcion': (f"Grupo pre-agrupado localmente por términos "
+                                    f"({', '.join(tema['terminos'])}); {tema['delta_pp']:+.1f}pp vs quarter anterior."),
+                    'frecuencia_pct': tema['pct_act'],
+                    'frecuencia_abs': tema['n_act'],
+                    'ejemplos': tema['ejemplos'],
+                }
+                for tema in resultado['temas'] if tema['n_act'] > 0
+            ],
+        }
+    return {
+        'metadata': {
+            'player': player,
+            'site': site,
+            'quarter': q_act,
+            'metodo': 'clusters_locales',
+        },
+        'causas_por_motivo': causas_por_motivo,
+    }
+
+
+def guardar_causas_clusters(datos_por_motivo, player, site, q_act, promotores=False, data_dir=None):
+    """
+    Guarda el JSON de respaldo en data/causas_raiz_clusters[_promotores]_{player}_{site}_{q_act}.json.
+
+    Returns:
+        str: path del archivo, o None si ningún motivo tuvo temas
+    """
+    clave = 'causas_satisfaccion' if promotores else 'causas_raiz'
+    contenido = causas_desde_temas(datos_por_motivo, player, site, q_act, clave_causas=clave)
+    if not contenido['causas_por_motivo']:
+        return None
+    data_dir = Path(data_dir) if data_dir else Path(__file__).resolve().parent.parent / 'data'
+    data_dir.mkdir(exist_ok=True)
+    sufijo = '_promotores' if promotores else ''
+    path = data_dir / f'causas_raiz_clusters{sufijo}_{player}_{site}_{q_act}.json'
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(contenido, f, ensure_ascii=False, indent=2)
+    return str(path)
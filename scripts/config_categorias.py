@@ -9,8 +9,18 @@ FIX: Múltiples archivos tenían listas diferentes de categorías.
 Importar en todos los módulos que necesiten categorías:
     from config_categorias import get_categorias, get_categorias_detalladas, mapear_categoria
 
+La agregación de motivos crudos (MOTIVO_IA) a categorías del waterfall y de
+causas raíz se define una sola vez en TAXONOMIA_MOTIVOS y se aplica con
+mapear_categoria (escalar) o map_categories (Series, vectorizado).
+
 """
 
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
 # ═════════════════════════════════════════════════════════════════════════════
 # CATEGORÍAS DETALLADAS (Para n8n y clasificación manual)
 # ═════════════════════════════════════════════════════════════════════════════
@@ -122,6 +132,160 @@ MAPEO_PRODUCTO_QUEJA = {
     'Facilidad de uso': 'Dificultad',
 }
 
+# ═════════════════════════════════════════════════════════════════════════════
+# TAXONOMÍA DE MOTIVOS: MOTIVO CRUDO → CATEGORÍA DEL WATERFALL
+# ═════════════════════════════════════════════════════════════════════════════
+# Reglas en orden de prioridad: gana la primera que aplica.
+#   contiene: keywords buscadas como substring del motivo en minúsculas
+#   exacto:   motivo completo en minúsculas
+#   excluye:  si aparece alguna de estas keywords la regla no aplica
+# Soporta categorías granulares de BigQuery, motivos declarados (ES/PT) y
+# categorías ya agregadas.
+
+CATEGORIA_SIN_OPINION = 'Sin opinión'
+CATEGORIA_OTRO = 'Otro'
+
+TAXONOMIA_MOTIVOS = [
+    # Tarifas (cobros, comisiones, mensualidades) va ANTES de Financiamiento
+    # para no confundir "tarifa" con "tasa" de interés
+    {'categoria': 'Tarifas',
+     'contiene': ['tarifa', 'cobrança', 'cobranza', 'comisión', 'comision', 'comissão',
+                  'mensualidad', 'mensalidade', 'costo de', 'custo de', 'cobro'],
+     'excluye': ['tasa', 'taxa']},
+    {'categoria': 'Financiamiento',
+     'contiene': ['financ', 'crédit', 'credit', 'cartão', 'tarjeta', 'limite',
+                  'empréstimo', 'préstamo', 'prestamo', 'taxa', 'tasa', 'juro',
+                  'interes', 'interés', 'acesso a créd', 'acesso a cred']},
+    # "cuota" (mantenimiento, mensual) es un cobro; con crédito/tarjeta/interés ya
+    # matcheó Financiamiento
+    {'categoria': 'Tarifas', 'contiene': ['cuota']},
+    {'categoria': 'Rendimientos',
+     'contiene': ['rendimento', 'rendimiento', 'investimento', 'inversiones', 'inversión',
+                  'poupança', 'ahorro', 'cdi', 'saldo da conta', 'inversion', 'invertir',
+                  'opcion', 'ganancia', 'ganancias', 'dinero en cuenta']},
+    {'categoria': 'Complejidad',
+     'contiene': ['dificuldade', 'dificultad', 'problema', 'complexidade', 'complejidad',
+                  'comodidade', 'facilidade', 'facilidad', 'complicado', 'difícil', 'bug']},
+    {'categoria': 'Funcionalidades',
+     'contiene': ['funcionalidade', 'funcionalidad', 'oferta de func', 'maior oferta',
+                  'feature', 'recurso']},
+    {'categoria': 'Seguridad',
+     'contiene': ['segurança', 'seguridad', 'seguro', 'fraude', 'golpe', 'roubo', 'robo']},
+    {'categoria': 'Atención',
+     'contiene': ['atendimento', 'atención', 'atencion', 'cliente', 'suporte', 'soporte', 'sac']},
+    {'categoria': 'Promociones',
+     'contiene': ['benefício', 'beneficio', 'desconto', 'descuento', 'promoção', 'promoción',
+                  'cashback', 'recompensa', 'reward', 'promocion', 'promociones', 'promo']},
+    {'categoria': CATEGORIA_SIN_OPINION,
+     'contiene': ['não uso', 'no uso', 'sem opinião', 'sin opinión', 'sin opinion']},
+    # Variantes de "otro" y valores inválidos / errores de Excel
+    {'categoria': CATEGORIA_OTRO,
+     'contiene': ['outro', 'otros', 'other', 'otro',
+                  '#¡valor!', '#valor!', '#value!', '#n/a', '#ref!'],
+     'exacto': ['otro', 'otros', 'outros', 'other', 'otra', 'outras',
+                'na', 'n/a', 'nan', 'null', 'none', '-']},
+    {'categoria': 'Funcionalidades', 'contiene': ['oferta'], 'excluye': ['func']},
+    {'categoria': 'Complejidad', 'exacto': ['app']},
+]
+
+# Encoding roto frecuente en exports (UTF-8 leído como Latin-1)
+_MOJIBAKE = [('ã§', 'ç'), ('ã£', 'ã'), ('ã©', 'é'), ('ã³', 'ó'), ('ã\xad', 'í'), ('ãº', 'ú'),
+             ('Ã§', 'ç'), ('Ã£', 'ã'), ('Ã©', 'é'), ('Ã³', 'ó'), ('Ã\xad', 'í'), ('Ãº', 'ú')]
+
+
+def _alternativa(keywords):
+    # Más largas primero para que el match reportado sea el más específico
+    return '|'.join(re.escape(k) for k in sorted(set(keywords), key=len, reverse=True))
+
+
+@lru_cache(maxsize=None)
+def _compilar_taxonomia():
+    """
+    Compila TAXONOMIA_MOTIVOS en un único regex multi-patrón.
+    
+    Cada regla aporta lookaheads opcionales con grupos nombrados (cN para
+    'contiene', xN para 'excluye'), así una sola pasada del regex indica qué
+    reglas tienen keywords presentes. Los 'exacto' se resuelven con un set.
+    
+    Returns:
+        tuple: (regex compilado, lista de reglas (categoria, grupo_c, grupo_x, exactos))
+    """
+    partes, reglas = [], []
+    for i, regla in enumerate(TAXONOMIA_MOTIVOS):
+        grupo_c = grupo_x = None
+        if regla.get('contiene'):
+            grupo_c = f'c{i}'
+            partes.append(f"(?=.*?(?P<{grupo_c}>{_alternativa(regla['contiene'])}))?")
+        if regla.get('excluye'):
+            grupo_x = f'x{i}'
+            partes.append(f"(?=.*?(?P<{grupo_x}>{_alternativa(regla['excluye'])}))?")
+        reglas.append((regla['categoria'], grupo_c, grupo_x, frozenset(regla.get('exacto', []))))
+    return re.compile(''.join(partes), re.DOTALL), reglas
+
+
+@lru_cache(maxsize=None)
+def _categoria_de_texto(m: str):
+    """Categoría para un motivo ya limpio (memoizado por valor distinto); None si no matchea."""
+    regex, reglas = _compilar_taxonomia()
+    m_lower = m.lower()
+    hits = regex.match(m_lower).groupdict()
+    for categoria, grupo_c, grupo_x, exactos in reglas:
+        aplica = (grupo_c is not None and hits[grupo_c] is not None) or m_lower in exactos
+        if aplica and (grupo_x is None or hits[grupo_x] is None):
+            return categoria
+    return None
+
+
+def mapear_categoria(motivo, sin_match=None) -> str:
+    """
+    Mapea un motivo crudo a su categoría agregada según TAXONOMIA_MOTIVOS.
+    
+    Args:
+        motivo: Motivo (MOTIVO_IA, motivo declarado o categoría agregada)
+        sin_match: Valor a retornar si ninguna regla aplica. Si es None se
+            retorna el motivo tal cual (con el encoding corregido).
+    
+    Returns:
+        str: Categoría agregada
+    
+    Examples:
+        >>> mapear_categoria('Tasa de interés de crédito o tarjeta')
+        'Financiamiento'
+        >>> mapear_categoria('Tarifas de la cuenta')
+        'Tarifas'
+    """
+    if pd.isna(motivo) or str(motivo).strip() in ['', '.', 'nan']:
+        return CATEGORIA_SIN_OPINION
+    m = str(motivo).strip()
+    for mal, bien in _MOJIBAKE:
+        m = m.replace(mal, bien)
+    categoria = _categoria_de_texto(m)
+    if categoria is not None:
+        return categoria
+    return m if sin_match is None else sin_match
+
+
+def map_categories(series: pd.Series, sin_match=None) -> pd.Series:
+    """
+    Versión vectorizada de mapear_categoria para una Series.
+    
+    El mapeo corre una vez por valor distinto (códigos de pd.factorize) y se
+    expande a las filas con indexado de numpy.
+    
+    Args:
+        series: Motivos crudos
+        sin_match: Ver mapear_categoria
+    
+    Returns:
+        pd.Series: Categorías, con el mismo índice que series
+    """
+    codigos, unicos = pd.factorize(series)
+    categorias = np.empty(len(unicos) + 1, dtype=object)
+    categorias[:-1] = [mapear_categoria(u, sin_match) for u in unicos]
+    categorias[-1] = mapear_categoria(np.nan, sin_match)
+    return pd.Series(categorias[codigos], index=series.index, dtype=object)
+
+
 # ═════════════════════════════════════════════════════════════════════════════
 # IDIOMA POR SITE
 # ═════════════════════════════════════════════════════════════════════════════
@@ -351,6 +515,21 @@ if __name__ == '__main__':
     assert normalizar_categoria('atencion', 'MLA') == 'Atención'  # Sin tilde -> con tilde
     print("PASS: Test 6")
 
+    # Test 7: Taxonomía de motivos
+    print("\nTest 7: Taxonomia de motivos")
+    assert mapear_categoria('Tasa de interés de crédito o tarjeta') == 'Financiamiento'
+    assert mapear_categoria('Tarifas da conta') == 'Tarifas'
+    assert mapear_categoria('Cuota de mantenimiento') == 'Tarifas'
+    assert mapear_categoria('Cuotas de la tarjeta') == 'Financiamiento'
+    assert mapear_categoria('No uso o sin opinión') == 'Sin opinión'
+    assert mapear_categoria('Oferta de funcionalidades') == 'Funcionalidades'
+    assert mapear_categoria('app') == 'Complejidad'
+    assert mapear_categoria('Algo nuevo') == 'Algo nuevo'
+    assert mapear_categoria('Algo nuevo', sin_match='Otro') == 'Otro'
+    serie = pd.Series(['Seguridad', None, 'Promoções e descontos', 'Seguridad'])
+    assert map_categories(serie).tolist() == ['Seguridad', 'Sin opinión', 'Promociones', 'Seguridad']
+    print("PASS: Test 7")
+
     print("\n" + "="*50)
     print("PASS: TODOS LOS TESTS PASARON")
     print("="*50)
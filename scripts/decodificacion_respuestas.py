@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════════════
+DECODIFICACIÓN DE RESPUESTAS DE LA ENCUESTA (POR VALOR DISTINTO)
+═══════════════════════════════════════════════════════════════════════════════
+
+Las respuestas crudas del CSV (strings) se decodifican con un decodificador
+por tipo de columna. Cada decodificador se evalúa UNA vez por valor distinto
+y el resultado se reparte a las filas con los códigos categóricos de la
+columna (pd.factorize o .cat.codes): el costo depende de la cardinalidad,
+no de la cantidad de filas.
+
+Decodificadores:
+    - 'si_no'     → 1 / 0 / NaN           (parte8, columnas USO_*)
+    - 'likert'    → 5..1 / NaN            (parte10, valoración de seguridad)
+    - 'nps'       → -1 / 0 / 1 numérico   (parte1 / parte3, igual que pd.to_numeric)
+    - 'encoding'  → texto con mojibake corregido
+    - flag_principal(valor) → 1 / 0       (parte9, valor detectado en la columna)
+
+Los mapeos {valor crudo: decodificado} se cachean en memoria por
+(huella del archivo, columna, decodificador). La huella sale de
+huella_archivo() en parte1 y viaja en config['huella_datos'].
+
+Uso:
+    from decodificacion_respuestas import decodificar
+    df['VAL'] = decodificar(df[col_valoracion], 'likert', huella=config.get('huella_datos'))
+"""
+
+import hashlib
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# VALORES DE REFERENCIA
+# ==============================================================================
+
+# Valores de las columnas USO_* (str(x).strip() se compara contra estas listas)
+VALORES_SI = ['Si', 'Sí', 'Sim', '1', 1, 'sim', 'SIM', 'SI', 'sí']
+VALORES_NO = ['No', 'Não', 'NÃ£o', '0', 0, 'no', 'NO', 'não', 'NAO', ' ']
+
+_SI = frozenset(str(v) for v in VALORES_SI)
+_NO = frozenset(str(v) for v in VALORES_NO)
+
+# Encoding roto (UTF-8 leído como latin-1) en textos de motivos
+REEMPLAZOS_MOJIBAKE = {
+    'Ã§': 'ç', 'Ã£': 'ã', 'Ãµ': 'õ', 'Ã¡': 'á', 'Ã©': 'é',
+    'Ã­': 'í', 'Ã³': 'ó', 'Ãº': 'ú', 'Ãª': 'ê', 'Ã\xa0': 'à',
+    'Ã¢': 'â', 'Ã´': 'ô', 'Ã±': 'ñ', 'Ã¼': 'ü',
+    'Ã‰': 'É', 'Ã"': 'Ó', 'Ã\x81': 'Á', 'Ãš': 'Ú',
+    'ÃŠ': 'Ê', 'Ã\x91': 'Ñ', 'Ãœ': 'Ü',
+    '\ufeff': '',
+}
+
+
+# ==============================================================================
+# DECODIFICADORES
+# ==============================================================================
+
+# nombre: clave de cache; funcion: valores distintos (lista) → lista decodificada;
+# dtype: dtype del resultado (None = inferido, como lo infiere pandas)
+Decodificador = namedtuple('Decodificador', ['nombre', 'funcion', 'dtype'])
+
+
+def _por_valor(funcion):
+    """Adapta una función de un valor a la firma lista → lista."""
+    return lambda valores: [funcion(v) for v in valores]
+
+
+def _si_no(valor):
+    texto = str(valor).strip()
+    if texto in _SI:
+        return 1.0
+    if texto in _NO:
+        return 0.0
+    return np.nan
+
+
+def _likert(valor):
+    """Primer dígito 5..1 que aparezca en la respuesta ('5 - Muy seguro' → 5)."""
+    if pd.isna(valor):
+        return np.nan
+    texto = str(valor)
+    for i in ['5', '4', '3', '2', '1']:
+        if i in texto:
+            return int(i)
+    return np.nan
+
+
+def _nps(valores):
+    return list(pd.to_numeric(pd.Series(valores, dtype=object), errors='coerce'))
+
+
+def fix_encoding_text(text):
+    """Corrige caracteres con encoding corrupto (común en CSVs latinos)."""
+    if not isinstance(text, str):
+        return str(text) if text is not None else ''
+
+    result = text
+    for old, new in REEMPLAZOS_MOJIBAKE.items():
+        result = result.replace(old, new)
+    return result
+
+
+DECODIFICADORES = {
+    'si_no': Decodificador('si_no', _por_valor(_si_no), float),
+    'likert': Decodificador('likert', _por_valor(_likert), None),
+    'nps': Decodificador('nps', _nps, None),
+    'encoding': Decodificador('encoding', _por_valor(fix_encoding_text), object),
+}
+
+
+def flag_principal(valor_principal):
+    """Decodificador 1 / 0 de la columna FLAG_PRINCIPALIDAD (valor detectado en parte9)."""
+    return Decodificador(f'principal={valor_principal!r}',
+                         _por_valor(lambda v: int(v == valor_principal)), None)
+
+
+def decodificador_por_valor(nombre, funcion, dtype=None):
+    """Decodificador ad hoc a partir de una función de un valor (ej. motivos por site)."""
+    return Decodificador(nombre, _por_valor(funcion), dtype)
+
+
+# ==============================================================================
+# HUELLA DEL ARCHIVO + CACHE
+# ==============================================================================
+
+_CACHE_MAPEOS = {}
+
+
+def huella_archivo(path):
+    """Huella barata del CSV de origen (path, tamaño, mtime): cambia si cambia el archivo."""
+    path = Path(path).resolve()
+    estado = path.stat()
+    texto = f'{path}|{estado.st_size}|{estado.st_mtime_ns}'
+    return hashlib.blake2b(texto.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def limpiar_cache(huella=None):
+    """Descarta los mapeos cacheados (de una huella o todos)."""
+    for clave in [k for k in _CACHE_MAPEOS if huella is None or k[0] == huella]:
+        del _CACHE_MAPEOS[clave]
+
+
+# ==============================================================================
+# APLICACIÓN
+# ==============================================================================
+
+def _codigos(serie):
+    """(códigos por fila con -1 = NaN, valores distintos) de una columna."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(), list(serie.cat.categories)
+    codigos, unicos = pd.factorize(serie)
+    return codigos, list(np.asarray(unicos, dtype=object))
+
+
+def decodificar(serie, decodificador, huella=None):
+    """
+    Decodifica una columna evaluando el decodificador una vez por valor distinto.
+
+    Args:
+        serie: columna cruda (pd.Series)
+        decodificador: nombre en DECODIFICADORES o un Decodificador
+        huella: huella del archivo de origen (config['huella_datos']); con
+            huella el mapeo valor → decodificado se reutiliza entre llamadas
+
+    Returns:
+        pd.Series decodificada (mismo índice y nombre)
+    """
+    dec = DECODIFICADORES[decodificador] if isinstance(decodificador, str) else decodificador
+    codigos, unicos = _codigos(serie)
+
+    # Clave (tipo, valor): 1, 1.0 y '1' decodifican distinto
+    mapeo = _CACHE_MAPEOS.setdefault((huella, serie.name, dec.nombre), {}) if huella else {}
+    claves = [(type(u), u) for u in unicos]
+    faltantes = [i for i, clave in enumerate(claves) if clave not in mapeo]
+    if faltantes:
+        for i, valor in zip(faltantes, dec.funcion([unicos[i] for i in faltantes])):
+            mapeo[claves[i]] = valor
+    valores = [mapeo[clave] for clave in claves]
+
+    # Código -1 (NaN) → el decodificador aplicado a NaN, solo si hay NaN (no altera el dtype)
+    hay_nan = bool((codigos < 0).any())
+    if hay_nan:
+        valores.append(dec.funcion([np.nan])[0])
+    tabla = pd.Series(valores, dtype=dec.dtype).to_numpy()
+    if len(tabla) == 0:
+        return pd.Series(tabla, index=serie.index, name=serie.name)
+    return pd.Series(tabla[codigos], index=serie.index, name=serie.name)
@@ -56,12 +56,19 @@ from parte1_carga_datos import cargar_datos
 from parte3_calculo_nps import calcular_nps
 from parte4_categorizacion import categorizar_comentarios
 from parte5_correccion_sin_opinion import corregir_sin_opinion
-from parte6_waterfall import generar_waterfall
+from parte6_waterfall import generar_waterfall, matriz_waterfall_competitivo
+from menciones_competidores import matriz_menciones_competidores
 from parte7_causas_raiz import analizar_causas_raiz, exportar_comentarios_para_cursor, preparar_analisis_semantico
 from parte7b_promotores import analizar_promotores, exportar_comentarios_promotores, preparar_analisis_semantico_promotores
+from prompts_fragmentados import unir_fragmentos, describir_estado
 from parte8_productos import analizar_productos
 from parte9_principalidad import analizar_principalidad
 from parte10_seguridad import analizar_seguridad
+from segmentos_demograficos import analizar_segmentos
+from shift_share import analizar_shift_share
+from ventana_quarters import analizar_ventana
+from simulador_whatif import armar_base_simulacion, guardar_base_simulacion
+from almacen_corridas import contexto_quarter_anterior, guardar_corrida, tendencia
 from parte11_deep_research import preparar_deep_research
 from parte12_senior_analyst import generar_resumen_ejecutivo, consolidar_para_html
 from validators import validate_site_code, validate_quarter_format
@@ -82,11 +89,35 @@ from analisis_automatico import (
     mostrar_sugerencias_busqueda,
     agregar_noticia_a_cache,
     cargar_causas_raiz_semanticas,
-    cargar_causas_raiz_semanticas_promotores
+    cargar_causas_raiz_semanticas_promotores,
+    cargar_causas_raiz_clusters
 )
 
 
-def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=None):
+def _unir_fragmentos_si_corresponde(resultado_semantico):
+    """
+    Modo fragmentado: si falta el JSON semántico final, intenta armarlo con los
+    fragmentos ya escritos por el agente y muestra cuáles siguen pendientes.
+
+    Returns:
+        dict de estado (ver prompts_fragmentados.estado_fragmentos) o None si
+        no hay manifest o el JSON final ya existe
+    """
+    manifest_path = resultado_semantico.get('manifest_path')
+    if not manifest_path:
+        return None
+    resultado = unir_fragmentos(manifest_path)
+    if resultado['ok']:
+        if resultado['estado']:
+            _print(f"   \U0001f9f1 Fragmentos unidos: {resultado['destino']}")
+        return None
+    for linea in describir_estado(resultado['estado']):
+        _print(f"   {linea}")
+    return resultado['estado']
+
+
+def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=None, modo_graficos=None,
+                             fallback_clusters=False, fragmentar_prompts=False, ventana=None):
     """
     Ejecuta el modelo NPS completo.
     
@@ -96,6 +127,13 @@ def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=N
         player: Nombre del player a analizar. Si None, usa config.yaml.
         q1: Período anterior (ej: 25Q3). Si None, usa config.yaml.
         q2: Período actual (ej: 25Q4). Si None, usa config.yaml.
+        modo_graficos: 'js' (Chart.js en el navegador) o 'png' (matplotlib). Si None, usa config.yaml.
+        fallback_clusters: Si True y falta el JSON semántico, continúa con los temas
+            pre-agrupados localmente (causas_raiz_clusters_*.json) en vez de detenerse.
+        fragmentar_prompts: Si True, escribe un prompt semántico por motivo + manifest.
+            Los checkpoints unen los fragmentos válidos y reportan cuáles faltan.
+        ventana: Cantidad de quarters (>= 2) para la trayectoria de drivers por par
+            adyacente hasta q2 (--window N). Si None, solo se compara q1 vs q2.
     
     Returns:
         dict: Resultados de todas las partes
@@ -132,6 +170,10 @@ def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=N
     df_completo = resultado_carga['df_completo']  # Usuarios CON SALDO (para NPS, waterfall, etc.)
     df_todos = resultado_carga['df_competitivo']  # TODOS los usuarios (para principalidad, seguridad)
     config = resultado_carga['config']
+    if modo_graficos:
+        config.setdefault('parametros', {})['modo_graficos'] = modo_graficos
+    if ventana:
+        config.setdefault('parametros', {})['ventana_quarters'] = ventana
     
     player = config['player']
     site = config['site']
@@ -146,10 +188,12 @@ def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=N
     _print(f"   ðŸŽ¯ Player: {player}")
     _print(f"   ðŸ“… Períodos: {q_ant} vs {q_act}")
     
-    # Cargar presentacion del quarter anterior (si existe)
+    # Contexto del quarter anterior: almacén de corridas y, si no hay corrida, presentación PDF
     try:
-        from scripts.parsear_presentacion import cargar_quarter_anterior
-        pres_anterior = cargar_quarter_anterior(site, player, q_act)
+        pres_anterior = contexto_quarter_anterior(site, player, q_act)
+        if pres_anterior is None:
+            from scripts.parsear_presentacion import cargar_quarter_anterior
+            pres_anterior = cargar_quarter_anterior(site, player, q_act)
         if pres_anterior:
             _print(f"   Presentacion anterior encontrada: {pres_anterior.get('quarter')}")
         resultados['presentacion_anterior'] = pres_anterior
@@ -157,6 +201,15 @@ def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=N
         _print(f"   No se pudo cargar presentacion anterior: {e}")
         resultados['presentacion_anterior'] = None
     
+    # Tendencias del almacén: evolución de quejas (parte6) e histórico de productos (parte8)
+    # salen de corridas guardadas; solo se recalculan los quarters sin corrida
+    try:
+        historico_waterfall = tendencia('waterfall', site, player)
+        historico_productos = tendencia('productos', site, player)
+    except Exception as e:
+        _print(f"   ⚠️ No se pudo leer el almacén de corridas: {e}")
+        historico_waterfall = historico_productos = None
+    
     # Función para normalizar texto (quitar tildes y caracteres especiales)
     def normalizar_texto(texto):
         if not isinstance(texto, str):
@@ -215,6 +268,12 @@ def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=N
     resultado_nps = calcular_nps(df_completo, config, verbose=verbose)
     resultados['nps'] = resultado_nps
     
+    # Cubo de segmentos demográficos del site + drill-down del Δ NPS del player
+    resultado_seg_demo = analizar_segmentos(df_completo, config, verbose=False)
+    if 'error' in resultado_seg_demo:
+        _print(f"   ⚠️ Segmentos: {resultado_seg_demo['error']}")
+    resultados['segmentos'] = resultado_seg_demo
+    
     # â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•
     # PARTE 4: CATEGORIZACIÃ“N
     # â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•
@@ -237,15 +296,31 @@ def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=N
     # â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•
     
     _print("\nðŸ“‰ PARTE 6: Calculando waterfall...")
-    resultado_wf = generar_waterfall(resultado_corr, df_player, config, verbose=verbose)
+    resultado_wf = generar_waterfall(resultado_corr, df_player, config, verbose=verbose,
+                                     historico=historico_waterfall)
     resultados['waterfall'] = resultado_wf
     
+    # Waterfall competitivo: todas las marcas del site con motivo declarado
+    _print("   🏁 Calculando waterfall competitivo del site...")
+    resultado_wf_comp = matriz_waterfall_competitivo(df_completo, config, verbose=False)
+    if 'error' in resultado_wf_comp:
+        _print(f"   ⚠️ Waterfall competitivo: {resultado_wf_comp['error']}")
+    resultados['waterfall_competitivo'] = resultado_wf_comp
+    
+    # Menciones de competidores: marca × marca mencionada × quarter (un escaneo por comentario,
+    # reutilizado por parte7 y por el bloque "¿Con quién nos comparan?" del HTML)
+    resultado_menciones = matriz_menciones_competidores(df_completo, config, verbose=False)
+    if 'error' in resultado_menciones:
+        _print(f"   ⚠️ Menciones de competidores: {resultado_menciones['error']}")
+    resultados['menciones_competidores'] = resultado_menciones
+    
     # â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•
     # PARTE 7: CAUSAS RAÍZ
     # â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•
     
     _print("\nðŸ” PARTE 7: Analizando causas raíz...")
-    resultado_cr = analizar_causas_raiz(resultado_wf, resultado_corr, df_player, config, verbose=verbose)
+    resultado_cr = analizar_causas_raiz(resultado_wf, resultado_corr, df_player, config, verbose=verbose,
+                                        indice_menciones=resultado_menciones.get('indice'))
     resultados['causas_raiz'] = resultado_cr
     
     # Exportar comentarios para análisis automático
@@ -260,7 +335,7 @@ def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=N
     _print("   \U0001f9e0 Preparando analisis semantico de causas raiz...")
     resultado_semantico = preparar_analisis_semantico(
         resultado_wf, resultado_corr, df_player, config,
-        max_comentarios_por_motivo=100, verbose=False
+        presupuesto_tokens=3000, fragmentar=fragmentar_prompts, verbose=False
     )
     resultados['analisis_semantico'] = resultado_semantico
     if resultado_semantico.get('prompt_path'):
@@ -278,7 +353,7 @@ def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=N
     _print("   \U0001f9e0 Preparando analisis semantico de promotores...")
     resultado_semantico_prom = preparar_analisis_semantico_promotores(
         resultado_prom, df_player, config,
-        max_comentarios_por_motivo=100, verbose=False
+        presupuesto_tokens=3000, fragmentar=fragmentar_prompts, verbose=False
     )
     resultados['analisis_semantico_promotores'] = resultado_semantico_prom
     if resultado_semantico_prom.get('prompt_path'):
@@ -289,7 +364,13 @@ def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=N
     # =========================================================================
     _print("\n🧠 CHECKPOINT: Verificando causas raiz semanticas promotores...")
 
+    estado_fragmentos_prom = _unir_fragmentos_si_corresponde(resultado_semantico_prom)
     causas_semanticas_promotores = cargar_causas_raiz_semanticas_promotores(player, q_act, site=site)
+    if not causas_semanticas_promotores and fallback_clusters:
+        causas_semanticas_promotores = cargar_causas_raiz_clusters(player, q_act, site=site, promotores=True)
+        if causas_semanticas_promotores:
+            _print(f"   \U0001f9e9 Usando temas locales de respaldo (provisorio): {resultado_semantico_prom.get('fallback_path')}")
+            resultados['causas_promotores_provisorias'] = True
     if causas_semanticas_promotores:
         _print(f"   ✅ Causas raiz semanticas promotores OK: {len(causas_semanticas_promotores)} motivos")
         _print(f"       Archivo: causas_raiz_semantico_promotores_{player}_{site}_{q_act}.json")
@@ -304,6 +385,8 @@ def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=N
         resultados['necesita_causas_raiz_promotores'] = True
         resultados['prompt_causas_raiz_promotores'] = prompt_path
         resultados['json_destino_causas_raiz_promotores'] = f'data/causas_raiz_semantico_promotores_{player}_{site}_{q_act}.json'
+        if estado_fragmentos_prom:
+            resultados['fragmentos_pendientes_promotores'] = estado_fragmentos_prom['faltantes'] + estado_fragmentos_prom['invalidos']
         _print(f"   Modelo detenido. Re-ejecutar despues de generar causas raiz promotores.")
         return resultados
 
@@ -312,11 +395,18 @@ def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=N
     # â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•
     
     _print("\nðŸ“¦ PARTE 8: Analizando productos...")
-    resultado_prod = analizar_productos(df_completo, df_player, config, verbose=verbose)
+    resultado_prod = analizar_productos(df_completo, df_player, config, verbose=verbose,
+                                        historico=historico_productos)
     if 'error' in resultado_prod:
         _print(f"   ⚠️ PARTE 8 WARNING: {resultado_prod['error']}")
     resultados['productos'] = resultado_prod
     
+    # Shift-share del Δ NPS: segmentos, productos y saldo (mix vs tasa por dimensión)
+    resultado_ss = analizar_shift_share(resultados, df_todos, config, verbose=False)
+    if 'error' in resultado_ss:
+        _print(f"   ⚠️ Shift-share: {resultado_ss['error']}")
+    resultados['shift_share'] = resultado_ss
+    
     # â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•
     # PARTE 9: PRINCIPALIDAD (movido antes de noticias)
     # â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•
@@ -338,6 +428,23 @@ def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=N
         _print(f"   ⚠️ PARTE 10 WARNING: {resultado_seg['error']}")
     resultados['seguridad'] = resultado_seg
     
+    # Ventana (--window N): todos los pares adyacentes sobre los agregados ya calculados
+    if config.get('parametros', {}).get('ventana_quarters'):
+        resultado_ventana = analizar_ventana(resultados, config, verbose=verbose)
+        if 'error' in resultado_ventana:
+            _print(f"   ⚠️ Ventana: {resultado_ventana['error']}")
+        resultados['ventana'] = resultado_ventana
+    
+    # Base del simulador what-if (arrays de motivos y productos; CLI y widget del HTML)
+    base_sim = armar_base_simulacion(resultados, config)
+    if 'error' in base_sim:
+        _print(f"   ⚠️ Simulador: {base_sim['error']}")
+    else:
+        base_sim['archivo'] = guardar_base_simulacion(base_sim)
+        if base_sim.get('productos_descartados'):
+            _print(f"   ⚠️ Simulador: sin datos completos para {', '.join(base_sim['productos_descartados'])}")
+    resultados['simulador'] = base_sim
+    
     # â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•
     # PARTE 8B: CARGA INTELIGENTE DE NOTICIAS Y TRIANGULACIÃ“N
     # â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•â•
@@ -355,6 +462,8 @@ def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=N
                 'delta': row.get('Delta', 0),
                 'pct_q1': row.get('Impacto_Anterior', 0),
                 'pct_q2': row.get('Impacto_Actual', 0),
+                'z': float(row['Z']) if 'Z' in row.index else None,
+                'significativo': bool(row['Significativo']) if 'Significativo' in row.index else None,
             })
     
     # Obtener deltas de métricas para búsqueda de noticias
@@ -370,7 +479,13 @@ def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=N
     
     _print("\n\U0001f9e0 CHECKPOINT: Verificando causas raiz semanticas...")
     
+    estado_fragmentos = _unir_fragmentos_si_corresponde(resultado_semantico)
     causas_semanticas = cargar_causas_raiz_semanticas(player, q_act, site=site)
+    if not causas_semanticas and fallback_clusters:
+        causas_semanticas = cargar_causas_raiz_clusters(player, q_act, site=site)
+        if causas_semanticas:
+            _print(f"   \U0001f9e9 Usando temas locales de respaldo (provisorio): {resultado_semantico.get('fallback_path')}")
+            resultados['causas_raiz_provisorias'] = True
     if causas_semanticas:
         _print(f"   \u2705 Causas raiz semanticas OK: {len(causas_semanticas)} motivos (archivo: causas_raiz_semantico_{player}_{site}_{q_act}.json)")
         resultados['causas_semanticas'] = causas_semanticas
@@ -384,6 +499,8 @@ def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=N
         resultados['necesita_causas_raiz'] = True
         resultados['prompt_causas_raiz'] = prompt_path
         resultados['json_destino_causas_raiz'] = f'data/causas_raiz_semantico_{player}_{site}_{q_act}.json'
+        if estado_fragmentos:
+            resultados['fragmentos_pendientes'] = estado_fragmentos['faltantes'] + estado_fragmentos['invalidos']
         _print(f"   Modelo detenido. Re-ejecutar despues de generar causas raiz.")
         return resultados
     
@@ -554,6 +671,12 @@ def ejecutar_modelo_completo(verbose=True, site=None, player=None, q1=None, q2=N
     else:
         _print("   ✅ Todos los drivers principales tienen noticias asociadas")
 
+    # Almacén local de corridas (contexto "vs quarter anterior" y tendencias de próximas corridas)
+    try:
+        guardar_corrida(resultados)
+    except Exception as e:
+        _print(f"   ⚠️ No se pudo guardar la corrida en el almacén: {e}")
+
     return resultados
 
 
@@ -0,0 +1,475 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════════════
+ESPEJO LOCAL DE LA TABLA DE RECLASIFICACIÓN (BIGQUERY → SQLITE)
+═══════════════════════════════════════════════════════════════════════════════
+
+PARTE 4 necesita, para Mercado Pago/Nubank, el MOTIVO_RECLASIFICADO de cada
+comentario ya clasificado por n8n. En vez de descargar toda la historia del
+site en cada corrida, se mantiene un espejo SQLite con:
+
+- reclasificados: SITE, numericalId, OLA, MARCA, HASH (MD5 del comentario
+  normalizado, ver parte4.hash_comentario) y MOTIVO. No guarda el texto.
+- sync_estado: filas y checksum por (SITE, OLA) y timestamp de la última
+  sincronización.
+
+Sincronización incremental por OLA: se consulta el conteo y un checksum
+remoto por OLA (BIT_XOR(FARM_FINGERPRINT(fila)), agregado barato) y solo se
+re-descargan las OLAs cuyo conteo o checksum cambió o que no existen en el
+espejo. El checksum detecta reclasificaciones y reemplazos de filas que no
+cambian el conteo. Dentro del TTL no se consulta BigQuery.
+
+construir_query_reclasificados arma las queries con predicate pushdown
+(OLAs, numericalId) y column pruning; ejecutar_query las corre con parámetros
+nombrados y descarga el resultado en formato Arrow.
+
+ClienteBigQueryLocal es un stand-in del cliente de BigQuery que ejecuta las
+mismas queries sobre un DataFrame en SQLite en memoria (uso offline y pruebas).
+
+Uso:
+    from espejo_bigquery import sincronizar_espejo, cargar_indices_espejo
+    sincronizar_espejo(client, 'MLB')
+    bq_por_clave, bq_por_id, bq_por_hash = cargar_indices_espejo('MLB')
+"""
+
+import hashlib
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# Tabla de BigQuery con las clasificaciones (n8n workflow)
+BQ_TABLE = "meli-bi-data.SBOX_NPS_ANALYTICS.comentarios_reclasificados_fintech"
+
+RUTA_ESPEJO_DEFAULT = Path(__file__).parent.parent / 'data' / 'cache' / 'bq_reclasificados.sqlite'
+TTL_HORAS_DEFAULT = 12
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reclasificados (
+    site TEXT NOT NULL,
+    numericalId TEXT,
+    ola TEXT,
+    marca TEXT,
+    hash TEXT,
+    motivo TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reclasificados_site_ola ON reclasificados (site, ola);
+CREATE TABLE IF NOT EXISTS sync_estado (
+    site TEXT NOT NULL,
+    ola TEXT NOT NULL,
+    filas INTEGER NOT NULL,
+    checksum TEXT,
+    sincronizado_en REAL NOT NULL,
+    PRIMARY KEY (site, ola)
+);
+"""
+
+# ==============================================================================
+# QUERIES (BigQuery Standard SQL, parámetros nombrados)
+# ==============================================================================
+
+# Máximo de IDs a empujar como parámetro ARRAY<STRING> (límite de tamaño de query);
+# por encima solo se filtra por OLA
+MAX_IDS_PUSHDOWN = 20000
+
+COLUMNAS_RECLASIFICADOS = {
+    'numericalId': 'CAST(numericalId AS STRING) AS numericalId',
+    'OLA': 'OLA',
+    'MARCA': 'MARCA',
+    'COMMENTS': 'COMMENTS',
+    'MOTIVO_RECLASIFICADO': 'MOTIVO_RECLASIFICADO',
+}
+
+# Huella de una fila con las columnas que guarda el espejo (XOR por OLA: no depende del orden)
+CHECKSUM_FILAS = """BIT_XOR(FARM_FINGERPRINT(CONCAT(
+            IFNULL(CAST(numericalId AS STRING), ''), '|', IFNULL(MARCA, ''), '|',
+            IFNULL(COMMENTS, ''), '|', MOTIVO_RECLASIFICADO)))"""
+
+
+def construir_query_reclasificados(site_code, columnas=None, olas=None, ids=None, excluir_ids=False,
+                                   agrupar_por_ola=False):
+    """
+    Arma la query a la tabla de reclasificación con predicate pushdown.
+
+    Args:
+        site_code: MLA, MLB, MLM, MLC
+        columnas: Columnas a traer (column pruning). Default: todas las de COLUMNAS_RECLASIFICADOS
+        olas: Si se indica, filtra ``COALESCE(OLA, '') IN UNNEST(@olas)``
+        ids: Si se indica, filtra por numericalId (``IN`` o ``NOT IN`` según excluir_ids)
+        excluir_ids: Si True, trae las filas cuyos IDs NO están en ``ids``
+        agrupar_por_ola: Si True, retorna el conteo de filas y el checksum por OLA
+
+    Returns:
+        tuple: (sql, parametros) con ``{tabla}`` sin formatear (ver ejecutar_query)
+    """
+    parametros = {'site': site_code}
+    if agrupar_por_ola:
+        select = f"COALESCE(OLA, '') AS OLA, COUNT(*) AS filas, {CHECKSUM_FILAS} AS checksum"
+    else:
+        columnas = columnas or list(COLUMNAS_RECLASIFICADOS)
+        select = ',\n            '.join(COLUMNAS_RECLASIFICADOS[c] for c in columnas)
+
+    sql = f"""
+        SELECT
+            {select}
+        FROM `{{tabla}}`
+        WHERE SITE = @site
+          AND MOTIVO_RECLASIFICADO IS NOT NULL
+          AND TRIM(MOTIVO_RECLASIFICADO) != ''"""
+    if olas is not None:
+        sql += "\n          AND COALESCE(OLA, '') IN UNNEST(@olas)"
+        parametros['olas'] = [str(o) for o in olas]
+    if ids is not None:
+        operador = 'NOT IN' if excluir_ids else 'IN'
+        sql += f"\n          AND CAST(numericalId AS STRING) {operador} UNNEST(@ids)"
+        parametros['ids'] = [str(i) for i in ids]
+    if agrupar_por_ola:
+        sql += "\n        GROUP BY 1"
+    return sql + "\n", parametros
+
+
+# ==============================================================================
+# STAND-IN LOCAL DEL CLIENTE BIGQUERY
+# ==============================================================================
+
+def _farm_fingerprint_local(texto):
+    """INT64 determinístico por texto (reemplazo local de FARM_FINGERPRINT)."""
+    if texto is None:
+        return None
+    return int.from_bytes(hashlib.blake2b(str(texto).encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+def _concat_local(*valores):
+    """CONCAT de BigQuery: NULL si algún argumento es NULL."""
+    return None if any(v is None for v in valores) else ''.join(str(v) for v in valores)
+
+
+class _BitXorLocal:
+    """Agregado BIT_XOR de BigQuery para SQLite."""
+
+    def __init__(self):
+        self.valor = 0
+
+    def step(self, valor):
+        if valor is not None:
+            self.valor ^= valor
+
+    def finalize(self):
+        return self.valor
+
+
+class _ResultadoLocal:
+    """Resultado de ClienteBigQueryLocal.query() (imita QueryJob)."""
+
+    def __init__(self, df):
+        self._df = df
+
+    def result(self):
+        return self
+
+    def to_dataframe(self, **kwargs):
+        return self._df.copy()
+
+    def to_arrow(self, **kwargs):
+        import pyarrow as pa
+        return pa.Table.from_pandas(self._df, preserve_index=False)
+
+
+class ClienteBigQueryLocal:
+    """
+    Stand-in del cliente de BigQuery sobre SQLite en memoria.
+
+    Ejecuta el subconjunto de SQL que usan PARTE 4 y el espejo: traduce
+    `CAST(... AS STRING)`, la referencia a la tabla con backticks y
+    `IN UNNEST(@lista)`, y registra CONCAT, FARM_FINGERPRINT (hash propio,
+    no el de BigQuery) y BIT_XOR. Los parámetros se pasan como dict en ``parametros``.
+
+    Args:
+        df_tabla: DataFrame con las columnas de la tabla remota
+                  (SITE, numericalId, OLA, MARCA, COMMENTS, MOTIVO_RECLASIFICADO)
+        tabla: Nombre completo de la tabla que aparece en las queries
+    """
+
+    def __init__(self, df_tabla, tabla=BQ_TABLE):
+        self.tabla = tabla
+        self.queries = []  # Historial (sql, parametros) para inspección en pruebas
+        self._conn = sqlite3.connect(':memory:')
+        self._conn.create_function('CONCAT', -1, _concat_local, deterministic=True)
+        self._conn.create_function('FARM_FINGERPRINT', 1, _farm_fingerprint_local, deterministic=True)
+        self._conn.create_aggregate('BIT_XOR', 1, _BitXorLocal)
+        df_tabla.to_sql('_tabla', self._conn, index=False)
+
+    def _traducir(self, sql, parametros):
+        sql = sql.replace(f'`{self.tabla}`', '_tabla')
+        sql = re.sub(r'AS\s+STRING\b', 'AS TEXT', sql, flags=re.IGNORECASE)
+        params = {}
+        for nombre, valor in (parametros or {}).items():
+            if isinstance(valor, (list, tuple, set)):
+                valores = list(valor)
+                nombres = [f'{nombre}_{i}' for i in range(len(valores))]
+                lista = ', '.join(f'@{n}' for n in nombres) if nombres else 'NULL'
+                sql = re.sub(rf'IN\s+UNNEST\(\s*@{nombre}\s*\)', f'IN ({lista})', sql, flags=re.IGNORECASE)
+                params.update(dict(zip(nombres, valores)))
+            else:
+                params[nombre] = valor
+        return sql, params
+
+    def query(self, sql, job_config=None, parametros=None):
+        self.queries.append((sql, dict(parametros or {})))
+        sql_local, params = self._traducir(sql, parametros)
+        return _ResultadoLocal(pd.read_sql_query(sql_local, self._conn, params=params))
+
+
+def ejecutar_query(client, sql, parametros=None, tabla=BQ_TABLE):
+    """
+    Ejecuta una query con parámetros nombrados y retorna un DataFrame.
+
+    Con el cliente real arma el QueryJobConfig (STRING escalar o ARRAY<STRING>)
+    y descarga el resultado en formato Arrow (BigQuery Storage API si está
+    disponible); si pyarrow no está instalado usa to_dataframe().
+    Con ClienteBigQueryLocal pasa los parámetros tal cual.
+    """
+    sql = sql.format(tabla=tabla)
+    if isinstance(client, ClienteBigQueryLocal):
+        job = client.query(sql, parametros=parametros)
+    else:
+        from google.cloud import bigquery
+        query_params = []
+        for nombre, valor in (parametros or {}).items():
+            if isinstance(valor, (list, tuple, set)):
+                query_params.append(bigquery.ArrayQueryParameter(nombre, 'STRING', [str(v) for v in valor]))
+            else:
+                query_params.append(bigquery.ScalarQueryParameter(nombre, 'STRING', str(valor)))
+        job = client.query(sql, job_config=bigquery.QueryJobConfig(query_parameters=query_params))
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return job.to_dataframe()
+    try:
+        tabla_arrow = job.to_arrow(create_bqstorage_client=True)
+    except TypeError:
+        tabla_arrow = job.to_arrow()
+    return tabla_arrow.to_pandas()
+
+
+# ==============================================================================
+# ESPEJO SQLITE
+# ==============================================================================
+
+def conectar_espejo(ruta=None):
+    """Abre (y crea si hace falta) el espejo SQLite."""
+    ruta = Path(ruta) if ruta else RUTA_ESPEJO_DEFAULT
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(ruta))
+    conn.executescript(_SCHEMA)
+    # Espejos creados antes del checksum: sus OLAs se re-descargan una vez
+    if 'checksum' not in {fila[1] for fila in conn.execute("PRAGMA table_info(sync_estado)")}:
+        conn.execute("ALTER TABLE sync_estado ADD COLUMN checksum TEXT")
+    return conn
+
+
+def hash_comentarios_unicos(comentarios):
+    """Hash de comentarios calculado una vez por texto distinto."""
+    from parte4_categorizacion import hash_comentario
+
+    comentarios = comentarios.astype(object)
+    validos = comentarios.notna()
+    unicos = pd.unique(comentarios[validos].astype(str))
+    mapa = {c: hash_comentario(c) for c in unicos}
+    hashes = pd.Series([None] * len(comentarios), index=comentarios.index, dtype=object)
+    hashes[validos] = comentarios[validos].astype(str).map(mapa)
+    return hashes
+
+
+def estado_espejo(site_code, ruta=None, olas=None):
+    """
+    Estado del espejo para un site (opcionalmente restringido a ciertas OLAs).
+
+    Returns:
+        dict: {'olas': {OLA: filas}, 'checksums': {OLA: checksum | None}, 'filas': int,
+               'ultima_sync': timestamp | None, 'vigente_hasta': timestamp | None}
+               ``vigente_hasta`` es la sincronización más antigua entre las OLAs
+               pedidas (None si alguna nunca se sincronizó).
+    """
+    conn = conectar_espejo(ruta)
+    try:
+        df = pd.read_sql_query(
+            "SELECT ola, filas, checksum, sincronizado_en FROM sync_estado WHERE site = ?",
+            conn, params=[site_code]
+        )
+    finally:
+        conn.close()
+    if olas is not None:
+        olas = [str(o) for o in olas]
+        df = df[df['ola'].isin(olas)]
+        completo = len(df) == len(set(olas))
+    else:
+        completo = len(df) > 0
+    return {
+        'olas': dict(zip(df['ola'], df['filas'].astype(int))),
+        'checksums': dict(zip(df['ola'], df['checksum'].astype(object).where(df['checksum'].notna(), None))),
+        'filas': int(df['filas'].sum()) if len(df) else 0,
+        'ultima_sync': float(df['sincronizado_en'].max()) if len(df) else None,
+        'vigente_hasta': float(df['sincronizado_en'].min()) if completo and len(df) else None
+    }
+
+
+def sincronizar_espejo(client, site_code, ruta=None, ttl_horas=TTL_HORAS_DEFAULT, forzar=False, olas=None, verbose=True):
+    """
+    Sincroniza incrementalmente el espejo local con BigQuery para un site.
+
+    Args:
+        client: Cliente BigQuery (o ClienteBigQueryLocal)
+        site_code: MLA, MLB, MLM, MLC
+        ruta: Ruta del SQLite (default: data/cache/bq_reclasificados.sqlite)
+        ttl_horas: Si la última sincronización es más reciente, no consulta BigQuery
+        forzar: Ignora el TTL y re-descarga todas las OLAs
+        olas: Si se indica, solo sincroniza esas OLAs (pushdown); None = todo el site
+        verbose: Si True, imprime progreso
+
+    Returns:
+        dict: {'estado': 'vigente' | 'sincronizado', 'olas_descargadas': [...],
+               'olas_eliminadas': [...], 'filas_descargadas': int}
+    """
+    estado = estado_espejo(site_code, ruta, olas=olas)
+    resultado = {'estado': 'vigente', 'olas_descargadas': [], 'olas_eliminadas': [], 'filas_descargadas': 0}
+
+    if not forzar and estado['vigente_hasta'] and ttl_horas is not None:
+        if time.time() - estado['vigente_hasta'] < ttl_horas * 3600:
+            if verbose:
+                print(f"   💾 Espejo local vigente ({estado['filas']:,} filas, TTL {ttl_horas}h)")
+            return resultado
+
+    # Conteo y checksum remoto por OLA (agregado barato) vs lo guardado en el espejo
+    sql_conteo, params_conteo = construir_query_reclasificados(site_code, olas=olas, agrupar_por_ola=True)
+    df_conteo = ejecutar_query(client, sql_conteo, params_conteo)
+    remoto = dict(zip(df_conteo['OLA'].astype(str), df_conteo['filas'].astype(int)))
+    checksum_remoto = dict(zip(df_conteo['OLA'].astype(str), [str(int(c)) for c in df_conteo['checksum']]))
+    local = {} if forzar else {o: (n, estado['checksums'].get(o)) for o, n in estado['olas'].items()}
+
+    olas_descargar = sorted(o for o, n in remoto.items() if local.get(o) != (n, checksum_remoto[o]))
+    olas_eliminar = sorted(o for o in estado['olas'] if o not in remoto)
+
+    if olas_descargar:
+        if verbose:
+            print(f"   📡 Sincronizando espejo {site_code}: {len(olas_descargar)} OLA(s) nuevas/modificadas {olas_descargar}")
+        sql_filas, params_filas = construir_query_reclasificados(site_code, olas=olas_descargar)
+        df_bq = ejecutar_query(client, sql_filas, params_filas)
+    else:
+        df_bq = pd.DataFrame(columns=['numericalId', 'OLA', 'MARCA', 'COMMENTS', 'MOTIVO_RECLASIFICADO'])
+
+    df_espejo = pd.DataFrame({
+        'site': site_code,
+        'numericalId': df_bq['numericalId'].astype(object).where(df_bq['numericalId'].notna(), None),
+        'ola': df_bq['OLA'].astype(object).where(df_bq['OLA'].notna(), None),
+        'marca': df_bq['MARCA'].astype(object).where(df_bq['MARCA'].notna(), None),
+        'hash': hash_comentarios_unicos(df_bq['COMMENTS']),
+        'motivo': df_bq['MOTIVO_RECLASIFICADO'].astype(str).str.strip(),
+    })
+
+    ahora = time.time()
+    conn = conectar_espejo(ruta)
+    try:
+        with conn:
+            for ola in olas_descargar + olas_eliminar:
+                conn.execute("DELETE FROM reclasificados WHERE site = ? AND COALESCE(ola, '') = ?", (site_code, ola))
+                conn.execute("DELETE FROM sync_estado WHERE site = ? AND ola = ?", (site_code, ola))
+            if len(df_espejo) > 0:
+                conn.executemany(
+                    "INSERT INTO reclasificados (site, numericalId, ola, marca, hash, motivo) VALUES (?, ?, ?, ?, ?, ?)",
+                    df_espejo.itertuples(index=False, name=None)
+                )
+            conn.executemany(
+                "INSERT OR REPLACE INTO sync_estado (site, ola, filas, checksum, sincronizado_en) VALUES (?, ?, ?, ?, ?)",
+                [(site_code, ola, n, checksum_remoto[ola], ahora) for ola, n in remoto.items()]
+            )
+            # OLAs pedidas que no existen en remoto: se registran vacías para respetar el TTL
+            if olas is not None:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO sync_estado (site, ola, filas, checksum, sincronizado_en) VALUES (?, ?, 0, NULL, ?)",
+                    [(site_code, str(o), ahora) for o in olas if str(o) not in remoto]
+                )
+    finally:
+        conn.close()
+
+    resultado.update({
+        'estado': 'sincronizado',
+        'olas_descargadas': olas_descargar,
+        'olas_eliminadas': olas_eliminar,
+        'filas_descargadas': len(df_espejo)
+    })
+    if verbose:
+        print(f"   ✅ Espejo {site_code}: {len(df_espejo):,} filas descargadas, {sum(remoto.values()):,} en total")
+    return resultado
+
+
+def construir_indices(df):
+    """
+    Construye los índices de lookup de PARTE 4 a partir de filas de la tabla.
+
+    Columnas esperadas (las que falten se omiten): numericalId, OLA, MARCA,
+    HASH y MOTIVO. Ante claves repetidas gana la última fila (igual que el
+    recorrido fila a fila original).
+
+    Returns:
+        tuple: (bq_por_clave, bq_por_id, bq_por_hash)
+    """
+    if df is None or len(df) == 0:
+        return {}, {}, {}
+
+    motivo = df['MOTIVO'].astype(str).str.strip()
+    bq_por_clave, bq_por_id, bq_por_hash = {}, {}, {}
+
+    if 'numericalId' in df.columns:
+        ids = df['numericalId'].astype(object)
+        con_id = ids.notna()
+        bq_por_id = dict(zip(ids[con_id].astype(str), motivo[con_id]))
+        if 'OLA' in df.columns and 'MARCA' in df.columns:
+            con_clave = con_id & df['OLA'].notna() & df['MARCA'].notna()
+            claves = ids[con_clave].astype(str) + '|' + df.loc[con_clave, 'OLA'].astype(str) + '|' + df.loc[con_clave, 'MARCA'].astype(str)
+            bq_por_clave = dict(zip(claves, motivo[con_clave]))
+
+    if 'HASH' in df.columns:
+        con_hash = df['HASH'].notna()
+        bq_por_hash = dict(zip(df.loc[con_hash, 'HASH'], motivo[con_hash]))
+
+    return bq_por_clave, bq_por_id, bq_por_hash
+
+
+def cargar_indices_espejo(site_code, ruta=None, olas=None, ids=None):
+    """
+    Construye los índices de lookup de PARTE 4 desde el espejo local.
+
+    Args:
+        site_code: MLA, MLB, MLM, MLC
+        ruta: Ruta del SQLite
+        olas: Si se indica, solo usa filas de esas OLAs
+        ids: Si se indica, el lookup por clave/ID solo usa filas de esos
+            numericalId (el índice por hash usa todas las filas de las OLAs)
+
+    Returns:
+        tuple: (bq_por_clave, bq_por_id, bq_por_hash)
+               clave = "numericalId|OLA|MARCA"
+    """
+    sql = ("SELECT numericalId, ola AS OLA, marca AS MARCA, hash AS HASH, motivo AS MOTIVO "
+           "FROM reclasificados WHERE site = ?")
+    params = [site_code]
+    if olas is not None:
+        olas = [str(o) for o in olas]
+        sql += f" AND COALESCE(ola, '') IN ({', '.join('?' * len(olas))})" if olas else " AND 0"
+        params += olas
+    conn = conectar_espejo(ruta)
+    try:
+        df = pd.read_sql_query(sql + " ORDER BY rowid", conn, params=params)
+    finally:
+        conn.close()
+    if ids is None:
+        return construir_indices(df)
+    del_player = df['numericalId'].astype(object).isin({str(i) for i in ids})
+    bq_por_clave, bq_por_id, _ = construir_indices(df[del_player])
+    _, _, bq_por_hash = construir_indices(df[['HASH', 'MOTIVO']])
+    return bq_por_clave, bq_por_id, bq_por_hash
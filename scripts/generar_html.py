@@ -16,10 +16,17 @@ ESTRUCTURA TAB RESUMEN (Pyramid Principle - Conclusión primero):
 """
 
 import html as html_module
+import json
+import math
 import random
+import shutil
 from pathlib import Path
 from datetime import datetime
 
+from config_categorias import mapear_categoria
+from menciones_competidores import comparaciones_de
+from ventana_quarters import TIPOS_DRIVER
+
 # ==============================================================================
 # THRESHOLDS CENTRALIZADOS
 # Todos los umbrales numéricos del modelo en un solo lugar
@@ -78,6 +85,9 @@ TEXTOS = {
 BANDERAS = {'MLB': '🇧🇷', 'MLA': '🇦🇷', 'MLM': '🇲🇽', 'MLC': '🇨🇱'}
 NOMBRES_PAIS = {'MLB': 'Brasil', 'MLA': 'Argentina', 'MLM': 'México', 'MLC': 'Chile'}
 
+# metadata.metodo de los JSON de causas que no salen del análisis semántico (LLM)
+ETIQUETAS_METODO_PROVISORIO = {'clusters_locales': 'Provisorio – clusters automáticos'}
+
 
 # ==============================================================================
 # CORRECCIÓN DE ENCODING - UTF-8 mal interpretado como Latin-1
@@ -139,6 +149,85 @@ def cargar_css():
     return css_match.group(1) if css_match else ""
 
 
+# ==============================================================================
+# GRÁFICOS CLIENT-SIDE (Chart.js desde CDN o copia local + bloques JSON)
+# ==============================================================================
+
+# Misma versión que templates/vendor/chart.umd.min.js (CDN y copia local de respaldo deben coincidir)
+CHARTJS_VERSION = '4.4.0'
+CHARTJS_CDN = f'https://cdn.jsdelivr.net/npm/chart.js@{CHARTJS_VERSION}/dist/chart.umd.min.js'
+CHARTJS_VENDOR = Path(__file__).parent.parent / 'templates' / 'vendor' / 'chart.umd.min.js'
+# Ruta de la copia vendorizada, relativa al reporte (la copia guardar_html)
+CHARTJS_LOCAL = 'vendor/chart.umd.min.js'
+
+
+def cargar_js_graficos():
+    """Carga los renderizadores Chart.js del template (graficos_nps.js)."""
+    js_path = Path(__file__).parent.parent / 'templates' / 'graficos_nps.js'
+    if not js_path.exists():
+        return ""
+    with open(js_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def cargar_js_simulador():
+    """Carga el widget del simulador what-if (simulador_whatif.js)."""
+    js_path = Path(__file__).parent.parent / 'templates' / 'simulador_whatif.js'
+    if not js_path.exists():
+        return ""
+    with open(js_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def script_chartjs():
+    """
+    Retorna el <script> que deja Chart.js disponible en el reporte.
+
+    Carga Chart.js desde el CDN y, si falla (sin conexión), desde la copia
+    vendorizada que guardar_html deja junto al reporte (CHARTJS_LOCAL). El
+    archivo no se embebe en el HTML, así el reporte queda liviano.
+    window.NPS_CHARTJS es una promesa que resuelve cuando Chart está cargado.
+    """
+    return f"""<script>
+    window.NPS_CHARTJS = (function() {{
+        function cargar(src) {{
+            return new Promise(function(ok, error) {{
+                var s = document.createElement('script');
+                s.src = src;
+                s.onload = ok; s.onerror = error;
+                document.head.appendChild(s);
+            }});
+        }}
+        return cargar('{CHARTJS_CDN}').catch(function() {{ return cargar('{CHARTJS_LOCAL}'); }});
+    }})();
+    </script>"""
+
+
+def html_grafico(canvas_id, tipo, data=None, b64=None, alto=380, msg_vacio='Gráfico no disponible'):
+    """
+    HTML de un gráfico del reporte.
+    
+    Con ``data`` (modo 'js') emite un <canvas> + bloque JSON compacto que dibuja
+    graficos_nps.js; con ``b64`` (modo 'png') embebe la imagen.
+    
+    Args:
+        canvas_id: id del <canvas>
+        tipo: Renderizador JS ('waterfall', 'lineas', 'barras_linea')
+        data: Dict con datos del gráfico (grafico_*_data)
+        b64: PNG base64 (grafico_*_base64)
+        alto: Alto del contenedor en px
+        msg_vacio: Texto si no hay gráfico
+    """
+    if data:
+        data_json = json.dumps(data, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+        return (f'<div style="position: relative; height: {alto}px;"><canvas id="{canvas_id}"></canvas></div>'
+                f'<script type="application/json" class="grafico-data" data-canvas="{canvas_id}" '
+                f'data-tipo="{tipo}">{data_json}</script>')
+    if b64:
+        return f'<img src="data:image/png;base64,{b64}" style="max-width:100%;">'
+    return f'<p style="color:#999;">{msg_vacio}</p>'
+
+
 def valor_class(val):
     """Retorna clase CSS según valor."""
     if val > 0: return 'valor-positivo'
@@ -457,6 +546,7 @@ def generar_html_completo(resultados, diagnostico_gpt=None):
     # ==========================================================================
     import json as _json
     _causas_semanticas = {}
+    _aviso_causas = ''
     _data_dir = Path(__file__).parent.parent / 'data'
     _json_cr = _data_dir / f'causas_raiz_semantico_{player}_{site}_{q_act}.json'
     # Fallback: intentar sin site (compatibilidad con archivos viejos)
@@ -464,11 +554,15 @@ def generar_html_completo(resultados, diagnostico_gpt=None):
         _json_cr_legacy = _data_dir / f'causas_raiz_semantico_{player}_{q_act}.json'
         if _json_cr_legacy.exists():
             _json_cr = _json_cr_legacy
+    # Respaldo provisorio: temas pre-agrupados localmente (ver clusters_comentarios.py)
+    if not _json_cr.exists() and resultados.get('causas_raiz_provisorias'):
+        _json_cr = _data_dir / f'causas_raiz_clusters_{player}_{site}_{q_act}.json'
     if _json_cr.exists():
         try:
             with open(_json_cr, 'r', encoding='utf-8') as _f:
                 _cr_data = _json.load(_f)
                 _causas_semanticas = _cr_data.get('causas_por_motivo', {})
+                _aviso_causas = _aviso_causas_provisorias(_cr_data.get('metadata'))
         except Exception:
             pass
     
@@ -541,6 +635,15 @@ def generar_html_completo(resultados, diagnostico_gpt=None):
     grafico_princ_b64 = princ_data.get('grafico_principalidad_base64', '')
     grafico_mot_princ_b64 = princ_data.get('grafico_motivos_princ_base64', '')
     
+    # Datos para gráficos Chart.js (modo_graficos = 'js')
+    graficos_data = {
+        'waterfall': wf_data.get('grafico_waterfall_data'),
+        'seguridad': seg_data.get('grafico_seguridad_data'),
+        'motivos_inseg': seg_data.get('grafico_motivos_inseg_data'),
+        'principalidad': princ_data.get('grafico_principalidad_data'),
+        'motivos_princ': princ_data.get('grafico_motivos_princ_data'),
+    }
+    
     prod_data = resultados.get('productos', {})
     productos = prod_data.get('productos_clave', [])
     productos_todos = prod_data.get('productos_todos', productos)  # Todos los productos para tabla
@@ -614,7 +717,7 @@ def generar_html_completo(resultados, diagnostico_gpt=None):
                 </div>
             </div>
             <script>
-            (function() {{
+            NPS_CHARTJS.then(function() {{
                 const ctx = document.getElementById('chartNpsEvolucion').getContext('2d');
                 const labels = {json.dumps(nps_labels)};
                 const data = {json.dumps(nps_values)};
@@ -697,7 +800,7 @@ def generar_html_completo(resultados, diagnostico_gpt=None):
                         }}
                     }}]
                 }});
-            }})();
+            }});
             </script>
         '''
     else:
@@ -714,7 +817,8 @@ def generar_html_completo(resultados, diagnostico_gpt=None):
             </div>
         """
     else:
-        html_diagnostico_principal = _generar_diagnostico_principal(resultados, TXT, q_ant, q_act, _causas_semanticas)
+        html_diagnostico_principal = (_aviso_causas
+                                      + _generar_diagnostico_principal(resultados, TXT, q_ant, q_act, _causas_semanticas))
     
     # ==========================================================================
     # ANÁLISIS DE QUEJAS (html_quejas_box del notebook)
@@ -806,7 +910,7 @@ def generar_html_completo(resultados, diagnostico_gpt=None):
                 <canvas id="chartQuejasEvolucion"></canvas>
             </div>
             <script>
-            (function() {{
+            NPS_CHARTJS.then(function() {{
                 const ctx = document.getElementById('chartQuejasEvolucion').getContext('2d');
                 const labels = {_json.dumps(quejas_labels)};
                 const datasets = {_json.dumps(chart_datasets)};
@@ -919,14 +1023,14 @@ def generar_html_completo(resultados, diagnostico_gpt=None):
                         }}
                     }}]
                 }});
-            }})();
+            }});
             </script>
         '''
     else:
         grafico_quejas_html = '<p style="color:#999;">Gráfico no disponible</p>'
     
     # Waterfall con acordeones enriquecidos (ahora con causas semánticas)
-    html_waterfall = _generar_waterfall_html(causas_waterfall, TXT, q_ant, q_act, _causas_semanticas)
+    html_waterfall = _aviso_causas + _generar_waterfall_html(causas_waterfall, TXT, q_ant, q_act, _causas_semanticas)
     
     # Promotores resumen
     html_promotores_resumen = _generar_promotores_resumen(resultados, TXT, q_ant, q_act)
@@ -1016,7 +1120,8 @@ def generar_html_completo(resultados, diagnostico_gpt=None):
                                    grafico_wf_b64, grafico_quejas_b64,
                                    grafico_seg_b64, grafico_mot_inseg_b64,
                                    grafico_princ_b64, grafico_mot_princ_b64,
-                                   seccion_triangulacion, seccion_noticias_grid)
+                                   seccion_triangulacion, seccion_noticias_grid,
+                                   graficos_data=graficos_data)
     
     # ==========================================================================
     # FOOTER
@@ -1038,7 +1143,7 @@ def generar_html_completo(resultados, diagnostico_gpt=None):
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{TXT['titulo_resumen']} - {player}</title>
     <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap" rel="stylesheet">
-    <script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.7/dist/chart.umd.min.js"></script>
+    {script_chartjs()}
 </head>
 <body style="margin: 0; padding: 20px; background: #f0f2f5;">
     
@@ -1053,6 +1158,12 @@ def generar_html_completo(resultados, diagnostico_gpt=None):
         {html_footer}
     </div>
 
+<script>
+{cargar_js_graficos()}
+</script>
+<script>
+{cargar_js_simulador()}
+</script>
 </body>
 </html>
 """
@@ -1117,25 +1228,23 @@ def _generar_resumen_narrativo(player, nps_delta, quejas_deterioro, quejas_mejor
     if triangulacion_motivos is None:
         triangulacion_motivos = []
     
-    # MAPEO MOTIVO → PRODUCTO (asociación para el diagnóstico)
+    # MAPEO CATEGORÍA DE MOTIVO → PRODUCTO (asociación para el diagnóstico)
     MAPEO_MOTIVO_PRODUCTO = {
-        'financiamiento': ['Crédito', 'Tarjeta de Crédito', 'Préstamo', 'Empréstimo'],
-        'rendimientos': ['Rendimientos', 'Cuenta Remunerada', 'Inversiones'],
-        'seguridad': ['Pix', 'Transferencias'],
-        'complejidad': ['App', 'Pagos', 'Transferencias'],
-        'promociones': ['Cashback', 'Beneficios'],
+        'Financiamiento': ['Crédito', 'Tarjeta de Crédito', 'Préstamo', 'Empréstimo'],
+        'Rendimientos': ['Rendimientos', 'Cuenta Remunerada', 'Inversiones'],
+        'Seguridad': ['Pix', 'Transferencias'],
+        'Complejidad': ['App', 'Pagos', 'Transferencias'],
+        'Promociones': ['Cashback', 'Beneficios'],
     }
     
     def buscar_producto_asociado(motivo, productos):
         """Busca producto relacionado al motivo de queja."""
-        motivo_lower = motivo.lower()
-        for key, productos_relacionados in MAPEO_MOTIVO_PRODUCTO.items():
-            if key in motivo_lower:
-                for prod in productos:
-                    nombre = prod.get('nombre_display', prod.get('nombre_original', '')).lower()
-                    for pr in productos_relacionados:
-                        if pr.lower() in nombre:
-                            return prod
+        productos_relacionados = MAPEO_MOTIVO_PRODUCTO.get(mapear_categoria(motivo), [])
+        for prod in productos:
+            nombre = prod.get('nombre_display', prod.get('nombre_original', '')).lower()
+            for pr in productos_relacionados:
+                if pr.lower() in nombre:
+                    return prod
         return None
     
     def buscar_noticia_triangulada(motivo, delta_queja=0):
@@ -1651,24 +1760,15 @@ def _buscar_noticia_para_motivo(motivo: str, triangulacion_motivos: list, notici
     
     # 2. Búsqueda directa en noticias por categoría
     MAPEO_MOTIVO_CATEGORIA = {
-        'financiamiento': ['financiamiento', 'crédito', 'credito', 'préstamo', 'emprestimo'],
-        'financiamento': ['financiamiento', 'crédito', 'credito', 'préstamo', 'emprestimo'],
-        'rendimiento': ['rendimientos', 'rendimentos', 'cdi', 'inversión', 'ahorro'],
-        'rendimentos': ['rendimientos', 'rendimentos', 'cdi', 'inversión', 'ahorro'],
-        'seguridad': ['seguridad', 'segurança', 'fraude', 'robo'],
-        'segurança': ['seguridad', 'segurança', 'fraude', 'robo'],
-        'atención': ['atención', 'atendimento', 'soporte', 'sac'],
-        'atendimento': ['atención', 'atendimento', 'soporte', 'sac'],
-        'funcionalidad': ['funcionalidades', 'app', 'tecnología', 'feature'],
-        'promociones': ['promociones', 'promoções', 'beneficios', 'cashback'],
-        'beneficios': ['promociones', 'promoções', 'beneficios', 'cashback'],
+        'Financiamiento': ['financiamiento', 'crédito', 'credito', 'préstamo', 'emprestimo'],
+        'Rendimientos': ['rendimientos', 'rendimentos', 'cdi', 'inversión', 'ahorro'],
+        'Seguridad': ['seguridad', 'segurança', 'fraude', 'robo'],
+        'Atención': ['atención', 'atendimento', 'soporte', 'sac'],
+        'Funcionalidades': ['funcionalidades', 'app', 'tecnología', 'feature'],
+        'Promociones': ['promociones', 'promoções', 'beneficios', 'cashback'],
     }
     
-    categorias_buscar = []
-    for key, cats in MAPEO_MOTIVO_CATEGORIA.items():
-        if key in motivo_lower:
-            categorias_buscar.extend(cats)
-            break
+    categorias_buscar = list(MAPEO_MOTIVO_CATEGORIA.get(mapear_categoria(motivo), []))
     
     if not categorias_buscar:
         categorias_buscar = [motivo_lower]
@@ -1711,57 +1811,14 @@ def _mapear_queja_a_producto(motivo, productos):
     - Quejas de Rendimientos → productos tipo 'ahorro'
     - Quejas operativas (Atención, Complejidad, Seguridad) → sin producto
     """
-    # Mapeo queja -> tipo de producto
+    # Mapeo categoría de queja -> tipo de producto (el resto son quejas
+    # operativas sin producto: Atención, Complejidad, Seguridad, etc.)
     MAPEO_QUEJA_TIPO = {
-        # Quejas relacionadas con CRÉDITO
-        'financiamento': 'credito',
-        'financiamiento': 'credito',
-        'crédito': 'credito',
-        'credito': 'credito',
-        'empréstimo': 'credito',
-        'emprestimo': 'credito',
-        'préstamo': 'credito',
-        'prestamo': 'credito',
-        'cartão': 'credito',
-        'cartao': 'credito',
-        'tarjeta': 'credito',
-        
-        # Quejas relacionadas con AHORRO/RENDIMIENTOS
-        'rendimento': 'ahorro',
-        'rendimientos': 'ahorro',
-        'investimento': 'ahorro',
-        'inversión': 'ahorro',
-        'inversion': 'ahorro',
-        'poupança': 'ahorro',
-        'poupanca': 'ahorro',
-        'ahorro': 'ahorro',
-        
-        # Quejas OPERATIVAS (sin producto)
-        'atención': None,
-        'atencion': None,
-        'atendimento': None,
-        'complejidad': None,
-        'complexidade': None,
-        'seguridad': None,
-        'segurança': None,
-        'seguranca': None,
-        'funcionalidades': None,
-        'funcionalidad': None,
-        'promociones': None,
-        'promoções': None,
-        'otro': None,
-        'outros': None,
-        'otros': None,
+        'Financiamiento': 'credito',
+        'Rendimientos': 'ahorro',
     }
     
-    motivo_lower = motivo.lower()
-    
-    # Determinar tipo de producto a buscar
-    tipo_producto = None
-    for queja_key, tipo in MAPEO_QUEJA_TIPO.items():
-        if queja_key in motivo_lower:
-            tipo_producto = tipo
-            break
+    tipo_producto = MAPEO_QUEJA_TIPO.get(mapear_categoria(motivo))
     
     # Si es queja operativa, no hay producto asociado
     if tipo_producto is None:
@@ -2510,6 +2567,421 @@ def _generar_waterfall_html(causas_waterfall, TXT, q_ant='Q1', q_act='Q2', causa
     return html
 
 
+def _generar_waterfall_competitivo(resultados, player):
+    """
+    Tabla Player vs Mercado del waterfall competitivo (PARTE 6).
+    
+    Muestra, por categoría, el share de quejas del player y del resto de las
+    marcas del site, ordenado por la mayor divergencia.
+    """
+    wf_comp = resultados.get('waterfall_competitivo') or {}
+    comparacion = wf_comp.get('comparacion') or []
+    if not comparacion:
+        return ''
+    
+    q_ant, q_act = wf_comp.get('q_ant', ''), wf_comp.get('q_act', '')
+    n_marcas = len(wf_comp.get('marcas', []))
+    gap_max = max(abs(r['gap_share']) for r in comparacion) or 1
+    
+    filas = []
+    for r in comparacion:
+        gap = r['gap_share']
+        color = '#dc2626' if gap > 0.5 else '#16a34a' if gap < -0.5 else '#64748b'
+        ancho = min(abs(gap) / gap_max * 50, 50)
+        barra = (f'<div style="position: relative; height: 8px; background: #f1f5f9; border-radius: 4px;">'
+                 f'<div style="position: absolute; {"left" if gap >= 0 else "right"}: 50%; width: {ancho:.0f}%; '
+                 f'height: 100%; background: {color}; border-radius: 4px;"></div></div>')
+        delta_gap = r.get('delta_gap')
+        delta_txt = f'{delta_gap:+.1f}pp' if delta_gap is not None else '—'
+        posicion = f"{r['posicion']}/{r['n_marcas']}" if r.get('posicion') else '—'
+        estilo_fila = 'color: #94a3b8;' if r.get('residual') else ''
+        filas.append(f"""
+            <tr style="border-bottom: 1px solid #f1f5f9; {estilo_fila}">
+                <td style="padding: 10px 12px; font-weight: 600;">{html_module.escape(str(r['categoria']))}</td>
+                <td style="padding: 10px 12px; text-align: center;">{r['share_player']:.1f}%</td>
+                <td style="padding: 10px 12px; text-align: center;">{r['share_mercado']:.1f}%</td>
+                <td style="padding: 10px 12px; text-align: center; color: {color}; font-weight: 700;">{gap:+.1f}pp</td>
+                <td style="padding: 10px 12px; min-width: 120px;">{barra}</td>
+                <td style="padding: 10px 12px; text-align: center; color: #64748b;">{delta_txt}</td>
+                <td style="padding: 10px 12px; text-align: center; color: #64748b;">{r['pp_player']:.1f} / {r['pp_mercado']:.1f}</td>
+                <td style="padding: 10px 12px; text-align: center;">{posicion}</td>
+            </tr>""")
+    
+    return f"""
+            <div class="grafico-box" style="margin-top: 25px;">
+                <div class="grafico-box-titulo">🏁 Quejas vs Mercado ({q_act})</div>
+                <div style="font-size: 12px; color: #64748b; margin-bottom: 15px; padding: 0 10px;">
+                    Share de quejas = % de los pp de NPS perdidos que explica cada categoría. Mercado = resto de las
+                    {max(n_marcas - 1, 0)} marcas del site, con motivo declarado para todas. Gap positivo: {html_module.escape(player)}
+                    concentra más quejas en esa categoría que el mercado. Ranking: 1 = menos quejas (pp).
+                </div>
+                <div style="overflow-x: auto;">
+                <table style="width: 100%; border-collapse: collapse; font-size: 13px;">
+                    <thead>
+                        <tr style="background: #f8fafc; color: #475569; font-size: 11px; text-transform: uppercase;">
+                            <th style="padding: 10px 12px; text-align: left;">Categoría</th>
+                            <th style="padding: 10px 12px;">Share {html_module.escape(player)}</th>
+                            <th style="padding: 10px 12px;">Share mercado</th>
+                            <th style="padding: 10px 12px;">Gap</th>
+                            <th style="padding: 10px 12px;"></th>
+                            <th style="padding: 10px 12px;">Δ gap vs {q_ant}</th>
+                            <th style="padding: 10px 12px;">pp player / mercado</th>
+                            <th style="padding: 10px 12px;">Ranking</th>
+                        </tr>
+                    </thead>
+                    <tbody>{''.join(filas)}
+                    </tbody>
+                </table>
+                </div>
+            </div>
+    """
+
+
+def _generar_comparaciones_competidores(resultados, player, q_ant, q_act):
+    """
+    ¿Con quién nos comparan? Marcas que mencionan los detractores y neutros
+    del player (matriz de menciones del site, comparaciones_de).
+    """
+    menciones = resultados.get('menciones_competidores') or {}
+    if 'error' in menciones or 'menciones' not in menciones:
+        return ''
+    top = comparaciones_de(menciones, player, q_act)
+    if not top:
+        return ''
+    previo = {c['nombre']: c['porcentaje'] for c in comparaciones_de(menciones, player, q_ant, top_n=None)}
+    
+    filas = []
+    for c in top:
+        pct_ant = previo.get(c['nombre'], 0.0)
+        delta = c['porcentaje'] - pct_ant
+        color = '#dc2626' if delta > 0.5 else '#16a34a' if delta < -0.5 else '#64748b'
+        filas.append(f"""
+            <tr style="border-bottom: 1px solid #f1f5f9;">
+                <td style="padding: 10px 12px; font-weight: 600;">{html_module.escape(str(c['nombre']))}</td>
+                <td style="padding: 10px 12px; text-align: center;">{pct_ant:.1f}%</td>
+                <td style="padding: 10px 12px; text-align: center;">{c['porcentaje']:.1f}%</td>
+                <td style="padding: 10px 12px; text-align: center; color: {color}; font-weight: 700;">{delta:+.1f}pp</td>
+                <td style="padding: 10px 12px; text-align: center; color: #64748b;">{c['comentarios']:,}</td>
+            </tr>""")
+    
+    return f"""
+            <div class="grafico-box" style="margin-top: 25px;">
+                <div class="grafico-box-titulo">🏆 ¿Con quién nos comparan? ({q_act})</div>
+                <div style="font-size: 12px; color: #64748b; margin-bottom: 15px; padding: 0 10px;">
+                    % de los comentarios de detractores y neutros de {html_module.escape(player)} que mencionan
+                    a cada marca competidora (top {len(top)} en {q_act}).
+                </div>
+                <div style="overflow-x: auto;">
+                <table style="width: 100%; border-collapse: collapse; font-size: 13px;">
+                    <thead>
+                        <tr style="background: #f8fafc; color: #475569; font-size: 11px; text-transform: uppercase;">
+                            <th style="padding: 10px 12px; text-align: left;">Marca mencionada</th>
+                            <th style="padding: 10px 12px;">{q_ant}</th>
+                            <th style="padding: 10px 12px;">{q_act}</th>
+                            <th style="padding: 10px 12px;">Δ</th>
+                            <th style="padding: 10px 12px;">Comentarios {q_act}</th>
+                        </tr>
+                    </thead>
+                    <tbody>{''.join(filas)}
+                    </tbody>
+                </table>
+                </div>
+            </div>
+    """
+
+
+def _fila_segmento(r, contrib_max, mostrar_dimension=True):
+    """Fila de la tabla de drill-down por segmento."""
+    contrib = r['contribucion']
+    color = '#16a34a' if contrib > 0.05 else '#dc2626' if contrib < -0.05 else '#64748b'
+    ancho = min(abs(contrib) / contrib_max * 50, 50)
+    barra = (f'<div style="position: relative; height: 8px; background: #f1f5f9; border-radius: 4px;">'
+             f'<div style="position: absolute; {"left" if contrib >= 0 else "right"}: 50%; width: {ancho:.0f}%; '
+             f'height: 100%; background: {color}; border-radius: 4px;"></div></div>')
+    nps_txt = lambda v: f'{v:.1f}' if v is not None else '—'
+    delta = r.get('delta_nps')
+    delta_txt = f'{delta:+.1f}' if delta is not None else '—'
+    estilo_fila = 'color: #94a3b8;' if r.get('base_baja') else ''
+    celda_dim = (f'<td style="padding: 8px 12px; color: #64748b;">{html_module.escape(r["dimension_label"])}</td>'
+                 if mostrar_dimension else '')
+    return f"""
+            <tr style="border-bottom: 1px solid #f1f5f9; {estilo_fila}">
+                {celda_dim}<td style="padding: 8px 12px; font-weight: 600;">{html_module.escape(str(r['segmento']))}</td>
+                <td style="padding: 8px 12px; text-align: center;">{r['share_q1']:.1f}% → {r['share_q2']:.1f}%</td>
+                <td style="padding: 8px 12px; text-align: center;">{nps_txt(r['nps_q1'])} → {nps_txt(r['nps_q2'])}</td>
+                <td style="padding: 8px 12px; text-align: center;">{delta_txt}</td>
+                <td style="padding: 8px 12px; text-align: center; color: #64748b;">{r.get('mix', 0):+.2f}</td>
+                <td style="padding: 8px 12px; text-align: center; color: #64748b;">{r.get('tasa', 0):+.2f}</td>
+                <td style="padding: 8px 12px; text-align: center; color: {color}; font-weight: 700;">{contrib:+.2f}pp</td>
+                <td style="padding: 8px 12px; min-width: 120px;">{barra}</td>
+                <td style="padding: 8px 12px; text-align: center; color: #64748b;">{nps_txt(r['nps_mercado_q2'])}</td>
+                <td style="padding: 8px 12px; text-align: center; color: #64748b;">{r['base_q2']:,}</td>
+            </tr>"""
+
+
+def _generar_drilldown_segmentos(resultados, player):
+    """
+    Drill-down del Δ NPS por segmento demográfico (cubo de segmentos).
+
+    Ranking de los segmentos por |mix| + |tasa| (shift-share) y, por
+    dimensión, el detalle completo (las contribuciones suman el Δ).
+    """
+    dd = (resultados.get('segmentos') or {}).get('drilldown') or {}
+    top = dd.get('top_segmentos') or []
+    if not top:
+        return ''
+
+    q_ant, q_act = dd['q_ant'], dd['q_act']
+    contrib_max = max(abs(r['contribucion']) for r in top) or 1
+
+    encabezado = lambda con_dimension: f"""
+                    <thead>
+                        <tr style="background: #f8fafc; color: #475569; font-size: 11px; text-transform: uppercase;">
+                            {'<th style="padding: 8px 12px; text-align: left;">Dimensión</th>' if con_dimension else ''}
+                            <th style="padding: 8px 12px; text-align: left;">Segmento</th>
+                            <th style="padding: 8px 12px;">Share {q_ant} → {q_act}</th>
+                            <th style="padding: 8px 12px;">NPS {q_ant} → {q_act}</th>
+                            <th style="padding: 8px 12px;">Δ NPS</th>
+                            <th style="padding: 8px 12px;">Mix</th>
+                            <th style="padding: 8px 12px;">Tasa</th>
+                            <th style="padding: 8px 12px;">Contribución</th>
+                            <th style="padding: 8px 12px;"></th>
+                            <th style="padding: 8px 12px;">NPS mercado</th>
+                            <th style="padding: 8px 12px;">Base {q_act}</th>
+                        </tr>
+                    </thead>"""
+
+    detalle = []
+    for filas in dd.get('dimensiones', {}).values():
+        if not filas:
+            continue
+        max_dim = max(abs(r['contribucion']) for r in filas) or 1
+        detalle.append(f"""
+                <details style="margin-top: 10px;">
+                    <summary style="font-size: 13px; font-weight: 600; color: #0369a1; cursor: pointer; user-select: none;">
+                        {html_module.escape(filas[0]['dimension_label'])} ({len(filas)} segmentos)
+                    </summary>
+                    <div style="overflow-x: auto;">
+                    <table style="width: 100%; border-collapse: collapse; font-size: 12px; margin-top: 8px;">
+                        {encabezado(False)}
+                        <tbody>{''.join(_fila_segmento(r, max_dim, mostrar_dimension=False) for r in filas)}
+                        </tbody>
+                    </table>
+                    </div>
+                </details>""")
+
+    return f"""
+            <div class="grafico-box" style="margin-top: 25px;">
+                <div class="grafico-box-titulo">👥 Δ NPS por Segmento ({q_ant} → {q_act}: {dd['delta']:+.1f}pp)</div>
+                <div style="font-size: 12px; color: #64748b; margin-bottom: 15px; padding: 0 10px;">
+                    Mix = Δ share × (NPS medio del segmento − NPS medio del player) (composición); Tasa = share medio × Δ NPS
+                    del segmento (desempeño). Contribución = Mix + Tasa: dentro de cada dimensión las contribuciones suman
+                    el Δ NPS de {html_module.escape(player)}; el ranking ordena por |Mix| + |Tasa|. NPS mercado = resto de las marcas del site
+                    en el mismo segmento ({q_act}). Ranking con base ≥ {dd.get('min_base', 30)} en ambos quarters.
+                </div>
+                <div style="overflow-x: auto;">
+                <table style="width: 100%; border-collapse: collapse; font-size: 13px;">
+                    {encabezado(True)}
+                    <tbody>{''.join(_fila_segmento(r, contrib_max) for r in top)}
+                    </tbody>
+                </table>
+                </div>
+                {''.join(detalle)}
+            </div>
+    """
+
+
+def _generar_trayectoria_ventana(resultados, player):
+    """
+    Trayectoria de drivers en la ventana (--window N): Δ de cada driver en
+    cada par de quarters adyacentes.
+
+    Negrita / color = significativo (|z| ≥ 1.96); gris = dentro del ruido.
+    En motivos el Δ es de pp de NPS perdido (+ = empeora); en el resto + = mejora.
+    """
+    ventana = resultados.get('ventana') or {}
+    trayectoria = ventana.get('trayectoria')
+    if trayectoria is None or len(trayectoria) == 0:
+        return ''
+
+    pares = ventana['pares']
+    orden_tipo = {t: i for i, t in enumerate(TIPOS_DRIVER)}
+    etiqueta_tipo = {'NPS': 'NPS', 'Motivo': 'Motivo', 'Producto': 'Producto (efecto total)',
+                     'Principalidad': 'Principalidad', 'Seguridad': 'Seguridad'}
+    celdas = trayectoria.set_index(['tipo', 'driver', 'par'])
+    drivers = sorted(dict.fromkeys(zip(trayectoria['tipo'], trayectoria['driver'])),
+                     key=lambda td: orden_tipo.get(td[0], len(orden_tipo)))
+
+    filas = []
+    for tipo, driver in drivers:
+        tds = []
+        for par in pares:
+            if (tipo, driver, par) not in celdas.index:
+                tds.append('<td style="padding: 8px 12px; text-align: center; color: #cbd5e1;">—</td>')
+                continue
+            c = celdas.loc[(tipo, driver, par)]
+            mejora = c['delta'] < 0 if tipo == 'Motivo' else c['delta'] > 0
+            if c['significativo']:
+                estilo = f"font-weight: 700; color: {'#16a34a' if mejora else '#dc2626'};"
+            else:
+                estilo = 'color: #94a3b8;'
+            z = 'z —' if math.isnan(c['z']) else 'z ∞' if math.isinf(c['z']) else f"z {c['z']:+.1f}"
+            tds.append(f'<td style="padding: 8px 12px; text-align: center; {estilo}" title="{z}">{c["delta"]:+.1f}</td>')
+        nombre = 'Δ NPS' if tipo == 'NPS' else html_module.escape(str(driver))
+        filas.append(f"""
+            <tr style="border-bottom: 1px solid #f1f5f9;">
+                <td style="padding: 8px 12px; font-size: 11px; color: #64748b;">{etiqueta_tipo.get(tipo, tipo)}</td>
+                <td style="padding: 8px 12px; font-weight: 600;">{nombre}</td>
+                {''.join(tds)}
+            </tr>""")
+
+    sin_desglose = ventana.get('quarters_sin_desglose') or []
+    nota_desglose = (f" Sin desglose de motivos en {', '.join(sin_desglose)}." if sin_desglose else '')
+    return f"""
+            <div class="grafico-box" style="margin-top: 25px;">
+                <div class="grafico-box-titulo">🪟 Trayectoria de Drivers ({ventana['quarters'][0]} → {ventana['quarters'][-1]})</div>
+                <div style="font-size: 12px; color: #64748b; margin-bottom: 15px; padding: 0 10px;">
+                    Δ de cada driver de {html_module.escape(player)} entre quarters consecutivos (pp). En motivos, + = más NPS
+                    perdido; en el resto, + = mejora. Negrita: significativo (|z| ≥ 1.96, z en el tooltip); gris: dentro
+                    del ruido muestral.{nota_desglose}
+                </div>
+                <div style="overflow-x: auto;">
+                <table style="width: 100%; border-collapse: collapse; font-size: 13px;">
+                    <thead>
+                        <tr style="background: #f8fafc; color: #475569; font-size: 11px; text-transform: uppercase;">
+                            <th style="padding: 8px 12px; text-align: left;">Tipo</th>
+                            <th style="padding: 8px 12px; text-align: left;">Driver</th>
+                            {''.join(f'<th style="padding: 8px 12px;">{par}</th>' for par in pares)}
+                        </tr>
+                    </thead>
+                    <tbody>{''.join(filas)}
+                    </tbody>
+                </table>
+                </div>
+            </div>
+    """
+
+
+def _generar_simulador_whatif(resultados, player):
+    """
+    Widget what-if: sliders por motivo (contribución al NPS perdido) y por
+    producto (share) que recalculan el NPS en el navegador sobre la base
+    embebida (simulador_whatif.js replica simular_nps).
+    """
+    base = resultados.get('simulador') or {}
+    if 'error' in base or not base.get('motivos'):
+        return ''
+
+    datos = {k: v for k, v in base.items() if k != 'archivo'}
+    data_json = json.dumps(datos, ensure_ascii=False, separators=(',', ':'), allow_nan=False).replace('</', '<\\/')
+    encabezado = lambda titulo: f"""
+                        <tr style="background: #f8fafc; color: #475569; font-size: 11px; text-transform: uppercase;">
+                            <th style="padding: 6px 10px; text-align: left;">{titulo}</th>
+                            <th style="padding: 6px 10px;"></th>
+                            <th style="padding: 6px 10px; text-align: right;">{base['q_act']}</th>
+                            <th style="padding: 6px 10px;">Volver a</th>
+                        </tr>"""
+    productos = ''
+    if base.get('productos'):
+        productos = f"""
+                    <table class="sim-productos" style="width: 100%; border-collapse: collapse; font-size: 12px; margin-top: 15px;">
+                        {encabezado('Producto (share)')}
+                    </table>"""
+
+    return f"""
+            <div class="grafico-box" style="margin-top: 25px;">
+                <div class="grafico-box-titulo">🎛️ Simulador What-if ({base['q_act']})</div>
+                <div style="font-size: 12px; color: #64748b; margin-bottom: 15px; padding: 0 10px;">
+                    Mové la contribución de un motivo al NPS perdido o el share de uso de un producto y el NPS de
+                    {html_module.escape(player)} se recalcula con la lógica del waterfall (−Δ contribución) y de productos
+                    (Mix Effect = Δ Share × Lift / 100). Los efectos se suman; productos superpuestos pueden contar dos veces.
+                </div>
+                <div id="simulador-whatif" style="padding: 0 10px;">
+                    <div style="display: flex; align-items: baseline; gap: 15px; margin-bottom: 15px;">
+                        <div style="font-size: 13px; color: #475569;">NPS {base['q_act']}: <strong>{base['nps_base']:.1f}</strong></div>
+                        <div style="font-size: 13px; color: #475569;">→ simulado: <strong class="sim-nps" style="font-size: 22px;"></strong></div>
+                        <div class="sim-delta" style="font-size: 16px; font-weight: 700;"></div>
+                        <div class="sim-desglose" style="font-size: 12px; color: #64748b;"></div>
+                        <button class="sim-reset" style="margin-left: auto; font-size: 12px; border: 1px solid #cbd5e1; background: white; border-radius: 4px; padding: 4px 10px; cursor: pointer;">Restablecer</button>
+                    </div>
+                    <table class="sim-motivos" style="width: 100%; border-collapse: collapse; font-size: 12px;">
+                        {encabezado('Motivo (pp NPS perdido)')}
+                    </table>
+                    {productos}
+                </div>
+                <script type="application/json" id="simulador-data">{data_json}</script>
+            </div>
+    """
+
+
+def _generar_ranking_shift_share(resultados, player):
+    """
+    Ranking de dimensiones que explican el Δ NPS (shift-share).
+
+    Por dimensión: Mix (cambio de composición) + Tasa (cambio de NPS dentro
+    de cada segmento) = Δ NPS; el poder explicativo ordena la tabla.
+    """
+    ss = resultados.get('shift_share') or {}
+    dimensiones = ss.get('dimensiones')
+    if dimensiones is None or len(dimensiones) == 0:
+        return ''
+
+    q_ant, q_act = ss.get('q_ant', ''), ss.get('q_act', '')
+    poder_max = float(dimensiones['poder_explicativo'].max()) or 1
+
+    filas = []
+    for _, r in dimensiones.iterrows():
+        ancho = min(r['poder_explicativo'] / poder_max * 100, 100)
+        color_mix = '#16a34a' if r['mix'] > 0.05 else '#dc2626' if r['mix'] < -0.05 else '#64748b'
+        estilo_fila = 'color: #94a3b8;' if r['base_baja'] else ''
+        fuente = f'<div style="font-size: 10px; color: #94a3b8;">{html_module.escape(str(r["fuente"]))}</div>' if r['fuente'] else ''
+        filas.append(f"""
+            <tr style="border-bottom: 1px solid #f1f5f9; {estilo_fila}">
+                <td style="padding: 10px 12px; font-weight: 600;">{html_module.escape(str(r['dimension_label']))}{fuente}</td>
+                <td style="padding: 10px 12px; text-align: center;">{r['delta']:+.1f}</td>
+                <td style="padding: 10px 12px; text-align: center; color: {color_mix}; font-weight: 700;">{r['mix']:+.2f}</td>
+                <td style="padding: 10px 12px; text-align: center;">{r['tasa']:+.2f}</td>
+                <td style="padding: 10px 12px; text-align: center;">{r['heterogeneidad']:.2f}</td>
+                <td style="padding: 10px 12px; min-width: 120px;">
+                    <div style="height: 8px; background: #f1f5f9; border-radius: 4px;">
+                        <div style="width: {ancho:.0f}%; height: 100%; background: #009ee3; border-radius: 4px;"></div>
+                    </div>
+                </td>
+                <td style="padding: 10px 12px; text-align: center;">{html_module.escape(str(r['segmento_top']))}</td>
+                <td style="padding: 10px 12px; text-align: center; color: #64748b;">{r['base_q2']:,}</td>
+            </tr>""")
+
+    return f"""
+            <div class="grafico-box" style="margin-top: 25px;">
+                <div class="grafico-box-titulo">🧮 ¿Qué dimensión explica el Δ NPS? ({q_ant} → {q_act})</div>
+                <div style="font-size: 12px; color: #64748b; margin-bottom: 15px; padding: 0 10px;">
+                    Shift-share por dimensión: Mix = cambio de composición de la base (Δ share × NPS relativo del segmento),
+                    Tasa = cambio de NPS dentro de cada segmento; Mix + Tasa = Δ NPS de {html_module.escape(player)} en esa base.
+                    Heterogeneidad = cuánto difiere el cambio de NPS entre segmentos. Poder explicativo = |Mix| + heterogeneidad:
+                    una dimensión donde todos los segmentos cayeron igual no explica el Δ. En gris, base menor a {ss.get('min_base', 100)}.
+                </div>
+                <div style="overflow-x: auto;">
+                <table style="width: 100%; border-collapse: collapse; font-size: 13px;">
+                    <thead>
+                        <tr style="background: #f8fafc; color: #475569; font-size: 11px; text-transform: uppercase;">
+                            <th style="padding: 10px 12px; text-align: left;">Dimensión</th>
+                            <th style="padding: 10px 12px;">Δ NPS</th>
+                            <th style="padding: 10px 12px;">Mix</th>
+                            <th style="padding: 10px 12px;">Tasa</th>
+                            <th style="padding: 10px 12px;">Heterogeneidad</th>
+                            <th style="padding: 10px 12px;">Poder explicativo</th>
+                            <th style="padding: 10px 12px;">Segmento clave</th>
+                            <th style="padding: 10px 12px;">Base {q_act}</th>
+                        </tr>
+                    </thead>
+                    <tbody>{''.join(filas)}
+                    </tbody>
+                </table>
+                </div>
+            </div>
+    """
+
+
 def _generar_acordeon_promotor(motivo_data, q_ant, q_act, comentarios_promotores=None, causas_semanticas=None):
     """
     Genera un acordeón para un motivo de promotor.
@@ -4221,9 +4693,12 @@ def _generar_alertas(resultados):
     return alertas
 
 
-def _generar_anexos(resultados, TXT, bandera, player, q_ant, q_act, g_wf, g_quejas, g_seg, g_mot_inseg, g_princ, g_mot_princ, seccion_triangulacion='', seccion_noticias_grid=''):
+def _generar_anexos(resultados, TXT, bandera, player, q_ant, q_act, g_wf, g_quejas, g_seg, g_mot_inseg, g_princ, g_mot_princ, seccion_triangulacion='', seccion_noticias_grid='', graficos_data=None):
     """Genera los tabs de anexos."""
     
+    # Gráficos: Chart.js si hay datos (modo 'js'), PNG base64 si no (modo 'png')
+    gd = graficos_data or {}
+    
     prod_data = resultados.get('productos', {})
     productos = prod_data.get('productos_todos', prod_data.get('productos_clave', []))
     
@@ -4247,8 +4722,14 @@ def _generar_anexos(resultados, TXT, bandera, player, q_ant, q_act, g_wf, g_quej
             </div>
             <div class="grafico-box">
                 <div class="grafico-box-titulo">📉 Waterfall NPS</div>
-                {f'<img src="data:image/png;base64,{g_wf}" style="max-width:100%;">' if g_wf else '<p style="color:#999;">Gráfico no disponible</p>'}
+                {html_grafico('chartWaterfall', 'waterfall', gd.get('waterfall'), g_wf, alto=460)}
             </div>
+            {_generar_waterfall_competitivo(resultados, player)}
+            {_generar_comparaciones_competidores(resultados, player, q_ant, q_act)}
+            {_generar_ranking_shift_share(resultados, player)}
+            {_generar_drilldown_segmentos(resultados, player)}
+            {_generar_trayectoria_ventana(resultados, player)}
+            {_generar_simulador_whatif(resultados, player)}
 
             <!-- Deep Dive: Causas Raíz Semánticas -->
             <div style="margin-top: 30px;">
@@ -4268,14 +4749,14 @@ def _generar_anexos(resultados, TXT, bandera, player, q_ant, q_act, g_wf, g_quej
             </div>
             <div class="grafico-box">
                 <div class="grafico-box-titulo">📊 Evolución de {TXT['seguridad']}</div>
-                {f'<img src="data:image/png;base64,{g_seg}" style="max-width:100%;">' if g_seg else '<p style="color:#999;">Gráfico no disponible</p>'}
+                {html_grafico('chartSeguridad', 'lineas', gd.get('seguridad'), g_seg, alto=340)}
             </div>
             <div class="grafico-box" style="margin-top: 25px;">
                 <div class="grafico-box-titulo">📉 Motivos de Inseguridad (Ponderado sobre Base Total)</div>
                 <div style="font-size: 12px; color: #64748b; margin-bottom: 15px; padding: 0 10px;">
                     % Ponderado = % Motivo × % Inseguridad de la marca. Muestra la proporción de usuarios inseguros por cada motivo respecto a la base total.
                 </div>
-                {f'<img src="data:image/png;base64,{g_mot_inseg}" style="max-width:100%;">' if g_mot_inseg else '<p style="color:#999;">Gráfico de motivos no disponible</p>'}
+                {html_grafico('chartMotivosInseg', 'barras_linea', gd.get('motivos_inseg'), g_mot_inseg, msg_vacio='Gráfico de motivos no disponible')}
             </div>
         </div>
     </div>
@@ -4291,14 +4772,14 @@ def _generar_anexos(resultados, TXT, bandera, player, q_ant, q_act, g_wf, g_quej
             </div>
             <div class="grafico-box">
                 <div class="grafico-box-titulo">📊 Evolución de {TXT['principalidad']}</div>
-                {f'<img src="data:image/png;base64,{g_princ}" style="max-width:100%;">' if g_princ else '<p style="color:#999;">Gráfico no disponible</p>'}
+                {html_grafico('chartPrincipalidad', 'lineas', gd.get('principalidad'), g_princ)}
             </div>
             <div class="grafico-box" style="margin-top: 25px;">
                 <div class="grafico-box-titulo">🏆 Motivos de Principalidad (Ponderado sobre Base Total)</div>
                 <div style="font-size: 12px; color: #64748b; margin-bottom: 15px; padding: 0 10px;">
                     % Ponderado = % Motivo × % Principalidad de la marca. Muestra la proporción de usuarios principales por cada motivo respecto a la base total.
                 </div>
-                {f'<img src="data:image/png;base64,{g_mot_princ}" style="max-width:100%;">' if g_mot_princ else '<p style="color:#999;">Gráfico de motivos no disponible</p>'}
+                {html_grafico('chartMotivosPrinc', 'barras_linea', gd.get('motivos_princ'), g_mot_princ, msg_vacio='Gráfico de motivos no disponible')}
             </div>
         </div>
     </div>
@@ -4449,6 +4930,22 @@ def _generar_anexos(resultados, TXT, bandera, player, q_ant, q_act, g_wf, g_quej
 # TAB CAUSAS RAÍZ SEMÁNTICAS
 # ==============================================================================
 
+def _aviso_causas_provisorias(metadata):
+    """
+    Etiqueta visible cuando el JSON de causas es el respaldo por clusters
+    (metadata.metodo en ETIQUETAS_METODO_PROVISORIO); '' si es semántico.
+    """
+    etiqueta = ETIQUETAS_METODO_PROVISORIO.get((metadata or {}).get('metodo'))
+    if not etiqueta:
+        return ''
+    return f"""
+        <div class="aviso-causas-provisorias" style="background: #fffbeb; border: 1px solid #f59e0b; border-left: 4px solid #f59e0b; color: #92400e; padding: 10px 16px; border-radius: 8px; margin-bottom: 15px; font-size: 13px;">
+            <strong>⚠️ {etiqueta}</strong> · Temas pre-agrupados por términos (TF-IDF + NMF), sin validar por el
+            análisis semántico: los títulos son términos frecuentes, no causas raíz.
+        </div>
+    """
+
+
 def _generar_causas_raiz_content(resultados, q_ant, q_act, player, site=None):
     """Genera el CONTENIDO de Causas Raíz (sin wrapper de tab) para incluirlo dentro de Waterfall."""
     import json
@@ -4460,6 +4957,8 @@ def _generar_causas_raiz_content(resultados, q_ant, q_act, player, site=None):
     # CARGA ESTRICTA: solo archivo exacto con site (sin fallbacks a legacy/glob)
     if site:
         json_path = data_dir / f'causas_raiz_semantico_{player}_{site}_{q_act}.json'
+        if not json_path.exists() and resultados.get('causas_raiz_provisorias'):
+            json_path = data_dir / f'causas_raiz_clusters_{player}_{site}_{q_act}.json'
         if json_path.exists():
             try:
                 with open(json_path, 'r', encoding='utf-8') as f:
@@ -4479,6 +4978,7 @@ def _generar_causas_raiz_content(resultados, q_ant, q_act, player, site=None):
         return '<p style="color:#999;">Análisis de Causas Raíz no disponible</p>'
     
     causas_por_motivo = causas_data['causas_por_motivo']
+    aviso = _aviso_causas_provisorias(causas_data.get('metadata'))
     
     motivos_ordenados = sorted(
         causas_por_motivo.items(),
@@ -4492,6 +4992,7 @@ def _generar_causas_raiz_content(resultados, q_ant, q_act, player, site=None):
             <div style="font-size: 24px; font-weight: 700; margin-bottom: 5px;">{player} - {q_ant} → {q_act}</div>
             <div style="opacity: 0.85; font-size: 13px;">{len(causas_por_motivo)} motivos analizados · Basado en comentarios reales de detractores y neutros</div>
         </div>
+        {aviso}
     """
     
     for motivo, datos in motivos_ordenados:
@@ -4592,6 +5093,8 @@ def _generar_promotores_causas_content(resultados, q_ant, q_act, player, site=No
     # CARGA ESTRICTA: solo archivo exacto con site (sin fallbacks a legacy/glob)
     if site:
         json_path = data_dir / f'causas_raiz_semantico_promotores_{player}_{site}_{q_act}.json'
+        if not json_path.exists() and resultados.get('causas_promotores_provisorias'):
+            json_path = data_dir / f'causas_raiz_clusters_promotores_{player}_{site}_{q_act}.json'
         if json_path.exists():
             try:
                 with open(json_path, 'r', encoding='utf-8') as f:
@@ -4611,6 +5114,7 @@ def _generar_promotores_causas_content(resultados, q_ant, q_act, player, site=No
         return '<p style="color:#999; padding: 20px;">Análisis Semántico de Promotores no disponible (pendiente de análisis LLM)</p>'
 
     causas_por_motivo = promotores_data['causas_por_motivo']
+    aviso = _aviso_causas_provisorias(promotores_data.get('metadata'))
 
     motivos_ordenados = sorted(
         causas_por_motivo.items(),
@@ -4624,6 +5128,7 @@ def _generar_promotores_causas_content(resultados, q_ant, q_act, player, site=No
             <div style="font-size: 24px; font-weight: 700; margin-bottom: 5px;">{player} - {q_ant} → {q_act}</div>
             <div style="opacity: 0.85; font-size: 13px;">{len(causas_por_motivo)} motivos analizados · Basado en comentarios reales de promotores</div>
         </div>
+        {aviso}
     """
 
     for motivo, datos in motivos_ordenados:
@@ -4714,7 +5219,7 @@ def _generar_promotores_causas_content(resultados, q_ant, q_act, player, site=No
 # ==============================================================================
 
 def guardar_html(html, player, periodo, site=None, output_dir=None):
-    """Guarda el HTML en un archivo."""
+    """Guarda el HTML en un archivo y deja Chart.js vendorizado al lado (respaldo offline)."""
     if output_dir is None:
         output_dir = Path(__file__).parent.parent / 'outputs'
     else:
@@ -4731,6 +5236,12 @@ def guardar_html(html, player, periodo, site=None, output_dir=None):
     with open(filepath, 'w', encoding='utf-8') as f:
         f.write(html)
     
+    destino_chartjs = output_dir / CHARTJS_LOCAL
+    if CHARTJS_VENDOR.exists() and (not destino_chartjs.exists()
+                                    or destino_chartjs.stat().st_size != CHARTJS_VENDOR.stat().st_size):
+        destino_chartjs.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(CHARTJS_VENDOR, destino_chartjs)
+    
     # Print suprimido - se muestra en resultado final de correr_modelo.py
     pass
     return str(filepath)
@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════════════
+ÍNDICE DE COMENTARIOS TOKENIZADOS (COMPARTIDO)
+═══════════════════════════════════════════════════════════════════════════════
+
+Tokeniza los comentarios UNA sola vez por corrida y expone reducciones sobre
+una matriz término-documento dispersa (formato CSR con numpy):
+
+    - top_keywords       → keywords más frecuentes de una selección
+    - tendencias_q1_q2   → temas nuevos / crecientes entre dos quarters
+
+Cada documento lleva sus claves (motivo × quarter × clase NPS), así que
+"comentarios de Tasas en 25Q4 de detractores" es una máscara, no un filtro
+de DataFrame. Los textos repetidos se tokenizan una vez (se indexan únicos).
+
+Perfiles de tokenización (mismo resultado que las funciones originales):
+    - 'causas':     parte7 / parte7b (extraer_keywords)
+    - 'acordeones': analisis_automatico (extraer_keywords_avanzado)
+    - 'plano':      texto normalizado sin tokenizar (subcausas, tema específico;
+                    ver analisis_automatico.presencia_keywords_subcausas)
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# PERFILES DE TOKENIZACIÓN
+# ==============================================================================
+
+# Encoding roto (UTF-8 leído como latin-1) - usado también por parte7.normalizar_encoding
+REEMPLAZOS_ENCODING = {
+    'Ã£': 'ã', 'Ã¡': 'á', 'Ã©': 'é', 'Ã­': 'í', 'Ã³': 'ó', 'Ãº': 'ú',
+    'Ã§': 'ç', 'Ã': 'í', 'Ãª': 'ê', 'Ã´': 'ô', 'Ã¢': 'â',
+    'confianã': 'confiança', 'seguranã': 'segurança', 'promoã': 'promoção',
+    'crã©dito': 'crédito', 'crã': 'cré', 'taxã': 'taxa', 'aplicaã': 'aplicaç',
+}
+
+_SIN_ACENTOS = {'ã': 'a', 'õ': 'o', 'ç': 'c', 'á': 'a', 'é': 'e', 'í': 'i',
+                'ó': 'o', 'ú': 'u', 'ñ': 'n'}
+
+STOPWORDS_CAUSAS = frozenset({
+    # Portugués
+    'de', 'a', 'o', 'que', 'e', 'do', 'da', 'em', 'um', 'para', 'é', 'com',
+    'não', 'uma', 'os', 'no', 'se', 'na', 'por', 'mais', 'as', 'dos', 'como',
+    'mas', 'foi', 'ao', 'ele', 'das', 'tem', 'à', 'seu', 'sua', 'ou', 'ser',
+    # Español
+    'la', 'el', 'en', 'y', 'los', 'del', 'las', 'un', 'con', 'su', 'al', 'es',
+    'lo', 'más', 'pero', 'sus', 'le', 'ya', 'fue', 'este', 'ha', 'sí', 'porque',
+    # Genéricos
+    'usar', 'usa', 'uso', 'ter', 'fazer', 'muy', 'bien', 'mal',
+})
+
+STOPWORDS_ACORDEONES = frozenset({
+    # Portugués básico
+    'de', 'a', 'o', 'que', 'e', 'do', 'da', 'em', 'um', 'para', 'é', 'com',
+    'não', 'uma', 'os', 'no', 'se', 'na', 'por', 'mais', 'as', 'dos', 'como',
+    'mas', 'foi', 'ao', 'ele', 'das', 'tem', 'à', 'seu', 'sua', 'ou', 'ser',
+    'nao', 'voce', 'você', 'eles', 'elas', 'nos', 'essa', 'esse', 'isso',
+    # Español básico
+    'la', 'el', 'en', 'los', 'del', 'las', 'al', 'lo', 'pero', 'sus', 'le',
+    'ya', 'fue', 'este', 'ha', 'sí', 'porque', 'muy', 'bien', 'mal', 'todo',
+    'usar', 'uso', 'ter', 'fazer', 'sempre', 'siempre', 'ainda', 'todavía',
+    'quando', 'cuando', 'onde', 'donde', 'como', 'muito', 'mucho', 'poco',
+    'pouco', 'nada', 'tudo', 'isso', 'eso', 'esto', 'aqui', 'aquí', 'ali',
+    'ahí', 'mesmo', 'mismo', 'gosto', 'gusto', 'gosta', 'gusta', 'acho',
+    'creo', 'pienso', 'penso', 'esta', 'este', 'esos', 'esas',
+    # Marcas y genéricos de fintech (NO informativos)
+    'app', 'mercado', 'pago', 'libre', 'nubank', 'banco', 'bank', 'conta',
+    'cuenta', 'aplicativo', 'aplicacion', 'dinheiro', 'dinero', 'plata',
+    'gente', 'pessoa', 'personas', 'usuario', 'cliente', 'clientes',
+    'coisa', 'cosa', 'cosas', 'forma', 'manera', 'parte', 'lugar',
+    'tempo', 'tiempo', 'vezes', 'veces', 'dias', 'anos', 'meses',
+    'alguns', 'algunas', 'varios', 'outras', 'otros', 'otras', 'outro',
+    'seria', 'poderia', 'podria', 'deveria', 'deberia', 'fazer', 'hacer',
+    'sendo', 'siendo', 'tendo', 'teniendo', 'pode', 'puede', 'podem',
+    'precisa', 'necesita', 'quero', 'quiero', 'quer', 'quiere',
+    'bom', 'bueno', 'ruim', 'malo', 'melhor', 'mejor', 'pior', 'peor',
+    'recomendo', 'recomiendo', 'gostaria', 'gustaria', 'ainda', 'todavia',
+    'sobre', 'entre', 'desde', 'hasta', 'cada', 'toda', 'todas', 'todos',
+    # Palabras genéricas adicionales (NO informativas)
+    'algumas', 'alguma', 'algum', 'algo', 'algun', 'alguno', 'alguna',
+    'muitas', 'muita', 'muitos', 'muchas', 'muchos', 'mucha',
+    'sempre', 'nunca', 'tambem', 'también', 'porem', 'porém',
+    'apenas', 'somente', 'solo', 'solamente',
+    'agora', 'ahora', 'depois', 'despues', 'antes', 'logo',
+    'assim', 'entao', 'entonces', 'portanto', 'pois', 'porque',
+    'sendo', 'sido', 'estar', 'estou', 'estoy', 'estava', 'estaba',
+})
+
+PERFILES_TOKENS = {
+    'causas': {
+        'reemplazos': REEMPLAZOS_ENCODING,
+        'patron': re.compile(r'\b[a-záéíóúãõàâêôçñü]{4,}\b'),
+        'stopwords': STOPWORDS_CAUSAS,
+    },
+    'acordeones': {
+        'reemplazos': _SIN_ACENTOS,
+        'patron': re.compile(r'\b[a-z]{4,15}\b'),
+        'stopwords': STOPWORDS_ACORDEONES,
+    },
+    'plano': {
+        'reemplazos': {**_SIN_ACENTOS, 'à': 'a', 'è': 'e', 'ì': 'i', 'ò': 'o', 'ù': 'u'},
+        'patron': None,
+        'stopwords': frozenset(),
+    },
+}
+
+CLASES_NPS = {-1: 'detractor', 0: 'neutro', 1: 'promotor'}
+
+
+def normalizar_texto(texto, perfil='plano'):
+    """Minúsculas + reemplazos del perfil (misma normalización que el índice)."""
+    texto = texto.lower()
+    for mal, bien in PERFILES_TOKENS[perfil]['reemplazos'].items():
+        texto = texto.replace(mal, bien)
+    return texto
+
+
+def regex_trie(palabras):
+    """
+    Regex de un trie de caracteres (alternativas por prefijo común, match más largo).
+
+    Envuelto en `(?=(...))`, findall da en cada posición la palabra más larga
+    que empieza ahí (ver compilar_keywords).
+    """
+    trie = {}
+    for palabra in palabras:
+        nodo = trie
+        for ch in palabra:
+            nodo = nodo.setdefault(ch, {})
+        nodo[''] = {}
+
+    def _rama(nodo):
+        ramas = [re.escape(ch) + _rama(hijo) for ch, hijo in sorted(nodo.items()) if ch != '']
+        if not ramas:
+            return ''
+        cuerpo = ramas[0] if len(ramas) == 1 else '(?:' + '|'.join(ramas) + ')'
+        return '(?:' + cuerpo + ')?' if '' in nodo else cuerpo
+
+    return _rama(trie)
+
+
+def compilar_keywords(keywords):
+    """
+    Compila una lista de keywords (con repetidas) en un único regex-trie.
+
+    El regex `(?=(trie))` da, en cada posición del texto, la keyword más
+    larga que empieza ahí; las keywords que son prefijo de esa también están
+    presentes. Así una sola pasada por texto reproduce exactamente el
+    `keyword in texto` de cada keyword (ver presencia_keywords).
+
+    Returns:
+        tuple: (regex compilado o None, dict keyword → número de columna (orden
+                de primera aparición), dict keyword → columnas de las keywords
+                que son prefijo suyo)
+    """
+    columnas = {}
+    for kw in keywords:
+        columnas.setdefault(kw, len(columnas))
+    no_vacias = [kw for kw in columnas if kw]
+    regex = re.compile('(?=(' + regex_trie(no_vacias) + '))', re.DOTALL) if no_vacias else None
+    prefijos = {kw: [columnas[p] for p in no_vacias if kw.startswith(p)] for kw in no_vacias}
+    return regex, columnas, prefijos
+
+
+def presencia_keywords(textos, regex, columnas, prefijos):
+    """
+    Matriz booleana texto × keyword (`keyword in texto`) con una pasada del
+    regex de compilar_keywords por texto. La keyword vacía está en todos.
+    """
+    presencia = np.zeros((len(textos), len(columnas)), dtype=bool)
+    if '' in columnas:
+        presencia[:, columnas['']] = True
+    if regex is not None:
+        filas, cols = [], []
+        for i, texto in enumerate(textos):
+            for hallada in set(regex.findall(texto)):
+                filas.extend([i] * len(prefijos[hallada]))
+                cols.extend(prefijos[hallada])
+        presencia[filas, cols] = True
+    return presencia
+
+
+# ==============================================================================
+# CONSTRUCCIÓN DEL ÍNDICE
+# ==============================================================================
+
+def construir_indice_comentarios(comentarios, **claves):
+    """
+    Crea el índice sobre una lista de comentarios (un documento por comentario).
+
+    Args:
+        comentarios: iterable de textos (ya filtrados: str, sin NaN)
+        **claves: arrays alineados con los comentarios (ej. motivo=..., ola=...,
+                  clase_nps=...). Cada uno se guarda factorizado.
+
+    Returns:
+        dict con textos únicos, doc → texto, claves factorizadas y cache de
+        matrices por perfil (se completa de forma lazy).
+    """
+    comentarios = pd.Series(list(comentarios), dtype=object)
+    doc_texto, textos = pd.factorize(comentarios)
+    indice = {
+        'textos': np.asarray(textos, dtype=object),
+        'doc_texto': doc_texto.astype(np.int64),
+        'claves': {},
+        '_cache': {},
+    }
+    for nombre, valores in claves.items():
+        codigos, unicos = pd.factorize(pd.Series(list(valores), dtype=object))
+        indice['claves'][nombre] = (codigos, list(unicos))
+    return indice
+
+
+def indice_desde_dataframe(df, col_comentario, col_motivo=None, col_ola=None, col_nps=None, min_largo=10,
+                           col_marca=None):
+    """
+    Índice de los comentarios de un DataFrame, keyed por motivo × quarter × clase NPS
+    (y marca, si se pasa col_marca).
+
+    Incluye las filas con comentario no nulo y len(str) > min_largo, en el
+    orden del DataFrame (mismo criterio que parte7 para comms_q1/comms_q2).
+    """
+    if not col_comentario or col_comentario not in df.columns:
+        return construir_indice_comentarios([], **{k: [] for k, c in
+                                                   (('motivo', col_motivo), ('ola', col_ola),
+                                                    ('clase_nps', col_nps), ('marca', col_marca)) if c})
+    serie = df[col_comentario]
+    mascara = serie.notna().to_numpy().copy()
+    serie = serie[mascara].astype(str)
+    largo_ok = (serie.str.len() > min_largo).to_numpy()
+    mascara[mascara] = largo_ok
+    serie = serie[largo_ok]
+    filas = df[mascara]
+
+    claves = {}
+    if col_motivo and col_motivo in filas.columns:
+        claves['motivo'] = filas[col_motivo].to_numpy()
+    if col_ola and col_ola in filas.columns:
+        claves['ola'] = filas[col_ola].to_numpy()
+    if col_nps and col_nps in filas.columns:
+        claves['clase_nps'] = filas[col_nps].map(CLASES_NPS).to_numpy()
+    if col_marca and col_marca in filas.columns:
+        claves['marca'] = filas[col_marca].to_numpy()
+    return construir_indice_comentarios(serie.to_numpy(), **claves)
+
+
+def matriz_terminos(indice, perfil='causas'):
+    """
+    Matriz término-documento (CSR sobre textos únicos) del perfil, cacheada.
+
+    Returns:
+        dict con indptr (n_textos + 1), terminos (ids por token, en orden de
+        aparición), vocabulario (array de strings) y posiciones (posición del
+        token dentro de su texto).
+    """
+    cache = indice['_cache']
+    if perfil in cache:
+        return cache[perfil]
+
+    spec = PERFILES_TOKENS[perfil]
+    n_textos = len(indice['textos'])
+    tokens = textos_normalizados(indice, perfil).str.findall(spec['patron'])
+    largos = tokens.str.len().to_numpy(dtype=np.int64) if n_textos else np.zeros(0, dtype=np.int64)
+    planos = pd.Series([t for lista in tokens for t in lista], dtype=object)
+    texto_de_token = np.repeat(np.arange(n_textos), largos)
+
+    validos = ~planos.isin(spec['stopwords']).to_numpy()
+    planos = planos[validos]
+    texto_de_token = texto_de_token[validos]
+    terminos, vocabulario = pd.factorize(planos)
+
+    por_texto = np.bincount(texto_de_token, minlength=n_textos)
+    indptr = np.concatenate([[0], np.cumsum(por_texto)]).astype(np.int64)
+    posiciones = np.arange(len(terminos)) - np.repeat(indptr[:-1], por_texto)
+
+    cache[perfil] = {
+        'indptr': indptr,
+        'terminos': terminos.astype(np.int64),
+        'vocabulario': np.asarray(vocabulario, dtype=object),
+        'posiciones': posiciones,
+    }
+    return cache[perfil]
+
+
+def textos_normalizados(indice, perfil='plano'):
+    """Textos únicos normalizados según el perfil (Series, cacheada)."""
+    clave = ('normalizado', perfil)
+    cache = indice['_cache']
+    if clave not in cache:
+        serie = pd.Series(indice['textos'], dtype=object).str.lower()
+        for mal, bien in PERFILES_TOKENS[perfil]['reemplazos'].items():
+            serie = serie.str.replace(mal, bien, regex=False)
+        cache[clave] = serie
+    return cache[clave]
+
+
+# ==============================================================================
+# SELECCIÓN DE DOCUMENTOS
+# ==============================================================================
+
+def seleccion(indice, **filtros):
+    """
+    IDs de texto (con repeticiones, en orden de documento) que cumplen los filtros.
+
+    Ejemplo: seleccion(indice, motivo='Tasas', ola='25Q4', clase_nps='detractor')
+    """
+    mascara = np.ones(len(indice['doc_texto']), dtype=bool)
+    for nombre, valor in filtros.items():
+        codigos, unicos = indice['claves'][nombre]
+        if valor not in unicos:
+            return np.zeros(0, dtype=np.int64)
+        mascara &= codigos == unicos.index(valor)
+    return indice['doc_texto'][mascara]
+
+
+def ids_de_textos(indice, comentarios):
+    """IDs de texto para una lista de comentarios ya presentes en el índice."""
+    ids = pd.Index(indice['textos']).get_indexer(pd.Series(list(comentarios), dtype=object))
+    if (ids < 0).any():
+        raise KeyError('Hay comentarios que no están en el índice')
+    return ids.astype(np.int64)
+
+
+def comentarios_de(indice, ids):
+    """Textos originales de una selección (lista, en orden)."""
+    return indice['textos'][ids].tolist()
+
+
+# ==============================================================================
+# REDUCCIONES
+# ==============================================================================
+
+def conteo_terminos(indice, ids, perfil='causas'):
+    """
+    Frecuencia de cada término del vocabulario en la selección.
+
+    Returns:
+        (conteos, primera): conteos por término (int64) y posición de la primera
+        aparición en el texto concatenado de la selección (desempate estable,
+        igual que Counter.most_common sobre ' '.join(comentarios)).
+    """
+    m = matriz_terminos(indice, perfil)
+    n_textos = len(indice['textos'])
+    n_vocab = len(m['vocabulario'])
+    ids = np.asarray(ids, dtype=np.int64)
+
+    por_texto = np.diff(m['indptr'])
+    repeticiones = np.bincount(ids, minlength=n_textos)
+    conteos = np.bincount(m['terminos'], weights=np.repeat(repeticiones, por_texto),
+                          minlength=n_vocab).astype(np.int64)
+
+    sentinela = np.iinfo(np.int64).max
+    primer_doc = np.full(n_textos, sentinela, dtype=np.int64)
+    unicos, primera_pos = np.unique(ids, return_index=True)
+    primer_doc[unicos] = primera_pos
+
+    largo_max = int(por_texto.max()) + 1 if len(por_texto) else 1
+    doc_de_token = np.repeat(primer_doc, por_texto)
+    seleccionado = doc_de_token != sentinela
+    clave = np.full(len(doc_de_token), sentinela, dtype=np.int64)
+    clave[seleccionado] = doc_de_token[seleccionado] * largo_max + m['posiciones'][seleccionado]
+    primera = np.full(n_vocab, sentinela, dtype=np.int64)
+    np.minimum.at(primera, m['terminos'], clave)
+    return conteos, primera
+
+
+def _ranking(conteos, primera, top_n):
+    """Términos con conteo > 0 ordenados por frecuencia desc (desempate: primera aparición)."""
+    candidatos = np.flatnonzero(conteos > 0)
+    orden = np.lexsort((primera[candidatos], -conteos[candidatos]))
+    return candidatos[orden][:top_n]
+
+
+def top_keywords(indice, ids, top_n=15, perfil='causas'):
+    """Top-N keywords {palabra: frecuencia} de la selección."""
+    if len(ids) == 0:
+        return {}
+    conteos, primera = conteo_terminos(indice, ids, perfil)
+    vocabulario = matriz_terminos(indice, perfil)['vocabulario']
+    return {vocabulario[t]: int(conteos[t]) for t in _ranking(conteos, primera, top_n)}
+
+
+def tendencias_q1_q2(indice, ids_q1, ids_q2, top_n=15, perfil='causas',
+                     min_menciones_nuevo=3, min_crecimiento_pct=20, max_temas=5):
+    """
+    Temas nuevos y crecientes entre dos selecciones (sobre el top-N de cada una).
+
+    - nuevos_temas: en el top-N de Q2, no en el de Q1, con >= min_menciones_nuevo
+    - temas_crecientes: en ambos top-N, con crecimiento >= min_crecimiento_pct
+    """
+    vacio = {'nuevos_temas': [], 'temas_crecientes': []}
+    if len(ids_q2) == 0:
+        return vacio
+    vocabulario = matriz_terminos(indice, perfil)['vocabulario']
+    c2, p2 = conteo_terminos(indice, ids_q2, perfil)
+    top2 = _ranking(c2, p2, top_n)
+    if len(ids_q1):
+        c1, p1 = conteo_terminos(indice, ids_q1, perfil)
+        en_top1 = np.zeros(len(vocabulario), dtype=bool)
+        en_top1[_ranking(c1, p1, top_n)] = True
+    else:
+        c1 = np.zeros(len(vocabulario), dtype=np.int64)
+        en_top1 = np.zeros(len(vocabulario), dtype=bool)
+
+    nuevos = top2[~en_top1[top2] & (c2[top2] >= min_menciones_nuevo)]
+    nuevos = nuevos[np.argsort(-c2[nuevos], kind='stable')][:max_temas]
+
+    comunes = top2[en_top1[top2]]
+    diff = c2[comunes] - c1[comunes]
+    comunes = comunes[(diff > 0) & (c1[comunes] > 0)]
+    pcts = [round((c2[t] - c1[t]) / c1[t] * 100) for t in comunes]
+    crecientes = [(vocabulario[t], pct) for t, pct in zip(comunes, pcts) if pct >= min_crecimiento_pct]
+    crecientes = sorted(crecientes, key=lambda x: x[1], reverse=True)[:max_temas]
+
+    return {
+        'nuevos_temas': [vocabulario[t] for t in nuevos],
+        'temas_crecientes': crecientes,
+    }
+
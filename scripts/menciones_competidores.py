@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MENCIONES DE COMPETIDORES (MOTOR MULTI-PATRÓN)
+═══════════════════════════════════════════════════════════════════════════════
+
+Detecta menciones de marcas competidoras en los comentarios con un único
+autómata por site (todos los alias compilados en una alternación, el más
+largo primero) y un mapeo alias → marca canónica.
+
+Cada comentario único se escanea UNA vez; el resultado se cachea en el
+índice de comentarios (indice_comentarios). La matriz del site devuelve su
+índice y ejecutar_modelo se lo pasa a parte7, así que la detección por
+motivo reutiliza ese escaneo en vez de repetirlo; el reporte HTML arma el
+bloque "¿Con quién nos comparan?" desde la misma matriz (comparaciones_de).
+
+Uso:
+    from menciones_competidores import detectar_competidores, matriz_menciones_competidores
+    resultado = matriz_menciones_competidores(df_completo, config)
+    detectar_competidores(comms_q2, aliases, player, indice=resultado['indice'])
+    comparaciones_de(resultado, 'Mercado Pago', '25Q4')   # ¿con quién nos comparan los detractores?
+"""
+
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from indice_comentarios import construir_indice_comentarios, ids_de_textos, indice_desde_dataframe
+
+# ==============================================================================
+# COMPETIDORES POR SITE
+# ==============================================================================
+
+COMPETIDORES_POR_SITE = {
+    'MLB': [  # Brasil
+        'nubank', 'nu bank', 'roxinho', 'inter', 'banco inter', 'c6', 'c6 bank',
+        'picpay', 'pic pay', 'pagbank', 'pagseguro', 'next', 'bradesco',
+        'itaú', 'itau', 'iti', 'santander', 'caixa', 'bb', 'banco do brasil',
+        'neon', 'original', 'will bank', 'will', 'ame', 'ame digital'
+    ],
+    'MLA': [  # Argentina
+        'ualá', 'uala', 'naranja x', 'naranja', 'brubank', 'bru bank',
+        'galicia', 'santander', 'bbva', 'macro', 'icbc', 'hsbc',
+        'banco nación', 'banco nacion', 'provincia', 'ciudad',
+        'reba', 'personal pay', 'modo', 'cuenta dni', 'dni'
+    ],
+    'MLM': [  # México
+        'nubank', 'nu', 'stori', 'klar', 'rappi', 'rappicard',
+        'bbva', 'bancomer', 'santander', 'banorte', 'citibanamex', 'banamex',
+        'hsbc', 'scotiabank', 'hey banco', 'hey', 'albo', 'fondeadora',
+        'spin', 'oxxo', 'flink'
+    ],
+    'MLC': [  # Chile
+        'mach', 'tenpo', 'fintual', 'racional', 'bice', 'banco estado',
+        'santander', 'bci', 'scotiabank', 'itaú', 'falabella',
+        'banco chile', 'security', 'ripley', 'cencosud'
+    ]
+}
+
+# Alias → marca canónica (nombres como en la columna MARCA). Sin entrada: alias.title()
+MARCAS_CANONICAS = {
+    # Brasil
+    'nubank': 'Nubank', 'nu bank': 'Nubank', 'roxinho': 'Nubank', 'nu': 'Nubank',
+    'inter': 'Banco Inter', 'banco inter': 'Banco Inter',
+    'c6': 'C6 Bank', 'c6 bank': 'C6 Bank',
+    'picpay': 'PicPay', 'pic pay': 'PicPay',
+    'pagbank': 'PagBank', 'pagseguro': 'PagBank',
+    'itaú': 'Itaú', 'itau': 'Itaú',
+    'bb': 'Banco Do Brasil', 'banco do brasil': 'Banco Do Brasil',
+    'will': 'Will Bank', 'will bank': 'Will Bank',
+    'ame': 'Ame Digital', 'ame digital': 'Ame Digital',
+    # Argentina
+    'ualá': 'Ualá', 'uala': 'Ualá',
+    'naranja': 'Naranja X', 'naranja x': 'Naranja X',
+    'brubank': 'Brubank', 'bru bank': 'Brubank',
+    'banco nación': 'Banco Nación', 'banco nacion': 'Banco Nación',
+    'modo': 'MODO', 'dni': 'Cuenta DNI', 'cuenta dni': 'Cuenta DNI',
+    'bbva': 'BBVA', 'icbc': 'ICBC', 'hsbc': 'HSBC',
+    # México
+    'bancomer': 'BBVA', 'citibanamex': 'Banamex', 'banamex': 'Banamex',
+    'rappi': 'Rappi', 'rappicard': 'Rappi', 'hey': 'Hey Banco', 'hey banco': 'Hey Banco',
+    # Chile
+    'mach': 'MACH', 'bci': 'BCI', 'bice': 'BICE', 'banco estado': 'Banco Estado',
+    'banco chile': 'Banco de Chile',
+}
+
+
+# ==============================================================================
+# AUTÓMATA
+# ==============================================================================
+
+@lru_cache(maxsize=None)
+def automata_competidores(aliases):
+    """
+    Compila los alias (tupla) en un único patrón con límites de palabra.
+
+    Los alias más largos van primero, así "banco inter" gana sobre "inter" en
+    la misma posición (una mención, no dos).
+
+    Returns:
+        (patron compilado, dict alias → marca canónica, orden de marcas)
+    """
+    aliases = tuple(dict.fromkeys(a.lower() for a in aliases))
+    if not aliases:
+        return None, {}, []
+    alternacion = '|'.join(re.escape(a) for a in sorted(aliases, key=len, reverse=True))
+    patron = re.compile(r'\b(?:' + alternacion + r')\b')
+    mapa = {a: MARCAS_CANONICAS.get(a, a.title()) for a in aliases}
+    return patron, mapa, list(dict.fromkeys(mapa.values()))
+
+
+def automata_site(site):
+    """Autómata de los competidores del site (MLA por defecto, como parte7)."""
+    return automata_competidores(tuple(COMPETIDORES_POR_SITE.get(site, COMPETIDORES_POR_SITE['MLA'])))
+
+
+def marca_canonica(nombre, aliases):
+    """Marca canónica de un nombre de marca (ej. 'Banco Inter' → 'Banco Inter', 'Nu' → 'Nubank')."""
+    patron, mapa, _ = automata_competidores(tuple(aliases))
+    if patron is not None and isinstance(nombre, str):
+        hallado = patron.search(nombre.lower())
+        if hallado:
+            return mapa[hallado.group(0)]
+    return nombre
+
+
+def tabla_menciones(indice, aliases):
+    """
+    Menciones por texto único del índice (escaneo único, cacheado en el índice).
+
+    Returns:
+        dict con arrays alineados texto, marca (código), ocurrencias y la
+        lista de marcas (orden de los alias)
+    """
+    aliases = tuple(aliases)
+    clave = ('menciones', aliases)
+    cache = indice['_cache']
+    if clave in cache:
+        return cache[clave]
+
+    patron, mapa, marcas = automata_competidores(aliases)
+    n_textos = len(indice['textos'])
+    if patron is None or n_textos == 0:
+        cache[clave] = {'texto': np.zeros(0, dtype=np.int64), 'marca': np.zeros(0, dtype=np.int64),
+                        'ocurrencias': np.zeros(0, dtype=np.int64), 'marcas': marcas}
+        return cache[clave]
+
+    hallados = pd.Series(indice['textos'], dtype=object).str.lower().str.findall(patron)
+    largos = hallados.str.len().to_numpy(dtype=np.int64)
+    texto = np.repeat(np.arange(n_textos), largos)
+    codigo_marca = {m: i for i, m in enumerate(marcas)}
+    marca = np.array([codigo_marca[mapa[a]] for lista in hallados for a in lista], dtype=np.int64)
+
+    pares, ocurrencias = np.unique(texto * len(marcas) + marca, return_counts=True)
+    cache[clave] = {
+        'texto': pares // len(marcas),
+        'marca': pares % len(marcas),
+        'ocurrencias': ocurrencias,
+        'marcas': marcas,
+    }
+    return cache[clave]
+
+
+def menciones_por_comentario(indice, ids, aliases):
+    """Conjunto de marcas mencionadas por cada comentario de la selección."""
+    tabla = tabla_menciones(indice, aliases)
+    por_texto = [set() for _ in range(len(indice['textos']))]
+    for t, m in zip(tabla['texto'], tabla['marca']):
+        por_texto[t].add(tabla['marcas'][m])
+    return [por_texto[i] for i in ids]
+
+
+# ==============================================================================
+# DETECCIÓN POR LISTA DE COMENTARIOS (parte7 / parte7b)
+# ==============================================================================
+
+def detectar_competidores(comentarios_list, competidores, player_actual, indice=None):
+    """
+    Detecta menciones de competidores.
+
+    Args:
+        comentarios_list: comentarios a analizar
+        competidores: alias del site (COMPETIDORES_POR_SITE[site])
+        player_actual: marca analizada (sus propias menciones se excluyen)
+        indice: índice de comentarios compartido (opcional, reutiliza el escaneo;
+            si le faltan comentarios se usa un índice propio)
+
+    Returns:
+        list: [{'nombre', 'menciones', 'comentarios', 'porcentaje'}] ordenado por menciones
+    """
+    if not comentarios_list:
+        return []
+    ids = None
+    if indice is not None:
+        try:
+            ids = ids_de_textos(indice, comentarios_list)
+        except KeyError:
+            ids = None
+    if ids is None:
+        indice = construir_indice_comentarios(comentarios_list)
+        ids = ids_de_textos(indice, comentarios_list)
+    tabla = tabla_menciones(indice, competidores)
+    marcas = tabla['marcas']
+    if not marcas:
+        return []
+
+    pesos = np.bincount(ids, minlength=len(indice['textos']))[tabla['texto']]
+    menciones = np.bincount(tabla['marca'], weights=pesos * tabla['ocurrencias'], minlength=len(marcas))
+    comentarios = np.bincount(tabla['marca'], weights=pesos, minlength=len(marcas))
+
+    propia = marca_canonica(player_actual, competidores)
+    total_comentarios = len(comentarios_list)
+    resultado = [
+        {
+            'nombre': marca,
+            'menciones': int(menciones[i]),
+            'comentarios': int(comentarios[i]),
+            'porcentaje': round(float(menciones[i]) / total_comentarios * 100, 1),
+        }
+        for i, marca in enumerate(marcas)
+        if menciones[i] > 0 and marca != propia
+    ]
+    return sorted(resultado, key=lambda x: x['menciones'], reverse=True)
+
+
+# ==============================================================================
+# MATRIZ MARCA × MARCA MENCIONADA × QUARTER (TODO EL SITE)
+# ==============================================================================
+
+def matriz_menciones_competidores(df_completo, config, n_quarters=5, col_comentario='COMENTARIO', verbose=True):
+    """
+    Menciones de competidores para todas las marcas del site en una sola pasada.
+
+    Returns:
+        dict: menciones (MARCA, OLA, CLASE_NPS, MENCIONADA, COMENTARIOS, MENCIONES),
+        base (comentarios por MARCA, OLA, CLASE_NPS), matriz ((MARCA, OLA) ×
+        MENCIONADA, % de comentarios de detractores y neutros que la mencionan),
+        marcas, quarters e indice (con el escaneo cacheado, para parte7); o
+        {'error'} si no hay comentarios
+    """
+    site = config['site']
+    col_ola, col_marca, col_nps = 'OLA', 'MARCA', 'NPS'
+    if col_comentario not in df_completo.columns:
+        return {'error': f'Sin columna de comentarios ({col_comentario})'}
+
+    quarters = sorted(df_completo[col_ola].dropna().unique())
+    ventana = quarters[-n_quarters:]
+    ventana = sorted(set(ventana) | ({config['periodo_1'], config['periodo_2']} & set(quarters)))
+    df_base = df_completo[df_completo[col_ola].isin(ventana) & df_completo[col_marca].notna()]
+
+    indice = indice_desde_dataframe(df_base, col_comentario, col_ola=col_ola, col_nps=col_nps, col_marca=col_marca)
+    if len(indice['doc_texto']) == 0:
+        return {'error': 'Sin comentarios en la ventana de quarters'}
+
+    aliases = tuple(COMPETIDORES_POR_SITE.get(site, COMPETIDORES_POR_SITE['MLA']))
+    tabla = tabla_menciones(indice, aliases)
+
+    def _valores(nombre):
+        codigos, unicos = indice['claves'][nombre]
+        return np.array(unicos + [np.nan], dtype=object)[codigos]
+
+    docs = pd.DataFrame({
+        'TEXTO': indice['doc_texto'],
+        col_marca: _valores('marca'),
+        col_ola: _valores('ola'),
+        'CLASE_NPS': _valores('clase_nps'),
+    })
+    grupos = [col_marca, col_ola, 'CLASE_NPS']
+    base = docs.groupby(grupos, dropna=False).size().rename('TOTAL').reset_index()
+
+    hallazgos = pd.DataFrame({
+        'TEXTO': tabla['texto'],
+        'MENCIONADA': np.array(tabla['marcas'], dtype=object)[tabla['marca']] if tabla['marcas'] else [],
+        'OCURRENCIAS': tabla['ocurrencias'],
+    })
+    cruce = docs.merge(hallazgos, on='TEXTO')
+    propias = {m: marca_canonica(m, aliases) for m in docs[col_marca].dropna().unique()}
+    cruce = cruce[cruce['MENCIONADA'] != cruce[col_marca].map(propias)]
+    menciones = (cruce.groupby(grupos + ['MENCIONADA'], dropna=False)
+                 .agg(COMENTARIOS=('TEXTO', 'size'), MENCIONES=('OCURRENCIAS', 'sum'))
+                 .reset_index())
+
+    quejas = menciones[menciones['CLASE_NPS'].isin(['detractor', 'neutro'])]
+    base_quejas = base[base['CLASE_NPS'].isin(['detractor', 'neutro'])].groupby([col_marca, col_ola])['TOTAL'].sum()
+    matriz = quejas.pivot_table(index=[col_marca, col_ola], columns='MENCIONADA',
+                                values='COMENTARIOS', aggfunc='sum', fill_value=0)
+    matriz = matriz.reindex(base_quejas.index, fill_value=0).div(base_quejas, axis=0) * 100
+
+    if verbose:
+        print(f"🏆 Menciones de competidores: {len(indice['textos']):,} comentarios únicos escaneados, "
+              f"{int(menciones['COMENTARIOS'].sum()):,} menciones cruzadas")
+
+    return {
+        'menciones': menciones,
+        'base': base,
+        'matriz': matriz,
+        'marcas': sorted(propias),
+        'quarters': ventana,
+        'indice': indice,
+    }
+
+
+def comparaciones_de(resultado, marca, ola, clases=('detractor', 'neutro'), top_n=5):
+    """
+    ¿Con quién se comparan los usuarios de una marca? (desde la matriz del site)
+
+    Con top_n=None devuelve todas las marcas mencionadas.
+
+    Returns:
+        list: [{'nombre', 'comentarios', 'menciones', 'porcentaje'}] ordenado por comentarios
+    """
+    if 'error' in resultado:
+        return []
+    m = resultado['menciones']
+    filtro = (m['MARCA'] == marca) & (m['OLA'] == ola) & m['CLASE_NPS'].isin(clases)
+    b = resultado['base']
+    total = b.loc[(b['MARCA'] == marca) & (b['OLA'] == ola) & b['CLASE_NPS'].isin(clases), 'TOTAL'].sum()
+    if total == 0:
+        return []
+    agg = (m[filtro].groupby('MENCIONADA')[['COMENTARIOS', 'MENCIONES']].sum()
+           .sort_values('COMENTARIOS', ascending=False, kind='stable').head(top_n))
+    return [
+        {'nombre': nombre, 'comentarios': int(fila['COMENTARIOS']), 'menciones': int(fila['MENCIONES']),
+         'porcentaje': round(float(fila['COMENTARIOS'] / total * 100), 1)}
+        for nombre, fila in agg.iterrows()
+    ]
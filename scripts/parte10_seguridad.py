@@ -15,33 +15,10 @@ Uso:
 import pandas as pd
 import numpy as np
 from pathlib import Path
-import matplotlib.pyplot as plt
-import io
-import base64
-
-# ==============================================================================
-# FUNCIÓN PARA CORREGIR ENCODING
-# ==============================================================================
-
-def fix_encoding_text(text):
-    """Corrige caracteres con encoding corrupto (común en CSVs latinos)."""
-    if not isinstance(text, str):
-        return str(text) if text is not None else ''
-    
-    replacements = {
-        'Ã§': 'ç', 'Ã£': 'ã', 'Ãµ': 'õ', 'Ã¡': 'á', 'Ã©': 'é',
-        'Ã­': 'í', 'Ã³': 'ó', 'Ãº': 'ú', 'Ãª': 'ê', 'Ã\xa0': 'à',
-        'Ã¢': 'â', 'Ã´': 'ô', 'Ã±': 'ñ', 'Ã¼': 'ü',
-        'Ã‰': 'É', 'Ã"': 'Ó', 'Ã\x81': 'Á', 'Ãš': 'Ú',
-        'ÃŠ': 'Ê', 'Ã\x91': 'Ñ', 'Ãœ': 'Ü',
-        '\ufeff': '',
-    }
-    
-    result = text
-    for old, new in replacements.items():
-        result = result.replace(old, new)
-    
-    return result
+from utils_graficos import usar_png, valores_json, fig_a_base64
+from decodificacion_respuestas import decodificar, decodificador_por_valor, fix_encoding_text
+from agregados_site import agregados_persistidos
+from utils_quarters import quarters_historico
 
 # ==============================================================================
 # CONFIGURACIÓN MULTISITE
@@ -165,6 +142,69 @@ COLUMNAS_MOTIVO_INSEG_DIRECTO = {
 }
 
 
+# ==============================================================================
+# AGREGADOS DEL SITE (TODAS LAS MARCAS Y QUARTERS)
+# ==============================================================================
+
+def simplificador_motivos_inseguridad(site):
+    """Función motivo crudo → categoría de inseguridad del site (keywords de MOTIVOS_INSEGURIDAD)."""
+    motivos_config = MOTIVOS_INSEGURIDAD.get(site, MOTIVOS_INSEGURIDAD['DEFAULT'])
+    labels = motivos_config['labels']
+    
+    def simplificar_motivo(m):
+        if pd.isna(m) or str(m).strip() in ['', '.', ' ']:
+            return labels['sin_motivo']
+        m = str(m).lower()
+        if any(k in m for k in motivos_config['no_confia']):
+            return labels['no_confia']
+        if any(k in m for k in motivos_config['no_conoce']):
+            return labels['no_conoce']
+        if any(k in m for k in motivos_config['insuficiente']):
+            return labels['insuficiente']
+        if any(k in m for k in motivos_config['fraude']):
+            return labels['fraude']
+        if any(k in m for k in motivos_config['noticias']):
+            return labels['noticias']
+        return labels['otro']
+    
+    return simplificar_motivo
+
+
+def agregados_seguridad_site(df_completo, site, col_valoracion, col_motivo=None, huella=None,
+                             col_marca='MARCA', col_periodo='OLA'):
+    """
+    Conteos de seguridad de todas las marcas × quarters del site.
+
+    Valoración (Likert 1-5) y motivo simplificado se decodifican una vez por
+    respuesta distinta; cada player solo filtra los conteos.
+
+    Returns:
+        dict con:
+            - valoraciones: DataFrame (OLA, MARCA, VAL, n) con NaN = respuesta no válida
+            - motivos: DataFrame (OLA, MARCA, MOTIVO_INSEG, n) de los inseguros (1-3),
+              o None sin columna de motivos
+    """
+    val = decodificar(df_completo[col_valoracion], 'likert', huella=huella).rename('VAL')
+    valoraciones = df_completo.groupby(
+        [df_completo[col_periodo], df_completo[col_marca], val], dropna=False
+    ).size().reset_index(name='n')
+
+    motivos = None
+    if col_motivo:
+        inseguros = (val <= 3).to_numpy()
+        df_inseg = df_completo[inseguros]
+        motivo = decodificar(
+            df_inseg[col_motivo],
+            decodificador_por_valor(f'motivo_inseguridad_{site}', simplificador_motivos_inseguridad(site)),
+            huella=huella
+        ).rename('MOTIVO_INSEG')
+        motivos = df_inseg.groupby(
+            [df_inseg[col_periodo], df_inseg[col_marca], motivo]
+        ).size().reset_index(name='n')
+
+    return {'valoraciones': valoraciones, 'motivos': motivos}
+
+
 # ==============================================================================
 # FUNCIÓN PRINCIPAL
 # ==============================================================================
@@ -272,11 +312,12 @@ def analizar_seguridad(df_completo, config, verbose=True):
     # Quarters dinámicos
     olas_disponibles = sorted(df_completo[col_periodo].unique())
     
+    n_historico = quarters_historico(config)
     if q_act in olas_disponibles:
         idx_final = olas_disponibles.index(q_act)
-        ultimos_5q = olas_disponibles[max(0, idx_final-4):idx_final+1]
+        ultimos_5q = olas_disponibles[max(0, idx_final-(n_historico-1)):idx_final+1]
     else:
-        ultimos_5q = olas_disponibles[-5:] if len(olas_disponibles) >= 5 else olas_disponibles
+        ultimos_5q = olas_disponibles[-n_historico:]
     
     if verbose:
         print(f"✅ Valoración: {col_valoracion}")
@@ -284,35 +325,35 @@ def analizar_seguridad(df_completo, config, verbose=True):
             print(f"✅ Motivos: {col_motivo}")
         print(f"📅 Trimestres: {ultimos_5q[0]} → {ultimos_5q[-1]}")
     
+    # ═══════════════════════════════════════════════════════════════════════════
+    # AGREGADOS DEL SITE (TODAS LAS MARCAS, SE CALCULAN UNA VEZ)
+    # ═══════════════════════════════════════════════════════════════════════════
+    
+    huella = config.get('huella_datos')
+    agregados = agregados_persistidos(
+        'seguridad', site, huella, [len(df_completo), col_valoracion, col_motivo],
+        lambda: agregados_seguridad_site(df_completo, site, col_valoracion, col_motivo, huella=huella),
+        verbose=verbose
+    )
+    
     # Filtrar datos
-    df = df_completo[
-        (df_completo[col_marca].isin(TOP_PLAYERS)) &
-        (df_completo[col_periodo].isin(ultimos_5q))
-    ].copy()
+    valoraciones = agregados['valoraciones']
+    valoraciones = valoraciones[valoraciones[col_marca].isin(TOP_PLAYERS) & valoraciones[col_periodo].isin(ultimos_5q)]
     
     if verbose:
-        print(f"📊 Registros: {len(df):,}")
+        print(f"📊 Registros: {valoraciones['n'].sum():,}")
     
     # ═══════════════════════════════════════════════════════════════════════════
     # CONVERTIR VALORACIONES
     # ═══════════════════════════════════════════════════════════════════════════
     
-    def to_num(val):
-        if pd.isna(val):
-            return np.nan
-        s = str(val)
-        for i in ['5', '4', '3', '2', '1']:
-            if i in s:
-                return int(i)
-        return np.nan
-    
-    df['VAL'] = df[col_valoracion].apply(to_num)
-    df = df[df['VAL'].notna()]
+    # Likert 1-5 ya decodificado en los agregados (una vez por respuesta distinta)
+    valoraciones = valoraciones[valoraciones['VAL'].notna()]
     
     if verbose:
-        print(f"✅ Válidos: {len(df):,}")
+        print(f"✅ Válidos: {valoraciones['n'].sum():,}")
     
-    if len(df) == 0:
+    if len(valoraciones) == 0:
         return {
             'seguridad_por_ola': pd.DataFrame(),
             'motivos_inseguridad': pd.DataFrame(),
@@ -320,10 +361,10 @@ def analizar_seguridad(df_completo, config, verbose=True):
         }
     
     # Seguro = valoración 4 o 5
-    df['SEG'] = (df['VAL'] >= 4).astype(int)
+    valoraciones = valoraciones.assign(SEG=valoraciones['n'] * (valoraciones['VAL'] >= 4))
     
-    result = df.groupby([col_periodo, col_marca]).agg(
-        Total=('VAL', 'count'),
+    result = valoraciones.groupby([col_periodo, col_marca]).agg(
+        Total=('n', 'sum'),
         Seguros=('SEG', 'sum')
     ).reset_index()
     
@@ -343,7 +384,7 @@ def analizar_seguridad(df_completo, config, verbose=True):
     # ═══════════════════════════════════════════════════════════════════════════
     
     motivos_inseguridad = pd.DataFrame()
-    n_inseguros = len(df[df['VAL'] <= 3])
+    n_inseguros = int(valoraciones.loc[valoraciones['VAL'] <= 3, 'n'].sum())
     
     if verbose:
         print(f"\n📊 Análisis de motivos de inseguridad:")
@@ -351,31 +392,11 @@ def analizar_seguridad(df_completo, config, verbose=True):
         print(f"   • Usuarios inseguros (1-3): {n_inseguros:,}")
     
     if col_motivo and n_inseguros > 0:
-        df_inseg = df[df['VAL'] <= 3].copy()
-        
-        motivos_config = MOTIVOS_INSEGURIDAD.get(site, MOTIVOS_INSEGURIDAD['DEFAULT'])
-        labels = motivos_config['labels']
-        
-        def simplificar_motivo(m):
-            if pd.isna(m) or str(m).strip() in ['', '.', ' ']:
-                return labels['sin_motivo']
-            m = str(m).lower()
-            if any(k in m for k in motivos_config['no_confia']):
-                return labels['no_confia']
-            if any(k in m for k in motivos_config['no_conoce']):
-                return labels['no_conoce']
-            if any(k in m for k in motivos_config['insuficiente']):
-                return labels['insuficiente']
-            if any(k in m for k in motivos_config['fraude']):
-                return labels['fraude']
-            if any(k in m for k in motivos_config['noticias']):
-                return labels['noticias']
-            return labels['otro']
+        motivos = agregados['motivos']
+        motivos = motivos[motivos[col_marca].isin(TOP_PLAYERS) & motivos[col_periodo].isin(ultimos_5q)]
         
-        df_inseg['MOTIVO_INSEG'] = df_inseg[col_motivo].apply(simplificar_motivo)
-        
-        mot_count = df_inseg.groupby([col_periodo, col_marca, 'MOTIVO_INSEG']).size().reset_index(name='Cantidad')
-        tot_inseg = df_inseg.groupby([col_periodo, col_marca]).size().reset_index(name='Total_Inseguros')
+        mot_count = motivos.groupby([col_periodo, col_marca, 'MOTIVO_INSEG'])['n'].sum().reset_index(name='Cantidad')
+        tot_inseg = motivos.groupby([col_periodo, col_marca])['n'].sum().reset_index(name='Total_Inseguros')
         
         motivos_inseguridad = mot_count.merge(tot_inseg, on=[col_periodo, col_marca])
         motivos_inseguridad['% Motivo'] = (motivos_inseguridad['Cantidad'] / motivos_inseguridad['Total_Inseguros'] * 100).round(1)
@@ -442,6 +463,9 @@ def analizar_seguridad(df_completo, config, verbose=True):
     
     grafico_seguridad_base64 = None
     grafico_motivos_inseg_base64 = None
+    grafico_seguridad_data = None
+    grafico_motivos_inseg_data = None
+    modo_png = usar_png(config)
     
     # Datos de evolución del player (últimos 5 quarters desde q_act hacia atrás)
     # FIX: Usar utils_quarters para filtrado correcto (no comparar strings alfabéticamente)
@@ -452,6 +476,28 @@ def analizar_seguridad(df_completo, config, verbose=True):
     
     # GRÁFICO 1: EVOLUCIÓN DE SEGURIDAD
     if len(datos_evol) > 0:
+        # Datos compactos para Chart.js (modo 'js')
+        max_val = datos_evol['% Seguridad Marca'].max()
+        min_val = datos_evol['% Seguridad Marca'].min()
+        grafico_seguridad_data = {
+            'titulo': f'{player} - Evolución de Seguridad',
+            'labels': datos_evol[col_periodo].astype(str).tolist(),
+            'series': [{
+                'label': player,
+                'data': valores_json(datos_evol['% Seguridad Marca']),
+                'color': '#009739',
+                'destacada': True
+            }],
+            'y_titulo': '% Seguridad'
+        }
+        if pd.notna(max_val) and pd.notna(min_val):
+            y_margin = (max_val - min_val) * 0.15 if max_val != min_val else 2
+            grafico_seguridad_data['y_min'] = round(float(max(0, min_val - y_margin)), 1)
+            grafico_seguridad_data['y_max'] = round(float(min(100, max_val + y_margin)), 1)
+    
+    if modo_png and len(datos_evol) > 0:
+        import matplotlib.pyplot as plt
+        
         fig_evol, ax_evol = plt.subplots(figsize=(10, 5), facecolor='white')
         ax_evol.set_facecolor('white')
         
@@ -477,12 +523,7 @@ def analizar_seguridad(df_completo, config, verbose=True):
         
         plt.tight_layout()
         
-        buf = io.BytesIO()
-        fig_evol.savefig(buf, format='png', dpi=120, bbox_inches='tight', facecolor='white')
-        buf.seek(0)
-        grafico_seguridad_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        buf.close()
-        plt.close(fig_evol)
+        grafico_seguridad_base64 = fig_a_base64(fig_evol)
     
     # GRÁFICO 2: MOTIVOS DE INSEGURIDAD PONDERADOS (BARRAS APILADAS)
     # Usa % Ponderado Base = % Motivo × % Inseguridad Marca / 100
@@ -514,6 +555,35 @@ def analizar_seguridad(df_completo, config, verbose=True):
                 def get_color_motivo(motivo):
                     return COLORES_MOTIVOS_INSEGURIDAD.get(motivo, '#95a5a6')  # Gris por defecto
                 
+                # Datos compactos para Chart.js (modo 'js')
+                inseg_evol = datos_evol.set_index(col_periodo).reindex(df_grafico.index)
+                tiene_linea = '% Inseguridad Marca' in inseg_evol.columns
+                max_inseg = inseg_evol['% Inseguridad Marca'].max() if tiene_linea and len(inseg_evol) > 0 else 20
+                grafico_motivos_inseg_data = {
+                    'titulo': f'Motivos de Inseguridad - {player} (Ponderado)',
+                    'labels': [str(q) for q in df_grafico.index],
+                    'barras': [
+                        {
+                            'label': fix_encoding_text(str(motivo)),
+                            'data': valores_json(df_grafico[motivo], 2),
+                            'color': get_color_motivo(motivo)
+                        }
+                        for motivo in df_grafico.columns
+                    ],
+                    'linea': {
+                        'label': '% Inseguridad',
+                        'data': valores_json(inseg_evol['% Inseguridad Marca']),
+                        'color': '#dc2626'
+                    } if tiene_linea else None,
+                    'umbral_etiqueta': 1,
+                    'y_max': round(float(max(df_grafico.sum(axis=1).max() * 1.3, 20)), 1),
+                    'y2_max': round(float(max(30, max_inseg * 1.2)), 1) if pd.notna(max_inseg) else 30,
+                    'y_titulo': '% sobre Base Total (ponderado)'
+                }
+            
+            if modo_png and len(pivot_mot) > 0:
+                import matplotlib.pyplot as plt
+                
                 fig_mot, ax_mot = plt.subplots(figsize=(12, 6), facecolor='white')
                 ax_mot.set_facecolor('white')
                 
@@ -568,12 +638,7 @@ def analizar_seguridad(df_completo, config, verbose=True):
                 
                 plt.tight_layout(rect=[0, 0, 0.85, 1])
                 
-                buf_mot = io.BytesIO()
-                fig_mot.savefig(buf_mot, format='png', dpi=120, bbox_inches='tight', facecolor='white')
-                buf_mot.seek(0)
-                grafico_motivos_inseg_base64 = base64.b64encode(buf_mot.read()).decode('utf-8')
-                buf_mot.close()
-                plt.close(fig_mot)
+                grafico_motivos_inseg_base64 = fig_a_base64(fig_mot)
     
     return {
         'seguridad_por_ola': result,
@@ -589,7 +654,9 @@ def analizar_seguridad(df_completo, config, verbose=True):
         'col_valoracion': col_valoracion,
         'col_motivo': col_motivo,
         'grafico_seguridad_base64': grafico_seguridad_base64,
-        'grafico_motivos_inseg_base64': grafico_motivos_inseg_base64
+        'grafico_motivos_inseg_base64': grafico_motivos_inseg_base64,
+        'grafico_seguridad_data': grafico_seguridad_data,
+        'grafico_motivos_inseg_data': grafico_motivos_inseg_data
     }
 
 
@@ -26,6 +26,7 @@ from validators import (
     validate_csv_encoding,
     validate_site_code
 )
+from decodificacion_respuestas import decodificar, huella_archivo
 
 # ==============================================================================
 # CONFIGURACIÓN DE RUTAS
@@ -362,6 +363,7 @@ def cargar_datos(site=None, player=None, periodo_1=None, periodo_2=None, verbose
     
     if not archivo.exists():
         raise FileNotFoundError(f"Archivo no encontrado: {archivo}")
+    huella_datos = huella_archivo(archivo)   # Clave de cache de los decodificadores de respuestas
 
     # Validar y detectar encoding del CSV
     if verbose:
@@ -542,7 +544,7 @@ def cargar_datos(site=None, player=None, periodo_1=None, periodo_2=None, verbose
     if verbose:
         print(f"   2️⃣ Convirtiendo NPS a numérico...")
     if col_nps in df_completo.columns:
-        df_completo[col_nps] = pd.to_numeric(df_completo[col_nps], errors='coerce')
+        df_completo[col_nps] = decodificar(df_completo[col_nps], 'nps', huella=huella_datos)
         if verbose:
             print(f"      ✅ NPS convertido")
     
@@ -678,7 +680,9 @@ def cargar_datos(site=None, player=None, periodo_1=None, periodo_2=None, verbose
         'col_ola': col_ola,
         'categorias_motivos': config_yaml.get('categorias_motivos', {}),
         'dominios_confiables': config_yaml.get('dominios_confiables', {}),
-        'parametros': config_yaml.get('parametros', {})
+        'parametros': config_yaml.get('parametros', {}),
+        'huella_datos': huella_datos,
+        'col_saldo': columna_saldo if columna_saldo in df_competitivo.columns else None
     }
     
     return {
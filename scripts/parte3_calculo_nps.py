@@ -16,12 +16,12 @@ Uso:
     resultados = calcular_nps(df, config)
 """
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from matplotlib.lines import Line2D
 from pathlib import Path
 from validators import validate_nps_values, validate_dataframe_not_empty
+from utils_graficos import usar_png
+from decodificacion_respuestas import decodificar
 
 # ==============================================================================
 # FUNCIÓN: ORDENAR QUARTERS
@@ -55,7 +55,7 @@ def calcular_nps(df_completo, config, generar_grafico=True, guardar_grafico=True
     Args:
         df_completo: DataFrame con todos los datos cargados
         config: Diccionario de configuración (de parte1_carga_datos)
-        generar_grafico: Si True, genera gráfico de evolución
+        generar_grafico: Si True, genera gráfico de evolución (PNG, solo en modo_graficos "png")
         guardar_grafico: Si True, guarda el gráfico en outputs/
         verbose: Si True, imprime información de progreso
     
@@ -95,7 +95,7 @@ def calcular_nps(df_completo, config, generar_grafico=True, guardar_grafico=True
     
     # Convertir NPS a numérico si es necesario
     if df_player[col_nps].dtype == 'object':
-        df_player[col_nps] = pd.to_numeric(df_player[col_nps], errors='coerce')
+        df_player[col_nps] = decodificar(df_player[col_nps], 'nps', huella=config.get('huella_datos'))
 
     # Validar valores de NPS
     validate_nps_values(df_player, col_nps, max_invalid_pct=0.1)
@@ -148,7 +148,10 @@ def calcular_nps(df_completo, config, generar_grafico=True, guardar_grafico=True
     fig = None
     grafico_base64 = None
     
-    if generar_grafico and len(nps_grafico) > 0:
+    # En modo 'js' el HTML dibuja la evolución con Chart.js a partir de nps_grafico
+    if generar_grafico and usar_png(config) and len(nps_grafico) > 0:
+        import matplotlib.pyplot as plt
+        
         # Formato exacto del notebook original
         fig, ax = plt.subplots(figsize=(14, 5), facecolor='white')
         ax.set_facecolor('white')
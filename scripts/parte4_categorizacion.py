@@ -15,6 +15,7 @@ Uso:
 """
 
 import pandas as pd
+import numpy as np
 import hashlib
 import unicodedata
 import re
@@ -55,14 +56,19 @@ SITE_CAT_CONFIG = {
     }
 }
 
-# Tabla de BigQuery con las clasificaciones (n8n workflow)
-BQ_TABLE = "meli-bi-data.SBOX_NPS_ANALYTICS.comentarios_reclasificados_fintech"
+# Tabla de BigQuery con las clasificaciones (n8n workflow) + espejo local SQLite
+from espejo_bigquery import (
+    BQ_TABLE, TTL_HORAS_DEFAULT, MAX_IDS_PUSHDOWN,
+    sincronizar_espejo, cargar_indices_espejo, estado_espejo,
+    construir_query_reclasificados, ejecutar_query, construir_indices, hash_comentarios_unicos
+)
 
 # ==============================================================================
 # CATEGORÍAS POR IDIOMA (Centralizadas)
 # ==============================================================================
 # FIX: Importar desde módulo centralizado en vez de hardcodear
 from config_categorias import get_categorias_detalladas
+from utils_quarters import quarters_historico
 
 # Las categorías se obtienen dinámicamente según el site
 # CATEGORIAS_PT / CATEGORIAS_ES ahora se obtienen con get_categorias_detalladas(site)
@@ -123,10 +129,33 @@ def conectar_bigquery():
         print(f"   ⚠️ Error conectando a BigQuery: {e}")
         return None
 
-def cargar_categorias_bigquery(site_code, verbose=True):
+def cargar_categorias_bigquery(site_code, verbose=True, client=None, usar_espejo=True,
+                               ruta_espejo=None, ttl_horas=TTL_HORAS_DEFAULT, olas=None, ids=None):
     """
     Carga categorías desde BigQuery.
     
+    Con ``usar_espejo`` (default) sincroniza incrementalmente el espejo local
+    SQLite (ver espejo_bigquery.py) y construye los índices desde ahí: solo se
+    descargan las OLAs nuevas o modificadas y, sin credenciales, se usa el
+    espejo existente (modo offline). Las ``olas`` acotan la sincronización y
+    la lectura; los ``ids`` restringen el lookup por clave/ID igual que sin
+    espejo y el índice por hash usa todas las filas de esas OLAs.
+    
+    Sin espejo, la consulta empuja los filtros a BigQuery (predicate pushdown):
+    solo las ``olas`` pedidas (en la consulta por clave/ID y en la de hash) y,
+    para el lookup por clave/ID, solo los ``ids`` del player, trayendo
+    únicamente las columnas necesarias en formato Arrow.
+    
+    Args:
+        site_code: MLA, MLB, MLM, MLC
+        verbose: Si True, imprime información
+        client: Cliente BigQuery a usar (o ClienteBigQueryLocal). Si None, conecta.
+        usar_espejo: Si False, consulta BigQuery directamente en cada corrida
+        ruta_espejo: Ruta del SQLite (default: data/cache/bq_reclasificados.sqlite)
+        ttl_horas: Horas durante las que el espejo se considera vigente
+        olas: Quarters a consultar (ej: ultimos_5q). None = todo el site
+        ids: IDs (numericalId) de los comentarios a categorizar. None = sin filtro por ID
+    
     Returns:
         tuple: (bq_por_clave, bq_por_id, bq_por_hash, bq_disponible)
     """
@@ -138,50 +167,77 @@ def cargar_categorias_bigquery(site_code, verbose=True):
     if verbose:
         print(f"\n📦 Cargando categorías desde BigQuery...")
     
+    if usar_espejo:
+        try:
+            estado = estado_espejo(site_code, ruta_espejo, olas=olas)
+            vigente = (estado['vigente_hasta'] is not None and ttl_horas is not None
+                       and time.time() - estado['vigente_hasta'] < ttl_horas * 3600)
+            if client is None and not vigente:
+                client = conectar_bigquery()
+            if client is not None:
+                sincronizar_espejo(client, site_code, ruta=ruta_espejo, ttl_horas=ttl_horas, olas=olas, verbose=verbose)
+            elif estado['filas'] > 0 and verbose:
+                if vigente:
+                    print(f"   💾 Espejo local vigente ({estado['filas']:,} filas, TTL {ttl_horas}h)")
+                else:
+                    print(f"   📴 Sin conexión a BigQuery: usando espejo local ({estado['filas']:,} filas)")
+            
+            bq_por_clave, bq_por_id, bq_por_hash = cargar_indices_espejo(site_code, ruta_espejo, olas=olas, ids=ids)
+            bq_disponible = len(bq_por_id) > 0 or len(bq_por_hash) > 0
+            if verbose:
+                if bq_disponible:
+                    print(f"   ✅ BigQuery (espejo): {len(bq_por_clave):,} por clave (ID|OLA|MARCA), {len(bq_por_hash):,} por hash")
+                else:
+                    print(f"   ⚠️ No hay datos en BigQuery para SITE={site_code}")
+            return bq_por_clave, bq_por_id, bq_por_hash, bq_disponible
+        except Exception as e:
+            if verbose:
+                print(f"   ⚠️ Error en espejo local de BigQuery: {e}")
+            return bq_por_clave, bq_por_id, bq_por_hash, bq_disponible
+    
     try:
-        client = conectar_bigquery()
+        if client is None:
+            client = conectar_bigquery()
         if client is None:
             return bq_por_clave, bq_por_id, bq_por_hash, False
         
-        query_bq = f"""
-        SELECT 
-            CAST(numericalId AS STRING) AS numericalId,
-            OLA,
-            MARCA,
-            COMMENTS,
-            MOTIVO_RECLASIFICADO
-        FROM `{BQ_TABLE}`
-        WHERE SITE = '{site_code}'
-          AND MOTIVO_RECLASIFICADO IS NOT NULL
-          AND TRIM(MOTIVO_RECLASIFICADO) != ''
-        """
+        if ids is not None and len(ids) > MAX_IDS_PUSHDOWN:
+            if verbose:
+                print(f"   ℹ️ {len(ids):,} IDs (> {MAX_IDS_PUSHDOWN:,}): se filtra solo por OLA")
+            ids = None
         
         if verbose:
-            print(f"   📡 Consultando BigQuery para SITE={site_code}...")
-        
-        df_bq = client.query(query_bq).to_dataframe()
-        
-        if len(df_bq) > 0:
-            for _, row in df_bq.iterrows():
-                categoria = str(row['MOTIVO_RECLASIFICADO']).strip()
-                
-                # Índice por clave compuesta: ID|OLA|MARCA (más preciso)
-                if pd.notna(row['numericalId']) and pd.notna(row.get('OLA')) and pd.notna(row.get('MARCA')):
-                    clave = f"{row['numericalId']}|{row['OLA']}|{row['MARCA']}"
-                    bq_por_clave[clave] = categoria
-                
-                # Índice por ID solo (fallback)
-                if pd.notna(row['numericalId']):
-                    bq_por_id[str(row['numericalId'])] = categoria
-                
-                # Índice por hash
-                if pd.notna(row['COMMENTS']):
-                    hash_com = hash_comentario(str(row['COMMENTS']))
-                    bq_por_hash[hash_com] = categoria
-            
+            filtro_olas = f", OLAs={list(olas)}" if olas is not None else ""
+            filtro_ids = f", {len(ids):,} IDs" if ids is not None else ""
+            print(f"   📡 Consultando BigQuery para SITE={site_code}{filtro_olas}{filtro_ids}...")
+        
+        if ids is not None:
+            # 1. Lookup por clave/ID: solo las filas de los IDs del player
+            sql_ids, params_ids = construir_query_reclasificados(site_code, olas=olas, ids=ids)
+            df_ids = ejecutar_query(client, sql_ids, params_ids)
+            # 2. Lookup por hash: solo COMMENTS + MOTIVO del resto de las mismas OLAs
+            sql_hash, params_hash = construir_query_reclasificados(
+                site_code, columnas=['COMMENTS', 'MOTIVO_RECLASIFICADO'], olas=olas, ids=ids, excluir_ids=True)
+            df_resto = ejecutar_query(client, sql_hash, params_hash)
+            bq_por_clave, bq_por_id, _ = construir_indices(df_ids.rename(columns={'MOTIVO_RECLASIFICADO': 'MOTIVO'}))
+            df_hash = pd.concat([df_ids[['COMMENTS', 'MOTIVO_RECLASIFICADO']], df_resto], ignore_index=True)
+            n_filas = len(df_ids) + len(df_resto)
+        else:
+            sql_bq, params_bq = construir_query_reclasificados(site_code, olas=olas)
+            df_hash = ejecutar_query(client, sql_bq, params_bq)
+            bq_por_clave, bq_por_id, _ = construir_indices(df_hash.rename(columns={'MOTIVO_RECLASIFICADO': 'MOTIVO'}))
+            n_filas = len(df_hash)
+        
+        # Índice por hash (MD5 calculado una vez por comentario distinto)
+        if len(df_hash) > 0:
+            df_hash = df_hash.assign(HASH=hash_comentarios_unicos(df_hash['COMMENTS']))
+            _, _, bq_por_hash = construir_indices(df_hash[['HASH', 'MOTIVO_RECLASIFICADO']].rename(
+                columns={'MOTIVO_RECLASIFICADO': 'MOTIVO'}))
+        
+        if n_filas > 0:
             bq_disponible = True
             if verbose:
-                print(f"   ✅ BigQuery: {len(bq_por_clave):,} por clave (ID|OLA|MARCA), {len(bq_por_hash):,} por hash")
+                print(f"   ✅ BigQuery: {len(bq_por_clave):,} por clave (ID|OLA|MARCA), {len(bq_por_hash):,} por hash ({n_filas:,} filas)")
         else:
             if verbose:
                 print(f"   ⚠️ No hay datos en BigQuery para SITE={site_code}")
@@ -192,6 +248,208 @@ def cargar_categorias_bigquery(site_code, verbose=True):
     
     return bq_por_clave, bq_por_id, bq_por_hash, bq_disponible
 
+# ==============================================================================
+# ASIGNACIÓN VECTORIZADA DE MOTIVOS (MODO RÁPIDO Y MODO IA)
+# ==============================================================================
+
+# Motivos declarados que no aportan información (se siguen buscando por IA)
+VALORES_OTROS = {'otros', 'otro', 'outra', 'outras', 'outras razões',
+                 'otra razón', 'otras razones', '', 'nan', 'none', '.', ' '}
+
+
+def resolver_por_claves(claves, lookup):
+    """
+    Join vectorizado de columnas de clave contra un dict de lookup.
+    
+    Para claves compuestas el dict usa "a|b|c" (ver cargar_categorias_bigquery):
+    la clave se arma con una sola concatenación vectorizada y el join se
+    resuelve con get_indexer contra el índice de claves del dict.
+    
+    Args:
+        claves: Lista de Series (mismo índice) con las columnas de la clave
+        lookup: Dict {clave: valor}
+    
+    Returns:
+        pd.Series: Valor encontrado o NaN, con el índice de claves[0]
+    """
+    indice = claves[0].index
+    if not lookup or len(indice) == 0:
+        return pd.Series(np.nan, index=indice, dtype=object)
+    
+    valores = np.array(list(lookup.values()), dtype=object)
+    tabla = pd.Index(list(lookup.keys()), dtype=object)
+    buscado = claves[0].astype(str)
+    if len(claves) > 1:
+        buscado = buscado.str.cat([c.astype(str) for c in claves[1:]], sep='|')
+    buscado = buscado.to_numpy(dtype=object)
+    
+    pos = tabla.get_indexer(buscado)
+    encontrado = pos >= 0
+    resultado = np.full(len(pos), np.nan, dtype=object)
+    resultado[encontrado] = valores[pos[encontrado]]
+    return pd.Series(resultado, index=indice, dtype=object)
+
+
+def aplicar_por_unicos(serie, funcion):
+    """
+    Aplica ``funcion`` una vez por valor distinto y la mapea de vuelta a cada fila.
+    
+    Usa los códigos de pd.factorize: el trabajo en Python es O(valores únicos)
+    y la expansión a filas es un indexado de numpy. Los nulos se evalúan una
+    sola vez como ``funcion(np.nan)``.
+    """
+    codigos, unicos = pd.factorize(serie)
+    resultados = np.empty(len(unicos) + 1, dtype=object)
+    resultados[:-1] = [funcion(u) for u in unicos]
+    resultados[-1] = funcion(np.nan)
+    return pd.Series(resultados[codigos], index=serie.index, dtype=object)
+
+
+def motivo_declarado_por_nps(df, col_nps, col_motivo_detra, col_motivo_neutro):
+    """
+    Motivo declarado crudo según clase NPS (np.select por columnas).
+    
+    Detractores (NPS=-1) toman col_motivo_detra y neutros (NPS=0)
+    col_motivo_neutro; el resto queda NaN.
+    """
+    condiciones, opciones = [], []
+    if col_motivo_detra:
+        condiciones.append((df[col_nps] == -1).to_numpy())
+        opciones.append(df[col_motivo_detra].to_numpy(dtype=object))
+    if col_motivo_neutro:
+        condiciones.append((df[col_nps] == 0).to_numpy())
+        opciones.append(df[col_motivo_neutro].to_numpy(dtype=object))
+    if not condiciones:
+        return pd.Series(np.nan, index=df.index, dtype=object)
+    return pd.Series(np.select(condiciones, opciones, default=np.nan), index=df.index, dtype=object)
+
+
+def detectar_columnas_motivo(df):
+    """Columnas de motivo declarado (MOTIVO_DETRA, MOTIVO_NEUTRO); None si no existen."""
+    col_motivo_detra = None
+    col_motivo_neutro = None
+    for col in df.columns:
+        col_upper = col.upper()
+        if col_upper == 'MOTIVO_DETRA':
+            col_motivo_detra = col
+        if col_upper == 'MOTIVO_NEUTRO':
+            col_motivo_neutro = col
+    return col_motivo_detra, col_motivo_neutro
+
+
+def motivo_declarado_rapido(df, col_nps, col_motivo_detra, col_motivo_neutro, sin_opinion):
+    """
+    MOTIVO_IA del modo rápido: motivo declarado limpio, o sin_opinion si está vacío.
+    
+    Es el camino que usan los players sin IA y el waterfall competitivo
+    (todas las marcas del site).
+    """
+    def limpiar_declarado(motivo):
+        if pd.isna(motivo) or str(motivo).strip() in ['', '.', 'nan', ' ', 'None']:
+            return sin_opinion
+        return str(motivo).strip()
+    
+    declarado = motivo_declarado_por_nps(df, col_nps, col_motivo_detra, col_motivo_neutro)
+    return aplicar_por_unicos(declarado, limpiar_declarado)
+
+
+def _limpiar_declarado_valido(motivo):
+    if pd.isna(motivo):
+        return np.nan
+    motivo_str = str(motivo).strip()
+    return np.nan if motivo_str.lower() in VALORES_OTROS else motivo_str
+
+
+def motivo_declarado_valido(df, col_nps, col_motivo_detra, col_motivo_neutro):
+    """
+    Motivo declarado por columna (detractores → MOTIVO_DETRA, neutros → MOTIVO_NEUTRO).
+    
+    Retorna NaN si no hay motivo o si es genérico (VALORES_OTROS). La limpieza
+    se hace sobre los valores distintos y se mapea de vuelta.
+    """
+    motivo = motivo_declarado_por_nps(df, col_nps, col_motivo_detra, col_motivo_neutro)
+    return aplicar_por_unicos(motivo, _limpiar_declarado_valido)
+
+
+def resolver_cascada_ia(df_con_comentarios, col_id, col_comentarios, col_motivo_detra, col_motivo_neutro,
+                        bq_por_clave, bq_por_id, bq_por_hash, bq_disponible, otros,
+                        col_nps='NPS', col_ola='OLA', col_marca='MARCA', verbose=True):
+    """
+    Asigna MOTIVO_IA a comentarios con texto mediante una cascada vectorizada.
+    
+    Orden: clave compuesta ID|OLA|MARCA → ID solo → hash del comentario
+    (calculado una vez por comentario distinto) → motivo declarado válido → OTROS.
+    Cada paso solo resuelve las filas que siguen sin motivo.
+    
+    Returns:
+        tuple: (df con MOTIVO_IA, dict con desde_bigquery, desde_declarado, desde_ia)
+    """
+    df = df_con_comentarios.copy()
+    motivo = pd.Series(np.nan, index=df.index, dtype=object)
+    desde_bigquery = 0
+    
+    # PASO 1: clave compuesta (ID|OLA|MARCA) y fallback por ID
+    if len(df) > 0 and col_id:
+        id_str = df[col_id].astype(str)
+        if col_marca in df.columns and col_ola in df.columns:
+            motivo = resolver_por_claves([id_str, df[col_ola].astype(str), df[col_marca].astype(str)], bq_por_clave)
+            encontrados_clave = int(motivo.notna().sum())
+            if verbose:
+                print(f"   ✅ Encontrados por clave (ID|OLA|MARCA): {encontrados_clave:,}")
+            
+            if encontrados_clave < len(df):
+                sin_match = motivo.isna()
+                motivo[sin_match] = resolver_por_claves([id_str[sin_match]], bq_por_id)
+                encontrados_id = int(motivo.notna().sum()) - encontrados_clave
+                if encontrados_id > 0 and verbose:
+                    print(f"   ✅ Encontrados por ID solo (fallback): {encontrados_id:,}")
+        else:
+            motivo = resolver_por_claves([id_str], bq_por_id)
+        
+        desde_bigquery = int(motivo.notna().sum())
+        if verbose:
+            print(f"   📊 Total BigQuery: {desde_bigquery:,} ({desde_bigquery/max(1,len(df))*100:.1f}%)")
+    
+    # PASO 2: hash del comentario (solo comentarios distintos sin match)
+    sin_match = motivo.isna()
+    if sin_match.any() and bq_disponible and len(bq_por_hash) > 0 and col_comentarios:
+        if verbose:
+            print(f"   🔍 Buscando {int(sin_match.sum()):,} restantes por hash...")
+        hashes = hash_comentarios_unicos(df.loc[sin_match, col_comentarios])
+        motivo_hash = resolver_por_claves([hashes], bq_por_hash)
+        encontrados_hash = int(motivo_hash.notna().sum())
+        if encontrados_hash > 0:
+            motivo[sin_match] = motivo_hash
+            desde_bigquery += encontrados_hash
+            if verbose:
+                print(f"   ✅ Encontrados por hash: {encontrados_hash:,}")
+    
+    # PASO 2.5: motivo declarado si no es "Otros"
+    sin_match = motivo.isna()
+    desde_declarado = 0
+    if sin_match.any() and (col_motivo_detra or col_motivo_neutro):
+        if verbose:
+            print(f"   📋 Buscando {int(sin_match.sum()):,} restantes en motivo declarado...")
+        declarado = motivo_declarado_valido(df[sin_match], col_nps, col_motivo_detra, col_motivo_neutro)
+        desde_declarado = int(declarado.notna().sum())
+        if desde_declarado > 0:
+            motivo[sin_match] = declarado
+            if verbose:
+                print(f"   ✅ Encontrados por motivo declarado: {desde_declarado:,}")
+    
+    # PASO 3: los que faltan van como OTROS (requieren revisión manual/IA)
+    sin_match = motivo.isna()
+    desde_ia = int(sin_match.sum())
+    if desde_ia > 0:
+        if verbose:
+            print(f"   ⚠️ {desde_ia:,} comentarios requieren categorización manual/IA")
+            print(f"      (Se marcarán como '{otros}' por ahora)")
+        motivo[sin_match] = otros
+    
+    df['MOTIVO_IA'] = motivo
+    return df, {'desde_bigquery': desde_bigquery, 'desde_declarado': desde_declarado, 'desde_ia': desde_ia}
+
+
 # ==============================================================================
 # FUNCIÓN PRINCIPAL: CATEGORIZAR COMENTARIOS
 # ==============================================================================
@@ -252,8 +510,8 @@ def categorizar_comentarios(df_player, config, resultados_parte3=None, verbose=T
     if verbose:
         print(f"\n📅 Quarters disponibles: {todos_quarters}")
     
-    # Filtrar a los últimos 5 quarters
-    ultimos_5q = todos_quarters[-5:] if len(todos_quarters) >= 5 else todos_quarters
+    # Filtrar a los últimos 5 quarters (o la ventana de --window si es más larga)
+    ultimos_5q = todos_quarters[-quarters_historico(config):]
     if verbose:
         print(f"📅 Últimos 5Q a categorizar: {ultimos_5q}")
     
@@ -279,16 +537,7 @@ def categorizar_comentarios(df_player, config, resultados_parte3=None, verbose=T
     # ═══════════════════════════════════════════════════════════════════
     
     # Detectar columnas de motivo declarado
-    col_motivo_detra = None
-    col_motivo_neutro = None
-    
-    for col in df_neutros_detractores.columns:
-        col_upper = col.upper()
-        
-        if col_upper == 'MOTIVO_DETRA':
-            col_motivo_detra = col
-        if col_upper == 'MOTIVO_NEUTRO':
-            col_motivo_neutro = col
+    col_motivo_detra, col_motivo_neutro = detectar_columnas_motivo(df_neutros_detractores)
     
     TIENE_MOTIVOS = col_motivo_detra is not None or col_motivo_neutro is not None
     PLAYER_REQUIERE_IA = es_player_con_ia(player_seleccionado)
@@ -310,18 +559,9 @@ def categorizar_comentarios(df_player, config, resultados_parte3=None, verbose=T
             print(f"   📋 Col detractores: {col_motivo_detra}")
             print(f"   📋 Col neutros: {col_motivo_neutro}")
         
-        def get_motivo_declarado(row):
-            motivo = None
-            if row[col_nps] == -1 and col_motivo_detra:
-                motivo = row.get(col_motivo_detra, '')
-            elif row[col_nps] == 0 and col_motivo_neutro:
-                motivo = row.get(col_motivo_neutro, '')
-            
-            if pd.isna(motivo) or str(motivo).strip() in ['', '.', 'nan', ' ', 'None']:
-                return SIN_OPINION
-            return str(motivo).strip()
-        
-        df_neutros_detractores['MOTIVO_IA'] = df_neutros_detractores.apply(get_motivo_declarado, axis=1)
+        df_neutros_detractores['MOTIVO_IA'] = motivo_declarado_rapido(
+            df_neutros_detractores, col_nps, col_motivo_detra, col_motivo_neutro, SIN_OPINION
+        )
         df_categorizado = df_neutros_detractores.copy()
         
         if verbose:
@@ -334,8 +574,27 @@ def categorizar_comentarios(df_player, config, resultados_parte3=None, verbose=T
         if verbose:
             print(f"\n🤖 MODO IA: BigQuery + fallback")
         
-        # Cargar categorías desde BigQuery
-        bq_por_clave, bq_por_id, bq_por_hash, bq_disponible = cargar_categorias_bigquery(SITE_CODE, verbose)
+        # Buscar columna de ID
+        col_id = None
+        for c in ['ID', 'numericalId', 'id', 'ID_RESPUESTA']:
+            if c in df_neutros_detractores.columns:
+                col_id = c
+                break
+        
+        if verbose:
+            print(f"   🔑 Columna ID: '{col_id}'")
+        
+        # Cargar categorías desde BigQuery (pushdown de quarters en ambas consultas e
+        # IDs del player en el lookup por clave/ID; el hash busca en la misma ventana)
+        parametros = config.get('parametros', {})
+        ids_player = df_neutros_detractores[col_id].dropna().astype(str).unique().tolist() if col_id else None
+        bq_por_clave, bq_por_id, bq_por_hash, bq_disponible = cargar_categorias_bigquery(
+            SITE_CODE, verbose,
+            usar_espejo=parametros.get('espejo_bigquery', True),
+            ttl_horas=parametros.get('espejo_bigquery_ttl_horas', TTL_HORAS_DEFAULT),
+            olas=ultimos_5q,
+            ids=ids_player
+        )
         
         # ═══════════════════════════════════════════════════════════════
         # WARNING: Si BigQuery no está disponible para MP/Nubank
@@ -372,16 +631,6 @@ def categorizar_comentarios(df_player, config, resultados_parte3=None, verbose=T
         if verbose and col_comentarios:
             print(f"   💬 Columna comentarios: '{col_comentarios}'")
         
-        # Buscar columna de ID
-        col_id = None
-        for c in ['ID', 'numericalId', 'id', 'ID_RESPUESTA']:
-            if c in df_neutros_detractores.columns:
-                col_id = c
-                break
-        
-        if verbose:
-            print(f"   🔑 Columna ID: '{col_id}'")
-        
         # Separar con/sin comentarios
         if col_comentarios:
             comentarios_validos = (
@@ -401,123 +650,18 @@ def categorizar_comentarios(df_player, config, resultados_parte3=None, verbose=T
             print(f"   • BigQuery: {'✅ ' + str(len(bq_por_clave)) + ' por clave compuesta' if bq_disponible else '❌'}")
         
         # ═══════════════════════════════════════════════════════════════
-        # PASO 1: Lookup VECTORIZADO en BigQuery por CLAVE COMPUESTA
+        # CASCADA: clave compuesta → ID → hash → motivo declarado → OTROS
         # ═══════════════════════════════════════════════════════════════
         if verbose:
             print(f"\n⚡ Aplicando lookup vectorizado desde BigQuery...")
         
-        desde_bigquery = 0
-        
-        if len(df_con_comentarios) > 0 and col_id:
-            # Crear columna de ID como string
-            df_con_comentarios['_id_str'] = df_con_comentarios[col_id].astype(str)
-            
-            # Crear clave compuesta: ID|OLA|MARCA
-            if col_marca in df_con_comentarios.columns and col_ola in df_con_comentarios.columns:
-                df_con_comentarios['_clave_compuesta'] = (
-                    df_con_comentarios[col_id].astype(str) + '|' + 
-                    df_con_comentarios[col_ola].astype(str) + '|' + 
-                    df_con_comentarios[col_marca].astype(str)
-                )
-                # Lookup por clave compuesta
-                df_con_comentarios['MOTIVO_IA'] = df_con_comentarios['_clave_compuesta'].map(bq_por_clave)
-                encontrados_clave = df_con_comentarios['MOTIVO_IA'].notna().sum()
-                if verbose:
-                    print(f"   ✅ Encontrados por clave (ID|OLA|MARCA): {encontrados_clave:,}")
-                
-                # Fallback por ID solo
-                if encontrados_clave < len(df_con_comentarios):
-                    mask_sin_match = df_con_comentarios['MOTIVO_IA'].isna()
-                    df_con_comentarios.loc[mask_sin_match, 'MOTIVO_IA'] = \
-                        df_con_comentarios.loc[mask_sin_match, '_id_str'].map(bq_por_id)
-                    encontrados_id = df_con_comentarios['MOTIVO_IA'].notna().sum() - encontrados_clave
-                    if encontrados_id > 0 and verbose:
-                        print(f"   ✅ Encontrados por ID solo (fallback): {encontrados_id:,}")
-            else:
-                df_con_comentarios['MOTIVO_IA'] = df_con_comentarios['_id_str'].map(bq_por_id)
-            
-            desde_bigquery = df_con_comentarios['MOTIVO_IA'].notna().sum()
-            if verbose:
-                print(f"   📊 Total BigQuery: {desde_bigquery:,} ({desde_bigquery/max(1,len(df_con_comentarios))*100:.1f}%)")
-        
-        # ═══════════════════════════════════════════════════════════════
-        # PASO 2: Para los no encontrados, intentar por hash
-        # ═══════════════════════════════════════════════════════════════
-        df_sin_match = df_con_comentarios[df_con_comentarios['MOTIVO_IA'].isna()].copy() if 'MOTIVO_IA' in df_con_comentarios.columns else df_con_comentarios.copy()
-        
-        if len(df_sin_match) > 0 and bq_disponible and len(bq_por_hash) > 0 and col_comentarios:
-            if verbose:
-                print(f"   🔍 Buscando {len(df_sin_match):,} restantes por hash...")
-            
-            df_sin_match['_hash'] = df_sin_match[col_comentarios].apply(lambda x: hash_comentario(str(x)))
-            df_sin_match['_motivo_hash'] = df_sin_match['_hash'].map(bq_por_hash)
-            
-            encontrados_hash = df_sin_match['_motivo_hash'].notna().sum()
-            if encontrados_hash > 0:
-                df_con_comentarios.loc[df_sin_match.index, 'MOTIVO_IA'] = df_sin_match['_motivo_hash']
-                desde_bigquery += encontrados_hash
-                if verbose:
-                    print(f"   ✅ Encontrados por hash: {encontrados_hash:,}")
-        
-        # ═══════════════════════════════════════════════════════════════
-        # PASO 2.5: Usar motivo declarado si no es "Otros" (fallback)
-        # ═══════════════════════════════════════════════════════════════
-        df_sin_match_2 = df_con_comentarios[df_con_comentarios['MOTIVO_IA'].isna()].copy() if 'MOTIVO_IA' in df_con_comentarios.columns else pd.DataFrame()
-        desde_declarado = 0
-        
-        if len(df_sin_match_2) > 0 and (col_motivo_detra or col_motivo_neutro):
-            if verbose:
-                print(f"   📋 Buscando {len(df_sin_match_2):,} restantes en motivo declarado...")
-            
-            VALORES_OTROS = {'otros', 'otro', 'outra', 'outras', 'outras razões', 
-                            'otra razón', 'otras razones', '', 'nan', 'none', '.', ' '}
-            
-            def get_motivo_declarado_valido(row):
-                motivo = None
-                if col_motivo_detra and row[col_nps] == -1:
-                    motivo = row.get(col_motivo_detra, None)
-                elif col_motivo_neutro and row[col_nps] == 0:
-                    motivo = row.get(col_motivo_neutro, None)
-                
-                if pd.isna(motivo):
-                    return None
-                
-                motivo_str = str(motivo).strip()
-                motivo_lower = motivo_str.lower()
-                
-                if motivo_lower in VALORES_OTROS:
-                    return None
-                
-                return motivo_str
-            
-            df_sin_match_2['_motivo_declarado'] = df_sin_match_2.apply(get_motivo_declarado_valido, axis=1)
-            
-            encontrados_declarado = df_sin_match_2['_motivo_declarado'].notna().sum()
-            if encontrados_declarado > 0:
-                mask_validos = df_sin_match_2['_motivo_declarado'].notna()
-                df_con_comentarios.loc[df_sin_match_2[mask_validos].index, 'MOTIVO_IA'] = \
-                    df_sin_match_2.loc[mask_validos, '_motivo_declarado']
-                desde_declarado = encontrados_declarado
-                if verbose:
-                    print(f"   ✅ Encontrados por motivo declarado: {desde_declarado:,}")
-        
-        # ═══════════════════════════════════════════════════════════════
-        # PASO 3: Los que faltan van como OTROS (requieren revisión manual/IA)
-        # ═══════════════════════════════════════════════════════════════
-        df_necesitan_ia = df_con_comentarios[df_con_comentarios['MOTIVO_IA'].isna()] if 'MOTIVO_IA' in df_con_comentarios.columns else pd.DataFrame()
-        desde_ia = 0
-        
-        if len(df_necesitan_ia) > 0:
-            if verbose:
-                print(f"   ⚠️ {len(df_necesitan_ia):,} comentarios requieren categorización manual/IA")
-                print(f"      (Se marcarán como '{OTROS}' por ahora)")
-            
-            df_con_comentarios.loc[df_necesitan_ia.index, 'MOTIVO_IA'] = OTROS
-            desde_ia = len(df_necesitan_ia)
-        
-        # Limpiar columnas temporales
-        cols_temp = ['_id_str', '_clave_compuesta', '_hash', '_motivo_hash', '_motivo_declarado']
-        df_con_comentarios = df_con_comentarios.drop(columns=[c for c in cols_temp if c in df_con_comentarios.columns], errors='ignore')
+        df_con_comentarios, conteos = resolver_cascada_ia(
+            df_con_comentarios, col_id, col_comentarios, col_motivo_detra, col_motivo_neutro,
+            bq_por_clave, bq_por_id, bq_por_hash, bq_disponible, OTROS, verbose=verbose
+        )
+        desde_bigquery = conteos['desde_bigquery']
+        desde_declarado = conteos['desde_declarado']
+        desde_ia = conteos['desde_ia']
         
         # Asignar SIN_OPINION a los sin comentarios
         df_sin_comentarios['MOTIVO_IA'] = SIN_OPINION
@@ -14,9 +14,13 @@ Uso:
     resultado = corregir_sin_opinion(resultado_parte4, config)
 """
 
+import re
+import numpy as np
 import pandas as pd
 import unicodedata
 
+from parte4_categorizacion import aplicar_por_unicos, motivo_declarado_por_nps
+
 # ==============================================================================
 # PLAYERS QUE REQUIEREN CORRECCIÓN (usaron IA en Parte 4)
 # ==============================================================================
@@ -34,6 +38,24 @@ def normalizar(t):
     t = unicodedata.normalize('NFD', str(t).lower().strip())
     return ''.join(c for c in t if unicodedata.category(c) != 'Mn')
 
+def marcar_sin_opinion(serie, patron):
+    """Máscara booleana de valores que, normalizados, coinciden con el patrón.
+    
+    La normalización y el regex corren una vez por valor distinto.
+    """
+    regex = re.compile(patron, re.IGNORECASE)
+    return aplicar_por_unicos(serie, lambda v: regex.search(normalizar(v)) is not None).astype(bool)
+
+def motivo_para_correccion(motivo, patron_check):
+    """Motivo declarado limpio si sirve para reemplazar "Sin opinión", si no NaN."""
+    if pd.isna(motivo) or not motivo:
+        return np.nan
+    m_str = str(motivo).strip()
+    # Verificar que el motivo es válido y no es también "sin opinión"
+    if m_str and m_str not in ['', '.', 'nan', 'None'] and patron_check not in normalizar(m_str):
+        return m_str
+    return np.nan
+
 # ==============================================================================
 # FUNCIÓN PRINCIPAL
 # ==============================================================================
@@ -108,9 +130,8 @@ def corregir_sin_opinion(resultado_parte4, config, verbose=True):
         print(f"📋 Col neutros: {col_neutro[:50] if col_neutro else None}...")
     
     # Buscar "sin opinión"
-    df['_norm'] = df['MOTIVO_IA'].apply(normalizar)
-    mascara = df['_norm'].str.contains(PATRON_SIN_OPINION, case=False, na=False)
-    total = mascara.sum()
+    mascara = marcar_sin_opinion(df['MOTIVO_IA'], PATRON_SIN_OPINION)
+    total = int(mascara.sum())
     
     if verbose:
         print(f"\n📊 'Sin opinión': {total} ({total/len(df)*100:.1f}%)")
@@ -119,34 +140,20 @@ def corregir_sin_opinion(resultado_parte4, config, verbose=True):
         if verbose:
             print("✅ Nada que corregir")
     else:
-        corregidos = 0
-        
-        for idx in df[mascara].index:
-            row = df.loc[idx]
-            motivo = None
-            
-            # Obtener motivo declarado según tipo de usuario
-            if row[col_nps] == -1 and col_detra: 
-                motivo = row.get(col_detra)
-            elif row[col_nps] == 0 and col_neutro: 
-                motivo = row.get(col_neutro)
-            
-            if motivo and pd.notna(motivo):
-                m_str = str(motivo).strip()
-                m_norm = normalizar(m_str)
-                
-                # Verificar que el motivo es válido y no es también "sin opinión"
-                patron_check = PATRON_SIN_OPINION.split('|')[0]
-                if m_str and m_str not in ['', '.', 'nan', 'None'] and patron_check not in m_norm:
-                    df.loc[idx, 'MOTIVO_IA'] = m_str
-                    corregidos += 1
+        # Motivo declarado según tipo de usuario, limpiado por valor distinto
+        patron_check = PATRON_SIN_OPINION.split('|')[0]
+        declarado = motivo_declarado_por_nps(df[mascara], col_nps, col_detra, col_neutro)
+        correccion = aplicar_por_unicos(declarado, lambda m: motivo_para_correccion(m, patron_check))
+        validos = correccion.notna()
+        corregidos = int(validos.sum())
+        if corregidos > 0:
+            df.loc[validos[validos].index, 'MOTIVO_IA'] = correccion[validos]
         
         if verbose:
             print(f"✅ Corregidos: {corregidos} de {total}")
         
-        # Verificar restantes
-        df['_norm'] = df['MOTIVO_IA'].apply(normalizar)
-        nuevo = df['_norm'].str.contains(PATRON_SIN_OPINION, case=False, na=False).sum()
+        # Verificar restantes (solo hace falta re-evaluar los valores reemplazados)
+        nuevo = (total - corregidos) + int(marcar_sin_opinion(correccion[validos], PATRON_SIN_OPINION).sum())
         
         if verbose:
             print(f"📊 'Sin opinión' restantes: {nuevo} ({nuevo/len(df)*100:.1f}%)")
@@ -155,9 +162,6 @@ def corregir_sin_opinion(resultado_parte4, config, verbose=True):
             for m, c in df['MOTIVO_IA'].value_counts().head(10).items():
                 print(f"   • {str(m)[:45]}: {c} ({c/len(df)*100:.1f}%)")
     
-    # Limpiar columna temporal
-    df.drop('_norm', axis=1, inplace=True)
-    
     if verbose:
         print(f"\n{'='*70}")
         print(f"✅ PARTE 5 OK")
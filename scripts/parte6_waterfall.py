@@ -17,122 +17,18 @@ Uso:
 """
 
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 from pathlib import Path
 import os
+from utils_graficos import usar_png, valores_json
+from config_categorias import map_categories
+from parte4_categorizacion import SITE_CAT_CONFIG, detectar_columnas_motivo, motivo_declarado_rapido
+from significancia import se_nps, significancia_nps, significancia_waterfall
 
 # ==============================================================================
-# MAPEO DE MOTIVOS (MULTISITE) - CORREGIDO
+# COLORES POR CATEGORÍA (mapeo de motivos en config_categorias.TAXONOMIA_MOTIVOS)
 # ==============================================================================
 
-def mapear_motivo(motivo):
-    """
-    Agrupa categorías granulares en categorías principales.
-    Soporta categorías en español y portugués.
-    CORREGIDO: unifica Beneficios→Promociones y agrega keywords de inversion
-    """
-    if pd.isna(motivo) or str(motivo).strip() in ['', '.', 'nan']: 
-        return 'Sin opinión'
-    
-    m = str(motivo).strip()
-    
-    # Normalizar encoding
-    m = m.replace('ã§','ç').replace('ã£','ã').replace('ã©','é').replace('ã³','ó').replace('ã­','í')
-    m = m.replace('Ã§','ç').replace('Ã£','ã').replace('Ã©','é').replace('Ã³','ó').replace('Ã­','í')
-    
-    m_lower = m.lower()
-    
-    # === TARIFAS (cobros, comisiones, mensualidades - NO tasas de interés) ===
-    # IMPORTANTE: Evaluar ANTES de Financiamiento para que no se confunda con "tasa"
-    if any(x in m_lower for x in [
-        'tarifa', 'cobrança', 'cobranza', 'comisión', 'comision', 'comissão',
-        'mensualidad', 'mensalidade', 'costo de', 'custo de', 'cobro'
-    ]) and 'tasa' not in m_lower and 'taxa' not in m_lower:
-        return 'Tarifas'
-    
-    # === FINANCIAMIENTO (incluye crédito, tarjeta, límites, tasas de interés) ===
-    if any(x in m_lower for x in [
-        'financ', 'crédit', 'credit', 'cartão', 'tarjeta', 'limite', 
-        'empréstimo', 'préstamo', 'prestamo', 'taxa', 'tasa', 'juro',
-        'acesso a créd', 'acesso a cred'
-    ]):
-        return 'Financiamiento'
-    
-    # === RENDIMIENTOS (incluye inversiones) - CORREGIDO PARA TODOS LOS SITES ===
-    if any(x in m_lower for x in [
-        'rendimento', 'rendimiento', 'investimento', 'inversiones', 'inversión',
-        'poupança', 'ahorro', 'cdi', 'saldo da conta',
-        'inversion', 'invertir', 'opcion',
-        'ganancia', 'ganancias', 'dinero en cuenta'  # AGREGADO PARA MÉXICO
-    ]):
-        return 'Rendimientos'
-    
-    # === COMPLEJIDAD / DIFICULTAD ===
-    if any(x in m_lower for x in [
-        'dificuldade', 'dificultad', 'problema', 'complexidade', 'complejidad',
-        'comodidade', 'facilidade', 'facilidad', 'complicado', 'difícil'
-    ]):
-        return 'Complejidad'
-    
-    # === FUNCIONALIDADES ===
-    if any(x in m_lower for x in [
-        'funcionalidade', 'funcionalidad', 'oferta de func', 'maior oferta',
-        'feature', 'recurso'
-    ]):
-        return 'Funcionalidades'
-    
-    # === SEGURIDAD ===
-    if any(x in m_lower for x in [
-        'segurança', 'seguridad', 'seguro', 'fraude', 'golpe', 'roubo', 'robo'
-    ]):
-        return 'Seguridad'
-    
-    # === ATENCIÓN ===
-    if any(x in m_lower for x in [
-        'atendimento', 'atención', 'atencion', 'cliente', 'suporte', 'soporte', 'sac'
-    ]):
-        return 'Atención'
-    
-    # === PROMOCIONES (unifica Beneficios) - CORREGIDO ===
-    if any(x in m_lower for x in [
-        'benefício', 'beneficio', 'desconto', 'descuento', 'promoção', 'promoción',
-        'cashback', 'recompensa', 'reward', 'promocion', 'promociones', 'promo'  # AGREGADO
-    ]):
-        return 'Promociones'  # CAMBIADO de 'Beneficios' a 'Promociones'
-    
-    # === SIN OPINIÓN ===
-    if any(x in m_lower for x in [
-        'não uso', 'no uso', 'sem opinião', 'sin opinión', 'sin opinion'
-    ]):
-        return 'Sin opinión'
-    
-    # === OTROS (unificar todas las variantes: otro, otros, outros, other) ===
-    if any(x in m_lower for x in ['outro', 'otros', 'other', 'otro']):
-        return 'Otro'
-    # Capturar también si es exactamente "otro" o variantes
-    if m_lower.strip() in ['otro', 'otros', 'outros', 'other', 'otra', 'outras']:
-        return 'Otro'
-    
-    # === VALORES INVÁLIDOS / ERRORES DE EXCEL → Otro ===
-    if any(x in m_lower for x in ['#¡valor!', '#valor!', '#value!', '#n/a', '#ref!']):
-        return 'Otro'
-    
-    # === NA / Na / N/A → Otro ===
-    if m_lower.strip() in ['na', 'n/a', 'nan', 'null', 'none', '-']:
-        return 'Otro'
-    
-    # === OFERTA → Funcionalidades ===
-    if 'oferta' in m_lower and 'func' not in m_lower:
-        return 'Funcionalidades'
-    
-    # === APP (problemas con la app) → Complejidad ===
-    if m_lower.strip() == 'app':
-        return 'Complejidad'
-    
-    # Si no matchea nada, devolver tal cual
-    return m
-
 # Colores para TODAS las categorías posibles - CORREGIDO
 COLORES = {
     # Categorías principales
@@ -157,11 +53,192 @@ COLORES = {
     'Sin desglose': '#bdc3c7',  # Gris claro
 }
 
+# ==============================================================================
+# CONTRIBUCIONES POR QUARTER Y CATEGORÍA
+# ==============================================================================
+
+def calcular_contribuciones(df_motivos, df_player, col_periodo, col_nps='NPS', col_grupo=None):
+    """
+    Contribución de cada categoría de motivo al NPS perdido, para todos los quarters.
+    
+    contribución = (2 × detractores + neutros) / encuestados del quarter × 100
+    
+    Se resuelve con un crosstab ponderado (quarter × categoría agregada, con
+    peso 2 para detractores y 1 para neutros) dividido por los totales por
+    quarter, sin filtrar el DataFrame por motivo ni por quarter.
+    
+    Args:
+        df_motivos: DataFrame categorizado (MOTIVO_IA) de PARTE 5
+        df_player: DataFrame completo del player (denominador)
+        col_periodo: Columna de quarter
+        col_nps: Columna NPS (-1, 0, 1)
+        col_grupo: Columna opcional (ej. MARCA); si se indica, el índice es
+            (grupo, quarter) y se calcula para todos los grupos a la vez
+    
+    Returns:
+        dict: contrib (DataFrame quarter × categoría, pp), pesos (mismo crosstab
+        sin dividir), pesos_cuadrado (Σ peso², para el SE), nps, se_nps, total
+        y quejas (Series por quarter; quejas = total de pp perdidos sin desglose)
+    """
+    def claves(df):
+        return [df[col_grupo], df[col_periodo]] if col_grupo else df[col_periodo]
+    
+    conteo = pd.crosstab(claves(df_player), df_player[col_nps])
+    total = conteo.sum(axis=1)
+    clase = lambda v: conteo[v] if v in conteo.columns else pd.Series(0, index=conteo.index)
+    nps = (clase(1) - clase(-1)) / total * 100
+    quejas = (clase(-1) * 2 + clase(0)) / total * 100
+    se = pd.Series(se_nps(clase(-1), clase(0), clase(1)), index=total.index)
+    
+    pesos = pd.DataFrame(index=total.index, dtype=float)
+    pesos_cuadrado = pesos.copy()
+    if 'MOTIVO_IA' in df_motivos.columns:
+        df_m = df_motivos[df_motivos['MOTIVO_IA'].notna()]
+        if len(df_m) > 0:
+            peso = np.select([df_m[col_nps] == -1, df_m[col_nps] == 0], [2, 1], default=0)
+            categoria = map_categories(df_m['MOTIVO_IA'])
+            pesos = pd.crosstab(claves(df_m), categoria, values=peso, aggfunc='sum').fillna(0)
+            # Σ peso² (4 × detractores + neutros) para el error estándar de la contribución
+            pesos_cuadrado = pd.crosstab(claves(df_m), categoria, values=peso ** 2, aggfunc='sum').fillna(0)
+            dentro = pesos.index.isin(total.index)
+            pesos, pesos_cuadrado = pesos[dentro], pesos_cuadrado[dentro]
+    pesos.columns.name = None
+    pesos_cuadrado.columns.name = None
+    contrib = pesos.div(total.reindex(pesos.index), axis=0) * 100
+    
+    return {'contrib': contrib, 'pesos': pesos, 'pesos_cuadrado': pesos_cuadrado, 'nps': nps,
+            'se_nps': se, 'total': total, 'quejas': quejas}
+
+
+# ==============================================================================
+# WATERFALL COMPETITIVO (TODAS LAS MARCAS DEL SITE)
+# ==============================================================================
+
+# Categorías que no son quejas accionables (van al final de la comparación)
+CATEGORIAS_RESIDUALES = ['Sin opinión', 'Otro', 'Otros', 'Outros']
+
+# Encuestados mínimos de una marca en el quarter para entrar al ranking
+MIN_MUESTRA_MARCA = 100
+
+
+def matriz_waterfall_competitivo(df_completo, config, n_quarters=5, verbose=True):
+    """
+    Waterfall de quejas para todas las marcas del site en una sola pasada.
+    
+    Usa el motivo declarado (camino del modo rápido de PARTE 4) para todas
+    las marcas, incluidas las que en PARTE 4 van por IA, así la comparación
+    es homogénea. Un solo crosstab (MARCA, OLA) × categoría da la matriz.
+    
+    Args:
+        df_completo: DataFrame del site con todas las marcas (de PARTE 1)
+        config: Diccionario de configuración
+        n_quarters: Cantidad de quarters hacia atrás
+        verbose: Si True, imprime información
+    
+    Returns:
+        dict: matriz ((MARCA, OLA) × categoría, pp), share (% del total de
+        quejas de cada fila), significancia (Δ q_ant → q_act con SE y z por
+        (MARCA, categoría)), significancia_nps (por MARCA), nps, total,
+        comparacion (player vs mercado en q_act, por categoría) y metadatos
+    """
+    site = config['site']
+    player = config['player']
+    q_ant, q_act = config['periodo_1'], config['periodo_2']
+    col_ola, col_marca, col_nps = 'OLA', 'MARCA', 'NPS'
+    sin_opinion = SITE_CAT_CONFIG.get(site, SITE_CAT_CONFIG['MLA'])['sin_opinion']
+    
+    quarters = sorted(df_completo[col_ola].dropna().unique())
+    ventana = quarters[-n_quarters:]
+    ventana = sorted(set(ventana) | ({q_ant, q_act} & set(quarters)))
+    df_base = df_completo[df_completo[col_ola].isin(ventana) & df_completo[col_marca].notna()]
+    df_nd = df_base[df_base[col_nps].isin([-1, 0])]
+    
+    col_detra, col_neutro = detectar_columnas_motivo(df_nd)
+    if not (col_detra or col_neutro):
+        if verbose:
+            print("⚠️ Waterfall competitivo: sin columnas de motivo declarado")
+        return {'error': 'Sin columnas de motivo declarado (MOTIVO_DETRA / MOTIVO_NEUTRO)'}
+    
+    df_motivos = df_nd[[col_marca, col_ola, col_nps]].assign(
+        MOTIVO_IA=motivo_declarado_rapido(df_nd, col_nps, col_detra, col_neutro, sin_opinion)
+    )
+    c = calcular_contribuciones(df_motivos, df_base, col_ola, col_nps, col_grupo=col_marca)
+    matriz, pesos, total = c['contrib'], c['pesos'], c['total']
+    share = matriz.div(matriz.sum(axis=1).replace(0, np.nan), axis=0) * 100
+    
+    def mercado(q):
+        """pp por categoría del resto de las marcas (pooled) en el quarter q"""
+        if q not in total.index.get_level_values(1):
+            return pd.Series(dtype=float)
+        otras = total.xs(q, level=1).drop(player, errors='ignore')
+        if otras.sum() == 0:
+            return pd.Series(dtype=float)
+        p = pesos.reindex(pd.MultiIndex.from_product([otras.index, [q]])).fillna(0).sum()
+        return p / otras.sum() * 100
+    
+    def fila(df, q):
+        return df.loc[(player, q)] if (player, q) in df.index else pd.Series(dtype=float)
+    
+    def a_share(serie):
+        return serie / serie.sum() * 100 if serie.sum() > 0 else serie * 0
+    
+    pp_player, pp_mercado = fila(matriz, q_act), mercado(q_act)
+    pp_player_ant, pp_mercado_ant = fila(matriz, q_ant), mercado(q_ant)
+    sh_player, sh_mercado = a_share(pp_player), a_share(pp_mercado)
+    gap_ant = a_share(pp_player_ant).sub(a_share(pp_mercado_ant), fill_value=0)
+    
+    # Ranking del player por categoría (1 = menos quejas) entre marcas con muestra suficiente
+    marcas_q = total.xs(q_act, level=1) if q_act in total.index.get_level_values(1) else pd.Series(dtype=float)
+    marcas_validas = marcas_q[marcas_q >= MIN_MUESTRA_MARCA].index
+    matriz_q = matriz.reindex(pd.MultiIndex.from_product([marcas_validas, [q_act]])).droplevel(1).fillna(0)
+    ranking = matriz_q.rank(method='min') if len(matriz_q) else matriz_q
+    
+    comparacion = []
+    for cat in sorted(set(pp_player.index) | set(pp_mercado.index)):
+        sp, sm = float(sh_player.get(cat, 0)), float(sh_mercado.get(cat, 0))
+        if sp == 0 and sm == 0:
+            continue
+        comparacion.append({
+            'categoria': cat,
+            'pp_player': float(pp_player.get(cat, 0)),
+            'pp_mercado': float(pp_mercado.get(cat, 0)),
+            'share_player': sp,
+            'share_mercado': sm,
+            'gap_share': sp - sm,
+            'delta_gap': (sp - sm) - float(gap_ant.get(cat, 0)) if len(gap_ant) else None,
+            'posicion': int(ranking.loc[player, cat]) if player in ranking.index and cat in ranking.columns else None,
+            'n_marcas': len(ranking),
+            'residual': cat in CATEGORIAS_RESIDUALES,
+        })
+    comparacion.sort(key=lambda r: (r['residual'], -abs(r['gap_share'])))
+    
+    if verbose:
+        print(f"\n🏁 WATERFALL COMPETITIVO: {matriz.index.get_level_values(0).nunique()} marcas × {len(ventana)} quarters")
+        for r in comparacion[:6]:
+            print(f"   • {r['categoria']:<16s} {player}: {r['share_player']:5.1f}%  mercado: {r['share_mercado']:5.1f}%  "
+                  f"(gap {r['gap_share']:+.1f}pp)")
+    
+    return {
+        'matriz': matriz,
+        'share': share,
+        'significancia': significancia_waterfall(c, q_ant, q_act),
+        'significancia_nps': significancia_nps(c, q_ant, q_act),
+        'nps': c['nps'],
+        'total': total,
+        'comparacion': comparacion,
+        'marcas': sorted(matriz.index.get_level_values(0).unique()),
+        'quarters': ventana,
+        'player': player,
+        'q_ant': q_ant,
+        'q_act': q_act,
+    }
+
+
 # ==============================================================================
 # FUNCIÓN PRINCIPAL
 # ==============================================================================
 
-def generar_waterfall(resultado_parte5, df_player, config, guardar_graficos=True, verbose=True):
+def generar_waterfall(resultado_parte5, df_player, config, guardar_graficos=True, verbose=True, historico=None):
     """
     Genera Waterfall NPS y gráfico de evolución de quejas.
     
@@ -171,9 +248,17 @@ def generar_waterfall(resultado_parte5, df_player, config, guardar_graficos=True
         config: Diccionario de configuración
         guardar_graficos: Si True, guarda los gráficos en outputs/
         verbose: Si True, imprime información
+        historico: almacen_corridas.tendencia('waterfall', ...) (opcional). La
+            evolución de quejas toma de ahí los quarters anteriores al par
+            actual y solo recalcula los que no tienen corrida guardada
     
     Returns:
-        dict: Diccionario con waterfall_data, nps_comparativo, evolucion_quejas_data
+        dict: Diccionario con waterfall_data, nps_comparativo, evolucion_quejas_data,
+            contribuciones_por_quarter (quarter × categoría), nps_por_quarter y
+            contribuciones (salida completa de calcular_contribuciones, para la ventana)
+            y quarters_almacen (quarters de la evolución leídos del almacén).
+            Con dos quarters, la tabla waterfall trae SE_Delta, Z y Significativo
+            por motivo y nps_comparativo trae se_delta, z y significativo.
     """
     
     # Extraer configuración
@@ -220,47 +305,26 @@ def generar_waterfall(resultado_parte5, df_player, config, guardar_graficos=True
     # CALCULAR CONTRIBUCIONES
     # ═══════════════════════════════════════════════════════════════════════════
     
-    def calc_contrib(df_motivos, periodo):
-        """Calcula contribución de cada motivo al NPS"""
-        df_total = df_player[df_player[col_periodo] == periodo]
-        if len(df_total) == 0: 
-            return {}, 0, 0
-        
-        prom = (df_total[col_nps] == 1).sum()
-        det = (df_total[col_nps] == -1).sum()
-        nps = (prom - det) / len(df_total) * 100
-        
-        df_p = df_motivos[df_motivos[col_periodo] == periodo]
-        contrib = {}
-        if 'MOTIVO_IA' in df_p.columns:
-            for mot in df_p['MOTIVO_IA'].dropna().unique():
-                sub = df_p[df_p['MOTIVO_IA'] == mot]
-                d, n = (sub[col_nps] == -1).sum(), (sub[col_nps] == 0).sum()
-                contrib[mot] = ((d * 2) + n) / len(df_total) * 100
-        return contrib, nps, len(df_total)
+    contribuciones = calcular_contribuciones(df_wf, df_player, col_periodo, col_nps)
+    contrib_q = contribuciones['contrib']
+    
+    def contrib_de(periodo):
+        """Contribución por categoría y NPS de un quarter (desde el crosstab)"""
+        c = contrib_q.loc[periodo].to_dict() if periodo in contrib_q.index else {}
+        return c, float(contribuciones['nps'].get(periodo, 0))
     
     # Calcular
     if usar_comp:
-        c_ant, nps_ant, t_ant = calc_contrib(df_wf, q_ant)
-        c_act, nps_act, t_act = calc_contrib(df_wf, q_act)
+        c_ant_m, nps_ant = contrib_de(q_ant)
+        c_act_m, nps_act = contrib_de(q_act)
         if verbose:
             print(f"\n📊 NPS: {q_ant}={nps_ant:.1f} → {q_act}={nps_act:.1f} (Δ{nps_act-nps_ant:+.1f})")
     else:
-        c_ant, nps_ant, t_ant = {}, 0, 0
-        c_act, nps_act, t_act = calc_contrib(df_wf, q_act)
+        c_ant_m, nps_ant = {}, 0
+        c_act_m, nps_act = contrib_de(q_act)
         if verbose:
             print(f"\n📊 NPS {q_act}: {nps_act:.1f}")
     
-    # Agrupar por categoría
-    def agrupar(c): 
-        agr = {}
-        for m, v in c.items():
-            cat = mapear_motivo(m)
-            agr[cat] = agr.get(cat, 0) + v
-        return agr
-    
-    c_ant_m, c_act_m = agrupar(c_ant), agrupar(c_act)
-    
     # ═══════════════════════════════════════════════════════════════════════════
     # CONSTRUIR DATAFRAME WATERFALL
     # ═══════════════════════════════════════════════════════════════════════════
@@ -289,6 +353,14 @@ def generar_waterfall(resultado_parte5, df_player, config, guardar_graficos=True
         df_otros = df_wf_final[mask_otros]
         df_wf_final = pd.concat([df_resto, df_otros], ignore_index=True)
     
+    if usar_comp and not df_wf_final.empty:
+        # Error estándar y z del Δ de cada motivo (muestras independientes por quarter)
+        sig = significancia_waterfall(contribuciones, q_ant, q_act)
+        sig = sig.reindex(df_wf_final['Motivo'])
+        df_wf_final['SE_Delta'] = sig['SE_Delta'].to_numpy()
+        df_wf_final['Z'] = sig['Z'].to_numpy()
+        df_wf_final['Significativo'] = sig['Significativo'].fillna(False).astype(bool).to_numpy()
+    
     if verbose:
         print(f"\n📊 TABLA WATERFALL:")
         print(df_wf_final.round(2).to_string(index=False))
@@ -300,8 +372,26 @@ def generar_waterfall(resultado_parte5, df_player, config, guardar_graficos=True
     fig_waterfall = None
     grafico_waterfall_base64 = None
     grafico_evolucion_quejas_base64 = None
+    grafico_waterfall_data = None
+    modo_png = usar_png(config)
     
     if not df_wf_final.empty:
+        # Datos compactos para Chart.js (modo 'js')
+        motivos_wf = df_wf_final['Motivo'].tolist()
+        grafico_waterfall_data = {
+            'titulo': f'{player_seleccionado} - Waterfall NPS ({q_act})' + (f' vs {q_ant}' if usar_comp else ''),
+            'etiqueta_inicio': f'NPS {q_act}',
+            'etiqueta_fin': 'Full Potential',
+            'nps': round(float(nps_act), 1),
+            'motivos': motivos_wf,
+            'valores': valores_json(df_wf_final['Impacto_Actual']),
+            'deltas': valores_json(df_wf_final['Delta']) if usar_comp else None,
+            'colores': [COLORES.get(m, '#95a5a6') for m in motivos_wf],
+        }
+    
+    if modo_png and not df_wf_final.empty:
+        import matplotlib.pyplot as plt
+        
         fig, ax = plt.subplots(figsize=(14, 7), facecolor='white')
         ax.set_facecolor('white')
         
@@ -375,35 +465,44 @@ def generar_waterfall(resultado_parte5, df_player, config, guardar_graficos=True
         print(f"📅 Quarters disponibles: {olas_disp}")
         print(f"📅 Últimos 5Q para gráfico: {ultimos_5q}")
     
+    def con_desglose(contrib_agrupado):
+        return (len(contrib_agrupado) > 1
+                and any(cat not in ['Sin opinión', 'Otro', 'Otros', 'Outros'] for cat in contrib_agrupado))
+    
+    # Quarters anteriores al par actual ya guardados en el almacén de corridas (con desglose)
+    almacenados = {}
+    if historico is not None and len(historico):
+        previos = historico[~historico['q_act'].isin(quarters_seleccionados) & historico['impacto_actual'].notna()]
+        for q, filas in previos.groupby('q_act'):
+            contrib_guardada = {m: float(v) for m, v in zip(filas['motivo'], filas['impacto_actual']) if v > 0.01}
+            if con_desglose(contrib_guardada):
+                almacenados[q] = contrib_guardada
+    quarters_almacen = []
+    
     # Calcular impacto por quarter
     impacto_por_quarter = {}
     quarters_sin_desglose = []
     
     for q in ultimos_5q:
-        contrib_q, nps_q, total_q = calc_contrib(df_wf, q)
+        if str(q) in almacenados:
+            impacto_por_quarter[q] = almacenados[str(q)]
+            quarters_almacen.append(q)
+            if verbose:
+                print(f"   💾 {q}: {len(impacto_por_quarter[q])} categorías (almacén de corridas)")
+            continue
         
-        if total_q == 0:
+        if contribuciones['total'].get(q, 0) == 0:
             if verbose:
                 print(f"   ⚠️ {q}: Sin datos")
             continue
         
-        # Agrupar por categoría
-        contrib_agrupado = {}
-        tiene_desglose = False
-        
-        for motivo_ia, impacto in contrib_q.items():
-            if impacto > 0.01:
-                categoria = mapear_motivo(motivo_ia)
-                contrib_agrupado[categoria] = contrib_agrupado.get(categoria, 0) + impacto
-                if categoria not in ['Sin opinión', 'Otro', 'Otros', 'Outros']:
-                    tiene_desglose = True
-        
-        # Si no tiene desglose real, calcular total de quejas
-        if not tiene_desglose or len(contrib_agrupado) <= 1:
-            df_q_total = df_player[df_player[col_periodo] == q]
-            det_q = (df_q_total[col_nps] == -1).sum()
-            neu_q = (df_q_total[col_nps] == 0).sum()
-            total_quejas = ((det_q * 2) + neu_q) / len(df_q_total) * 100 if len(df_q_total) > 0 else 0
+        # Categorías con impacto del quarter (misma matriz que el waterfall)
+        contrib_agrupado, _ = contrib_de(q)
+        contrib_agrupado = {cat: v for cat, v in contrib_agrupado.items() if v > 0.01}
+        
+        # Si no tiene desglose real, usar total de quejas
+        if not con_desglose(contrib_agrupado):
+            total_quejas = float(contribuciones['quejas'][q])
             impacto_por_quarter[q] = {'Sin desglose': total_quejas}
             quarters_sin_desglose.append(q)
             if verbose:
@@ -448,53 +547,57 @@ def generar_waterfall(resultado_parte5, df_player, config, guardar_graficos=True
         cols_orden = cols_principales + [c for c in cols_finales if c in df_plot.columns]
         df_plot = df_plot[[c for c in cols_orden if c in df_plot.columns]]
         
-        # Gráfico
-        fig2, ax2 = plt.subplots(figsize=(12, 6), facecolor='white')
-        ax2.set_facecolor('white')
-        x = np.arange(len(df_plot))
-        bottom = np.zeros(len(df_plot))
-        
-        for mot in df_plot.columns:
-            vals = df_plot[mot].values
-            color = COLORES.get(mot, '#a5b1c2')
-            ax2.bar(x, vals, 0.65, bottom=bottom, label=mot, color=color, edgecolor='white', linewidth=1.5)
-            for i, (v, b) in enumerate(zip(vals, bottom)):
-                if v >= 3:
-                    tc = 'white' if mot not in ['Sin opinión', 'Otro', 'Sin desglose'] else '#333'
-                    ax2.text(i, b + v/2, f'{v:.0f}%', ha='center', va='center', fontsize=9, fontweight='600', color=tc)
-            bottom += vals
-        
-        # Total arriba de cada barra
-        for i, t in enumerate(bottom): 
-            ax2.text(i, t + 0.8, f'{t:.0f}%', ha='center', fontsize=11, fontweight='bold', color='#2d3436')
-        
-        ax2.set_xticks(x)
-        ax2.set_xticklabels(df_plot.index, fontsize=11, fontweight='600')
-        ax2.set_ylabel('Impacto (pp)', fontsize=11)
-        ax2.set_title(f'Evolución de Quejas - {player_seleccionado}', fontsize=13, fontweight='bold', pad=15)
-        # Leyenda FUERA del gráfico (a la derecha)
-        ax2.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=9, frameon=True, fancybox=True)
-        ax2.spines['top'].set_visible(False)
-        ax2.spines['right'].set_visible(False)
-        ax2.yaxis.grid(True, alpha=0.15)
-        ax2.set_ylim(0, max(bottom) * 1.08 if len(bottom) > 0 else 50)
-        plt.tight_layout(rect=[0, 0, 0.82, 1])  # Dejar espacio para la leyenda a la derecha
-        
-        fig_evolucion = fig2
         df_evolucion = df_plot
         
-        # Nota: Los gráficos se embeben en el HTML como base64, no se guardan como archivos separados
-        
-        # Guardar como base64 para HTML
-        import io
-        import base64
-        buf_evol = io.BytesIO()
-        fig2.savefig(buf_evol, format='png', dpi=120, bbox_inches='tight', facecolor='white')
-        buf_evol.seek(0)
-        grafico_evolucion_quejas_base64 = base64.b64encode(buf_evol.read()).decode('utf-8')
-        buf_evol.close()
-        
-        plt.close(fig2)
+        # Gráfico PNG (en modo 'js' el HTML lo dibuja desde evolucion_quejas_data)
+        if modo_png:
+            import matplotlib.pyplot as plt
+            
+            fig2, ax2 = plt.subplots(figsize=(12, 6), facecolor='white')
+            ax2.set_facecolor('white')
+            x = np.arange(len(df_plot))
+            bottom = np.zeros(len(df_plot))
+        
+            for mot in df_plot.columns:
+                vals = df_plot[mot].values
+                color = COLORES.get(mot, '#a5b1c2')
+                ax2.bar(x, vals, 0.65, bottom=bottom, label=mot, color=color, edgecolor='white', linewidth=1.5)
+                for i, (v, b) in enumerate(zip(vals, bottom)):
+                    if v >= 3:
+                        tc = 'white' if mot not in ['Sin opinión', 'Otro', 'Sin desglose'] else '#333'
+                        ax2.text(i, b + v/2, f'{v:.0f}%', ha='center', va='center', fontsize=9, fontweight='600', color=tc)
+                bottom += vals
+        
+            # Total arriba de cada barra
+            for i, t in enumerate(bottom): 
+                ax2.text(i, t + 0.8, f'{t:.0f}%', ha='center', fontsize=11, fontweight='bold', color='#2d3436')
+        
+            ax2.set_xticks(x)
+            ax2.set_xticklabels(df_plot.index, fontsize=11, fontweight='600')
+            ax2.set_ylabel('Impacto (pp)', fontsize=11)
+            ax2.set_title(f'Evolución de Quejas - {player_seleccionado}', fontsize=13, fontweight='bold', pad=15)
+            # Leyenda FUERA del gráfico (a la derecha)
+            ax2.legend(loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=9, frameon=True, fancybox=True)
+            ax2.spines['top'].set_visible(False)
+            ax2.spines['right'].set_visible(False)
+            ax2.yaxis.grid(True, alpha=0.15)
+            ax2.set_ylim(0, max(bottom) * 1.08 if len(bottom) > 0 else 50)
+            plt.tight_layout(rect=[0, 0, 0.82, 1])  # Dejar espacio para la leyenda a la derecha
+        
+            fig_evolucion = fig2
+        
+            # Nota: Los gráficos se embeben en el HTML como base64, no se guardan como archivos separados
+        
+            # Guardar como base64 para HTML
+            import io
+            import base64
+            buf_evol = io.BytesIO()
+            fig2.savefig(buf_evol, format='png', dpi=120, bbox_inches='tight', facecolor='white')
+            buf_evol.seek(0)
+            grafico_evolucion_quejas_base64 = base64.b64encode(buf_evol.read()).decode('utf-8')
+            buf_evol.close()
+        
+            plt.close(fig2)
         
         # Advertencia si hay quarters sin desglose
         if quarters_sin_desglose and verbose:
@@ -509,6 +612,10 @@ def generar_waterfall(resultado_parte5, df_player, config, guardar_graficos=True
     # ═══════════════════════════════════════════════════════════════════════════
     
     nps_comparativo = {q_ant: nps_ant, q_act: nps_act, 'delta': nps_act - nps_ant} if usar_comp else {q_act: nps_act}
+    if usar_comp:
+        sig_nps = significancia_nps(contribuciones, q_ant, q_act).iloc[0]
+        nps_comparativo.update({'se_delta': float(sig_nps['se']), 'z': float(sig_nps['z']),
+                                'significativo': bool(sig_nps['significativo'])})
     
     if verbose:
         print(f"\n{'='*70}")
@@ -523,8 +630,13 @@ def generar_waterfall(resultado_parte5, df_player, config, guardar_graficos=True
         'fig_waterfall': fig_waterfall,
         'fig_evolucion': fig_evolucion,
         'ultimos_5q': ultimos_5q,
+        'quarters_almacen': quarters_almacen,
         'grafico_waterfall_base64': grafico_waterfall_base64,
-        'grafico_evolucion_quejas_base64': grafico_evolucion_quejas_base64
+        'grafico_evolucion_quejas_base64': grafico_evolucion_quejas_base64,
+        'grafico_waterfall_data': grafico_waterfall_data,
+        'contribuciones_por_quarter': contrib_q,
+        'nps_por_quarter': contribuciones['nps'].to_dict(),
+        'contribuciones': contribuciones
     }
 
 
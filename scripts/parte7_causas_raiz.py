@@ -14,40 +14,19 @@ Uso:
 
 import pandas as pd
 import random
-import re
 import json
-from collections import Counter
 from pathlib import Path
 
-# ==============================================================================
-# COMPETIDORES POR SITE
-# ==============================================================================
-
-COMPETIDORES_POR_SITE = {
-    'MLB': [  # Brasil
-        'nubank', 'nu bank', 'roxinho', 'inter', 'banco inter', 'c6', 'c6 bank',
-        'picpay', 'pic pay', 'pagbank', 'pagseguro', 'next', 'bradesco',
-        'itaú', 'itau', 'iti', 'santander', 'caixa', 'bb', 'banco do brasil',
-        'neon', 'original', 'will bank', 'will', 'ame', 'ame digital'
-    ],
-    'MLA': [  # Argentina
-        'ualá', 'uala', 'naranja x', 'naranja', 'brubank', 'bru bank',
-        'galicia', 'santander', 'bbva', 'macro', 'icbc', 'hsbc',
-        'banco nación', 'banco nacion', 'provincia', 'ciudad',
-        'reba', 'personal pay', 'modo', 'cuenta dni', 'dni'
-    ],
-    'MLM': [  # México
-        'nubank', 'nu', 'stori', 'klar', 'rappi', 'rappicard',
-        'bbva', 'bancomer', 'santander', 'banorte', 'citibanamex', 'banamex',
-        'hsbc', 'scotiabank', 'hey banco', 'hey', 'albo', 'fondeadora',
-        'spin', 'oxxo', 'flink'
-    ],
-    'MLC': [  # Chile
-        'mach', 'tenpo', 'fintual', 'racional', 'bice', 'banco estado',
-        'santander', 'bci', 'scotiabank', 'itaú', 'falabella',
-        'banco chile', 'security', 'ripley', 'cencosud'
-    ]
-}
+from casi_duplicados import PRESUPUESTO_TOKENS_MOTIVO, preparar_muestra_prompt, formatear_comentarios_prompt
+from clusters_comentarios import agrupar_temas, formatear_temas_prompt, guardar_causas_clusters
+from prompts_fragmentados import escribir_fragmentos
+from reuso_semantico import huella_motivo, semilla_estable, sincronizar_motivos, registrar_pedido
+from config_categorias import CATEGORIA_OTRO, map_categories
+from indice_comentarios import (
+    REEMPLAZOS_ENCODING, construir_indice_comentarios, indice_desde_dataframe,
+    seleccion, comentarios_de, top_keywords, tendencias_q1_q2,
+)
+from menciones_competidores import COMPETIDORES_POR_SITE, detectar_competidores
 
 # ==============================================================================
 # FUNCIONES AUXILIARES
@@ -55,173 +34,17 @@ COMPETIDORES_POR_SITE = {
 
 def normalizar_encoding(texto):
     """Corrige encoding roto (UTF-8 mal interpretado)"""
-    reemplazos = {
-        'Ã£': 'ã', 'Ã¡': 'á', 'Ã©': 'é', 'Ã­': 'í', 'Ã³': 'ó', 'Ãº': 'ú',
-        'Ã§': 'ç', 'Ã': 'í', 'Ãª': 'ê', 'Ã´': 'ô', 'Ã¢': 'â',
-        'confianã': 'confiança', 'seguranã': 'segurança', 'promoã': 'promoção',
-        'crã©dito': 'crédito', 'crã': 'cré', 'taxã': 'taxa', 'aplicaã': 'aplicaç',
-    }
-    for mal, bien in reemplazos.items():
+    for mal, bien in REEMPLAZOS_ENCODING.items():
         texto = texto.replace(mal, bien)
     return texto
 
 
 def extraer_keywords(comentarios_list, top_n=15):
-    """Extrae keywords más frecuentes"""
-    stopwords_pt = {'de', 'a', 'o', 'que', 'e', 'do', 'da', 'em', 'um', 'para', 'é', 'com',
-                    'não', 'uma', 'os', 'no', 'se', 'na', 'por', 'mais', 'as', 'dos', 'como',
-                    'mas', 'foi', 'ao', 'ele', 'das', 'tem', 'à', 'seu', 'sua', 'ou', 'ser'}
-    stopwords_es = {'de', 'la', 'que', 'el', 'en', 'y', 'a', 'los', 'del', 'se', 'las', 'por',
-                    'un', 'para', 'con', 'no', 'una', 'su', 'al', 'es', 'lo', 'como', 'más',
-                    'pero', 'sus', 'le', 'ya', 'o', 'fue', 'este', 'ha', 'sí', 'porque'}
-    stopwords = stopwords_pt | stopwords_es | {'usar', 'usa', 'uso', 'ter', 'fazer', 'muy', 'bien', 'mal'}
-    
+    """Extrae keywords más frecuentes (índice ad-hoc; en el loop se usa el índice de la corrida)"""
     if not comentarios_list:
         return {}
-    
-    texto = normalizar_encoding(' '.join(comentarios_list).lower())
-    palabras = re.findall(r'\b[a-záéíóúãõàâêôçñü]{4,}\b', texto)
-    palabras_filtradas = [p for p in palabras if p not in stopwords]
-    
-    return dict(Counter(palabras_filtradas).most_common(top_n))
-
-
-def detectar_competidores(comentarios_list, competidores, player_actual):
-    """Detecta menciones de competidores"""
-    if not comentarios_list:
-        return []
-    
-    menciones = {}
-    texto_lower = ' '.join(comentarios_list).lower()
-    total_comentarios = len(comentarios_list)
-    
-    competidores_encontrados = set()
-    for comp in competidores:
-        if comp.lower() in player_actual.lower():
-            continue
-        
-        count = len(re.findall(r'\b' + re.escape(comp) + r'\b', texto_lower))
-        if count > 0:
-            nombre = comp.title()
-            # Normalizar nombres
-            if 'nubank' in comp or 'roxinho' in comp or 'nu bank' in comp:
-                nombre = 'Nubank'
-            elif 'inter' in comp:
-                nombre = 'Banco Inter'
-            elif 'c6' in comp:
-                nombre = 'C6 Bank'
-            elif 'picpay' in comp:
-                nombre = 'PicPay'
-            elif 'pagbank' in comp or 'pagseguro' in comp:
-                nombre = 'PagBank'
-            elif 'ualá' in comp or 'uala' in comp:
-                nombre = 'Ualá'
-            elif 'naranja' in comp:
-                nombre = 'Naranja X'
-            elif 'brubank' in comp:
-                nombre = 'Brubank'
-            elif 'itaú' in comp or 'itau' in comp:
-                nombre = 'Itaú'
-            elif 'caixa' in comp:
-                nombre = 'Caixa'
-            elif 'bb' in comp or 'banco do brasil' in comp:
-                nombre = 'Banco Do Brasil'
-            
-            if nombre not in competidores_encontrados:
-                competidores_encontrados.add(nombre)
-                menciones[nombre] = {
-                    'menciones': count,
-                    'porcentaje': round((count / total_comentarios) * 100, 1)
-                }
-    
-    return sorted([{'nombre': k, **v} for k, v in menciones.items()],
-                  key=lambda x: x['menciones'], reverse=True)
-
-
-def analizar_tendencias_q1_q2(kw_q1, kw_q2):
-    """Analiza cambios en keywords entre Q1 y Q2"""
-    nuevos = {k: v for k, v in kw_q2.items() if k not in kw_q1 and v >= 3}
-    nuevos_sorted = sorted(nuevos.items(), key=lambda x: x[1], reverse=True)[:5]
-    
-    crecientes = []
-    for k in set(kw_q1.keys()) & set(kw_q2.keys()):
-        diff = kw_q2[k] - kw_q1[k]
-        if diff > 0 and kw_q1[k] > 0:
-            pct = round((diff / kw_q1[k]) * 100)
-            if pct >= 20:
-                crecientes.append((k, pct, kw_q2[k]))
-    crecientes = sorted(crecientes, key=lambda x: x[1], reverse=True)[:5]
-    
-    return {
-        'nuevos_temas': [k for k, v in nuevos_sorted],
-        'temas_crecientes': [(k, pct) for k, pct, _ in crecientes],
-    }
-
-
-def mapear_motivo_categoria(motivo):
-    """Mapea motivos a categorías unificadas.
-    
-    Soporta tanto categorías granulares de BigQuery (ej: 'Acceso a crédito o tarjeta de crédito')
-    como categorías ya simplificadas (ej: 'Financiamiento', 'Complejidad').
-    """
-    if pd.isna(motivo) or str(motivo).strip() in ['', '.', 'nan']:
-        return 'Sin opinión'
-    m = str(motivo).strip()
-    m_lower = m.lower()
-    m_lower = m_lower.replace('ã§', 'ç').replace('ã£', 'ã').replace('ã©', 'é')
-    m_lower = m_lower.replace('ã³', 'ó').replace('ã­', 'í').replace('ãº', 'ú')
-    
-    # Match exacto de categorías simplificadas (BigQuery a veces devuelve estos directamente)
-    MAPEO_EXACTO = {
-        'financiamiento': 'Financiamiento',
-        'financiamento': 'Financiamiento',
-        'rendimientos': 'Rendimientos',
-        'rendimentos': 'Rendimientos',
-        'complejidad': 'Complejidad',
-        'complexidade': 'Complejidad',
-        'promociones': 'Promociones',
-        'promoções': 'Promociones',
-        'promo': 'Promociones',
-        'seguridad': 'Seguridad',
-        'segurança': 'Seguridad',
-        'atención': 'Atención',
-        'atencion': 'Atención',
-        'atendimento': 'Atención',
-        'tarifas': 'Tarifas',
-        'funcionalidades': 'Funcionalidades',
-        'inversion': 'Rendimientos',
-        'inversiones': 'Rendimientos',
-        'investimento': 'Rendimientos',
-        'investimentos': 'Rendimientos',
-    }
-    if m_lower in MAPEO_EXACTO:
-        return MAPEO_EXACTO[m_lower]
-    
-    # Match por keywords (para categorías granulares de BigQuery)
-    if any(x in m_lower for x in ['taxa', 'juros', 'tasa', 'interes', 'crédito', 'credito', 
-                             'limite', 'empréstimo', 'préstamo', 'cartão', 'tarjeta',
-                             'financ']):
-        return 'Financiamiento'
-    if any(x in m_lower for x in ['atendimento', 'atención', 'atencion', 'cliente', 'suporte', 'soporte']):
-        return 'Atención'
-    if any(x in m_lower for x in ['rendimento', 'rendimiento', 'cdi', 'poupança',
-                             'inversion', 'inversión', 'invertir', 'opcion', 'dinero en cuenta']):
-        return 'Rendimientos'
-    if any(x in m_lower for x in ['segurança', 'seguridad', 'fraude', 'golpe', 'roubo']):
-        return 'Seguridad'
-    if any(x in m_lower for x in ['promoç', 'promoc', 'desconto', 'descuento', 'cashback', 
-                             'benefício', 'beneficio', 'promocion', 'promociones', 'promo']):
-        return 'Promociones'
-    if any(x in m_lower for x in ['tarifa', 'mensalidade', 'cuota', 'cobrança']):
-        return 'Tarifas'
-    if any(x in m_lower for x in ['comodidade', 'facilidade', 'dificuldade', 'dificultad', 
-                             'problema', 'complexidade', 'complejidad', 'uso', 'app', 'bug']):
-        return 'Complejidad'
-    if any(x in m_lower for x in ['funcionalidade', 'funcionalidad', 'oferta', 'feature']):
-        return 'Funcionalidades'
-    if any(x in m_lower for x in ['não uso', 'no uso', 'sem opinião', 'sin opinión']):
-        return 'Sin opinión'
-    return 'Otro'
+    indice = construir_indice_comentarios(comentarios_list)
+    return top_keywords(indice, indice['doc_texto'], top_n=top_n)
 
 
 # ==============================================================================
@@ -238,7 +61,7 @@ def generar_prompt_subcausas(motivo, comentarios, player, quarter_label):
         return None
     
     sample_size = min(50, len(comentarios))
-    sample = random.sample(comentarios, sample_size)
+    sample = random.Random(semilla_estable(motivo, quarter_label)).sample(comentarios, sample_size)
     comentarios_texto = '\n'.join([f"{i+1}. \"{c}\"" for i, c in enumerate(sample)])
     
     prompt = f"""Analiza estos {sample_size} comentarios sobre "{motivo}" ({quarter_label}).
@@ -331,7 +154,7 @@ def comparar_subcausas(subcausas_q1, subcausas_q2):
 # ==============================================================================
 
 def analizar_causas_raiz(resultado_parte6, resultado_parte5, df_player, config, 
-                          generar_subcausas_ia=False, verbose=True):
+                          generar_subcausas_ia=False, verbose=True, indice_menciones=None):
     """
     Analiza causas raíz de cada motivo del waterfall.
     
@@ -342,6 +165,9 @@ def analizar_causas_raiz(resultado_parte6, resultado_parte5, df_player, config,
         config: Diccionario de configuración
         generar_subcausas_ia: Si True, genera prompts para intervención de Cursor
         verbose: Si True, imprime información
+        indice_menciones: índice de la matriz de menciones del site (opcional,
+            matriz_menciones_competidores()['indice']); la detección de
+            competidores por motivo reutiliza su escaneo
     
     Returns:
         dict: Diccionario con causas_raiz_data, prompts_subcausas
@@ -371,7 +197,7 @@ def analizar_causas_raiz(resultado_parte6, resultado_parte5, df_player, config,
     
     # Crear columna MOTIVO_CATEGORIA
     if 'MOTIVO_IA' in df_comentarios.columns:
-        df_comentarios['MOTIVO_CATEGORIA'] = df_comentarios['MOTIVO_IA'].apply(mapear_motivo_categoria)
+        df_comentarios['MOTIVO_CATEGORIA'] = map_categories(df_comentarios['MOTIVO_IA'], sin_match=CATEGORIA_OTRO)
         if verbose:
             print(f"✅ Columna MOTIVO_CATEGORIA creada")
     
@@ -387,6 +213,10 @@ def analizar_causas_raiz(resultado_parte6, resultado_parte5, df_player, config,
     if verbose:
         print(f"✅ Columna de comentarios: {col_comentario}")
     
+    # Índice de comentarios (motivo × quarter × clase NPS): se tokeniza una sola vez
+    indice = indice_desde_dataframe(df_comentarios, col_comentario, col_motivo='MOTIVO_CATEGORIA',
+                                    col_ola=col_ola, col_nps=col_nps, min_largo=10)
+    
     # Calcular NPS por quarter
     df_q1 = df_player[df_player[col_ola] == q_ant]
     df_q2 = df_player[df_player[col_ola] == q_act]
@@ -433,44 +263,30 @@ def analizar_causas_raiz(resultado_parte6, resultado_parte5, df_player, config,
             print(f"\n{emoji} {motivo}")
             print(f"   Cambio: {delta:+.1f}pp ({impacto_ant:.1f}% → {impacto_act:.1f}%)")
         
-        # Filtrar comentarios por motivo y quarter
-        if 'MOTIVO_CATEGORIA' in df_comentarios.columns:
-            df_motivo = df_comentarios[df_comentarios['MOTIVO_CATEGORIA'] == motivo]
-        else:
-            df_motivo = df_comentarios[df_comentarios['MOTIVO_IA'].apply(mapear_motivo_categoria) == motivo]
-        
-        df_motivo_q1 = df_motivo[df_motivo[col_ola] == q_ant]
-        df_motivo_q2 = df_motivo[df_motivo[col_ola] == q_act]
-        
-        # Extraer comentarios
-        comms_q1 = []
-        comms_q2 = []
-        
-        if col_comentario:
-            comms_q1 = df_motivo_q1[col_comentario].dropna().astype(str).tolist()
-            comms_q1 = [c for c in comms_q1 if len(c) > 10]
-            
-            comms_q2 = df_motivo_q2[col_comentario].dropna().astype(str).tolist()
-            comms_q2 = [c for c in comms_q2 if len(c) > 10]
+        # Comentarios del motivo por quarter (selecciones sobre el índice)
+        ids_q1 = seleccion(indice, motivo=motivo, ola=q_ant)
+        ids_q2 = seleccion(indice, motivo=motivo, ola=q_act)
+        comms_q1 = comentarios_de(indice, ids_q1)
+        comms_q2 = comentarios_de(indice, ids_q2)
         
         if verbose:
             print(f"   📊 Comentarios: {len(comms_q1)} ({q_ant}) → {len(comms_q2)} ({q_act})")
         
         # Keywords
-        kw_q1 = extraer_keywords(comms_q1)
-        kw_q2 = extraer_keywords(comms_q2)
+        kw_q2 = top_keywords(indice, ids_q2)
         
         if verbose and kw_q2:
             top_kw = ', '.join(list(kw_q2.keys())[:5])
             print(f"   🔑 Keywords: {top_kw}")
         
         # Tendencias
-        tendencias = analizar_tendencias_q1_q2(kw_q1, kw_q2)
+        tendencias = tendencias_q1_q2(indice, ids_q1, ids_q2)
         if verbose and tendencias['nuevos_temas']:
             print(f"   🆕 Nuevos: {', '.join(tendencias['nuevos_temas'][:3])}")
         
         # Competidores mencionados
-        competidores_mencionados = detectar_competidores(comms_q2, COMPETIDORES, player)
+        competidores_mencionados = detectar_competidores(comms_q2, COMPETIDORES, player,
+                                                         indice=indice_menciones or indice)
         if verbose and competidores_mencionados:
             nombres = ', '.join([c['nombre'] for c in competidores_mencionados[:3]])
             print(f"   🏆 Mencionan: {nombres}")
@@ -497,7 +313,7 @@ def analizar_causas_raiz(resultado_parte6, resultado_parte5, df_player, config,
         # Ejemplos de comentarios
         ejemplos = []
         if comms_q2:
-            sample = random.sample(comms_q2, min(3, len(comms_q2)))
+            sample = random.Random(semilla_estable(motivo, q_act)).sample(comms_q2, min(3, len(comms_q2)))
             ejemplos = [normalizar_encoding(c)[:150] + '...' if len(c) > 150 else normalizar_encoding(c) for c in sample]
         
         resultado_motivo = {
@@ -554,7 +370,8 @@ def analizar_causas_raiz(resultado_parte6, resultado_parte5, df_player, config,
 # ==============================================================================
 
 def preparar_analisis_semantico(resultado_parte6, resultado_parte5, df_player, config,
-                                 max_comentarios_por_motivo=100, verbose=True):
+                                 presupuesto_tokens=PRESUPUESTO_TOKENS_MOTIVO, fragmentar=False,
+                                 verbose=True):
     """
     Prepara comentarios por motivo para análisis semántico con LLM.
     
@@ -567,13 +384,18 @@ def preparar_analisis_semantico(resultado_parte6, resultado_parte5, df_player, c
         resultado_parte5: Dict con df_final_categorizado
         df_player: DataFrame del player
         config: Dict de configuración
-        max_comentarios_por_motivo: Máximo de comentarios a incluir por motivo
+        presupuesto_tokens: Tokens (aprox.) de comentarios por motivo en el prompt.
+            Los casi duplicados se colapsan en un representante [×N] y los
+            grupos se muestrean ponderando por tamaño.
+        fragmentar: Si True, además escribe un prompt por motivo + manifest
+            (ver prompts_fragmentados.py) para analizarlos en paralelo.
         verbose: Si True, imprime info
     
     Returns:
         dict con:
             - prompt_path: path al archivo de prompt generado
             - datos_por_motivo: dict con comentarios preparados por motivo
+            - omitidos_no_significativos: motivos salteados por Δ no significativo
     """
     site = config['site']
     player = config['player']
@@ -590,7 +412,7 @@ def preparar_analisis_semantico(resultado_parte6, resultado_parte5, df_player, c
     df_comentarios = resultado_parte5['df_final_categorizado'].copy()
     
     if 'MOTIVO_IA' in df_comentarios.columns:
-        df_comentarios['MOTIVO_CATEGORIA'] = df_comentarios['MOTIVO_IA'].apply(mapear_motivo_categoria)
+        df_comentarios['MOTIVO_CATEGORIA'] = map_categories(df_comentarios['MOTIVO_IA'], sin_match=CATEGORIA_OTRO)
     
     # Detectar columna de comentarios
     col_comentario = None
@@ -611,6 +433,16 @@ def preparar_analisis_semantico(resultado_parte6, resultado_parte5, df_player, c
     df_wf = df_waterfall[~df_waterfall['Motivo'].isin(motivos_excluir)].copy()
     # Ordenar por impacto absoluto
     df_wf = df_wf.reindex(df_wf['Delta'].abs().sort_values(ascending=False).index)
+    # Motivos cuyo Δ no es significativo (ver significancia.py) no van al LLM;
+    # si ninguno lo es, queda el de mayor |Δ| para que el checkpoint tenga causas
+    omitidos = []
+    if 'Significativo' in df_wf.columns and len(df_wf):
+        significativo = df_wf['Significativo'].astype(bool).tolist()
+        significativo[0] = significativo[0] or not any(significativo)
+        omitidos = df_wf.loc[[not s for s in significativo], 'Motivo'].tolist()
+        df_wf = df_wf[significativo]
+        if verbose and omitidos:
+            print(f"   ⚪ Sin cambio significativo, se omiten: {', '.join(omitidos)}")
     
     # Preparar comentarios por motivo
     datos_por_motivo = {}
@@ -642,47 +474,88 @@ def preparar_analisis_semantico(resultado_parte6, resultado_parte5, df_player, c
                 print(f"   ⏭️  {motivo}: sin comentarios en {q_act}, skip")
             continue
         
-        # Limitar comentarios (solo Q2)
-        if len(comms_q2) > max_comentarios_por_motivo:
-            comms_q2 = random.sample(comms_q2, max_comentarios_por_motivo)
+        # Huella del input (reuso entre corridas) → también fija la semilla del muestreo
+        huella = huella_motivo(comms_q2, motivo, 'causas_raiz', comentarios_anterior=comms_q1,
+                               presupuesto_tokens=presupuesto_tokens)
+
+        # Colapsar casi duplicados y muestrear por presupuesto (solo Q2)
+        muestra = preparar_muestra_prompt(comms_q2, presupuesto_tokens, semilla=semilla_estable(huella))
+        # Temas candidatos locales (todos los comentarios de ambos quarters)
+        temas = agrupar_temas(comms_q2, comms_q1)
         
         datos_por_motivo[motivo] = {
             'delta': delta,
             'impacto_actual': impacto_act,
             'impacto_anterior': impacto_ant,
-            'comentarios_q2': comms_q2,
+            'comentarios_q2': muestra['comentarios'],
+            'pesos_q2': muestra['pesos'],
+            'comentarios_q2_cubiertos': muestra['cubiertos'],
             'comentarios_q1_count': len(comms_q1),
             'comentarios_q2_count': len(comms_q2),
+            'temas_candidatos': temas,
+            'huella': huella,
         }
         
         if verbose:
             emoji = "🔥" if delta > 0 else "✅"
-            print(f"   {emoji} {motivo}: {delta:+.1f}pp, {len(comms_q2)} comentarios")
-    
-    # Generar prompt
-    prompt = _generar_prompt_semantico(datos_por_motivo, player, site, q_ant, q_act)
-    
-    # Guardar prompt - carpeta prompts/ en la raíz del proyecto
-    script_dir = Path(__file__).resolve().parent
-    prompts_dir = script_dir.parent / 'prompts'
-    prompts_dir.mkdir(exist_ok=True)
-    prompt_filename = f'prompt_causas_raiz_{player}_{site}_{q_act}.txt'
-    prompt_path = prompts_dir / prompt_filename
-    
-    with open(prompt_path, 'w', encoding='utf-8') as f:
-        f.write(prompt)
-    
-    if verbose:
-        print(f"\n   ✅ Prompt generado: {prompt_path}")
-        print(f"   📋 {len(datos_por_motivo)} motivos con comentarios para analizar")
+            print(f"   {emoji} {motivo}: {delta:+.1f}pp, {len(comms_q2)} comentarios → "
+                  f"{len(muestra['comentarios'])} de {muestra['grupos']} grupos (~{muestra['tokens']} tokens)")
+    
+    # Reuso incremental: solo se piden al LLM los motivos nuevos o cuya huella cambió
+    sincronizacion = sincronizar_motivos(datos_por_motivo, player, site, q_act, promotores=False)
+    pendientes = {m: datos_por_motivo[m] for m in sincronizacion['pendientes']}
+    if verbose and sincronizacion['reutilizados']:
+        print(f"\n   ♻️  {len(sincronizacion['reutilizados'])} motivos reutilizados (huella sin cambios), "
+              f"{len(pendientes)} pendientes")
+    if verbose and sincronizacion['json_final']:
+        print(f"   ✅ JSON semántico armado desde el almacén: {sincronizacion['json_final']}")
+
+    # Generar prompt (solo motivos pendientes)
+    prompt_path = None
+    if pendientes:
+        prompt = _generar_prompt_semantico(pendientes, player, site, q_ant, q_act)
+
+        # Guardar prompt - carpeta prompts/ en la raíz del proyecto
+        script_dir = Path(__file__).resolve().parent
+        prompts_dir = script_dir.parent / 'prompts'
+        prompts_dir.mkdir(exist_ok=True)
+        prompt_filename = f'prompt_causas_raiz_{player}_{site}_{q_act}.txt'
+        prompt_path = prompts_dir / prompt_filename
+
+        with open(prompt_path, 'w', encoding='utf-8') as f:
+            f.write(prompt)
+        registrar_pedido({m: d['huella'] for m, d in pendientes.items()}, player, site, q_act, promotores=False)
+
+        if verbose:
+            print(f"\n   ✅ Prompt generado: {prompt_path}")
+            print(f"   📋 {len(pendientes)} motivos con comentarios para analizar")
+    
+    # Respaldo local (temas pre-agrupados) con el esquema del JSON semántico
+    fallback_path = guardar_causas_clusters(datos_por_motivo, player, site, q_act, promotores=False)
+    if verbose and fallback_path:
+        print(f"   🧩 Temas locales de respaldo: {fallback_path}")
+
+    # Un prompt por motivo + manifest (modo fragmentado)
+    manifest_path = None
+    if fragmentar and pendientes:
+        manifest_path = escribir_fragmentos(pendientes, _generar_prompt_semantico, player, site, q_ant, q_act,
+                                            promotores=False, reutilizados=sincronizacion['reutilizados'],
+                                            huellas=sincronizacion['huellas'])
+        if verbose:
+            print(f"   🧱 {len(pendientes)} fragmentos + manifest: {manifest_path}")
     
     return {
-        'prompt_path': str(prompt_path),
+        'prompt_path': str(prompt_path) if prompt_path else None,
         'datos_por_motivo': datos_por_motivo,
+        'fallback_path': fallback_path,
+        'manifest_path': manifest_path,
+        'reutilizados': list(sincronizacion['reutilizados']),
+        'pendientes': sincronizacion['pendientes'],
+        'omitidos_no_significativos': omitidos,
     }
 
 
-def _generar_prompt_semantico(datos_por_motivo, player, site, q_ant, q_act):
+def _generar_prompt_semantico(datos_por_motivo, player, site, q_ant, q_act, destino=None):
     """Genera el prompt estructurado para análisis semántico de causas raíz."""
     
     prompt = f"""
@@ -705,6 +578,12 @@ Para cada motivo:
 5. **Calcular frecuencia** de cada causa (% y cantidad)
 6. **Seleccionar 2-3 ejemplos** representativos
 
+Cuando un motivo trae **Temas candidatos**, son grupos armados localmente por
+términos (TF-IDF + NMF): úsalos como punto de partida, no como respuesta.
+
+Los comentarios marcados con **[×N]** representan N comentarios casi idénticos
+agrupados: pondéralos por N al calcular frecuencias.
+
 ## Formato de salida REQUERIDO
 
 Responde ÚNICAMENTE con un JSON válido:
@@ -751,6 +630,9 @@ Responde ÚNICAMENTE con un JSON válido:
         imp_ant = datos['impacto_anterior']
         imp_act = datos['impacto_actual']
         comentarios = datos['comentarios_q2']
+        pesos = datos.get('pesos_q2')
+        bloque_temas = formatear_temas_prompt(datos.get('temas_candidatos'), q_ant, q_act)
+        cubiertos = datos.get('comentarios_q2_cubiertos', len(comentarios))
         
         emoji = "🔥" if delta > 0 else "✅"
         direccion = "EMPEORÓ" if delta > 0 else "MEJORÓ"
@@ -760,22 +642,20 @@ Responde ÚNICAMENTE con un JSON válido:
 
 **Impacto:** {imp_ant:.1f}% → {imp_act:.1f}% | **Comentarios:** {n_q1} ({q_ant}) → {n_q2} ({q_act})
 
-**Comentarios {q_act}:**
+{bloque_temas}**Comentarios {q_act}** (muestra: {len(comentarios)} grupos que cubren {cubiertos} de {n_q2}):
 
 """
-        for i, c in enumerate(comentarios, 1):
-            c_limpio = c[:250] + '...' if len(c) > 250 else c
-            prompt += f'{i}. "{c_limpio}"\n\n'
+        prompt += formatear_comentarios_prompt(comentarios, pesos)
         
         prompt += "\n" + "=" * 80 + "\n"
     
-    output_filename = f'causas_raiz_semantico_{player}_{site}_{q_act}.json'
+    destino = destino or f'data/causas_raiz_semantico_{player}_{site}_{q_act}.json'
     
     prompt += f"""
 ## 📝 INSTRUCCIONES FINALES
 
 1. **Guardar el archivo** usando Write tool:
-   - **Path:** `data/{output_filename}`
+   - **Path:** `{destino}`
 2. **Confirmar** que se guardó correctamente
 
 IMPORTANTE:
@@ -837,7 +717,7 @@ def exportar_comentarios_para_cursor(resultado_parte6, resultado_parte5, df_play
     
     # Crear columna MOTIVO_CATEGORIA
     if 'MOTIVO_IA' in df_comentarios.columns:
-        df_comentarios['MOTIVO_CATEGORIA'] = df_comentarios['MOTIVO_IA'].apply(mapear_motivo_categoria)
+        df_comentarios['MOTIVO_CATEGORIA'] = map_categories(df_comentarios['MOTIVO_IA'], sin_match=CATEGORIA_OTRO)
     
     # Motivos a analizar
     motivos_excluir = ['Sin opinión', 'Não uso ou sem opinião', 'No uso o sin opinión', 'Otro', 'Otros', 'Outros']
@@ -863,7 +743,7 @@ def exportar_comentarios_para_cursor(resultado_parte6, resultado_parte5, df_play
                 
                 # Limitar cantidad
                 if len(comms) > max_comentarios:
-                    comms = random.sample(comms, max_comentarios)
+                    comms = random.Random(semilla_estable(motivo, q)).sample(comms, max_comentarios)
                 
                 comentarios_motivo[key] = comms
         
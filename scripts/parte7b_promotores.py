@@ -12,41 +12,20 @@ Uso:
     resultado = analizar_promotores(df_player, config)
 """
 
-import pandas as pd
-import random
 import re
-from collections import Counter
+from functools import lru_cache
 from pathlib import Path
 
-# ==============================================================================
-# COMPETIDORES POR SITE
-# ==============================================================================
+import numpy as np
+import pandas as pd
 
-COMPETIDORES_POR_SITE = {
-    'MLB': [
-        'nubank', 'nu bank', 'roxinho', 'inter', 'banco inter', 'c6', 'c6 bank',
-        'picpay', 'pic pay', 'pagbank', 'pagseguro', 'next', 'bradesco',
-        'itaú', 'itau', 'iti', 'santander', 'caixa', 'bb', 'banco do brasil',
-        'neon', 'original', 'will bank', 'will', 'ame', 'ame digital'
-    ],
-    'MLA': [
-        'ualá', 'uala', 'naranja x', 'naranja', 'brubank', 'bru bank',
-        'galicia', 'santander', 'bbva', 'macro', 'icbc', 'hsbc',
-        'banco nación', 'banco nacion', 'provincia', 'ciudad',
-        'reba', 'personal pay', 'modo', 'cuenta dni', 'dni'
-    ],
-    'MLM': [
-        'nubank', 'nu', 'stori', 'klar', 'rappi', 'rappicard',
-        'bbva', 'bancomer', 'santander', 'banorte', 'citibanamex', 'banamex',
-        'hsbc', 'scotiabank', 'hey banco', 'hey', 'albo', 'fondeadora',
-        'spin', 'oxxo', 'flink'
-    ],
-    'MLC': [
-        'mach', 'tenpo', 'fintual', 'racional', 'bice', 'banco estado',
-        'santander', 'bci', 'scotiabank', 'itaú', 'falabella',
-        'banco chile', 'security', 'ripley', 'cencosud'
-    ]
-}
+from casi_duplicados import PRESUPUESTO_TOKENS_MOTIVO, preparar_muestra_prompt, formatear_comentarios_prompt
+from clusters_comentarios import agrupar_temas, formatear_temas_prompt, guardar_causas_clusters
+from prompts_fragmentados import escribir_fragmentos
+from reuso_semantico import huella_motivo, semilla_estable, sincronizar_motivos, registrar_pedido
+from indice_comentarios import construir_indice_comentarios, top_keywords, compilar_keywords, presencia_keywords
+from menciones_competidores import COMPETIDORES_POR_SITE, detectar_competidores
+from significancia import es_significativo, prueba_delta, se_proporcion
 
 # ==============================================================================
 # CATEGORÍAS DE SATISFACCIÓN (POSITIVAS)
@@ -134,63 +113,85 @@ def clasificar_motivo_positivo(comentario, categorias):
     return 'Otros positivos'
 
 
-def extraer_keywords(comentarios_list, top_n=15):
-    """Extrae keywords más frecuentes"""
-    stopwords_pt = {'de', 'a', 'o', 'que', 'e', 'do', 'da', 'em', 'um', 'para', 'é', 'com',
-                    'não', 'uma', 'os', 'no', 'se', 'na', 'por', 'mais', 'as', 'dos', 'como',
-                    'mas', 'foi', 'ao', 'ele', 'das', 'tem', 'à', 'seu', 'sua', 'ou', 'ser'}
-    stopwords_es = {'de', 'la', 'que', 'el', 'en', 'y', 'a', 'los', 'del', 'se', 'las', 'por',
-                    'un', 'para', 'con', 'no', 'una', 'su', 'al', 'es', 'lo', 'como', 'más',
-                    'pero', 'sus', 'le', 'ya', 'o', 'fue', 'este', 'ha', 'sí', 'porque'}
-    stopwords = stopwords_pt | stopwords_es | {'usar', 'usa', 'uso', 'ter', 'fazer', 'muy', 'bien', 'mal'}
-    
-    if not comentarios_list:
-        return {}
-    
-    texto = normalizar_encoding(' '.join(comentarios_list).lower())
-    palabras = re.findall(r'\b[a-záéíóúãõàâêôçñü]{4,}\b', texto)
-    palabras_filtradas = [p for p in palabras if p not in stopwords]
-    
-    return dict(Counter(palabras_filtradas).most_common(top_n))
+# Misma corrección de encoding (en minúsculas) que clasificar_motivo_positivo, en el mismo orden
+_REEMPLAZOS_CLASIFICACION = [('ã§', 'ç'), ('ã£', 'ã'), ('ã©', 'é'), ('ã³', 'ó'), ('ã­', 'í'), ('ãº', 'ú')]
+
+
+def _corregir_minusculas(texto):
+    """Texto en minúsculas con el encoding corregido, como lo ve clasificar_motivo_positivo."""
+    texto = texto.lower()
+    for mal, bien in _REEMPLAZOS_CLASIFICACION:
+        texto = texto.replace(mal, bien)
+    return texto
+
+
+@lru_cache(maxsize=None)
+def _compilar_categorias(categorias_items):
+    """
+    Compila las keywords de todas las categorías en un único regex-trie
+    (indice_comentarios.compilar_keywords).
+
+    Args:
+        categorias_items: tuple de (categoría, tuple de keywords)
+
+    Returns:
+        tuple: (regex compilado o None, dict keyword → columna, dict keyword →
+                columnas de las keywords que son prefijo suyo, matriz keyword ×
+                categoría con las veces que la keyword figura en cada categoría)
+    """
+    regex, columnas, prefijos = compilar_keywords(kw for _, keywords in categorias_items for kw in keywords)
+    pertenece = np.zeros((len(columnas), len(categorias_items)), dtype=np.int32)
+    for j, (_, keywords) in enumerate(categorias_items):
+        for kw in keywords:
+            pertenece[columnas[kw], j] += 1
+    return regex, columnas, prefijos, pertenece
+
 
+def clasificar_motivos_positivos(comentarios, categorias):
+    """
+    Versión vectorizada de clasificar_motivo_positivo para una Serie entera.
+
+    Cada texto único se escanea una vez con el regex-trie de todas las keywords;
+    los hits (texto, keyword) se reducen a una matriz texto × categoría con la
+    cantidad de keywords presentes y la categoría es su argmax (empate → la
+    primera del dict, igual que max() sobre el dict de scores).
 
-def detectar_competidores(comentarios_list, competidores, player_actual):
-    """Detecta menciones de competidores"""
+    Returns:
+        pd.Series con la categoría de cada comentario (mismo índice)
+    """
+    comentarios = pd.Series(comentarios)
+    codigos, unicos = pd.factorize(comentarios)
+    crudos = [str(u) for u in np.asarray(unicos, dtype=object)]
+    sin_especificar = np.fromiter((c.strip() in ('', '.', 'nan') for c in crudos), dtype=bool, count=len(crudos))
+    textos = [_corregir_minusculas(c) for c in crudos]
+
+    nombres = list(categorias)
+    regex, columnas, prefijos, pertenece = _compilar_categorias(
+        tuple((c, tuple(kws)) for c, kws in categorias.items()))
+    scores = presencia_keywords(textos, regex, columnas, prefijos).astype(np.int32) @ pertenece
+
+    # Sin hits: 'General positivo' si tiene ≤ 3 palabras, si no 'Otros positivos'
+    con_hits = (scores > 0).any(axis=1)
+    etiquetas = np.full(len(textos), 'Otros positivos', dtype=object)
+    if con_hits.any():
+        etiquetas[con_hits] = np.array(nombres, dtype=object)[scores[con_hits].argmax(axis=1)]
+    for i in np.flatnonzero(~con_hits):
+        if len(textos[i].split()) <= 3:
+            etiquetas[i] = 'General positivo'
+    etiquetas[sin_especificar] = 'Sin especificar'
+
+    resultado = np.full(len(codigos), 'Sin especificar', dtype=object)
+    validos = codigos >= 0
+    resultado[validos] = etiquetas[codigos[validos]]
+    return pd.Series(resultado, index=comentarios.index)
+
+
+def extraer_keywords(comentarios_list, top_n=15):
+    """Extrae keywords más frecuentes (perfil 'causas' del índice compartido)"""
     if not comentarios_list:
-        return []
-    
-    menciones = {}
-    texto_lower = ' '.join(comentarios_list).lower()
-    total_comentarios = len(comentarios_list)
-    
-    competidores_encontrados = set()
-    for comp in competidores:
-        if comp.lower() in player_actual.lower():
-            continue
-        
-        count = len(re.findall(r'\b' + re.escape(comp) + r'\b', texto_lower))
-        if count > 0:
-            nombre = comp.title()
-            if 'nubank' in comp or 'roxinho' in comp:
-                nombre = 'Nubank'
-            elif 'inter' in comp:
-                nombre = 'Banco Inter'
-            elif 'c6' in comp:
-                nombre = 'C6 Bank'
-            elif 'ualá' in comp or 'uala' in comp:
-                nombre = 'Ualá'
-            elif 'naranja' in comp:
-                nombre = 'Naranja X'
-            
-            if nombre not in competidores_encontrados:
-                competidores_encontrados.add(nombre)
-                menciones[nombre] = {
-                    'menciones': count,
-                    'porcentaje': round((count / total_comentarios) * 100, 1)
-                }
-    
-    return sorted([{'nombre': k, **v} for k, v in menciones.items()],
-                  key=lambda x: x['menciones'], reverse=True)
+        return {}
+    indice = construir_indice_comentarios(comentarios_list)
+    return top_keywords(indice, indice['doc_texto'], top_n=top_n)
 
 
 def calcular_distribucion(df_q):
@@ -324,8 +325,8 @@ def analizar_promotores(df_player, config, verbose=True):
         if es_texto_libre:
             if verbose:
                 print(f"   🔄 Detectado como TEXTO LIBRE → Clasificando automáticamente...")
-            df_promotores['MOTIVO_SATISFACCION'] = df_promotores[col_motivo_fuente].apply(
-                lambda x: clasificar_motivo_positivo(x, CATEGORIAS)
+            df_promotores['MOTIVO_SATISFACCION'] = clasificar_motivos_positivos(
+                df_promotores[col_motivo_fuente], CATEGORIAS
             )
             if verbose:
                 n_categorias = df_promotores['MOTIVO_SATISFACCION'].nunique()
@@ -377,6 +378,15 @@ def analizar_promotores(df_player, config, verbose=True):
             'count_q2': count_q2
         })
     
+    # z del Δ de share de cada motivo (dos proporciones independientes, todos los motivos a la vez)
+    if motivos_con_delta:
+        pct_1 = np.array([m['pct_q1'] for m in motivos_con_delta], dtype=float)
+        pct_2 = np.array([m['pct_q2'] for m in motivos_con_delta], dtype=float)
+        prueba = prueba_delta(pct_2 - pct_1, se_proporcion(pct_1, len(df_q1)), se_proporcion(pct_2, len(df_q2)))
+        for m, z, sig in zip(motivos_con_delta, prueba['z'], prueba['significativo']):
+            m['z'] = float(z)
+            m['significativo'] = bool(sig)
+    
     motivos_con_delta.sort(key=lambda x: x['pct_q2'], reverse=True)
     
     if verbose:
@@ -522,7 +532,8 @@ def exportar_comentarios_promotores(resultado_7b, config, max_comentarios=20, ve
 # ==============================================================================
 
 def preparar_analisis_semantico_promotores(resultado_7b, df_player, config,
-                                            max_comentarios_por_motivo=100, verbose=True):
+                                            presupuesto_tokens=PRESUPUESTO_TOKENS_MOTIVO, fragmentar=False,
+                                            verbose=True):
     """
     Prepara comentarios de promotores por motivo para análisis semántico con LLM.
 
@@ -533,13 +544,18 @@ def preparar_analisis_semantico_promotores(resultado_7b, df_player, config,
         resultado_7b: Dict con resultado de analizar_promotores()
         df_player: DataFrame del player
         config: Dict de configuración
-        max_comentarios_por_motivo: Máximo de comentarios a incluir por motivo
+        presupuesto_tokens: Tokens (aprox.) de comentarios por motivo en el prompt.
+            Los casi duplicados se colapsan en un representante [×N] y los
+            grupos se muestrean ponderando por tamaño.
+        fragmentar: Si True, además escribe un prompt por motivo + manifest
+            (ver prompts_fragmentados.py) para analizarlos en paralelo.
         verbose: Si True, imprime info
 
     Returns:
         dict con:
             - prompt_path: path al archivo de prompt generado
             - datos_por_motivo: dict con comentarios preparados por motivo
+            - omitidos_no_significativos: motivos salteados por Δ no significativo
     """
     site = config['site']
     player = config['player']
@@ -593,6 +609,14 @@ def preparar_analisis_semantico_promotores(resultado_7b, df_player, config,
 
     # Ordenar por delta descendente (mejores mejoras primero)
     promotores_ordenados = sorted(promotores_data, key=lambda x: x.get('delta', 0), reverse=True)
+    # Motivos con Δ no significativo (ver significancia.py) no van al LLM;
+    # si ninguno lo es, se conserva el de mayor Δ
+    significativos = [m for m in promotores_ordenados if es_significativo(m)] or \
+        [m for m in promotores_ordenados if m.get('motivo', '') not in motivos_excluir][:1]
+    omitidos = [m.get('motivo', '') for m in promotores_ordenados if m not in significativos]
+    promotores_ordenados = significativos
+    if verbose and omitidos:
+        print(f"   ⚪ Sin cambio significativo, se omiten: {', '.join(str(m) for m in omitidos)}")
 
     for motivo_data in promotores_ordenados:
         motivo = motivo_data.get('motivo', '')
@@ -623,52 +647,93 @@ def preparar_analisis_semantico_promotores(resultado_7b, df_player, config,
                 print(f"   ⏭️  {motivo}: muy pocos comentarios en {q_act}, skip")
             continue
 
-        # Limitar comentarios (solo Q2)
-        if len(comms_q2) > max_comentarios_por_motivo:
-            comms_q2 = random.sample(comms_q2, max_comentarios_por_motivo)
+        # Huella del input (reuso entre corridas) → también fija la semilla del muestreo
+        huella = huella_motivo(comms_q2, motivo, 'promotores', comentarios_anterior=comms_q1,
+                               presupuesto_tokens=presupuesto_tokens)
+
+        # Colapsar casi duplicados y muestrear por presupuesto (solo Q2)
+        muestra = preparar_muestra_prompt(comms_q2, presupuesto_tokens, semilla=semilla_estable(huella))
+        # Temas candidatos locales (todos los comentarios de ambos quarters)
+        temas = agrupar_temas(comms_q2, comms_q1)
 
         datos_por_motivo[motivo] = {
             'delta': delta,
             'pct_actual': pct_q2,
             'pct_anterior': pct_q1,
-            'comentarios_q2': comms_q2,
+            'comentarios_q2': muestra['comentarios'],
+            'pesos_q2': muestra['pesos'],
+            'comentarios_q2_cubiertos': muestra['cubiertos'],
             'comentarios_q1_count': len(comms_q1),
             'comentarios_q2_count': len(comms_q2),
+            'temas_candidatos': temas,
+            'huella': huella,
         }
 
         if verbose:
             emoji = "🔥" if delta > 1 else "✅" if delta > 0 else "➡️"
-            print(f"   {emoji} {motivo}: {delta:+.1f}pp, {len(comms_q2)} comentarios")
+            print(f"   {emoji} {motivo}: {delta:+.1f}pp, {len(comms_q2)} comentarios → "
+                  f"{len(muestra['comentarios'])} de {muestra['grupos']} grupos (~{muestra['tokens']} tokens)")
 
     if not datos_por_motivo:
         if verbose:
             print("   ⚠️ No hay motivos con suficientes comentarios para analizar")
         return {'prompt_path': None, 'datos_por_motivo': {}}
 
-    # Generar prompt
-    prompt = _generar_prompt_semantico_promotores(datos_por_motivo, player, site, q_ant, q_act)
+    # Reuso incremental: solo se piden al LLM los motivos nuevos o cuya huella cambió
+    sincronizacion = sincronizar_motivos(datos_por_motivo, player, site, q_act, promotores=True)
+    pendientes = {m: datos_por_motivo[m] for m in sincronizacion['pendientes']}
+    if verbose and sincronizacion['reutilizados']:
+        print(f"\n   ♻️  {len(sincronizacion['reutilizados'])} motivos reutilizados (huella sin cambios), "
+              f"{len(pendientes)} pendientes")
+    if verbose and sincronizacion['json_final']:
+        print(f"   ✅ JSON semántico armado desde el almacén: {sincronizacion['json_final']}")
+
+    # Generar prompt (solo motivos pendientes)
+    prompt_path = None
+    if pendientes:
+        prompt = _generar_prompt_semantico_promotores(pendientes, player, site, q_ant, q_act)
+
+        # Guardar prompt - carpeta prompts/ en la raíz del proyecto
+        script_dir = Path(__file__).resolve().parent
+        prompts_dir = script_dir.parent / 'prompts'
+        prompts_dir.mkdir(exist_ok=True)
+        prompt_filename = f'prompt_promotores_{player}_{site}_{q_act}.txt'
+        prompt_path = prompts_dir / prompt_filename
+
+        with open(prompt_path, 'w', encoding='utf-8') as f:
+            f.write(prompt)
+        registrar_pedido({m: d['huella'] for m, d in pendientes.items()}, player, site, q_act, promotores=True)
 
-    # Guardar prompt - carpeta prompts/ en la raíz del proyecto
-    script_dir = Path(__file__).resolve().parent
-    prompts_dir = script_dir.parent / 'prompts'
-    prompts_dir.mkdir(exist_ok=True)
-    prompt_filename = f'prompt_promotores_{player}_{site}_{q_act}.txt'
-    prompt_path = prompts_dir / prompt_filename
-
-    with open(prompt_path, 'w', encoding='utf-8') as f:
-        f.write(prompt)
-
-    if verbose:
-        print(f"\n   ✅ Prompt generado: {prompt_path}")
-        print(f"   📋 {len(datos_por_motivo)} motivos con comentarios para analizar")
+        if verbose:
+            print(f"\n   ✅ Prompt generado: {prompt_path}")
+            print(f"   📋 {len(pendientes)} motivos con comentarios para analizar")
+
+    # Respaldo local (temas pre-agrupados) con el esquema del JSON semántico
+    fallback_path = guardar_causas_clusters(datos_por_motivo, player, site, q_act, promotores=True)
+    if verbose and fallback_path:
+        print(f"   🧩 Temas locales de respaldo: {fallback_path}")
+
+    # Un prompt por motivo + manifest (modo fragmentado)
+    manifest_path = None
+    if fragmentar and pendientes:
+        manifest_path = escribir_fragmentos(pendientes, _generar_prompt_semantico_promotores, player, site, q_ant, q_act,
+                                            promotores=True, reutilizados=sincronizacion['reutilizados'],
+                                            huellas=sincronizacion['huellas'])
+        if verbose:
+            print(f"   🧱 {len(pendientes)} fragmentos + manifest: {manifest_path}")
 
     return {
-        'prompt_path': str(prompt_path),
+        'prompt_path': str(prompt_path) if prompt_path else None,
         'datos_por_motivo': datos_por_motivo,
+        'fallback_path': fallback_path,
+        'manifest_path': manifest_path,
+        'reutilizados': list(sincronizacion['reutilizados']),
+        'pendientes': sincronizacion['pendientes'],
+        'omitidos_no_significativos': omitidos,
     }
 
 
-def _generar_prompt_semantico_promotores(datos_por_motivo, player, site, q_ant, q_act):
+def _generar_prompt_semantico_promotores(datos_por_motivo, player, site, q_ant, q_act, destino=None):
     """Genera el prompt estructurado para análisis semántico de causas de satisfacción."""
 
     prompt = f"""
@@ -691,6 +756,12 @@ Para cada motivo:
 5. **Calcular frecuencia** de cada causa (% y cantidad)
 6. **Seleccionar 2-3 ejemplos** representativos
 
+Cuando un motivo trae **Temas candidatos**, son grupos armados localmente por
+términos (TF-IDF + NMF): úsalos como punto de partida, no como respuesta.
+
+Los comentarios marcados con **[×N]** representan N comentarios casi idénticos
+agrupados: pondéralos por N al calcular frecuencias.
+
 ## Formato de salida REQUERIDO
 
 Responde ÚNICAMENTE con un JSON válido:
@@ -737,6 +808,9 @@ Responde ÚNICAMENTE con un JSON válido:
         pct_ant = datos['pct_anterior']
         pct_act = datos['pct_actual']
         comentarios = datos['comentarios_q2']
+        pesos = datos.get('pesos_q2')
+        bloque_temas = formatear_temas_prompt(datos.get('temas_candidatos'), q_ant, q_act)
+        cubiertos = datos.get('comentarios_q2_cubiertos', len(comentarios))
 
         emoji = "🔥" if delta > 1 else "✅" if delta > 0 else "➡️"
         direccion = "SUBIÓ" if delta > 0 else "BAJÓ" if delta < 0 else "ESTABLE"
@@ -746,22 +820,20 @@ Responde ÚNICAMENTE con un JSON válido:
 
 **Proporción:** {pct_ant:.1f}% → {pct_act:.1f}% | **Comentarios:** {n_q1} ({q_ant}) → {n_q2} ({q_act})
 
-**Comentarios {q_act}:**
+{bloque_temas}**Comentarios {q_act}** (muestra: {len(comentarios)} grupos que cubren {cubiertos} de {n_q2}):
 
 """
-        for i, c in enumerate(comentarios, 1):
-            c_limpio = c[:250] + '...' if len(c) > 250 else c
-            prompt += f'{i}. "{c_limpio}"\n\n'
+        prompt += formatear_comentarios_prompt(comentarios, pesos)
 
         prompt += "\n" + "=" * 80 + "\n"
 
-    output_filename = f'promotores_semantico_{player}_{site}_{q_act}.json'
+    destino = destino or f'data/causas_raiz_semantico_promotores_{player}_{site}_{q_act}.json'
 
     prompt += f"""
 ## 📝 INSTRUCCIONES FINALES
 
 1. **Guardar el archivo** usando Write tool:
-   - **Path:** `data/{output_filename}`
+   - **Path:** `{destino}`
 2. **Confirmar** que se guardó correctamente
 
 IMPORTANTE:
@@ -790,6 +862,24 @@ if __name__ == "__main__":
     print("🧪 PRUEBA PARTE 7B: ANÁLISIS DE PROMOTORES")
     print("=" * 70)
     
+    # Paridad: clasificar_motivos_positivos (vectorizada) == clasificar_motivo_positivo fila a fila
+    print("\nTest: paridad de la clasificación vectorizada de motivos positivos")
+    casos = [
+        None, '', '.', 'nan', '   ', float('nan'), 'ok', 'muy bueno todo', 'Ótimo!',
+        'App fácil e rápido atendimento', 'rÃ¡pido atendimento e seguranÃ§a', 'RÁPIDO ATENDIMENTO',
+        'tarjeta sin comisión y gratis, me gusta', 'sem anuidade, taxa baixa e cashback no pix',
+        'confiança na marca, confiável e seguro', 'el pago por qr y la transferencia spei',
+        'rinde más que el ahorro en el banco y la inversión es simple',
+        'nada que comentar sobre esta empresa en particular', 'limite alto no cartão de crédito',
+        'fácil fácil fácil', 'bom', 'Excelente atención, resolver rápido', 123, 'pontos e vantagem',
+    ]
+    for site_test, categorias_test in CATEGORIAS_POSITIVAS.items():
+        esperado = [clasificar_motivo_positivo(c, categorias_test) for c in casos]
+        obtenido = clasificar_motivos_positivos(pd.Series(casos, dtype=object), categorias_test).tolist()
+        diferencias = [(c, e, o) for c, e, o in zip(casos, esperado, obtenido) if e != o]
+        assert not diferencias, f"{site_test}: {diferencias}"
+    print(f"PASS: {len(casos)} comentarios × {len(CATEGORIAS_POSITIVAS)} sites")
+    
     try:
         # Cargar datos
         resultado_carga = cargar_datos(verbose=False)
@@ -15,6 +15,8 @@ Uso:
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from decodificacion_respuestas import decodificar
+from significancia import significancia_productos
 
 # ==============================================================================
 # CONFIGURACIÓN MULTISITE - PATRONES DE COLUMNAS DE PRODUCTOS
@@ -235,27 +237,194 @@ NOMBRES_DISPLAY_MLC = {
 }
 
 # ==============================================================================
-# FUNCIONES AUXILIARES
+# MOTOR MATRICIAL (TODOS LOS PLAYERS Y QUARTERS DEL SITE)
 # ==============================================================================
 
-def fix_encoding_str(s):
-    """Corrige caracteres con encoding corrupto."""
-    if not isinstance(s, str):
-        return s
-    return (s
-        .replace('\ufeff', '')
-        .replace('Ã§', 'ç').replace('Ã£', 'ã').replace('Ãµ', 'õ')
-        .replace('Ã¡', 'á').replace('Ã©', 'é').replace('Ã­', 'í')
-        .replace('Ã³', 'ó').replace('Ãº', 'ú').replace('Ãª', 'ê')
-        .replace('Ã', 'à').replace('Ã§Ã', 'çõ').replace('Ã§Ã£', 'ção')
+def binarizar_productos(df, product_cols, huella=None):
+    """
+    Matrices uint8 (filas × productos) de usuarios y no usuarios de cada USO_*.
+
+    Misma conversión que el notebook: si la columna es texto o tiene valores
+    Sí/No, usa = str(x).strip() ∈ VALORES_SI y no_usa = 1 - usa (NaN → no usa);
+    si no (numérica sin 0/1), usa = (x == 1) y no_usa = (x == 0). Cada valor
+    distinto se decodifica una vez (decodificador 'si_no').
+
+    Returns:
+        tuple: (usa, no_usa) np.ndarray uint8 de forma (len(df), len(product_cols))
+    """
+    usa = np.zeros((len(df), len(product_cols)), dtype=np.uint8)
+    no_usa = np.zeros_like(usa)
+    for j, col in enumerate(product_cols):
+        serie = df[col]
+        si_no = decodificar(serie, 'si_no', huella=huella)
+        if serie.dtype == 'object' or si_no.notna().any():
+            usa[:, j] = (si_no == 1).to_numpy()
+            no_usa[:, j] = 1 - usa[:, j]
+        else:
+            usa[:, j] = (serie == 1).to_numpy()
+            no_usa[:, j] = (serie == 0).to_numpy()
+    return usa, no_usa
+
+
+def metricas_productos_site(df_completo, product_cols, col_nps='NPS', col_marca='MARCA', col_periodo='OLA',
+                            huella=None):
+    """
+    Share, NPS de usuarios / no usuarios y lift de cada producto para todos
+    los players × quarters del site en una pasada.
+
+    Por cada grupo MARCA × OLA: usa.T @ [1, nps, nps válido, nps²] y lo mismo
+    con no_usa (productos × 4), de donde salen conteos, sumas de NPS y share
+    (Σ nps² queda para el error estándar, ver significancia.py).
+    Mismos criterios que el cálculo por player: NPS con NaN fuera del
+    promedio, 0 si el producto no tiene usuarios (o no usuarios).
+
+    Returns:
+        dict con:
+            - productos: DataFrame indexado por (MARCA, OLA, producto) con
+              usuarios, share, nps_usuario, nps_no_usuario, lift, los
+              conteos con NPS válido (validos_usuario, validos_no_usuario)
+              y Σ nps² (cuadrados_usuario, cuadrados_no_usuario)
+            - grupos: DataFrame indexado por (MARCA, OLA) con total, validos y nps_global
+    """
+    usa, no_usa = binarizar_productos(df_completo, product_cols, huella=huella)
+    nps = decodificar(df_completo[col_nps], 'nps', huella=huella).to_numpy(dtype=float)
+    valido = ~np.isnan(nps)
+    nps_valido = np.where(valido, nps, 0.0)
+    pesos = np.column_stack([np.ones(len(nps)), nps_valido, valido, nps_valido ** 2])
+
+    # Filas ordenadas por grupo MARCA × OLA (sin claves vacías, como los filtros por == player / == q)
+    cod_marca, marcas = pd.factorize(df_completo[col_marca], sort=True)
+    cod_ola, olas = pd.factorize(df_completo[col_periodo], sort=True)
+    con_clave = (cod_marca >= 0) & (cod_ola >= 0)
+    grupo_fila = cod_marca * len(olas) + cod_ola
+    presentes, grupo = np.unique(grupo_fila[con_clave], return_inverse=True)
+    grupos = pd.MultiIndex.from_arrays([marcas[presentes // len(olas)], olas[presentes % len(olas)]])
+    orden = np.argsort(grupo, kind='stable')
+    filas = np.flatnonzero(con_clave)[orden]
+    cortes = np.searchsorted(grupo[orden], np.arange(len(grupos) + 1))
+
+    # (grupos × productos × [filas, Σ nps, n válidos, Σ nps²]) para usuarios y no usuarios
+    sumas_usa = np.zeros((len(grupos), len(product_cols), 4))
+    sumas_no_usa = np.zeros_like(sumas_usa)
+    sumas_grupo = np.zeros((len(grupos), 4))
+    for g in range(len(grupos)):
+        rango = filas[cortes[g]:cortes[g + 1]]
+        w = pesos[rango]
+        sumas_usa[g] = usa[rango].T @ w
+        sumas_no_usa[g] = no_usa[rango].T @ w
+        sumas_grupo[g] = w.sum(axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total = sumas_grupo[:, 0]
+        share = sumas_usa[:, :, 0] / total[:, None] * 100
+        nps_usuario = np.where(sumas_usa[:, :, 0] > 0, sumas_usa[:, :, 1] / sumas_usa[:, :, 2] * 100, 0.0)
+        nps_no_usuario = np.where(sumas_no_usa[:, :, 0] > 0,
+                                  sumas_no_usa[:, :, 1] / sumas_no_usa[:, :, 2] * 100, 0.0)
+        nps_global = sumas_grupo[:, 1] / sumas_grupo[:, 2] * 100
+
+    indice = pd.MultiIndex.from_arrays([
+        np.repeat(grupos.get_level_values(0), len(product_cols)),
+        np.repeat(grupos.get_level_values(1), len(product_cols)),
+        np.tile(np.asarray(product_cols, dtype=object), len(grupos)),
+    ], names=[col_marca, col_periodo, 'producto'])
+    productos = pd.DataFrame({
+        'usuarios': sumas_usa[:, :, 0].ravel(),
+        'share': share.ravel(),
+        'nps_usuario': nps_usuario.ravel(),
+        'nps_no_usuario': nps_no_usuario.ravel(),
+        'lift': (nps_usuario - nps_no_usuario).ravel(),
+        'validos_usuario': sumas_usa[:, :, 2].ravel(),
+        'validos_no_usuario': sumas_no_usa[:, :, 2].ravel(),
+        'cuadrados_usuario': sumas_usa[:, :, 3].ravel(),
+        'cuadrados_no_usuario': sumas_no_usa[:, :, 3].ravel(),
+    }, index=indice)
+    grupos_df = pd.DataFrame({'total': total.astype(int), 'validos': sumas_grupo[:, 2].astype(int),
+                              'nps_global': nps_global},
+                             index=grupos.set_names([col_marca, col_periodo]))
+    return {'productos': productos, 'grupos': grupos_df}
+
+
+def resumen_productos_site(metricas, mapeo_productos, site, q1, q2):
+    """
+    Tabla resumen (share, NPS usuario / no usuario, lift, efectos) de TODOS
+    los players con datos en q1 y q2. La tabla de analizar_productos es el
+    slice de un player (mismos redondeos, en el mismo orden).
+
+    Returns:
+        DataFrame con columna MARCA + columnas de la tabla por player (sin filtrar)
+    """
+    lbl_producto = 'Produto' if site == 'MLB' else 'Producto'
+    lbl_nps_usuario = 'NPS Usuário' if site == 'MLB' else 'NPS Usuario'
+    lbl_nps_no_usuario = 'NPS No Usuário' if site == 'MLB' else 'NPS No Usuario'
+
+    productos = metricas['productos']
+    grupos = metricas['grupos']
+    marcas = [m for m in grupos.index.get_level_values(0).unique()
+              if (m, q1) in grupos.index and (m, q2) in grupos.index]
+    cols = list(mapeo_productos)
+    if not marcas:
+        return pd.DataFrame()
+
+    # productos está en orden grupo × producto: fila del grupo (m, q) = posición en grupos
+    n_productos = len(productos) // len(grupos)
+    orden_cols = pd.Index(productos.index.get_level_values(2)[:n_productos]).get_indexer(cols)
+
+    def _valores(q, campo):
+        pos = grupos.index.get_indexer([(m, q) for m in marcas])
+        return productos[campo].to_numpy().reshape(len(grupos), n_productos)[pos][:, orden_cols].ravel()
+
+    summary = pd.DataFrame({
+        'MARCA': np.repeat(marcas, len(cols)),
+        lbl_producto: [mapeo_productos[col] for col in cols] * len(marcas),
+        f'Share {q1}': _valores(q1, 'share'),
+        f'Share {q2}': _valores(q2, 'share'),
+        f'{lbl_nps_usuario} {q1}': _valores(q1, 'nps_usuario'),
+        f'{lbl_nps_usuario} {q2}': _valores(q2, 'nps_usuario'),
+        f'{lbl_nps_no_usuario} {q1}': _valores(q1, 'nps_no_usuario'),
+        f'{lbl_nps_no_usuario} {q2}': _valores(q2, 'nps_no_usuario'),
+        f'Lift {q1}': _valores(q1, 'lift'),
+        f'Lift {q2}': _valores(q2, 'lift'),
+    })
+
+    # Redondear
+    for col in summary.columns:
+        if col not in ('MARCA', lbl_producto):
+            summary[col] = summary[col].round(1)
+
+    # Calcular deltas
+    summary['Δ Share'] = (summary[f'Share {q2}'] - summary[f'Share {q1}']).round(1)
+    summary[f'Δ {lbl_nps_usuario}'] = (summary[f'{lbl_nps_usuario} {q2}'] - summary[f'{lbl_nps_usuario} {q1}']).round(1)
+    summary['Δ Lift'] = (summary[f'Lift {q2}'] - summary[f'Lift {q1}']).round(1)
+
+    # Efectos (método con lift)
+    # Mix Effect = Δ Share × Lift / 100
+    summary['Mix Effect'] = (summary['Δ Share'] * summary[f'Lift {q2}'] / 100).round(2)
+    # NPS Effect = Share Q2 × Δ NPS Usuario / 100
+    summary['NPS Effect'] = (summary[f'Share {q2}'] * summary[f'Δ {lbl_nps_usuario}'] / 100).round(2)
+    summary['Total Effect'] = (summary['Mix Effect'] + summary['NPS Effect']).round(2)
+    return summary
+
+
+def filtrar_productos_validos(summary, q2, lbl_producto):
+    """
+    Productos que entran al análisis: share en q2 entre 2% y 95% y nombre
+    fuera de NOMBRES_INVALIDOS, ordenados por share en q2.
+    """
+    mask_valido = (
+        (summary[f'Share {q2}'] >= 2.0) & 
+        (summary[f'Share {q2}'] < 95.0) &
+        (~summary[lbl_producto].str.lower().str.contains('|'.join(NOMBRES_INVALIDOS), na=False, regex=True))
     )
+    
+    summary_filtrado = summary[mask_valido].copy()
+    return summary_filtrado.sort_values(f'Share {q2}', ascending=False).reset_index(drop=True)
 
 
 # ==============================================================================
 # FUNCIÓN PRINCIPAL
 # ==============================================================================
 
-def analizar_productos(df_completo, df_player, config, verbose=True):
+def analizar_productos(df_completo, df_player, config, verbose=True, historico=None):
     """
     Analiza el uso de productos y su impacto en el NPS.
     
@@ -264,9 +433,13 @@ def analizar_productos(df_completo, df_player, config, verbose=True):
         df_player: DataFrame filtrado por player
         config: Diccionario de configuración
         verbose: Si True, imprime información
+        historico: almacen_corridas.tendencia('productos', ...) (opcional). El
+            histórico de productos clave toma de ahí los quarters anteriores al
+            par actual y solo recalcula los que no tienen corrida guardada
     
     Returns:
         dict: Diccionario con tabla resumen y análisis de productos clave
+        (cada producto trae se_total_effect, z_total_effect y significativo)
     """
     
     site = config['site']
@@ -331,8 +504,8 @@ def analizar_productos(df_completo, df_player, config, verbose=True):
     # ═══════════════════════════════════════════════════════════════════════════
     
     # Filtrar df_completo por player
-    df_productos = df_completo[df_completo['MARCA'] == player].copy()
-    
+    df_productos = df_completo[df_completo['MARCA'] == player]
+
     # Seleccionar mapeo según site
     NOMBRES_DISPLAY_POR_SITE = {
         'MLM': NOMBRES_DISPLAY_MLM,
@@ -341,37 +514,29 @@ def analizar_productos(df_completo, df_player, config, verbose=True):
         'MLC': NOMBRES_DISPLAY_MLC,
     }
     nombres_display = NOMBRES_DISPLAY_POR_SITE.get(site, NOMBRES_DISPLAY_MLA)
-    
-    mapeo_productos = {}
-    VALORES_SI = ['Si', 'Sí', 'Sim', '1', 1, 'sim', 'SIM', 'SI', 'sí']
-    VALORES_NO = ['No', 'Não', 'NÃ£o', '0', 0, 'no', 'NO', 'não', 'NAO', ' ']
-    
+
     if verbose:
         print(f"📦 Usando columnas USO_* pre-mapeadas de {NOMBRE_PAIS}")
-    
-    for col in product_cols_raw:
-        nombre_display = nombres_display.get(col, col.replace('USO_', '').replace('_', ' ').title())
-        mapeo_productos[col] = nombre_display
-        
-        if col in df_productos.columns:
-            valores_unicos = df_productos[col].dropna().unique()
-            tiene_si_no = any(str(v).strip() in VALORES_SI + VALORES_NO for v in valores_unicos)
-            
-            if tiene_si_no or df_productos[col].dtype == 'object':
-                df_productos[col] = df_productos[col].apply(
-                    lambda x: 1 if str(x).strip() in VALORES_SI else 0
-                )
-    
+
+    mapeo_productos = {
+        col: nombres_display.get(col, col.replace('USO_', '').replace('_', ' ').title())
+        for col in product_cols_raw
+    }
     product_cols = list(mapeo_productos.keys())
-    
+
+    # Todo el site (players × quarters) en una pasada; el player es un slice
+    metricas_site = metricas_productos_site(df_completo, product_cols, col_nps=col_nps, col_periodo=col_periodo,
+                                            huella=config.get('huella_datos'))
+    productos_site = metricas_site['productos']
+    grupos_site = metricas_site['grupos']
+
     # Verificar conversión
-    convertidos = 0
-    for col in product_cols:
-        if col in df_productos.columns:
-            suma = df_productos[col].sum()
-            if suma > 0:
-                convertidos += 1
-    
+    if player in productos_site.index.get_level_values(0):
+        usuarios_player = productos_site.loc[player].groupby(level='producto')['usuarios'].sum()
+    else:
+        usuarios_player = pd.Series(dtype=float)
+    convertidos = int((usuarios_player > 0).sum())
+
     if verbose:
         print(f"✅ {convertidos} productos con datos (de {len(product_cols)} columnas)")
         print(f"✅ {len(product_cols)} productos convertidos a binario")
@@ -380,118 +545,61 @@ def analizar_productos(df_completo, df_player, config, verbose=True):
             print(f"   {i:2d}. {nombre}")
         if len(mapeo_productos) > 10:
             print(f"   ... y {len(mapeo_productos)-10} más\n")
-    
+
     # ═══════════════════════════════════════════════════════════════════════════
     # CALCULAR MÉTRICAS
     # ═══════════════════════════════════════════════════════════════════════════
-    
-    df_q1 = df_productos[df_productos[col_periodo] == q1].copy()
-    df_q2 = df_productos[df_productos[col_periodo] == q2].copy()
-    
-    total_q1 = len(df_q1)
-    total_q2 = len(df_q2)
-    
+
+    def _total(q):
+        return int(grupos_site['total'].get((player, q), 0))
+
+    total_q1 = _total(q1)
+    total_q2 = _total(q2)
+
     if verbose:
         print(f"📊 Registros por período:")
         print(f"   • {q1}: {total_q1:,} usuarios")
         print(f"   • {q2}: {total_q2:,} usuarios\n")
-    
+
     if total_q1 == 0 or total_q2 == 0:
         return {
             'summary': pd.DataFrame(),
             'productos_clave': [],
             'error': 'No hay datos suficientes para comparar períodos'
         }
-    
-    # Share (% que usa cada producto)
-    share_q1 = {}
-    share_q2 = {}
-    nps_users_q1 = {}
-    nps_users_q2 = {}
-    nps_nousers_q1 = {}
-    nps_nousers_q2 = {}
-    
-    for col in product_cols:
-        if col not in df_q1.columns or col not in df_q2.columns:
-            continue
-        
-        # Share
-        share_q1[col] = df_q1[col].sum() / total_q1 * 100 if total_q1 > 0 else 0
-        share_q2[col] = df_q2[col].sum() / total_q2 * 100 if total_q2 > 0 else 0
-        
-        # NPS usuarios Q1
-        users_q1 = df_q1[df_q1[col] == 1][col_nps].mean() * 100 if (df_q1[col] == 1).any() else 0
-        nousers_q1 = df_q1[df_q1[col] == 0][col_nps].mean() * 100 if (df_q1[col] == 0).any() else 0
-        nps_users_q1[col] = users_q1
-        nps_nousers_q1[col] = nousers_q1
-        
-        # NPS usuarios Q2
-        users_q2 = df_q2[df_q2[col] == 1][col_nps].mean() * 100 if (df_q2[col] == 1).any() else 0
-        nousers_q2 = df_q2[df_q2[col] == 0][col_nps].mean() * 100 if (df_q2[col] == 0).any() else 0
-        nps_users_q2[col] = users_q2
-        nps_nousers_q2[col] = nousers_q2
-    
+
     # ═══════════════════════════════════════════════════════════════════════════
-    # CONSTRUIR TABLA FINAL
+    # CONSTRUIR TABLA FINAL (slice del player en la tabla del site)
     # ═══════════════════════════════════════════════════════════════════════════
-    
+
     lbl_producto = 'Produto' if site == 'MLB' else 'Producto'
     lbl_nps_usuario = 'NPS Usuário' if site == 'MLB' else 'NPS Usuario'
-    lbl_nps_no_usuario = 'NPS No Usuário' if site == 'MLB' else 'NPS No Usuario'
-    
-    valid_cols = [col for col in product_cols if col in share_q1]
-    
-    summary = pd.DataFrame({
-        lbl_producto: [mapeo_productos[col] for col in valid_cols],
-        f'Share {q1}': [share_q1[col] for col in valid_cols],
-        f'Share {q2}': [share_q2[col] for col in valid_cols],
-        f'{lbl_nps_usuario} {q1}': [nps_users_q1[col] for col in valid_cols],
-        f'{lbl_nps_usuario} {q2}': [nps_users_q2[col] for col in valid_cols],
-        f'{lbl_nps_no_usuario} {q1}': [nps_nousers_q1[col] for col in valid_cols],
-        f'{lbl_nps_no_usuario} {q2}': [nps_nousers_q2[col] for col in valid_cols],
-        f'Lift {q1}': [nps_users_q1[col] - nps_nousers_q1[col] for col in valid_cols],
-        f'Lift {q2}': [nps_users_q2[col] - nps_nousers_q2[col] for col in valid_cols],
-    })
-    
-    # Redondear
-    for col in summary.columns:
-        if col != lbl_producto:
-            summary[col] = summary[col].round(1)
-    
-    # Calcular deltas
-    summary['Δ Share'] = (summary[f'Share {q2}'] - summary[f'Share {q1}']).round(1)
-    summary[f'Δ {lbl_nps_usuario}'] = (summary[f'{lbl_nps_usuario} {q2}'] - summary[f'{lbl_nps_usuario} {q1}']).round(1)
-    summary['Δ Lift'] = (summary[f'Lift {q2}'] - summary[f'Lift {q1}']).round(1)
-    
-    # ═══════════════════════════════════════════════════════════════════════════
-    # CALCULAR EFECTOS (MÉTODO CON LIFT)
-    # ═══════════════════════════════════════════════════════════════════════════
-    
-    # Mix Effect = Δ Share × Lift / 100
-    summary['Mix Effect'] = (summary['Δ Share'] * summary[f'Lift {q2}'] / 100).round(2)
-    
-    # NPS Effect = Share Q2 × Δ NPS Usuario / 100
-    summary['NPS Effect'] = (summary[f'Share {q2}'] * summary[f'Δ {lbl_nps_usuario}'] / 100).round(2)
-    
-    # Total Effect
-    summary['Total Effect'] = (summary['Mix Effect'] + summary['NPS Effect']).round(2)
-    
+
+    summary_site = resumen_productos_site(metricas_site, mapeo_productos, site, q1, q2)
+    summary = summary_site[summary_site['MARCA'] == player].drop(columns='MARCA').reset_index(drop=True)
+
+    # SE / z del efecto total de cada producto (todas las marcas en una pasada; el player es un slice)
+    significancia_site = significancia_productos(metricas_site, q1, q2)
+    columna_de = {nombre: col for col, nombre in reversed(list(mapeo_productos.items()))}
+
+    def _significancia(nombre):
+        clave = (player, columna_de.get(nombre))
+        if clave not in significancia_site.index:
+            return {'se_total_effect': None, 'z_total_effect': None, 'significativo': None}
+        fila = significancia_site.loc[clave]
+        return {'se_total_effect': round(float(fila['se_total_effect']), 2),
+                'z_total_effect': round(float(fila['z_total_effect']), 2),
+                'significativo': bool(fila['significativo'])}
+
     # Filtrar productos válidos
-    mask_valido = (
-        (summary[f'Share {q2}'] >= 2.0) & 
-        (summary[f'Share {q2}'] < 95.0) &
-        (~summary[lbl_producto].str.lower().str.contains('|'.join(NOMBRES_INVALIDOS), na=False, regex=True))
-    )
-    
-    summary_filtrado = summary[mask_valido].copy()
-    summary_filtrado = summary_filtrado.sort_values(f'Share {q2}', ascending=False).reset_index(drop=True)
+    summary_filtrado = filtrar_productos_validos(summary, q2, lbl_producto)
     
     # ═══════════════════════════════════════════════════════════════════════════
     # VALIDACIÓN NPS GLOBAL
     # ═══════════════════════════════════════════════════════════════════════════
     
-    nps_q1_global = df_q1[col_nps].mean() * 100 if len(df_q1) > 0 else 0
-    nps_q2_global = df_q2[col_nps].mean() * 100 if len(df_q2) > 0 else 0
+    nps_q1_global = grupos_site.loc[(player, q1), 'nps_global']
+    nps_q2_global = grupos_site.loc[(player, q2), 'nps_global']
     delta_nps_global = nps_q2_global - nps_q1_global
     
     suma_mix = summary_filtrado['Mix Effect'].sum()
@@ -561,7 +669,8 @@ def analizar_productos(df_completo, df_player, config, verbose=True):
                     'delta_lift': row['Δ Lift'],
                     'mix_effect': row['Mix Effect'],
                     'nps_effect': row['NPS Effect'],
-                    'total_effect': row['Total Effect']
+                    'total_effect': row['Total Effect'],
+                    **_significancia(row[lbl_producto])
                 }
                 break
     
@@ -577,6 +686,14 @@ def analizar_productos(df_completo, df_player, config, verbose=True):
         print(f"   Quarters disponibles: {olas_disponibles}")
         print(f"   Últimos 5Q: {ultimos_5q}")
     
+    # (producto, quarter) → (share, NPS usuario) de corridas anteriores al par actual
+    almacenados = {}
+    if historico is not None and len(historico):
+        previos = historico[~historico['q_act'].isin([q1, q2])
+                            & historico['share_act'].notna() & historico['nps_usuario_act'].notna()]
+        almacenados = {(r.producto, r.q_act): (float(r.share_act), float(r.nps_usuario_act))
+                       for r in previos.itertuples(index=False)}
+    
     for clave, prod_info in productos_clave_encontrados.items():
         # Find the original USO_ column for this product
         col_uso = None
@@ -590,23 +707,21 @@ def analizar_productos(df_completo, df_player, config, verbose=True):
         historico_nps = []
         historico_quarters = []
         
-        if col_uso and col_uso in df_productos.columns:
-            for q in ultimos_5q:
-                df_q = df_productos[df_productos[col_periodo] == q]
-                total_q = len(df_q)
-                if total_q == 0:
-                    continue
-                
+        for q in ultimos_5q:
+            if (nombre_orig, str(q)) in almacenados:
+                share, nps_u = almacenados[(nombre_orig, str(q))]
+            elif col_uso and _total(q) != 0:
                 # Share = % de usuarios que usan el producto
-                share = df_q[col_uso].sum() / total_q * 100 if total_q > 0 else 0
-                
                 # NPS usuario = NPS promedio de quienes usan el producto
-                usuarios = df_q[df_q[col_uso] == 1]
-                nps_u = usuarios[col_nps].mean() * 100 if len(usuarios) > 0 else 0
-                
-                historico_quarters.append(str(q))
-                historico_share.append(round(share, 1))
-                historico_nps.append(round(nps_u, 1))
+                fila = productos_site.loc[(player, q, col_uso)]
+                share = fila['share']
+                nps_u = fila['nps_usuario']
+            else:
+                continue
+            
+            historico_quarters.append(str(q))
+            historico_share.append(round(share, 1))
+            historico_nps.append(round(nps_u, 1))
         
         prod_info['historico'] = {
             'quarters': historico_quarters,
@@ -673,7 +788,9 @@ def analizar_productos(df_completo, df_player, config, verbose=True):
             print(f"   │ Mix Effect:  {data['mix_effect']:+.2f}pp  (Δ Share × Lift)")
             print(f"   │ NPS Effect:  {data['nps_effect']:+.2f}pp  (Share × Δ NPS Usuario)")
             print(f"   │ ═══════════════════════════════════")
-            print(f"   │ TOTAL:       {data['total_effect']:+.2f}pp")
+            z_txt = f"  (z {data['z_total_effect']:+.1f}{'' if data['significativo'] else ', no significativo'})" \
+                if data['z_total_effect'] is not None else ''
+            print(f"   │ TOTAL:       {data['total_effect']:+.2f}pp{z_txt}")
             print(f"   └─────────────────────────────────────────────────────────")
             print(f"   📝 {explicacion}")
     
@@ -731,11 +848,16 @@ def analizar_productos(df_completo, df_player, config, verbose=True):
             'delta_lift': row['Δ Lift'],
             'mix_effect': row['Mix Effect'],
             'nps_effect': row['NPS Effect'],
-            'total_effect': row['Total Effect']
+            'total_effect': row['Total Effect'],
+            **_significancia(row[lbl_producto])
         })
     
     return {
         'summary': summary_filtrado,
+        'summary_site': summary_site,
+        'metricas_site': metricas_site,
+        'significancia_site': significancia_site,
+        'mapeo_productos': mapeo_productos,
         'productos_clave': analisis_productos_clave,
         'productos_todos': productos_todos,  # TODOS los productos
         'nps_q1_global': nps_q1_global,
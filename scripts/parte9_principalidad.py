@@ -14,35 +14,11 @@ Uso:
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import io
-import base64
 from pathlib import Path
-
-# ==============================================================================
-# FUNCIÓN PARA CORREGIR ENCODING
-# ==============================================================================
-
-def fix_encoding_text(text):
-    """Corrige caracteres con encoding corrupto (común en CSVs latinos)."""
-    if not isinstance(text, str):
-        return str(text) if text is not None else ''
-    
-    # Mapeo de caracteres corruptos a correctos
-    replacements = {
-        'Ã§': 'ç', 'Ã£': 'ã', 'Ãµ': 'õ', 'Ã¡': 'á', 'Ã©': 'é',
-        'Ã­': 'í', 'Ã³': 'ó', 'Ãº': 'ú', 'Ãª': 'ê', 'Ã\xa0': 'à',
-        'Ã¢': 'â', 'Ã´': 'ô', 'Ã±': 'ñ', 'Ã¼': 'ü',
-        'Ã‰': 'É', 'Ã"': 'Ó', 'Ã\x81': 'Á', 'Ãš': 'Ú',
-        'ÃŠ': 'Ê', 'Ã\x91': 'Ñ', 'Ãœ': 'Ü',
-        '\ufeff': '',
-    }
-    
-    result = text
-    for old, new in replacements.items():
-        result = result.replace(old, new)
-    
-    return result
+from utils_graficos import usar_png, valores_json, fig_a_base64
+from decodificacion_respuestas import decodificar, flag_principal, fix_encoding_text
+from agregados_site import agregados_persistidos
+from utils_quarters import quarters_historico
 
 # ==============================================================================
 # CONFIGURACIÓN MULTISITE
@@ -129,6 +105,37 @@ VALORES_PRINCIPAL_EXACTOS = ['sí', 'si', 'sim', 'yes', '1', 'true', 'principal'
 VALORES_NO_PRINCIPAL = ['no', 'não', 'no principal', 'não principal', '0', 'false', 'n']
 
 
+# ==============================================================================
+# AGREGADOS DEL SITE (TODAS LAS MARCAS Y QUARTERS)
+# ==============================================================================
+
+def agregados_principalidad_site(df_completo, col_flag, col_motivo=None, col_marca='MARCA', col_periodo='OLA'):
+    """
+    Conteos de principalidad de todas las marcas × quarters del site.
+
+    Cada player solo filtra estos conteos (top players + últimos 5 quarters):
+    la detección del valor principal, los % y los motivos salen de acá.
+
+    Returns:
+        dict con:
+            - conteos: DataFrame (OLA, MARCA, FLAG, n) con NaN como un valor más de FLAG
+            - motivos: DataFrame (OLA, MARCA, FLAG, Motivo, n) o None sin columna de motivos
+    """
+    flag = df_completo[col_flag].rename('FLAG')
+    conteos = df_completo.groupby(
+        [df_completo[col_periodo], df_completo[col_marca], flag], dropna=False
+    ).size().reset_index(name='n')
+
+    motivos = None
+    if col_motivo:
+        motivos = df_completo.groupby(
+            [df_completo[col_periodo], df_completo[col_marca], flag, df_completo[col_motivo].rename('Motivo')],
+            dropna=False
+        ).size().reset_index(name='n')
+
+    return {'conteos': conteos, 'motivos': motivos}
+
+
 # ==============================================================================
 # FUNCIÓN PRINCIPAL
 # ==============================================================================
@@ -202,12 +209,13 @@ def analizar_principalidad(df_completo, config, verbose=True):
     # Quarters dinámicos
     olas_disponibles = sorted(df_completo[col_periodo].unique())
     
+    n_historico = quarters_historico(config)
     if q_act in olas_disponibles:
         idx_final = olas_disponibles.index(q_act)
-        idx_inicio = max(0, idx_final - 4)
+        idx_inicio = max(0, idx_final - (n_historico - 1))
         ultimos_5q = olas_disponibles[idx_inicio:idx_final + 1]
     else:
-        ultimos_5q = olas_disponibles[-5:] if len(olas_disponibles) >= 5 else olas_disponibles
+        ultimos_5q = olas_disponibles[-n_historico:]
     
     if verbose:
         print(f"\n🎯 Analizando: {', '.join(TOP_PLAYERS[:3])}, ...")
@@ -215,17 +223,55 @@ def analizar_principalidad(df_completo, config, verbose=True):
         print(f"📊 Base: {len(df_completo):,} registros")
         print(f"🏷️ Columna FLAG: {col_flag}\n")
     
+    # ═══════════════════════════════════════════════════════════════════════════
+    # DETECTAR COLUMNA DE MOTIVOS
+    # ═══════════════════════════════════════════════════════════════════════════
+    
+    col_motivo = None
+    columnas_directas = COLUMNAS_MOTIVO_DIRECTO.get(site, [])
+    
+    if verbose:
+        print(f"\n🔍 Buscando columna de motivos principalidad...")
+    
+    for col_directa in columnas_directas:
+        if col_directa in df_completo.columns:
+            col_motivo = col_directa
+            if verbose:
+                print(f"   ✅ Columna de motivos: '{col_motivo[:60]}...'")
+            break
+    
+    if not col_motivo:
+        keywords_motivo = ['elegiste', 'escolheu', 'motivo_princip', 'motivo princip', 'por qué', 'por que']
+        for c in df_completo.columns:
+            c_lower = c.lower()
+            for kw in keywords_motivo:
+                if kw in c_lower and ('principal' in c_lower or 'motivo' in c_lower):
+                    col_motivo = c
+                    if verbose:
+                        print(f"   ✅ Columna de motivos (keyword): '{col_motivo[:60]}...'")
+                    break
+            if col_motivo:
+                break
+    
+    # ═══════════════════════════════════════════════════════════════════════════
+    # AGREGADOS DEL SITE (TODAS LAS MARCAS, SE CALCULAN UNA VEZ)
+    # ═══════════════════════════════════════════════════════════════════════════
+    
+    agregados = agregados_persistidos(
+        'principalidad', site, config.get('huella_datos'), [len(df_completo), col_flag, col_motivo],
+        lambda: agregados_principalidad_site(df_completo, col_flag, col_motivo),
+        verbose=verbose
+    )
+    
     # ═══════════════════════════════════════════════════════════════════════════
     # CALCULAR % PRINCIPALIDAD
     # ═══════════════════════════════════════════════════════════════════════════
     
-    df_princ_top = df_completo[
-        (df_completo[col_marca].isin(TOP_PLAYERS)) &
-        (df_completo[col_periodo].isin(ultimos_5q))
-    ].copy()
+    conteos = agregados['conteos']
+    conteos = conteos[conteos[col_marca].isin(TOP_PLAYERS) & conteos[col_periodo].isin(ultimos_5q)]
     
     # Detectar valor de "Principal"
-    valores_flag = df_princ_top[col_flag].value_counts()
+    valores_flag = conteos.groupby('FLAG')['n'].sum().sort_values(ascending=False, kind='stable')
     
     if verbose:
         print(f"📋 Valores en {col_flag}:")
@@ -267,19 +313,17 @@ def analizar_principalidad(df_completo, config, verbose=True):
         }
     
     # Calcular base total por ola
-    base_total_ola = df_princ_top.groupby(col_periodo).size().reset_index(name='Base_Total')
-    
-    # Calcular principalidad por marca y período
-    def calc_principalidad(x):
-        return pd.Series({
-            'Total': len(x),
-            'Principales': (x[col_flag] == valor_principal).sum(),
-            '% Principalidad Marca': (x[col_flag] == valor_principal).sum() / len(x) * 100 if len(x) > 0 else 0
-        })
-    
-    principalidad_ola = df_princ_top.groupby([col_periodo, col_marca]).apply(
-        calc_principalidad, include_groups=False
-    ).reset_index()
+    base_total_ola = conteos.groupby(col_periodo)['n'].sum().reset_index(name='Base_Total')
+    
+    # Calcular principalidad por marca y período (conteos × flag 1/0 por valor distinto)
+    es_principal = decodificar(conteos['FLAG'], flag_principal(valor_principal)).to_numpy()
+    principalidad_ola = conteos.assign(_PRINCIPALES=conteos['n'] * es_principal).groupby(
+        [col_periodo, col_marca]
+    ).agg(Total=('n', 'sum'), Principales=('_PRINCIPALES', 'sum')).astype(float)
+    principalidad_ola['% Principalidad Marca'] = (
+        principalidad_ola['Principales'] / principalidad_ola['Total'] * 100
+    )
+    principalidad_ola = principalidad_ola.reset_index()
     
     principalidad_ola = principalidad_ola.merge(base_total_ola, on=col_periodo, how='left')
     principalidad_ola['% Principalidad'] = (
@@ -300,47 +344,25 @@ def analizar_principalidad(df_completo, config, verbose=True):
                 print(f"   • {marca}: {dato['% Principalidad Marca'].values[0]:.1f}%")
     
     # ═══════════════════════════════════════════════════════════════════════════
-    # BUSCAR MOTIVOS DE PRINCIPALIDAD
+    # MOTIVOS DE PRINCIPALIDAD
     # ═══════════════════════════════════════════════════════════════════════════
     
-    col_motivo = None
-    columnas_directas = COLUMNAS_MOTIVO_DIRECTO.get(site, [])
-    
-    if verbose:
-        print(f"\n🔍 Buscando columna de motivos principalidad...")
-    
-    for col_directa in columnas_directas:
-        if col_directa in df_completo.columns:
-            col_motivo = col_directa
-            if verbose:
-                print(f"   ✅ Columna de motivos: '{col_motivo[:60]}...'")
-            break
-    
-    if not col_motivo:
-        keywords_motivo = ['elegiste', 'escolheu', 'motivo_princip', 'motivo princip', 'por qué', 'por que']
-        for c in df_completo.columns:
-            c_lower = c.lower()
-            for kw in keywords_motivo:
-                if kw in c_lower and ('principal' in c_lower or 'motivo' in c_lower):
-                    col_motivo = c
-                    if verbose:
-                        print(f"   ✅ Columna de motivos (keyword): '{col_motivo[:60]}...'")
-                    break
-            if col_motivo:
-                break
-    
     motivos_final = pd.DataFrame()
     
     if col_motivo:
-        df_principales = df_princ_top[df_princ_top[col_flag] == valor_principal].copy()
+        motivos = agregados['motivos']
+        motivos = motivos[
+            motivos[col_marca].isin(TOP_PLAYERS) & motivos[col_periodo].isin(ultimos_5q) &
+            (motivos['FLAG'] == valor_principal)
+        ]
         
-        if len(df_principales) > 0:
+        if len(motivos) > 0:
             if verbose:
-                print(f"   📊 Registros principales: {len(df_principales):,}")
+                print(f"   📊 Registros principales: {motivos['n'].sum():,}")
             
             # Calcular motivos
-            motivos_principalidad = df_principales.groupby([col_periodo, col_marca, col_motivo]).size().reset_index(name='Cantidad')
-            totales_principales = df_principales.groupby([col_periodo, col_marca]).size().reset_index(name='Total_Principales')
+            motivos_principalidad = motivos.groupby([col_periodo, col_marca, 'Motivo'])['n'].sum().reset_index(name='Cantidad')
+            totales_principales = motivos.groupby([col_periodo, col_marca])['n'].sum().reset_index(name='Total_Principales')
             
             motivos_con_pct = motivos_principalidad.merge(totales_principales, on=[col_periodo, col_marca], how='left')
             motivos_con_pct['% Motivo'] = (motivos_con_pct['Cantidad'] / motivos_con_pct['Total_Principales'] * 100).round(1)
@@ -351,8 +373,7 @@ def analizar_principalidad(df_completo, config, verbose=True):
                 on=[col_periodo, col_marca], how='left'
             )
             motivos_final['% Ponderado Base'] = (motivos_final['% Motivo'] * motivos_final['% Principalidad Marca'] / 100).round(2)
-            motivos_final = motivos_final[motivos_final[col_motivo].notna() & (motivos_final[col_motivo].astype(str).str.strip() != '')]
-            motivos_final = motivos_final.rename(columns={col_motivo: 'Motivo'})
+            motivos_final = motivos_final[motivos_final['Motivo'].notna() & (motivos_final['Motivo'].astype(str).str.strip() != '')]
             
             if verbose:
                 print(f"   📊 Motivos únicos: {motivos_final['Motivo'].nunique()}")
@@ -411,6 +432,9 @@ def analizar_principalidad(df_completo, config, verbose=True):
     
     grafico_principalidad_base64 = None
     grafico_motivos_princ_base64 = None
+    grafico_principalidad_data = None
+    grafico_motivos_princ_data = None
+    modo_png = usar_png(config)
     
     # Paleta de colores para motivos
     PALETA_RESPALDO = ['#2ecc71', '#3498db', '#e74c3c', '#f39c12', '#9b59b6', '#1abc9c', '#e67e22', '#34495e']
@@ -431,6 +455,32 @@ def analizar_principalidad(df_completo, config, verbose=True):
     marcas_grafico = [m for m in TOP_PLAYERS if m in principalidad_grafico['MARCA'].unique()]
     
     if len(marcas_grafico) > 0:
+        # Datos compactos para Chart.js (modo 'js')
+        quarters_grafico = [q for q in ultimos_5q if q in set(principalidad_grafico[col_periodo])]
+        series = []
+        for marca in marcas_grafico:
+            datos_marca = principalidad_grafico[principalidad_grafico['MARCA'] == marca]
+            if len(datos_marca) > 0 and datos_marca['% Principalidad Marca'].sum() > 0:
+                valores = datos_marca.set_index(col_periodo)['% Principalidad Marca'].reindex(quarters_grafico)
+                series.append({
+                    'label': marca,
+                    'data': valores_json(valores),
+                    'color': COLORES_MARCAS.get(marca, '#95a5a6'),
+                    'destacada': marca == player
+                })
+        max_val = principalidad_ola['% Principalidad Marca'].max()
+        grafico_principalidad_data = {
+            'titulo': 'Evolución de Principalidad',
+            'labels': quarters_grafico,
+            'series': series,
+            'y_min': 0,
+            'y_max': round(float(max(max_val * 1.15, 10)), 1) if pd.notna(max_val) else 100,
+            'y_titulo': '% Principalidad'
+        }
+    
+    if modo_png and len(marcas_grafico) > 0:
+        import matplotlib.pyplot as plt
+        
         fig1, ax1 = plt.subplots(figsize=(12, 6), facecolor='white')
         ax1.set_facecolor('white')
         
@@ -464,12 +514,7 @@ def analizar_principalidad(df_completo, config, verbose=True):
         
         plt.tight_layout()
         
-        buf1 = io.BytesIO()
-        fig1.savefig(buf1, format='png', dpi=120, bbox_inches='tight', facecolor='white')
-        buf1.seek(0)
-        grafico_principalidad_base64 = base64.b64encode(buf1.read()).decode('utf-8')
-        buf1.close()
-        plt.close(fig1)
+        grafico_principalidad_base64 = fig_a_base64(fig1)
     
     # GRÁFICO 2: MOTIVOS DE PRINCIPALIDAD PONDERADOS (BARRAS APILADAS)
     # Usa % Ponderado Base = % Motivo × % Principalidad Marca / 100
@@ -508,6 +553,34 @@ def analizar_principalidad(df_completo, config, verbose=True):
                 if len(otros_cols) > 0:
                     df_plot['Otro'] = pivot_motivos[otros_cols].sum(axis=1)
                 
+                # Datos compactos para Chart.js (modo 'js')
+                princ_evol = datos_evol.set_index(col_periodo).reindex(df_plot.index)
+                total_barras = df_plot.sum(axis=1)
+                grafico_motivos_princ_data = {
+                    'titulo': f'{player} - Motivos de Principalidad (Ponderado)',
+                    'labels': [str(q) for q in df_plot.index],
+                    'barras': [
+                        {
+                            'label': fix_encoding_text(str(motivo)),
+                            'data': valores_json(df_plot[motivo], 2),
+                            'color': COLORES_MOTIVOS_PRINC.get(motivo, PALETA_RESPALDO[idx % len(PALETA_RESPALDO)])
+                        }
+                        for idx, motivo in enumerate(df_plot.columns)
+                    ],
+                    'linea': {
+                        'label': '% Principalidad',
+                        'data': valores_json(princ_evol['% Principalidad Marca']),
+                        'color': '#1e40af'
+                    } if '% Principalidad Marca' in princ_evol.columns else None,
+                    'umbral_etiqueta': 2,
+                    'y_max': round(float(max(total_barras.max() * 1.2, 40)), 1),
+                    'y2_max': 100,
+                    'y_titulo': '% sobre Base Total (ponderado)'
+                }
+            
+            if modo_png and len(pivot_motivos) > 0:
+                import matplotlib.pyplot as plt
+                
                 fig2, ax2 = plt.subplots(figsize=(12, 6), facecolor='white')
                 ax2.set_facecolor('white')
                 
@@ -560,12 +633,7 @@ def analizar_principalidad(df_completo, config, verbose=True):
                 
                 plt.tight_layout(rect=[0, 0, 0.85, 1])
                 
-                buf2 = io.BytesIO()
-                fig2.savefig(buf2, format='png', dpi=120, bbox_inches='tight', facecolor='white')
-                buf2.seek(0)
-                grafico_motivos_princ_base64 = base64.b64encode(buf2.read()).decode('utf-8')
-                buf2.close()
-                plt.close(fig2)
+                grafico_motivos_princ_base64 = fig_a_base64(fig2)
     
     return {
         'principalidad_por_ola': principalidad_ola,
@@ -581,7 +649,9 @@ def analizar_principalidad(df_completo, config, verbose=True):
         'valor_principal': valor_principal,
         'col_flag': col_flag,
         'grafico_principalidad_base64': grafico_principalidad_base64,
-        'grafico_motivos_princ_base64': grafico_motivos_princ_base64
+        'grafico_motivos_princ_base64': grafico_motivos_princ_base64,
+        'grafico_principalidad_data': grafico_principalidad_data,
+        'grafico_motivos_princ_data': grafico_motivos_princ_data
     }
 
 
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════════════
+PROMPTS SEMÁNTICOS FRAGMENTADOS (UN PROMPT POR MOTIVO) + MERGE VALIDADO
+═══════════════════════════════════════════════════════════════════════════════
+
+En vez de un único prompt con todos los motivos (y un único JSON que el
+checkpoint exige completo), escribe un fragmento por motivo con su propio JSON
+destino y un manifest. El agente puede analizar los fragmentos en paralelo;
+unir_fragmentos valida cada JSON contra el esquema y arma el archivo final
+causas_raiz_semantico[_promotores]_{player}_{site}_{q_act}.json.
+
+Estructura:
+    prompts/fragmentos/<base>/manifest.json
+    prompts/fragmentos/<base>/01_<motivo>.txt ...
+    data/fragmentos/<base>/<motivo>__<huella>.json ...     ← los escribe el agente
+
+El JSON de cada fragmento lleva la huella de los comentarios del motivo en el
+nombre: si los comentarios cambian, el JSON viejo no se confunde con el nuevo
+(se borra al reescribir el fragmento y el merge solo acepta el de la huella
+del manifest).
+
+Uso:
+    python scripts/prompts_fragmentados.py --manifest prompts/fragmentos/<base>/manifest.json
+    python scripts/prompts_fragmentados.py --manifest ... --unir
+"""
+
+import json
+import re
+import sys
+import unicodedata
+from pathlib import Path
+
+RAIZ_PROYECTO = Path(__file__).resolve().parent.parent
+
+# Campos obligatorios de cada causa y su tipo
+CAMPOS_CAUSA = {
+    'titulo': str,
+    'descripcion': str,
+    'frecuencia_pct': (int, float),
+    'frecuencia_abs': (int, float),
+    'ejemplos': list,
+}
+
+
+def nombre_base(player, site, q_act, promotores=False):
+    """Nombre del JSON semántico final (sin extensión), el mismo que busca el checkpoint."""
+    sufijo = '_promotores' if promotores else ''
+    return f'causas_raiz_semantico{sufijo}_{player}_{site}_{q_act}'
+
+
+def _slug(texto):
+    """Motivo → nombre de archivo ASCII ('Atención al cliente' → 'atencion_al_cliente')."""
+    ascii_ = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '_', ascii_.lower()).strip('_') or 'motivo'
+
+
+def nombre_json_fragmento(motivo, huella=None):
+    """'Tasas', 'ab12…' → 'tasas__ab12….json' (el slug nunca tiene '__')."""
+    return f'{_slug(motivo)}__{huella}.json' if huella else f'{_slug(motivo)}.json'
+
+
+def descartar_fragmentos_obsoletos(huellas, player, site, q_act, promotores=False, raiz=None):
+    """
+    Borra los JSON de fragmento de estos motivos que no corresponden a su
+    huella actual (de una huella anterior o del formato viejo NN_<motivo>.json).
+
+    Args:
+        huellas: {motivo: huella actual} de los motivos que se vuelven a pedir
+
+    Returns:
+        list de paths borrados
+    """
+    raiz = Path(raiz) if raiz else RAIZ_PROYECTO
+    dir_json = raiz / 'data' / 'fragmentos' / nombre_base(player, site, q_act, promotores)
+    if not dir_json.exists():
+        return []
+    borrados = []
+    for motivo, huella in huellas.items():
+        vigente = nombre_json_fragmento(motivo, huella)
+        patron = re.compile(rf'^(\d{{2}}_)?{re.escape(_slug(motivo))}(__[0-9a-f]+)?\.json$')
+        for path in dir_json.glob('*.json'):
+            if path.name != vigente and patron.match(path.name):
+                path.unlink()
+                borrados.append(str(path))
+    return borrados
+
+
+# ==============================================================================
+# ESCRITURA DE FRAGMENTOS + MANIFEST
+# ==============================================================================
+
+def escribir_fragmentos(datos_por_motivo, generar_prompt, player, site, q_ant, q_act,
+                        promotores=False, reutilizados=None, huellas=None, raiz=None):
+    """
+    Escribe un prompt por motivo y el manifest que los lista.
+
+    Args:
+        datos_por_motivo: mismo dict que arma preparar_analisis_semantico[_promotores]
+        generar_prompt: función (datos, player, site, q_ant, q_act, destino=...) → str
+            (_generar_prompt_semantico o _generar_prompt_semantico_promotores)
+        promotores: True para el análisis de promotores
+        reutilizados: {motivo: entrada} ya resueltos (reuso por huella); no llevan
+            fragmento y se suman tal cual al unir
+        huellas: {motivo: huella} de todos los motivos (van a metadata.huellas y
+            al nombre del JSON de cada fragmento)
+
+    Returns:
+        str: path del manifest
+    """
+    raiz = Path(raiz) if raiz else RAIZ_PROYECTO
+    base = nombre_base(player, site, q_act, promotores)
+    dir_prompts = raiz / 'prompts' / 'fragmentos' / base
+    dir_json = raiz / 'data' / 'fragmentos' / base
+    dir_prompts.mkdir(parents=True, exist_ok=True)
+    dir_json.mkdir(parents=True, exist_ok=True)
+
+    # Los prompts se regeneran completos; de los JSON del agente solo se
+    # conservan los de la huella actual de cada motivo
+    for viejo in dir_prompts.glob('*.txt'):
+        viejo.unlink()
+    huellas = huellas or {}
+    huellas_fragmentos = {m: huellas.get(m, d.get('huella')) for m, d in datos_por_motivo.items()}
+    descartar_fragmentos_obsoletos(huellas_fragmentos, player, site, q_act, promotores, raiz)
+
+    fragmentos = []
+    for i, (motivo, datos) in enumerate(datos_por_motivo.items(), 1):
+        json_path = dir_json / nombre_json_fragmento(motivo, huellas_fragmentos[motivo])
+        prompt_path = dir_prompts / f'{i:02d}_{_slug(motivo)}.txt'
+        destino = json_path.relative_to(raiz).as_posix()
+        prompt = generar_prompt({motivo: datos}, player, site, q_ant, q_act, destino=destino)
+        with open(prompt_path, 'w', encoding='utf-8') as f:
+            f.write(prompt)
+        fragmentos.append({
+            'motivo': motivo,
+            'prompt': prompt_path.relative_to(raiz).as_posix(),
+            'json': destino,
+            'huella': huellas_fragmentos[motivo],
+        })
+
+    manifest = {
+        'tipo': 'promotores' if promotores else 'causas_raiz',
+        'player': player,
+        'site': site,
+        'q_ant': q_ant,
+        'q_act': q_act,
+        'destino': f'data/{base}.json',
+        'fragmentos': fragmentos,
+        'reutilizados': reutilizados or {},
+        'huellas': huellas,
+    }
+    manifest_path = dir_prompts / 'manifest.json'
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return str(manifest_path)
+
+
+# ==============================================================================
+# VALIDACIÓN
+# ==============================================================================
+
+def validar_fragmento(data, motivo, player, site, q_act, huella=None):
+    """
+    Valida el JSON de un fragmento contra el esquema del análisis semántico.
+    Con huella, rechaza el JSON si declara otra (metadata.huella).
+
+    Returns:
+        list de errores (vacía si es válido)
+    """
+    if not isinstance(data, dict):
+        return ['el JSON no es un objeto']
+    errores = []
+    metadata = data.get('metadata', {}) or {}
+    for campo, esperado in (('player', player), ('site', site), ('quarter', q_act)):
+        if metadata.get(campo) and metadata[campo] != esperado:
+            errores.append(f"metadata.{campo} = '{metadata[campo]}' (esperado '{esperado}')")
+    if huella and metadata.get('huella') and metadata['huella'] != huella:
+        errores.append(f"metadata.huella = '{metadata['huella']}' (esperado '{huella}'): resultado de otros comentarios")
+
+    por_motivo = data.get('causas_por_motivo')
+    if not isinstance(por_motivo, dict) or motivo not in por_motivo:
+        return errores + [f"falta causas_por_motivo['{motivo}']"]
+    entrada = por_motivo[motivo]
+    if not isinstance(entrada, dict):
+        return errores + [f"causas_por_motivo['{motivo}'] no es un objeto"]
+
+    # Promotores: el prompt pide causas_satisfaccion, pero el HTML acepta ambas
+    causas = entrada.get('causas_raiz', entrada.get('causas_satisfaccion'))
+    if not isinstance(causas, list) or not causas:
+        return errores + ['falta la lista de causas (causas_raiz / causas_satisfaccion)']
+
+    for i, causa in enumerate(causas, 1):
+        if not isinstance(causa, dict):
+            errores.append(f'causa {i}: no es un objeto')
+            continue
+        for campo, tipo in CAMPOS_CAUSA.items():
+            valor = causa.get(campo)
+            if not isinstance(valor, tipo) or isinstance(valor, bool):
+                errores.append(f'causa {i}: {campo} falta o tiene tipo inválido')
+        if isinstance(causa.get('titulo'), str) and not causa['titulo'].strip():
+            errores.append(f'causa {i}: titulo vacío')
+        pct = causa.get('frecuencia_pct')
+        if isinstance(pct, (int, float)) and not 0 <= pct <= 100:
+            errores.append(f'causa {i}: frecuencia_pct fuera de [0, 100]')
+        if isinstance(causa.get('ejemplos'), list) and not all(isinstance(e, str) for e in causa['ejemplos']):
+            errores.append(f'causa {i}: ejemplos debe ser una lista de textos')
+    return errores
+
+
+def _leer_manifest(manifest_path):
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def estado_fragmentos(manifest_path):
+    """
+    Revisa qué fragmentos del manifest ya tienen un JSON válido.
+
+    Returns:
+        dict con total, completos (motivos), faltantes [{motivo, prompt, json}]
+        e invalidos [{motivo, json, errores}]
+    """
+    manifest = _leer_manifest(manifest_path)
+    raiz = Path(manifest_path).resolve().parents[3]
+    estado = {'total': len(manifest['fragmentos']), 'completos': [], 'faltantes': [], 'invalidos': []}
+    for frag in manifest['fragmentos']:
+        json_path = raiz / frag['json']
+        # Manifest con huella: el JSON tiene que ser el de esa huella (nombre y metadata)
+        if frag.get('huella') and json_path.name != nombre_json_fragmento(frag['motivo'], frag['huella']):
+            estado['invalidos'].append({'motivo': frag['motivo'], 'json': frag['json'],
+                                        'errores': [f"el JSON no corresponde a la huella {frag['huella']}"]})
+            continue
+        if not json_path.exists():
+            estado['faltantes'].append(frag)
+            continue
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            errores = validar_fragmento(data, frag['motivo'], manifest['player'], manifest['site'], manifest['q_act'],
+                                        huella=frag.get('huella'))
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            errores = [f'JSON ilegible: {e}']
+        if errores:
+            estado['invalidos'].append({'motivo': frag['motivo'], 'json': frag['json'], 'errores': errores})
+        else:
+            estado['completos'].append(frag['motivo'])
+    return estado
+
+
+# ==============================================================================
+# MERGE
+# ==============================================================================
+
+def unir_fragmentos(manifest_path, sobrescribir=False):
+    """
+    Si todos los fragmentos son válidos, arma el JSON semántico final.
+
+    Args:
+        sobrescribir: Si False y el JSON final ya existe, no lo toca (ok=True)
+
+    Returns:
+        dict con ok (bool), destino (path del JSON final o None) y estado
+        (ver estado_fragmentos; None si no hizo falta revisar)
+    """
+    manifest = _leer_manifest(manifest_path)
+    raiz = Path(manifest_path).resolve().parents[3]
+    destino = raiz / manifest['destino']
+    if destino.exists() and not sobrescribir:
+        return {'ok': True, 'destino': str(destino), 'estado': None}
+
+    estado = estado_fragmentos(manifest_path)
+    if estado['faltantes'] or estado['invalidos']:
+        return {'ok': False, 'destino': None, 'estado': estado}
+
+    causas_por_motivo = dict(manifest.get('reutilizados', {}))
+    for frag in manifest['fragmentos']:
+        with open(raiz / frag['json'], 'r', encoding='utf-8') as f:
+            causas_por_motivo[frag['motivo']] = json.load(f)['causas_por_motivo'][frag['motivo']]
+
+    final = {
+        'metadata': {
+            'player': manifest['player'],
+            'site': manifest['site'],
+            'quarter': manifest['q_act'],
+            'metodo': 'analisis_semantico_promotores' if manifest['tipo'] == 'promotores' else 'analisis_semantico',
+            'fragmentos': len(manifest['fragmentos']),
+            'huellas': manifest.get('huellas', {}),
+        },
+        'causas_por_motivo': causas_por_motivo,
+    }
+    with open(destino, 'w', encoding='utf-8') as f:
+        json.dump(final, f, ensure_ascii=False, indent=2)
+    return {'ok': True, 'destino': str(destino), 'estado': estado}
+
+
+def describir_estado(estado):
+    """Líneas legibles con los fragmentos pendientes (para el checkpoint)."""
+    lineas = [f"{len(estado['completos'])}/{estado['total']} fragmentos listos"]
+    for frag in estado['faltantes']:
+        lineas.append(f"FALTA   {frag['motivo']}: {frag['prompt']} → {frag['json']}")
+    for frag in estado['invalidos']:
+        lineas.append(f"INVÁLIDO {frag['motivo']} ({frag['json']}): {'; '.join(frag['errores'][:3])}")
+    return lineas
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Estado y merge de prompts semánticos fragmentados')
+    parser.add_argument('--manifest', required=True, help='Path al manifest.json de los fragmentos')
+    parser.add_argument('--unir', action='store_true', help='Armar el JSON final si todos los fragmentos son válidos')
+    args = parser.parse_args()
+
+    if args.unir:
+        resultado = unir_fragmentos(args.manifest, sobrescribir=True)
+        for linea in describir_estado(resultado['estado']):
+            print(f"   {linea}")
+        if resultado['ok']:
+            print(f"✅ JSON final: {resultado['destino']}")
+        else:
+            sys.exit(42)
+    else:
+        for linea in describir_estado(estado_fragmentos(args.manifest)):
+            print(f"   {linea}")
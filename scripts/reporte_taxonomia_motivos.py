@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════════════
+REPORTE DE CONSISTENCIA: TAXONOMÍA DE MOTIVOS
+═══════════════════════════════════════════════════════════════════════════════
+
+Antes de config_categorias.TAXONOMIA_MOTIVOS había dos cadenas de keywords
+distintas para agrupar motivos: parte6.mapear_motivo (waterfall) y
+parte7.mapear_motivo_categoria (causas raíz). Este script conserva ambas
+versiones como referencia y lista los motivos donde no coinciden entre sí o
+con la taxonomía unificada.
+
+Motivos evaluados: categorías detalladas/agregadas de config_categorias,
+motivos de los JSON de causas raíz en data/ y, opcionalmente, los valores de
+MOTIVO_IA de un CSV/Parquet.
+
+Uso:
+    python scripts/reporte_taxonomia_motivos.py
+    python scripts/reporte_taxonomia_motivos.py --archivo comentarios.parquet --salida outputs/taxonomia.csv
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from config_categorias import (
+    CATEGORIAS_AGREGADAS, CATEGORIAS_DETALLADAS, CATEGORIA_OTRO, mapear_categoria,
+)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# ==============================================================================
+# MAPEADORES ANTERIORES (copia congelada, solo para comparar)
+# ==============================================================================
+
+def mapear_motivo_waterfall_anterior(motivo):
+    """
+    Agrupa categorías granulares en categorías principales.
+    Soporta categorías en español y portugués.
+    CORREGIDO: unifica Beneficios→Promociones y agrega keywords de inversion
+    """
+    if pd.isna(motivo) or str(motivo).strip() in ['', '.', 'nan']: 
+        return 'Sin opinión'
+    
+    m = str(motivo).strip()
+    
+    # Normalizar encoding
+    m = m.replace('ã§','ç').replace('ã£','ã').replace('ã©','é').replace('ã³','ó').replace('ã­','í')
+    m = m.replace('Ã§','ç').replace('Ã£','ã').replace('Ã©','é').replace('Ã³','ó').replace('Ã­','í')
+    
+    m_lower = m.lower()
+    
+    # === TARIFAS (cobros, comisiones, mensualidades - NO tasas de interés) ===
+    # IMPORTANTE: Evaluar ANTES de Financiamiento para que no se confunda con "tasa"
+    if any(x in m_lower for x in [
+        'tarifa', 'cobrança', 'cobranza', 'comisión', 'comision', 'comissão',
+        'mensualidad', 'mensalidade', 'costo de', 'custo de', 'cobro'
+    ]) and 'tasa' not in m_lower and 'taxa' not in m_lower:
+        return 'Tarifas'
+    
+    # === FINANCIAMIENTO (incluye crédito, tarjeta, límites, tasas de interés) ===
+    if any(x in m_lower for x in [
+        'financ', 'crédit', 'credit', 'cartão', 'tarjeta', 'limite', 
+        'empréstimo', 'préstamo', 'prestamo', 'taxa', 'tasa', 'juro',
+        'acesso a créd', 'acesso a cred'
+    ]):
+        return 'Financiamiento'
+    
+    # === RENDIMIENTOS (incluye inversiones) - CORREGIDO PARA TODOS LOS SITES ===
+    if any(x in m_lower for x in [
+        'rendimento', 'rendimiento', 'investimento', 'inversiones', 'inversión',
+        'poupança', 'ahorro', 'cdi', 'saldo da conta',
+        'inversion', 'invertir', 'opcion',
+        'ganancia', 'ganancias', 'dinero en cuenta'  # AGREGADO PARA MÉXICO
+    ]):
+        return 'Rendimientos'
+    
+    # === COMPLEJIDAD / DIFICULTAD ===
+    if any(x in m_lower for x in [
+        'dificuldade', 'dificultad', 'problema', 'complexidade', 'complejidad',
+        'comodidade', 'facilidade', 'facilidad', 'complicado', 'difícil'
+    ]):
+        return 'Complejidad'
+    
+    # === FUNCIONALIDADES ===
+    if any(x in m_lower for x in [
+        'funcionalidade', 'funcionalidad', 'oferta de func', 'maior oferta',
+        'feature', 'recurso'
+    ]):
+        return 'Funcionalidades'
+    
+    # === SEGURIDAD ===
+    if any(x in m_lower for x in [
+        'segurança', 'seguridad', 'seguro', 'fraude', 'golpe', 'roubo', 'robo'
+    ]):
+        return 'Seguridad'
+    
+    # === ATENCIÓN ===
+    if any(x in m_lower for x in [
+        'atendimento', 'atención', 'atencion', 'cliente', 'suporte', 'soporte', 'sac'
+    ]):
+        return 'Atención'
+    
+    # === PROMOCIONES (unifica Beneficios) - CORREGIDO ===
+    if any(x in m_lower for x in [
+        'benefício', 'beneficio', 'desconto', 'descuento', 'promoção', 'promoción',
+        'cashback', 'recompensa', 'reward', 'promocion', 'promociones', 'promo'  # AGREGADO
+    ]):
+        return 'Promociones'  # CAMBIADO de 'Beneficios' a 'Promociones'
+    
+    # === SIN OPINIÓN ===
+    if any(x in m_lower for x in [
+        'não uso', 'no uso', 'sem opinião', 'sin opinión', 'sin opinion'
+    ]):
+        return 'Sin opinión'
+    
+    # === OTROS (unificar todas las variantes: otro, otros, outros, other) ===
+    if any(x in m_lower for x in ['outro', 'otros', 'other', 'otro']):
+        return 'Otro'
+    # Capturar también si es exactamente "otro" o variantes
+    if m_lower.strip() in ['otro', 'otros', 'outros', 'other', 'otra', 'outras']:
+        return 'Otro'
+    
+    # === VALORES INVÁLIDOS / ERRORES DE EXCEL → Otro ===
+    if any(x in m_lower for x in ['#¡valor!', '#valor!', '#value!', '#n/a', '#ref!']):
+        return 'Otro'
+    
+    # === NA / Na / N/A → Otro ===
+    if m_lower.strip() in ['na', 'n/a', 'nan', 'null', 'none', '-']:
+        return 'Otro'
+    
+    # === OFERTA → Funcionalidades ===
+    if 'oferta' in m_lower and 'func' not in m_lower:
+        return 'Funcionalidades'
+    
+    # === APP (problemas con la app) → Complejidad ===
+    if m_lower.strip() == 'app':
+        return 'Complejidad'
+    
+    # Si no matchea nada, devolver tal cual
+    return m
+
+
+def mapear_motivo_causas_anterior(motivo):
+    """Mapea motivos a categorías unificadas.
+    
+    Soporta tanto categorías granulares de BigQuery (ej: 'Acceso a crédito o tarjeta de crédito')
+    como categorías ya simplificadas (ej: 'Financiamiento', 'Complejidad').
+    """
+    if pd.isna(motivo) or str(motivo).strip() in ['', '.', 'nan']:
+        return 'Sin opinión'
+    m = str(motivo).strip()
+    m_lower = m.lower()
+    m_lower = m_lower.replace('ã§', 'ç').replace('ã£', 'ã').replace('ã©', 'é')
+    m_lower = m_lower.replace('ã³', 'ó').replace('ã­', 'í').replace('ãº', 'ú')
+    
+    # Match exacto de categorías simplificadas (BigQuery a veces devuelve estos directamente)
+    MAPEO_EXACTO = {
+        'financiamiento': 'Financiamiento',
+        'financiamento': 'Financiamiento',
+        'rendimientos': 'Rendimientos',
+        'rendimentos': 'Rendimientos',
+        'complejidad': 'Complejidad',
+        'complexidade': 'Complejidad',
+        'promociones': 'Promociones',
+        'promoções': 'Promociones',
+        'promo': 'Promociones',
+        'seguridad': 'Seguridad',
+        'segurança': 'Seguridad',
+        'atención': 'Atención',
+        'atencion': 'Atención',
+        'atendimento': 'Atención',
+        'tarifas': 'Tarifas',
+        'funcionalidades': 'Funcionalidades',
+        'inversion': 'Rendimientos',
+        'inversiones': 'Rendimientos',
+        'investimento': 'Rendimientos',
+        'investimentos': 'Rendimientos',
+    }
+    if m_lower in MAPEO_EXACTO:
+        return MAPEO_EXACTO[m_lower]
+    
+    # Match por keywords (para categorías granulares de BigQuery)
+    if any(x in m_lower for x in ['taxa', 'juros', 'tasa', 'interes', 'crédito', 'credito', 
+                             'limite', 'empréstimo', 'préstamo', 'cartão', 'tarjeta',
+                             'financ']):
+        return 'Financiamiento'
+    if any(x in m_lower for x in ['atendimento', 'atención', 'atencion', 'cliente', 'suporte', 'soporte']):
+        return 'Atención'
+    if any(x in m_lower for x in ['rendimento', 'rendimiento', 'cdi', 'poupança',
+                             'inversion', 'inversión', 'invertir', 'opcion', 'dinero en cuenta']):
+        return 'Rendimientos'
+    if any(x in m_lower for x in ['segurança', 'seguridad', 'fraude', 'golpe', 'roubo']):
+        return 'Seguridad'
+    if any(x in m_lower for x in ['promoç', 'promoc', 'desconto', 'descuento', 'cashback', 
+                             'benefício', 'beneficio', 'promocion', 'promociones', 'promo']):
+        return 'Promociones'
+    if any(x in m_lower for x in ['tarifa', 'mensalidade', 'cuota', 'cobrança']):
+        return 'Tarifas'
+    if any(x in m_lower for x in ['comodidade', 'facilidade', 'dificuldade', 'dificultad', 
+                             'problema', 'complexidade', 'complejidad', 'uso', 'app', 'bug']):
+        return 'Complejidad'
+    if any(x in m_lower for x in ['funcionalidade', 'funcionalidad', 'oferta', 'feature']):
+        return 'Funcionalidades'
+    if any(x in m_lower for x in ['não uso', 'no uso', 'sem opinião', 'sin opinión']):
+        return 'Sin opinión'
+    return 'Otro'
+
+
+# ==============================================================================
+# REPORTE
+# ==============================================================================
+
+def motivos_conocidos(data_dir=None):
+    """Motivos de config_categorias y de los JSON de causas raíz de detractores."""
+    motivos = set()
+    for cats in list(CATEGORIAS_DETALLADAS.values()) + list(CATEGORIAS_AGREGADAS.values()):
+        motivos.update(cats)
+    data_dir = Path(data_dir) if data_dir else BASE_DIR / 'data'
+    for ruta in sorted(data_dir.glob('causas_raiz_semantico_*.json')):
+        if 'promotores' in ruta.name:
+            continue
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                motivos.update((json.load(f).get('causas_por_motivo') or {}).keys())
+        except (OSError, ValueError, AttributeError):
+            continue
+    return motivos
+
+
+def reporte_consistencia(motivos, frecuencias=None):
+    """
+    Compara los dos mapeadores anteriores y la taxonomía unificada.
+    
+    Args:
+        motivos: Iterable de motivos crudos
+        frecuencias: Dict opcional {motivo: cantidad de filas}
+    
+    Returns:
+        pd.DataFrame: Una fila por motivo con columnas waterfall_anterior,
+        causas_anterior, taxonomia, taxonomia_causas, n y flags de diferencia
+    """
+    frecuencias = frecuencias or {}
+    filas = []
+    for motivo in sorted(set(motivos), key=str):
+        waterfall = mapear_motivo_waterfall_anterior(motivo)
+        causas = mapear_motivo_causas_anterior(motivo)
+        filas.append({
+            'motivo': motivo,
+            'n': int(frecuencias.get(motivo, 0)),
+            'waterfall_anterior': waterfall,
+            'causas_anterior': causas,
+            'taxonomia': mapear_categoria(motivo),
+            'taxonomia_causas': mapear_categoria(motivo, sin_match=CATEGORIA_OTRO),
+        })
+    df = pd.DataFrame(filas)
+    if df.empty:
+        return df
+    df['difieren_anteriores'] = df['waterfall_anterior'] != df['causas_anterior']
+    df['cambia_waterfall'] = df['waterfall_anterior'] != df['taxonomia']
+    df['cambia_causas'] = df['causas_anterior'] != df['taxonomia_causas']
+    return df.sort_values(['difieren_anteriores', 'n', 'motivo'], ascending=[False, False, True]).reset_index(drop=True)
+
+
+def imprimir_reporte(df):
+    """Resumen en consola de las diferencias."""
+    print("=" * 70)
+    print("🧭 CONSISTENCIA DE TAXONOMÍA DE MOTIVOS")
+    print("=" * 70)
+    print(f"📋 Motivos evaluados: {len(df):,}")
+    if df.empty:
+        return
+    difieren = df[df['difieren_anteriores']]
+    print(f"⚠️ waterfall vs causas raíz (anteriores) no coinciden en: {len(difieren):,}")
+    for _, r in difieren.iterrows():
+        print(f"   • {str(r['motivo'])[:45]:45s} waterfall={r['waterfall_anterior']:<16s} "
+              f"causas={r['causas_anterior']:<16s} → {r['taxonomia']}")
+    for col, nombre in [('cambia_waterfall', 'waterfall'), ('cambia_causas', 'causas raíz')]:
+        cambios = df[df[col]]
+        print(f"\n🔁 Cambian respecto al {nombre} anterior: {len(cambios):,}")
+        anterior = 'waterfall_anterior' if col == 'cambia_waterfall' else 'causas_anterior'
+        nuevo = 'taxonomia' if col == 'cambia_waterfall' else 'taxonomia_causas'
+        for _, r in cambios.iterrows():
+            print(f"   • {str(r['motivo'])[:45]:45s} {r[anterior]} → {r[nuevo]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Reporte de consistencia de la taxonomía de motivos')
+    parser.add_argument('--archivo', help='CSV/Parquet con columna MOTIVO_IA (opcional)')
+    parser.add_argument('--columna', default='MOTIVO_IA')
+    parser.add_argument('--salida', help='Ruta CSV donde guardar el reporte completo')
+    args = parser.parse_args()
+
+    motivos = motivos_conocidos()
+    frecuencias = {}
+    if args.archivo:
+        ruta = Path(args.archivo)
+        df_in = pd.read_parquet(ruta) if ruta.suffix == '.parquet' else pd.read_csv(ruta)
+        frecuencias = df_in[args.columna].value_counts().to_dict()
+        motivos.update(frecuencias.keys())
+
+    reporte = reporte_consistencia(motivos, frecuencias)
+    imprimir_reporte(reporte)
+    if args.salida:
+        Path(args.salida).parent.mkdir(parents=True, exist_ok=True)
+        reporte.to_csv(args.salida, index=False, encoding='utf-8')
+        print(f"\n💾 Reporte guardado: {args.salida}")
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════════════
+REUSO INCREMENTAL DE CAUSAS RAÍZ SEMÁNTICAS (HUELLA POR MOTIVO)
+═══════════════════════════════════════════════════════════════════════════════
+
+Cada motivo del análisis semántico lleva una huella de su conjunto de
+comentarios de entrada (más los parámetros de muestreo). El resultado del LLM
+para ese motivo se guarda en un almacén keyed por huella, así que en la
+siguiente corrida solo se vuelven a pedir los motivos cuya huella cambió
+(o que son nuevos); el resto se reutiliza.
+
+Archivos (data/cache/ está en .gitignore):
+    data/cache/semantico/{tipo}_{player}_{site}.json          ← almacén {huella: resultado}
+    data/cache/semantico/pedido_{base}.json                   ← motivos pedidos en el último prompt
+    data/cache/semantico/anterior_{base}.json                 ← JSON final desplazado
+
+Flujo (dentro de preparar_analisis_semantico[_promotores]):
+    1. absorber_resultados: el JSON final existente entra al almacén
+    2. partir_motivos: reutilizados vs pendientes
+    3. sin pendientes → escribir_json_final (el checkpoint pasa sin LLM)
+       con pendientes → prompt solo con ellos + registrar_pedido
+
+El muestreo es determinístico: la semilla sale de la huella (semilla_estable).
+"""
+
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+
+from prompts_fragmentados import descartar_fragmentos_obsoletos
+
+RAIZ_PROYECTO = Path(__file__).resolve().parent.parent
+VERSION_HUELLA = 1   # Subir si cambia el armado del prompt (invalida el almacén)
+
+
+# ==============================================================================
+# HUELLAS Y SEMILLAS
+# ==============================================================================
+
+def semilla_estable(*partes):
+    """Semilla entera reproducible entre corridas (hash() de Python no lo es)."""
+    texto = '\x1f'.join(str(p) for p in partes)
+    return int.from_bytes(hashlib.blake2b(texto.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def huella_motivo(comentarios, motivo, tipo='causas_raiz', comentarios_anterior=(), **parametros):
+    """
+    Huella del conjunto de comentarios de entrada de un motivo.
+
+    Independiente del orden de los comentarios; incluye los del quarter
+    anterior (entran en los temas candidatos del prompt), el motivo, el tipo
+    de análisis y los parámetros que cambian el prompt (ej. presupuesto_tokens).
+    """
+    h = hashlib.blake2b(digest_size=10)
+    cabecera = [VERSION_HUELLA, tipo, motivo] + [f'{k}={parametros[k]}' for k in sorted(parametros)]
+    h.update('\x1f'.join(map(str, cabecera)).encode('utf-8'))
+    for separador, grupo in ((b'\x1e', comentarios), (b'\x1d', comentarios_anterior)):
+        for comentario in sorted(grupo):
+            h.update(separador)
+            h.update(comentario.encode('utf-8'))
+    return h.hexdigest()
+
+
+# ==============================================================================
+# ALMACÉN
+# ==============================================================================
+
+def _dir_cache(raiz=None):
+    return (Path(raiz) if raiz else RAIZ_PROYECTO) / 'data' / 'cache' / 'semantico'
+
+
+def _tipo(promotores):
+    return 'promotores' if promotores else 'causas_raiz'
+
+
+def ruta_json_final(player, site, q_act, promotores=False, raiz=None):
+    """Path del JSON semántico que lee el checkpoint (mismo nombre de siempre)."""
+    sufijo = '_promotores' if promotores else ''
+    return (Path(raiz) if raiz else RAIZ_PROYECTO) / 'data' / f'causas_raiz_semantico{sufijo}_{player}_{site}_{q_act}.json'
+
+
+def _leer_json(path, defecto):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError, UnicodeDecodeError):
+        return defecto
+
+
+def _escribir_json(path, contenido):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(contenido, f, ensure_ascii=False, indent=2)
+
+
+def cargar_almacen(player, site, promotores=False, raiz=None):
+    """Almacén {huella: {motivo, quarter, fecha, entrada}} de un player/site."""
+    path = _dir_cache(raiz) / f'{_tipo(promotores)}_{player}_{site}.json'
+    return _leer_json(path, {}).get('entradas', {})
+
+
+def guardar_almacen(entradas, player, site, promotores=False, raiz=None):
+    path = _dir_cache(raiz) / f'{_tipo(promotores)}_{player}_{site}.json'
+    _escribir_json(path, {'version': VERSION_HUELLA, 'entradas': entradas})
+
+
+def registrar_pedido(huellas, player, site, q_act, promotores=False, raiz=None):
+    """Anota qué huella corresponde a cada motivo pedido en el prompt actual."""
+    path = _dir_cache(raiz) / f'pedido_{ruta_json_final(player, site, q_act, promotores, raiz).stem}.json'
+    _escribir_json(path, {'fecha': datetime.now().isoformat(timespec='seconds'), 'huellas': huellas})
+
+
+def absorber_resultados(huellas_actuales, player, site, q_act, promotores=False, raiz=None):
+    """
+    Pasa al almacén los motivos del JSON final existente, cada uno con su huella.
+
+    De dónde sale la huella de cada motivo del JSON:
+        - metadata.huellas (JSON armado por escribir_json_final / unir_fragmentos)
+        - el último pedido, si el JSON es posterior al pedido (lo escribió el agente)
+        - las huellas actuales si no hay ni una ni otra (JSON previo al reuso:
+          se confía en él como antes)
+
+    Returns:
+        dict: almacén actualizado
+    """
+    almacen = cargar_almacen(player, site, promotores, raiz)
+    path_final = ruta_json_final(player, site, q_act, promotores, raiz)
+    data = _leer_json(path_final, None) if path_final.exists() else None
+    if not data or not isinstance(data.get('causas_por_motivo'), dict):
+        return almacen
+
+    huellas = (data.get('metadata') or {}).get('huellas')
+    if not huellas:
+        path_pedido = _dir_cache(raiz) / f'pedido_{path_final.stem}.json'
+        if path_pedido.exists() and path_final.stat().st_mtime >= path_pedido.stat().st_mtime:
+            huellas = _leer_json(path_pedido, {}).get('huellas', {})
+        elif not path_pedido.exists():
+            huellas = huellas_actuales
+
+    cambios = False
+    for motivo, entrada in data['causas_por_motivo'].items():
+        huella = (huellas or {}).get(motivo)
+        if huella and huella not in almacen and isinstance(entrada, dict):
+            almacen[huella] = {
+                'motivo': motivo,
+                'quarter': q_act,
+                'fecha': datetime.now().isoformat(timespec='seconds'),
+                'entrada': entrada,
+            }
+            cambios = True
+    if cambios:
+        guardar_almacen(almacen, player, site, promotores, raiz)
+    return almacen
+
+
+def partir_motivos(datos_por_motivo, almacen):
+    """
+    Returns:
+        (reutilizados {motivo: entrada}, pendientes [motivo]) según datos['huella']
+    """
+    reutilizados, pendientes = {}, []
+    for motivo, datos in datos_por_motivo.items():
+        guardado = almacen.get(datos.get('huella'))
+        if guardado and guardado.get('motivo') == motivo:
+            entrada = dict(guardado['entrada'])
+            entrada['delta_pp'] = round(float(datos.get('delta', entrada.get('delta_pp', 0))), 2)
+            reutilizados[motivo] = entrada
+        else:
+            pendientes.append(motivo)
+    return reutilizados, pendientes
+
+
+def escribir_json_final(causas_por_motivo, huellas, player, site, q_act, promotores=False, raiz=None):
+    """JSON final completo (mismo esquema que el del LLM) con metadata.huellas."""
+    path = ruta_json_final(player, site, q_act, promotores, raiz)
+    _escribir_json(path, {
+        'metadata': {
+            'player': player,
+            'site': site,
+            'quarter': q_act,
+            'metodo': 'analisis_semantico_promotores' if promotores else 'analisis_semantico',
+            'huellas': huellas,
+        },
+        'causas_por_motivo': causas_por_motivo,
+    })
+    return str(path)
+
+
+def sincronizar_motivos(datos_por_motivo, player, site, q_act, promotores=False, raiz=None):
+    """
+    Pasos 1-3 del flujo: absorbe el JSON existente, parte reutilizados /
+    pendientes y, si no queda nada pendiente, reescribe el JSON final completo.
+    Si quedan pendientes, mueve el JSON final desactualizado a
+    data/cache/semantico/anterior_*.json para que el checkpoint pida solo lo
+    que falta (sus motivos con huella ya quedaron en el almacén) y borra los
+    JSON de fragmento de los pendientes que son de otra huella.
+
+    Returns:
+        dict con reutilizados, pendientes, huellas y json_final (path o None)
+    """
+    huellas = {m: d['huella'] for m, d in datos_por_motivo.items()}
+    almacen = absorber_resultados(huellas, player, site, q_act, promotores, raiz)
+    reutilizados, pendientes = partir_motivos(datos_por_motivo, almacen)
+
+    json_final = None
+    path_final = ruta_json_final(player, site, q_act, promotores, raiz)
+    if not pendientes and reutilizados:
+        json_final = escribir_json_final(reutilizados, huellas, player, site, q_act, promotores, raiz)
+    elif pendientes and path_final.exists():
+        respaldo = _dir_cache(raiz) / f'anterior_{path_final.name}'
+        respaldo.parent.mkdir(parents=True, exist_ok=True)
+        path_final.replace(respaldo)
+    if pendientes:
+        descartar_fragmentos_obsoletos({m: huellas[m] for m in pendientes}, player, site, q_act, promotores, raiz)
+    return {
+        'reutilizados': reutilizados,
+        'pendientes': pendientes,
+        'huellas': huellas,
+        'json_final': json_final,
+    }
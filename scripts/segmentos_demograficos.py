@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════════════
+CUBO DE SEGMENTOS DEMOGRÁFICOS (DRILL-DOWN DEL NPS)
+═══════════════════════════════════════════════════════════════════════════════
+
+Conteos de detractores / neutros / promotores por MARCA × OLA × dimensión ×
+segmento (GÉNERO, EDAD, ESTADO, REGIÓN, NSE, ANTIGÜEDAD) para todo el site,
+armados en una sola pasada: cada segmento se decodifica una vez por valor
+distinto (edad y antigüedad numéricas van a rangos fijos) y todas las
+dimensiones se cuentan juntas con un único np.bincount.
+
+El cubo queda indexado y ordenado por (MARCA, OLA, dimension, segmento), así
+que cortar un player / quarter es un .xs(). Se persiste junto a la base con
+agregados_site (misma huella que principalidad y seguridad).
+
+Drill-down: por dimensión, NPS = Σ share_s × NPS_s y el Δ de cada segmento
+se parte con shift_share.descomponer_shift_share (punto medio):
+    mix_s  = Δshare_s × (NPS̄_s − NPS̄)      (composición)
+    tasa_s = sharē_s × ΔNPS_s              (desempeño)
+    contribución_s = mix_s + tasa_s
+Las contribuciones de cada dimensión suman exactamente el Δ NPS del player.
+Un segmento que sólo crece en share con un NPS igual al promedio no aporta
+(mix ≈ 0), a diferencia de share_q2 × NPS_q2 − share_q1 × NPS_q1.
+
+Uso:
+    from segmentos_demograficos import analizar_segmentos
+    resultado = analizar_segmentos(df_completo, config)
+    resultado['drilldown']['top_segmentos']
+"""
+
+import numpy as np
+import pandas as pd
+
+from agregados_site import agregados_persistidos
+from decodificacion_respuestas import decodificar, decodificador_por_valor, fix_encoding_text
+
+# ==============================================================================
+# DIMENSIONES Y RANGOS
+# ==============================================================================
+
+# Columna (nombre en parte1) → etiqueta en el reporte
+DIMENSIONES_SEGMENTO = {
+    'GENERO': 'Género',
+    'EDAD': 'Edad',
+    'ESTADO': 'Estado',
+    'REGION': 'Región',
+    'NSE': 'NSE',
+    'ANTIGUEDAD': 'Antigüedad',
+}
+
+# Rangos para respuestas numéricas (límite inferior inclusive, etiqueta)
+RANGOS_EDAD = [(0, '<18'), (18, '18-24'), (25, '25-34'), (35, '35-44'), (45, '45-54'), (55, '55+')]
+RANGOS_ANTIGUEDAD = [(0, '<1 año'), (1, '1-2 años'), (2, '2-5 años'), (5, '5-10 años'), (10, '10+ años')]   # en años
+
+SIN_DATO = 'Sin dato'
+CLASES_NPS = ['detractores', 'neutros', 'promotores']   # NPS -1 / 0 / 1
+MIN_BASE_SEGMENTO = 30
+
+
+def _texto_segmento(valor):
+    """Respuesta categórica → etiqueta limpia ('Sin dato' si viene vacía)."""
+    if pd.isna(valor):
+        return SIN_DATO
+    texto = fix_encoding_text(str(valor)).strip()
+    return texto if texto and texto.lower() != 'nan' else SIN_DATO
+
+
+def _rango(rangos):
+    """Decodificador de rangos: numérico → etiqueta del rango; texto → tal cual (ya viene agrupado)."""
+    limites = [limite for limite, _ in rangos]
+
+    def rango(valor):
+        if pd.isna(valor):
+            return SIN_DATO
+        try:
+            numero = float(str(valor).strip().replace(',', '.'))
+        except ValueError:
+            return _texto_segmento(valor)
+        if numero < 0:
+            return SIN_DATO
+        return rangos[int(np.searchsorted(limites, numero, side='right')) - 1][1]
+
+    return rango
+
+
+DECODIFICADORES_SEGMENTO = {
+    'EDAD': decodificador_por_valor('segmento_edad', _rango(RANGOS_EDAD), object),
+    'ANTIGUEDAD': decodificador_por_valor('segmento_antiguedad', _rango(RANGOS_ANTIGUEDAD), object),
+}
+_DECODIFICADOR_TEXTO = decodificador_por_valor('segmento_texto', _texto_segmento, object)
+
+
+# ==============================================================================
+# CUBO
+# ==============================================================================
+
+def construir_cubo_segmentos(df_completo, dimensiones=None, col_nps='NPS', col_marca='MARCA',
+                             col_periodo='OLA', huella=None):
+    """
+    Cubo MARCA × OLA × dimensión × segmento con conteos por clase de NPS.
+
+    Solo cuentan las filas con NPS -1 / 0 / 1 y MARCA / OLA presentes.
+
+    Returns:
+        DataFrame indexado por (MARCA, OLA, dimension, segmento) con
+        detractores, neutros, promotores y total (int64), sin celdas vacías
+    """
+    dimensiones = [d for d in (dimensiones or DIMENSIONES_SEGMENTO) if d in df_completo.columns]
+    columnas = CLASES_NPS + ['total']
+    indice_vacio = pd.MultiIndex.from_arrays([[], [], [], []], names=[col_marca, col_periodo, 'dimension', 'segmento'])
+    if not dimensiones:
+        return pd.DataFrame(columns=columnas, index=indice_vacio, dtype='int64')
+
+    nps = decodificar(df_completo[col_nps], 'nps', huella=huella).to_numpy(dtype=float)
+    clase = np.select([nps == -1, nps == 0, nps == 1], [0, 1, 2], default=-1)
+    cod_marca, marcas = pd.factorize(df_completo[col_marca], sort=True)
+    cod_ola, olas = pd.factorize(df_completo[col_periodo], sort=True)
+    valido = (clase >= 0) & (cod_marca >= 0) & (cod_ola >= 0)
+    grupo = (cod_marca * len(olas) + cod_ola)[valido]
+    clase = clase[valido]
+
+    # Segmentos de todas las dimensiones en un mismo espacio de códigos (offset por dimensión)
+    codigos, etiquetas, dims_segmento, offset = [], [], [], 0
+    for dim in dimensiones:
+        decodificador = DECODIFICADORES_SEGMENTO.get(dim, _DECODIFICADOR_TEXTO)
+        segmento = decodificar(df_completo[dim], decodificador, huella=huella)
+        cod_seg, segmentos = pd.factorize(segmento, sort=True)
+        codigos.append(cod_seg[valido] + offset)
+        etiquetas.extend(segmentos)
+        dims_segmento.extend([dim] * len(segmentos))
+        offset += len(segmentos)
+
+    # Una sola pasada: (grupo, segmento, clase) → conteo
+    n_celdas = len(marcas) * len(olas) * offset
+    celda = (np.tile(grupo, len(dimensiones)) * offset + np.concatenate(codigos)) * 3 + np.tile(clase, len(dimensiones))
+    conteos = np.bincount(celda, minlength=n_celdas * 3).reshape(n_celdas, 3)
+
+    total = conteos.sum(axis=1)
+    presentes = np.flatnonzero(total)
+    grupo_celda, seg_celda = presentes // offset, presentes % offset
+    indice = pd.MultiIndex.from_arrays([
+        marcas[grupo_celda // len(olas)],
+        olas[grupo_celda % len(olas)],
+        np.asarray(dims_segmento, dtype=object)[seg_celda],
+        np.asarray(etiquetas, dtype=object)[seg_celda],
+    ], names=[col_marca, col_periodo, 'dimension', 'segmento'])
+    cubo = pd.DataFrame(conteos[presentes], columns=CLASES_NPS, index=indice).astype('int64')
+    cubo['total'] = total[presentes].astype('int64')
+    return cubo.sort_index()
+
+
+def nps_de(conteos):
+    """NPS (-100..100) de un DataFrame / fila con detractores, promotores y total."""
+    return (conteos['promotores'] - conteos['detractores']) / conteos['total'] * 100
+
+
+# ==============================================================================
+# DRILL-DOWN DEL PLAYER
+# ==============================================================================
+
+def _corte(cubo, marca, ola):
+    """Conteos de una marca × quarter indexados por (dimension, segmento); vacío si no hay."""
+    try:
+        return cubo.xs((marca, ola), level=[0, 1])
+    except KeyError:
+        return cubo.iloc[:0].droplevel([0, 1])
+
+
+def drilldown_segmentos(cubo, player, q_ant, q_act, min_base=MIN_BASE_SEGMENTO, top_n=8):
+    """
+    Qué segmentos movieron el NPS del player entre q_ant y q_act.
+
+    Args:
+        cubo: salida de construir_cubo_segmentos
+        min_base: base mínima (en ambos quarters) para entrar al ranking top
+
+    Returns:
+        dict con nps_q1, nps_q2, delta, dimensiones {dim: [filas]} y
+        top_segmentos (mayor |mix| + |tasa| entre todas las dimensiones)
+    """
+    from shift_share import descomponer_shift_share   # shift_share importa este módulo
+
+    q1, q2 = _corte(cubo, player, q_ant), _corte(cubo, player, q_act)
+    if q1.empty or q2.empty:
+        return {'error': f'Sin datos de segmentos para {player} en {q_ant} / {q_act}'}
+
+    # Mercado = resto de las marcas del site en q_act (mismo segmento)
+    mercado = cubo.xs(q_act, level=1).groupby(level=['dimension', 'segmento']).sum()
+    mercado = mercado.sub(q2.reindex(mercado.index, fill_value=0))
+
+    tabla = pd.concat([q1, q2], axis=1, keys=['q1', 'q2']).fillna(0)
+    filas_por_dim, todas = {}, []
+    nps_q1 = nps_q2 = None
+    for dim in tabla.index.get_level_values('dimension').unique():
+        t = tabla.xs(dim, level='dimension')
+        base1, base2 = t[('q1', 'total')], t[('q2', 'total')]
+        share1, share2 = base1 / base1.sum(), base2 / base2.sum()
+        n1 = nps_de(t['q1']).where(base1 > 0, 0.0)
+        n2 = nps_de(t['q2']).where(base2 > 0, 0.0)
+        efectos = descomponer_shift_share(
+            np.column_stack([base1, base2]), np.column_stack([n1, n2]), np.zeros(len(t), dtype=np.intp)
+        )
+        if nps_q1 is None:
+            nps_q1, nps_q2 = float((share1 * n1).sum()), float((share2 * n2).sum())
+
+        m = mercado.xs(dim, level='dimension').reindex(t.index)
+        nps_mercado = nps_de(m).where(m['total'] > 0)
+
+        filas = []
+        for i, seg in enumerate(t.index):
+            fila = {
+                'dimension': dim,
+                'dimension_label': DIMENSIONES_SEGMENTO.get(dim, dim),
+                'segmento': seg,
+                'base_q1': int(base1[seg]),
+                'base_q2': int(base2[seg]),
+                'share_q1': round(float(share1[seg]) * 100, 1),
+                'share_q2': round(float(share2[seg]) * 100, 1),
+                'nps_q1': round(float(n1[seg]), 1) if base1[seg] > 0 else None,
+                'nps_q2': round(float(n2[seg]), 1) if base2[seg] > 0 else None,
+                'mix': round(float(efectos['mix'][i]), 2),
+                'tasa': round(float(efectos['tasa'][i]), 2),
+                'contribucion': round(float(efectos['efecto'][i]), 2),
+                'nps_mercado_q2': round(float(nps_mercado[seg]), 1) if pd.notna(nps_mercado[seg]) else None,
+                'base_baja': bool(min(base1[seg], base2[seg]) < min_base),
+            }
+            fila['delta_nps'] = (round(fila['nps_q2'] - fila['nps_q1'], 1)
+                                 if fila['nps_q1'] is not None and fila['nps_q2'] is not None else None)
+            filas.append(fila)
+        filas.sort(key=lambda f: -(abs(f['mix']) + abs(f['tasa'])))
+        filas_por_dim[dim] = filas
+        todas.extend(f for f in filas if not f['base_baja'] and f['segmento'] != SIN_DATO)
+
+    todas.sort(key=lambda f: -(abs(f['mix']) + abs(f['tasa'])))
+    return {
+        'player': player,
+        'q_ant': q_ant,
+        'q_act': q_act,
+        'nps_q1': round(nps_q1, 1),
+        'nps_q2': round(nps_q2, 1),
+        'delta': round(nps_q2 - nps_q1, 1),
+        'min_base': min_base,
+        'dimensiones': filas_por_dim,
+        'top_segmentos': todas[:top_n],
+    }
+
+
+# ==============================================================================
+# FUNCIÓN PRINCIPAL
+# ==============================================================================
+
+def analizar_segmentos(df_completo, config, verbose=True):
+    """
+    Cubo de segmentos del site (persistido) + drill-down del player.
+
+    Args:
+        df_completo: DataFrame con todas las marcas (de parte1)
+        config: Diccionario de configuración
+
+    Returns:
+        dict con cubo, dimensiones (columnas usadas) y drilldown; o {'error': ...}
+    """
+    site, player = config['site'], config['player']
+    q_ant, q_act = config['periodo_1'], config['periodo_2']
+    col_nps = config.get('col_nps', 'NPS')
+    col_periodo = config.get('col_ola', 'OLA')
+    huella = config.get('huella_datos')
+
+    dimensiones = [d for d in DIMENSIONES_SEGMENTO if d in df_completo.columns]
+    if not dimensiones:
+        return {'error': 'Sin columnas demográficas (GENERO, EDAD, ESTADO, REGION, NSE, ANTIGUEDAD)'}
+
+    agregados = agregados_persistidos(
+        'segmentos', site, huella, [len(df_completo), col_nps, col_periodo, *dimensiones],
+        lambda: {'cubo': construir_cubo_segmentos(df_completo, dimensiones, col_nps=col_nps,
+                                                  col_periodo=col_periodo, huella=huella)},
+        verbose=verbose
+    )
+    cubo = agregados['cubo']
+    drilldown = drilldown_segmentos(cubo, player, q_ant, q_act)
+
+    if verbose:
+        print(f"   👥 Cubo de segmentos: {len(cubo):,} celdas ({', '.join(dimensiones)})")
+        if 'error' in drilldown:
+            print(f"   ⚠️ {drilldown['error']}")
+        else:
+            for fila in drilldown['top_segmentos'][:3]:
+                print(f"   • {fila['dimension_label']} {fila['segmento']}: {fila['contribucion']:+.2f}pp")
+
+    return {
+        'cubo': cubo,
+        'dimensiones': dimensiones,
+        'drilldown': drilldown,
+    }
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════════════
+DESCOMPOSICIÓN SHIFT-SHARE DEL Δ NPS (CUALQUIER DIMENSIÓN)
+═══════════════════════════════════════════════════════════════════════════════
+
+Para una dimensión que parte la base en segmentos s (región, NSE, antigüedad,
+usa / no usa un producto, tiene / no tiene saldo...), el NPS del player es
+    NPS = Σ w_s × r_s        (w = share del segmento, r = NPS del segmento)
+y el Δ entre quarters se parte EXACTO en (punto medio, w̄ = (w1+w2)/2):
+    Mix  (composición) = Σ Δw_s × (r̄_s − NPS̄)
+    Tasa (desempeño)   = Σ w̄_s × Δr_s
+Mix es el mismo "Δ Share × Lift" de parte8 generalizado a k segmentos
+(r̄_s − NPS̄ hace de lift; Σ Δw_s = 0, así que la constante no cambia el total).
+
+El motor recibe celdas (dimensión, segmento) con base y NPS de cada quarter
+y resuelve TODAS las dimensiones juntas con np.bincount: el costo depende de
+la cantidad de celdas, no de filas.
+
+Ranking de dimensiones (qué dimensión explica el Δ):
+    heterogeneidad = Σ w̄_s × |Δr_s − Tasa|   (cuánto difiere el cambio entre segmentos)
+    poder_explicativo = |Mix| + heterogeneidad
+Una dimensión donde todos los segmentos se movieron igual y sin cambio de
+composición no explica nada (poder 0), aunque sus efectos sumen el Δ.
+
+Uso:
+    from shift_share import analizar_shift_share
+    resultado = analizar_shift_share(resultados, df_todos, config)
+    resultado['dimensiones']   # DataFrame ordenado por poder_explicativo
+"""
+
+import numpy as np
+import pandas as pd
+
+from agregados_site import agregados_persistidos
+from segmentos_demograficos import DIMENSIONES_SEGMENTO, construir_cubo_segmentos, nps_de
+
+# Base mínima del player por quarter para reportar una dimensión
+MIN_BASE_DIMENSION = 100
+
+
+# ==============================================================================
+# MOTOR
+# ==============================================================================
+
+def descomponer_shift_share(base, nps, dimension):
+    """
+    Descomposición mix / tasa de todas las dimensiones a la vez.
+
+    Args:
+        base: array (n_celdas, 2) con la base de cada segmento en [q1, q2]
+        nps: array (n_celdas, 2) con el NPS (-100..100) de cada segmento; se
+            ignora donde la base es 0
+        dimension: array (n_celdas,) con el código entero de la dimensión
+
+    Returns:
+        dict de arrays:
+            - por celda: share (n, 2) en %, mix, tasa, efecto (= mix + tasa)
+            - por dimensión: nps (d, 2), delta, mix_total, tasa_total,
+              heterogeneidad, poder_explicativo, base (d, 2)
+    """
+    base = np.asarray(base, dtype=float)
+    nps = np.asarray(nps, dtype=float)
+    dimension = np.asarray(dimension, dtype=np.intp)
+    n_dim = int(dimension.max()) + 1 if len(dimension) else 0
+    por_dim = lambda x: np.bincount(dimension, weights=x, minlength=n_dim)
+
+    base_dim = np.column_stack([por_dim(base[:, 0]), por_dim(base[:, 1])])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = np.where(base_dim[dimension] > 0, base / base_dim[dimension], 0.0)
+
+    # Segmento ausente en un quarter: su NPS es el del otro (Δr = 0; la identidad sigue siendo exacta)
+    presente = base > 0
+    r = np.where(presente, np.nan_to_num(nps), 0.0)
+    r = np.where(presente, r, r[:, ::-1])
+
+    nps_dim = np.column_stack([por_dim(w[:, 0] * r[:, 0]), por_dim(w[:, 1] * r[:, 1])])
+    w_medio, r_medio = w.mean(axis=1), r.mean(axis=1)
+    delta_w, delta_r = w[:, 1] - w[:, 0], r[:, 1] - r[:, 0]
+
+    mix = delta_w * (r_medio - nps_dim[dimension].mean(axis=1))
+    tasa = w_medio * delta_r
+    tasa_total = por_dim(tasa)
+    mix_total = por_dim(mix)
+    heterogeneidad = por_dim(w_medio * np.abs(delta_r - tasa_total[dimension]))
+
+    return {
+        'share': w * 100,
+        'mix': mix,
+        'tasa': tasa,
+        'efecto': mix + tasa,
+        'nps': nps_dim,
+        'delta': nps_dim[:, 1] - nps_dim[:, 0],
+        'mix_total': mix_total,
+        'tasa_total': tasa_total,
+        'heterogeneidad': heterogeneidad,
+        'poder_explicativo': np.abs(mix_total) + heterogeneidad,
+        'base': base_dim,
+    }
+
+
+def tabla_shift_share(celdas, min_base=MIN_BASE_DIMENSION):
+    """
+    Tablas de efectos a partir de celdas (dimension, segmento).
+
+    Args:
+        celdas: DataFrame indexado por (dimension, segmento) con base_q1,
+            base_q2, nps_q1, nps_q2 (y opcionalmente dimension_label, fuente)
+        min_base: base mínima por quarter para rankear la dimensión
+
+    Returns:
+        dict con:
+            - segmentos: DataFrame por celda con share_q1/q2, nps_q1/q2, mix, tasa, efecto
+            - dimensiones: DataFrame por dimensión con nps_q1/q2, delta,
+              mix, tasa, heterogeneidad, poder_explicativo, segmento_top;
+              ordenado por poder_explicativo (las de base baja al final)
+    """
+    codigos, dims = pd.factorize(celdas.index.get_level_values('dimension'))
+    r = descomponer_shift_share(
+        celdas[['base_q1', 'base_q2']].to_numpy(), celdas[['nps_q1', 'nps_q2']].to_numpy(), codigos
+    )
+
+    segmentos = celdas.copy()
+    segmentos['share_q1'], segmentos['share_q2'] = r['share'][:, 0], r['share'][:, 1]
+    segmentos['mix'], segmentos['tasa'], segmentos['efecto'] = r['mix'], r['tasa'], r['efecto']
+
+    # Segmento con mayor |efecto| de cada dimensión
+    orden = np.lexsort((-np.abs(r['efecto']), codigos))
+    primero = orden[np.r_[True, codigos[orden][1:] != codigos[orden][:-1]]]
+    segmento_top = pd.Series(celdas.index.get_level_values('segmento')[primero], index=codigos[primero])
+
+    etiquetas = (celdas['dimension_label'].groupby(level='dimension').first()
+                 if 'dimension_label' in celdas.columns else pd.Series(dims, index=dims))
+    fuentes = (celdas['fuente'].groupby(level='dimension').first()
+               if 'fuente' in celdas.columns else pd.Series('', index=dims))
+    dimensiones = pd.DataFrame({
+        'dimension_label': etiquetas.reindex(dims).to_numpy(),
+        'fuente': fuentes.reindex(dims).to_numpy(),
+        'base_q1': r['base'][:, 0].astype(int),
+        'base_q2': r['base'][:, 1].astype(int),
+        'nps_q1': r['nps'][:, 0],
+        'nps_q2': r['nps'][:, 1],
+        'delta': r['delta'],
+        'mix': r['mix_total'],
+        'tasa': r['tasa_total'],
+        'heterogeneidad': r['heterogeneidad'],
+        'poder_explicativo': r['poder_explicativo'],
+        'segmento_top': segmento_top.reindex(np.arange(len(dims))).to_numpy(),
+    }, index=pd.Index(dims, name='dimension'))
+    dimensiones['base_baja'] = dimensiones[['base_q1', 'base_q2']].min(axis=1) < min_base
+    dimensiones = dimensiones.sort_values(['base_baja', 'poder_explicativo'], ascending=[True, False])
+    return {'segmentos': segmentos, 'dimensiones': dimensiones}
+
+
+# ==============================================================================
+# CELDAS DESDE LOS AGREGADOS EXISTENTES
+# ==============================================================================
+
+def celdas_desde_cubo(cubo, player, q_ant, q_act, fuente='segmentos'):
+    """Celdas (dimension, segmento) del player desde un cubo de segmentos_demograficos."""
+    cortes = []
+    for q in (q_ant, q_act):
+        try:
+            cortes.append(cubo.xs((player, q), level=[0, 1]))
+        except KeyError:
+            return pd.DataFrame()
+    q1, q2 = cortes
+    tabla = pd.concat([q1, q2], axis=1, keys=['q1', 'q2']).fillna(0)
+    celdas = pd.DataFrame({
+        'base_q1': tabla[('q1', 'total')],
+        'base_q2': tabla[('q2', 'total')],
+        'nps_q1': nps_de(tabla['q1']).fillna(0),
+        'nps_q2': nps_de(tabla['q2']).fillna(0),
+    }, index=tabla.index)
+    dims = celdas.index.get_level_values('dimension')
+    celdas['dimension_label'] = [DIMENSIONES_SEGMENTO.get(d, d) for d in dims]
+    celdas['fuente'] = fuente
+    return celdas
+
+
+def celdas_desde_productos(metricas, player, q_ant, q_act, mapeo_productos=None):
+    """
+    Celdas de productos: cada producto es una dimensión binaria (usa / no usa)
+    con la base de respuestas con NPS válido (metricas_productos_site de parte8).
+    """
+    productos = metricas['productos']
+    cortes = []
+    for q in (q_ant, q_act):
+        try:
+            cortes.append(productos.xs((player, q), level=[0, 1]))
+        except KeyError:
+            return pd.DataFrame()
+    q1, q2 = cortes
+    mapeo_productos = mapeo_productos or {}
+
+    filas = []
+    for col in q1.index.intersection(q2.index):
+        nombre = mapeo_productos.get(col, col)
+        for segmento, base, nps in (('Usa', 'validos_usuario', 'nps_usuario'),
+                                    ('No usa', 'validos_no_usuario', 'nps_no_usuario')):
+            filas.append({
+                'dimension': col, 'segmento': segmento,
+                'base_q1': q1.at[col, base], 'base_q2': q2.at[col, base],
+                'nps_q1': q1.at[col, nps], 'nps_q2': q2.at[col, nps],
+                'dimension_label': f'Producto: {nombre}', 'fuente': 'productos',
+            })
+    if not filas:
+        return pd.DataFrame()
+    return pd.DataFrame(filas).set_index(['dimension', 'segmento'])
+
+
+# ==============================================================================
+# FUNCIÓN PRINCIPAL
+# ==============================================================================
+
+def analizar_shift_share(resultados, df_todos, config, verbose=True):
+    """
+    Shift-share del Δ NPS del player sobre todas las dimensiones disponibles:
+    segmentos demográficos (resultados['segmentos']), productos
+    (resultados['productos']) y saldo (base completa, df_todos).
+
+    Returns:
+        dict con segmentos, dimensiones (ranking), q_ant, q_act; o {'error': ...}
+    """
+    site, player = config['site'], config['player']
+    q_ant, q_act = config['periodo_1'], config['periodo_2']
+
+    celdas = []
+    cubo = (resultados.get('segmentos') or {}).get('cubo')
+    if cubo is not None and len(cubo):
+        celdas.append(celdas_desde_cubo(cubo, player, q_ant, q_act))
+
+    productos = resultados.get('productos') or {}
+    if productos.get('metricas_site'):
+        celdas.append(celdas_desde_productos(productos['metricas_site'], player, q_ant, q_act,
+                                             productos.get('mapeo_productos')))
+
+    # Saldo: solo existe en la base completa (la base del reporte es "con saldo")
+    col_saldo = config.get('col_saldo')
+    if col_saldo and df_todos is not None and col_saldo in df_todos.columns:
+        col_nps, col_periodo = config.get('col_nps', 'NPS'), config.get('col_ola', 'OLA')
+        huella = config.get('huella_datos')
+        cubo_saldo = agregados_persistidos(
+            'segmentos_saldo', site, huella, [len(df_todos), col_saldo, col_nps, col_periodo],
+            lambda: {'cubo': construir_cubo_segmentos(df_todos, [col_saldo], col_nps=col_nps,
+                                                      col_periodo=col_periodo, huella=huella)}
+        )['cubo']
+        celdas_saldo = celdas_desde_cubo(cubo_saldo, player, q_ant, q_act, fuente='base completa')
+        if len(celdas_saldo):
+            celdas_saldo['dimension_label'] = 'Saldo (base completa)'
+            celdas.append(celdas_saldo)
+
+    celdas = [c for c in celdas if len(c)]
+    if not celdas:
+        return {'error': f'Sin dimensiones para descomponer el Δ NPS de {player} ({q_ant} → {q_act})'}
+
+    resultado = tabla_shift_share(pd.concat(celdas))
+    resultado.update({'q_ant': q_ant, 'q_act': q_act, 'min_base': MIN_BASE_DIMENSION})
+
+    if verbose:
+        print(f"   🧮 Shift-share: {len(resultado['dimensiones'])} dimensiones")
+        for dim, fila in resultado['dimensiones'].head(3).iterrows():
+            print(f"   • {fila['dimension_label']}: mix {fila['mix']:+.2f} | tasa {fila['tasa']:+.2f} "
+                  f"| poder {fila['poder_explicativo']:.2f}")
+    return resultado
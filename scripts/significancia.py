@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════════════
+CAPA DE SIGNIFICANCIA ESTADÍSTICA (Δ NPS, WATERFALL, PRODUCTOS)
+═══════════════════════════════════════════════════════════════════════════════
+
+Los umbrales fijos (0.3pp de efecto de producto, 0.5pp de driver, etc.) no
+miran el tamaño de muestra: con 150 encuestados un Δ de 2pp es ruido y con
+8.000 un Δ de 0.4pp es real. Esta capa agrega error estándar y z-score a
+cada delta para que los consumidores (sugerencias de búsqueda, prompts
+semánticos) salteen lo que no es distinguible de cero.
+
+Todas las métricas son promedios por encuestado de un puntaje x, así que
+comparten un mismo estimador:
+    SE(x̄) = escala × √((Σx²/n − x̄²) / n)
+    NPS:           x ∈ {−1, 0, 1}                  (Σx = P − D, Σx² = P + D)
+    contribución:  x = 2 detractor / 1 neutro con el motivo, 0 si no
+    share:         x ∈ {0, 1}
+Los quarters son muestras independientes: SE(Δ) = √(SE₁² + SE₂²).
+El efecto total de un producto (Mix + NPS Effect) usa el método delta sobre
+share, NPS usuario y NPS no usuario (share y promedios condicionales son
+asintóticamente independientes).
+
+Todo opera sobre arrays / DataFrames completos (motivos × marcas, productos
+× marcas), sin loops por fila.
+
+Uso:
+    from significancia import significancia_waterfall, significancia_productos
+    sig = significancia_waterfall(calcular_contribuciones(...), q_ant, q_act)
+    sig.loc['Atención', 'Significativo']
+"""
+
+import numpy as np
+import pandas as pd
+
+# z crítico a dos colas (95%)
+Z_CRITICO = 1.96
+
+
+# ==============================================================================
+# ESTIMADORES
+# ==============================================================================
+
+def se_media(suma, suma_cuadrados, n, escala=100):
+    """
+    Error estándar del promedio de un puntaje por encuestado.
+
+    Args:
+        suma, suma_cuadrados: Σx y Σx² (arrays del mismo shape)
+        n: encuestados (mismo shape o broadcastable)
+        escala: 100 para expresar en pp
+
+    Returns:
+        np.ndarray; NaN donde n == 0
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        n = np.where(np.asarray(n) > 0, n, np.nan)
+        media = suma / n
+        varianza = np.maximum(suma_cuadrados / n - media ** 2, 0)
+        return escala * np.sqrt(varianza / n)
+
+
+def se_proporcion(pct, n):
+    """Error estándar (pp) de un porcentaje pct (0..100) sobre n casos."""
+    p = np.asarray(pct, dtype=float) / 100
+    return se_media(p * n, p * n, n)
+
+
+def se_nps(detractores, neutros, promotores):
+    """Error estándar (pp) del NPS a partir de los conteos de cada clase."""
+    n = detractores + neutros + promotores
+    return se_media(promotores - detractores, promotores + detractores, n)
+
+
+def prueba_delta(delta, se_1, se_2, z_critico=Z_CRITICO):
+    """
+    z-score de un Δ entre dos quarters independientes.
+
+    Un SE de 0 con Δ ≠ 0 (ej. 0% → 100%) da z = ±inf; SE NaN (sin base en
+    algún quarter) da z NaN y no significativo.
+
+    Returns:
+        dict con se, z y significativo (mismo shape que delta)
+    """
+    delta = np.asarray(delta, dtype=float)
+    se = np.sqrt(np.asarray(se_1, dtype=float) ** 2 + np.asarray(se_2, dtype=float) ** 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(se > 0, delta / se, np.sign(delta) * np.inf)
+    z = np.where(np.isnan(se), np.nan, np.where((se == 0) & (delta == 0), 0.0, z))
+    return {'se': se, 'z': z, 'significativo': np.abs(np.nan_to_num(z)) >= z_critico}
+
+
+# ==============================================================================
+# WATERFALL (CONTRIBUCIONES POR MOTIVO)
+# ==============================================================================
+
+def _con_grupo(obj):
+    """Índice (grupo, quarter) aunque venga solo por quarter (grupo único None)."""
+    if isinstance(obj.index, pd.MultiIndex):
+        return obj
+    obj = obj.copy()
+    obj.index = pd.MultiIndex.from_product([[None], obj.index])
+    return obj
+
+
+def significancia_waterfall(contribuciones, q_ant, q_act, z_critico=Z_CRITICO):
+    """
+    Δ, SE y z de la contribución de cada motivo entre q_ant y q_act.
+
+    Args:
+        contribuciones: dict de parte6_waterfall.calcular_contribuciones
+            (índice quarter o (grupo, quarter); usa pesos, pesos_cuadrado y total)
+        q_ant, q_act: quarters a comparar
+
+    Returns:
+        DataFrame con Delta, SE_Delta, Z y Significativo indexado por Motivo
+        (o por (grupo, Motivo) si las contribuciones vienen por grupo)
+    """
+    por_grupo = isinstance(contribuciones['total'].index, pd.MultiIndex)
+    pesos = _con_grupo(contribuciones['pesos'])
+    cuadrados = _con_grupo(contribuciones['pesos_cuadrado'])
+    total = _con_grupo(contribuciones['total'])
+    grupos = total.index.get_level_values(0).unique()
+    motivos = pesos.columns
+
+    def corte(q):
+        filas = pd.MultiIndex.from_product([grupos, [q]])
+        n = total.reindex(filas).fillna(0).to_numpy()[:, None]
+        p = pesos.reindex(index=filas, columns=motivos).fillna(0).to_numpy()
+        p2 = cuadrados.reindex(index=filas, columns=motivos).fillna(0).to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            contrib = np.where(n > 0, p / n * 100, 0.0)
+        return contrib, se_media(p, p2, np.broadcast_to(n, p.shape))
+
+    c_ant, se_ant = corte(q_ant)
+    c_act, se_act = corte(q_act)
+    delta = c_act - c_ant
+    prueba = prueba_delta(delta, se_ant, se_act, z_critico)
+
+    indice = pd.MultiIndex.from_product([grupos, motivos], names=['grupo', 'Motivo'])
+    tabla = pd.DataFrame({
+        'Delta': delta.ravel(),
+        'SE_Delta': prueba['se'].ravel(),
+        'Z': prueba['z'].ravel(),
+        'Significativo': prueba['significativo'].ravel(),
+    }, index=indice)
+    return tabla if por_grupo else tabla.droplevel('grupo')
+
+
+def significancia_nps(contribuciones, q_ant, q_act, z_critico=Z_CRITICO):
+    """
+    Δ NPS con SE y z entre q_ant y q_act (por grupo si aplica).
+
+    Returns:
+        DataFrame con delta, se, z, significativo indexado por grupo
+        (una sola fila con índice None si no hay grupo)
+    """
+    nps = _con_grupo(contribuciones['nps'])
+    se = _con_grupo(contribuciones['se_nps'])
+    grupos = nps.index.get_level_values(0).unique()
+
+    def corte(serie, q):
+        return serie.reindex(pd.MultiIndex.from_product([grupos, [q]])).to_numpy(dtype=float)
+
+    delta = corte(nps, q_act) - corte(nps, q_ant)
+    prueba = prueba_delta(delta, corte(se, q_ant), corte(se, q_act), z_critico)
+    return pd.DataFrame({'delta': delta, 'se': prueba['se'], 'z': prueba['z'],
+                         'significativo': prueba['significativo']}, index=grupos)
+
+
+# ==============================================================================
+# PRODUCTOS (EFECTO TOTAL = MIX + NPS EFFECT)
+# ==============================================================================
+
+def significancia_productos(metricas, q1, q2, z_critico=Z_CRITICO):
+    """
+    SE y z del efecto total de cada producto para TODAS las marcas con datos
+    en q1 y q2 (batch sobre parte8.metricas_productos_site).
+
+    Efecto total (mismo que resumen_productos_site, sin redondeos):
+        TE = [(s2 − s1) × (u2 − nu2) + s2 × (u2 − u1)] / 100
+    con s = share (%), u / nu = NPS usuario / no usuario. SE por método delta.
+
+    Returns:
+        DataFrame indexado por (MARCA, producto) con total_effect,
+        se_total_effect, z_total_effect, se_delta_nps_usuario,
+        z_delta_nps_usuario y significativo (del efecto total)
+    """
+    productos = metricas['productos']
+    grupos = metricas['grupos']
+    marcas = [m for m in grupos.index.get_level_values(0).unique()
+              if (m, q1) in grupos.index and (m, q2) in grupos.index]
+    if not marcas:
+        return pd.DataFrame()
+
+    n_productos = len(productos) // len(grupos)
+    nombres = productos.index.get_level_values(2)[:n_productos]
+
+    def matriz(q, campo):
+        pos = grupos.index.get_indexer([(m, q) for m in marcas])
+        return productos[campo].to_numpy(dtype=float).reshape(len(grupos), n_productos)[pos]
+
+    def total(q):
+        return grupos['total'].reindex([(m, q) for m in marcas]).to_numpy(dtype=float)[:, None]
+
+    def se_nps_segmento(q, sufijo):
+        validos = matriz(q, f'validos_{sufijo}')
+        suma = matriz(q, f'nps_{sufijo}') * validos / 100
+        return se_media(suma, matriz(q, f'cuadrados_{sufijo}'), validos)
+
+    s1, s2 = matriz(q1, 'share'), matriz(q2, 'share')
+    u1, u2 = matriz(q1, 'nps_usuario'), matriz(q2, 'nps_usuario')
+    nu2 = matriz(q2, 'nps_no_usuario')
+    var_s1 = se_proporcion(s1, total(q1)) ** 2
+    var_s2 = se_proporcion(s2, total(q2)) ** 2
+    var_u1 = se_nps_segmento(q1, 'usuario') ** 2
+    var_u2 = se_nps_segmento(q2, 'usuario') ** 2
+    var_nu2 = se_nps_segmento(q2, 'no_usuario') ** 2
+
+    efecto = ((s2 - s1) * (u2 - nu2) + s2 * (u2 - u1)) / 100
+    # Gradiente de TE (× 100) respecto de s1, s2, u1, u2, nu2; sin usuarios en un quarter no aporta varianza
+    gradientes = [
+        (-(u2 - nu2), var_s1),
+        ((u2 - nu2) + (u2 - u1), var_s2),
+        (-s2, var_u1),
+        ((s2 - s1) + s2, var_u2),
+        (-(s2 - s1), var_nu2),
+    ]
+    varianza = sum(g ** 2 * np.nan_to_num(v) for g, v in gradientes) / 100 ** 2
+    se_efecto = np.sqrt(varianza)
+    prueba_efecto = prueba_delta(efecto, se_efecto, 0, z_critico)
+    prueba_nps = prueba_delta(u2 - u1, np.sqrt(var_u1), np.sqrt(var_u2), z_critico)
+
+    indice = pd.MultiIndex.from_arrays([
+        np.repeat(np.asarray(marcas, dtype=object), n_productos),
+        np.tile(np.asarray(nombres, dtype=object), len(marcas)),
+    ], names=[grupos.index.names[0], 'producto'])
+    return pd.DataFrame({
+        'total_effect': efecto.ravel(),
+        'se_total_effect': se_efecto.ravel(),
+        'z_total_effect': prueba_efecto['z'].ravel(),
+        'se_delta_nps_usuario': prueba_nps['se'].ravel(),
+        'z_delta_nps_usuario': prueba_nps['z'].ravel(),
+        'significativo': prueba_efecto['significativo'].ravel(),
+    }, index=indice)
+
+
+# ==============================================================================
+# FILTRO PARA CONSUMIDORES
+# ==============================================================================
+
+def es_significativo(driver):
+    """
+    True salvo que el driver venga marcado explícitamente como no significativo
+    (drivers sin la marca, ej. armados a mano, se consideran significativos).
+    """
+    valor = driver.get('significativo', True)
+    return True if valor is None or (isinstance(valor, float) and np.isnan(valor)) else bool(valor)
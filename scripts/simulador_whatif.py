@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════════════
+SIMULADOR WHAT-IF DEL NPS (QUEJAS Y PRODUCTOS)
+═══════════════════════════════════════════════════════════════════════════════
+
+"¿Qué NPS tendríamos si las quejas de Financiamiento volvieran al nivel del
+quarter anterior?" / "¿y si el uso de tarjeta de crédito creciera 5pp?"
+
+El simulador recalcula el NPS del quarter actual desde arrays chicos que la
+corrida ya calculó, sin volver a correr el pipeline:
+
+    Waterfall (parte6): NPS + Σ contribución de motivos + sin desglose = 100,
+        así que bajar x pp la contribución de un motivo sube x pp el NPS
+        (esos detractores / neutros pasan a promotores, como en Full Potential).
+    Productos (parte8): mismos efectos que la tabla de productos
+        Mix Effect = Δ Share × Lift / 100      (Lift = NPS usuario − no usuario)
+        NPS Effect = Share × Δ NPS Usuario / 100
+    Los efectos se suman (mismo supuesto que "total explicado" de parte8:
+    productos que se superponen pueden contar dos veces).
+
+La base (armar_base_simulacion) es un dict JSON-serializable; la corrida la
+guarda en outputs/ y el reporte HTML la embebe para el widget interactivo,
+que replica simular_nps en JS.
+
+Uso:
+    from simulador_whatif import armar_base_simulacion, simular_nps
+    base = armar_base_simulacion(resultados, config)
+    simular_nps(base, motivos={'Financiamiento': 'q_ant'}, shares={'Tarjeta de crédito': '+5'})
+
+    python scripts/simulador_whatif.py outputs/Simulador_NPS_Mercado_Pago_MLA_25Q4.json \\
+        --motivo "Financiamiento=q_ant" --share "Tarjeta de crédito=+5"
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+
+# ==============================================================================
+# BASE (ARRAYS PRECALCULADOS DE LA CORRIDA)
+# ==============================================================================
+
+def armar_base_simulacion(resultados, config):
+    """
+    Arrays del player para simular: contribución de cada motivo y share /
+    NPS usuario / NPS no usuario de cada producto válido, en q_ant y q_act.
+
+    Args:
+        resultados: dict de ejecutar_modelo (usa waterfall y productos)
+        config: Diccionario de configuración
+
+    Returns:
+        dict JSON-serializable (sin NaN: los productos con algún valor
+        faltante quedan en productos_descartados); o {'error': ...}
+    """
+    site, player = config['site'], config['player']
+    q_ant, q_act = config['periodo_1'], config['periodo_2']
+
+    contribuciones = (resultados.get('waterfall') or {}).get('contribuciones')
+    if contribuciones is None or q_act not in contribuciones['nps'].index:
+        return {'error': f'Sin contribuciones del waterfall de {player} en {q_act}'}
+
+    nps_base = float(contribuciones['nps'][q_act])
+    if not np.isfinite(nps_base):
+        return {'error': f'NPS de {player} en {q_act} sin dato'}
+
+    contrib = contribuciones['contrib']
+    actual = contrib.loc[q_act].sort_values(ascending=False) if q_act in contrib.index else contrib.iloc[:0, 0]
+    motivos = [str(m) for m in actual.index[actual > 0]]
+    fila = lambda q: contrib.reindex(index=[q], columns=motivos).fillna(0).to_numpy(dtype=float)[0]
+
+    base = {
+        'site': site, 'player': player, 'q_ant': q_ant, 'q_act': q_act,
+        'nps_base': nps_base,
+        'motivos': motivos,
+        'contrib_act': fila(q_act).round(3).tolist(),
+        'contrib_ant': fila(q_ant).round(3).tolist(),
+        'productos': [], 'share_act': [], 'share_ant': [],
+        'nps_usuario_act': [], 'nps_usuario_ant': [], 'nps_no_usuario_act': [],
+    }
+
+    summary = (resultados.get('productos') or {}).get('summary')
+    if summary is not None and len(summary):
+        lbl_producto = 'Produto' if site == 'MLB' else 'Producto'
+        lbl_nps_usuario = 'NPS Usuário' if site == 'MLB' else 'NPS Usuario'
+        lbl_nps_no_usuario = 'NPS No Usuário' if site == 'MLB' else 'NPS No Usuario'
+        columnas = {
+            'share_act': f'Share {q_act}', 'share_ant': f'Share {q_ant}',
+            'nps_usuario_act': f'{lbl_nps_usuario} {q_act}', 'nps_usuario_ant': f'{lbl_nps_usuario} {q_ant}',
+            'nps_no_usuario_act': f'{lbl_nps_no_usuario} {q_act}',
+        }
+        valores = summary[list(columnas.values())].astype(float)
+        # Productos sin share o NPS en algún quarter (NaN) no se pueden simular
+        completos = np.isfinite(valores.to_numpy()).all(axis=1)
+        base['productos'] = summary.loc[completos, lbl_producto].astype(str).tolist()
+        base['productos_descartados'] = summary.loc[~completos, lbl_producto].astype(str).tolist()
+        for clave, col in columnas.items():
+            base[clave] = valores.loc[completos, col].round(3).tolist()
+    return base
+
+
+def guardar_base_simulacion(base, output_dir=None):
+    """Guarda la base en outputs/Simulador_NPS_{player}_{site}_{q_act}.json."""
+    output_dir = Path(output_dir) if output_dir else Path(__file__).parent.parent / 'outputs'
+    output_dir.mkdir(parents=True, exist_ok=True)
+    ruta = output_dir / f"Simulador_NPS_{base['player'].replace(' ', '_')}_{base['site']}_{base['q_act']}.json"
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(base, f, ensure_ascii=False, indent=1, allow_nan=False)
+    return str(ruta)
+
+
+def cargar_base_simulacion(ruta):
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+# ==============================================================================
+# SIMULACIÓN
+# ==============================================================================
+
+def resolver_valor(valor, actual, anterior):
+    """
+    Nuevo nivel de un driver a partir de lo que pide el analista:
+    'q_ant' = nivel del quarter anterior, '+x' / '-x' = delta sobre el
+    actual, número sin signo = nivel absoluto.
+    """
+    if isinstance(valor, str):
+        texto = valor.strip().replace(',', '.')
+        if texto.lower() == 'q_ant':
+            return anterior
+        if texto[:1] in '+-':
+            return actual + float(texto)
+        return float(texto)
+    return float(valor)
+
+
+def _aplicar(nombres, actual, anterior, cambios, tipo):
+    """Array con los nuevos niveles (copia de actual con los cambios pedidos)."""
+    nuevo = np.array(actual, dtype=float)
+    for nombre, valor in (cambios or {}).items():
+        if nombre not in nombres:
+            raise ValueError(f"{tipo} desconocido: '{nombre}'. Disponibles: {', '.join(nombres)}")
+        i = nombres.index(nombre)
+        nuevo[i] = resolver_valor(valor, actual[i], anterior[i])
+    return nuevo
+
+
+def simular_nps(base, motivos=None, shares=None, nps_usuarios=None):
+    """
+    NPS simulado del quarter actual.
+
+    Args:
+        base: dict de armar_base_simulacion
+        motivos: {motivo: nivel de contribución (pp)} ('q_ant', '+x', '-x' o número)
+        shares: {producto: share (%)} (idem)
+        nps_usuarios: {producto: NPS de usuarios} (idem)
+
+    Returns:
+        dict con nps_base, nps_simulado, delta, efecto_motivos, efecto_mix,
+        efecto_nps_usuario y detalle (un item por driver modificado)
+    """
+    motivos_base = base['motivos']
+    productos = base['productos']
+    c_act = np.asarray(base['contrib_act'], dtype=float)
+    s_act = np.asarray(base['share_act'], dtype=float)
+    u_act = np.asarray(base['nps_usuario_act'], dtype=float)
+    nu_act = np.asarray(base['nps_no_usuario_act'], dtype=float)
+
+    c_nuevo = np.clip(_aplicar(motivos_base, c_act, base['contrib_ant'], motivos, 'Motivo'), 0, 100)
+    s_nuevo = np.clip(_aplicar(productos, s_act, base['share_ant'], shares, 'Producto'), 0, 100)
+    u_nuevo = np.clip(_aplicar(productos, u_act, base['nps_usuario_ant'], nps_usuarios, 'Producto'), -100, 100)
+
+    efecto_motivo = -(c_nuevo - c_act)
+    efecto_mix = (s_nuevo - s_act) * (u_act - nu_act) / 100
+    efecto_nps_usuario = s_nuevo * (u_nuevo - u_act) / 100
+
+    nps_simulado = float(np.clip(base['nps_base'] + efecto_motivo.sum() + efecto_mix.sum()
+                                 + efecto_nps_usuario.sum(), -100, 100))
+
+    detalle = []
+    for i in np.flatnonzero(c_nuevo != c_act):
+        detalle.append({'tipo': 'Motivo', 'driver': motivos_base[i], 'actual': float(c_act[i]),
+                        'simulado': float(c_nuevo[i]), 'efecto': float(efecto_motivo[i])})
+    for i in np.flatnonzero(s_nuevo != s_act):
+        detalle.append({'tipo': 'Share', 'driver': productos[i], 'actual': float(s_act[i]),
+                        'simulado': float(s_nuevo[i]), 'efecto': float(efecto_mix[i])})
+    for i in np.flatnonzero(u_nuevo != u_act):
+        detalle.append({'tipo': 'NPS usuario', 'driver': productos[i], 'actual': float(u_act[i]),
+                        'simulado': float(u_nuevo[i]), 'efecto': float(efecto_nps_usuario[i])})
+
+    return {
+        'nps_base': base['nps_base'],
+        'nps_simulado': nps_simulado,
+        'delta': nps_simulado - base['nps_base'],
+        'efecto_motivos': float(efecto_motivo.sum()),
+        'efecto_mix': float(efecto_mix.sum()),
+        'efecto_nps_usuario': float(efecto_nps_usuario.sum()),
+        'detalle': detalle,
+    }
+
+
+# ==============================================================================
+# CLI
+# ==============================================================================
+
+def _parsear_cambios(items):
+    """['Financiamiento=q_ant', 'Pix=+5'] → {'Financiamiento': 'q_ant', 'Pix': '+5'}"""
+    cambios = {}
+    for item in items or []:
+        nombre, sep, valor = item.rpartition('=')
+        if not sep or not nombre.strip():
+            raise ValueError(f"Formato inválido '{item}' (esperado NOMBRE=VALOR)")
+        cambios[nombre.strip()] = valor.strip()
+    return cambios
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Simulador what-if del NPS sobre la base guardada por una corrida',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Valores: q_ant (nivel del quarter anterior), +x / -x (delta sobre el actual) o x (nivel).
+
+Ejemplos:
+  python scripts/simulador_whatif.py outputs/Simulador_NPS_Mercado_Pago_MLA_25Q4.json --listar
+  python scripts/simulador_whatif.py outputs/Simulador_NPS_Mercado_Pago_MLA_25Q4.json --motivo "Financiamiento=q_ant"
+  python scripts/simulador_whatif.py outputs/Simulador_NPS_Mercado_Pago_MLA_25Q4.json --share "Tarjeta de crédito=+5"
+        """
+    )
+    parser.add_argument('base', help='JSON de la base (outputs/Simulador_NPS_*.json)')
+    parser.add_argument('--motivo', action='append', metavar='MOTIVO=VALOR',
+                        help='Contribución del motivo al NPS perdido (pp)')
+    parser.add_argument('--share', action='append', metavar='PRODUCTO=VALOR',
+                        help='Share de uso del producto (%%)')
+    parser.add_argument('--nps-usuario', action='append', metavar='PRODUCTO=VALOR',
+                        help='NPS de los usuarios del producto')
+    parser.add_argument('--listar', action='store_true', help='Mostrar drivers disponibles y sus niveles')
+    args = parser.parse_args(argv)
+
+    base = cargar_base_simulacion(args.base)
+    print(f"🎯 {base['player']} ({base['site']}) {base['q_act']} | NPS {base['nps_base']:.1f}")
+
+    if args.listar:
+        print(f"\n📉 Motivos (contribución pp {base['q_ant']} → {base['q_act']}):")
+        for m, ant, act in zip(base['motivos'], base['contrib_ant'], base['contrib_act']):
+            print(f"   • {m}: {ant:.1f} → {act:.1f}")
+        print(f"\n📦 Productos (share % | NPS usuario {base['q_act']}):")
+        for p, s, u in zip(base['productos'], base['share_act'], base['nps_usuario_act']):
+            print(f"   • {p}: {s:.1f}% | {u:.1f}")
+        return 0
+
+    try:
+        resultado = simular_nps(base, motivos=_parsear_cambios(args.motivo), shares=_parsear_cambios(args.share),
+                                nps_usuarios=_parsear_cambios(args.nps_usuario))
+    except ValueError as e:
+        parser.error(str(e))
+
+    for d in resultado['detalle']:
+        print(f"   • {d['tipo']} {d['driver']}: {d['actual']:.1f} → {d['simulado']:.1f} ({d['efecto']:+.2f}pp NPS)")
+    print(f"\n📊 NPS simulado: {resultado['nps_simulado']:.1f} ({resultado['delta']:+.2f}pp)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Utilidades para el modo de renderizado de gráficos.
+
+Los gráficos del reporte se pueden generar de dos formas:
+- "js"  (default): cada parte devuelve un dict compacto con los datos del
+  gráfico (clave ``grafico_*_data``) y el HTML lo dibuja con Chart.js en el navegador.
+  No se importa matplotlib.
+- "png": comportamiento original, matplotlib renderiza PNGs que se embeben
+  como base64 (clave ``grafico_*_base64``).
+
+El modo se toma de ``parametros.modo_graficos`` en config.yaml o del flag
+``--graficos`` de correr_modelo.py.
+"""
+
+import math
+from typing import Any, Dict, List, Optional
+
+MODOS_GRAFICOS = ('js', 'png')
+MODO_GRAFICOS_DEFAULT = 'js'
+
+
+def get_modo_graficos(config: Optional[Dict[str, Any]]) -> str:
+    """
+    Retorna el modo de gráficos configurado ('js' o 'png').
+
+    Args:
+        config: Diccionario de configuración (de PARTE 1)
+
+    Returns:
+        str: Modo válido; si el valor configurado no es válido usa el default
+    """
+    if not config:
+        return MODO_GRAFICOS_DEFAULT
+    modo = config.get('modo_graficos') or config.get('parametros', {}).get('modo_graficos')
+    modo = str(modo).strip().lower() if modo else MODO_GRAFICOS_DEFAULT
+    return modo if modo in MODOS_GRAFICOS else MODO_GRAFICOS_DEFAULT
+
+
+def usar_png(config: Optional[Dict[str, Any]]) -> bool:
+    """True si los gráficos deben renderizarse con matplotlib."""
+    return get_modo_graficos(config) == 'png'
+
+
+def valores_json(valores, decimales: int = 1) -> List[Optional[float]]:
+    """
+    Convierte una secuencia numérica en lista serializable a JSON.
+
+    Redondea para que el bloque de datos sea compacto y reemplaza NaN/None
+    por None (Chart.js lo interpreta como hueco en la serie).
+    """
+    salida = []
+    for v in valores:
+        try:
+            f = float(v)
+        except (TypeError, ValueError):
+            salida.append(None)
+            continue
+        salida.append(None if math.isnan(f) or math.isinf(f) else round(f, decimales))
+    return salida
+
+
+def fig_a_base64(fig) -> str:
+    """Serializa una figura de matplotlib como PNG base64 y la cierra."""
+    import io
+    import base64
+    import matplotlib.pyplot as plt
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=120, bbox_inches='tight', facecolor='white')
+    buf.seek(0)
+    b64 = base64.b64encode(buf.read()).decode('utf-8')
+    buf.close()
+    plt.close(fig)
+    return b64
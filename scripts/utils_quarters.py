@@ -173,6 +173,24 @@ def get_last_n_quarters(quarters: List[str], max_quarter: str, n: int = 5) -> Li
     return sorted_qs[-n:] if len(sorted_qs) > n else sorted_qs
 
 
+def quarters_historico(config: dict, minimo: int = 5) -> int:
+    """
+    Cantidad de quarters del histórico (categorización, principalidad, seguridad).
+
+    Son 5 salvo que la corrida pida una ventana más larga (--window N,
+    config['parametros']['ventana_quarters']).
+
+    Args:
+        config: Diccionario de configuración
+        minimo: Histórico por defecto
+
+    Returns:
+        int: max(minimo, ventana)
+    """
+    ventana = (config.get('parametros') or {}).get('ventana_quarters') or 0
+    return max(minimo, int(ventana))
+
+
 def filter_dataframe_by_quarters(df: pd.DataFrame,
                                   quarter_col: str,
                                   max_quarter: str,
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+═══════════════════════════════════════════════════════════════════════════════
+VENTANA DE QUARTERS (--window N): TRAYECTORIA DE DRIVERS
+═══════════════════════════════════════════════════════════════════════════════
+
+Una corrida compara q1 vs q2. Con --window N se reportan además TODOS los
+pares adyacentes de los últimos N quarters hasta q2 (N−1 pares), sin volver
+a correr el pipeline por par: los agregados que ya arman las partes cubren
+todos los quarters y cada par es un slice.
+
+    NPS y waterfall  → parte6 contribuciones (quarter × motivo, Σ peso y Σ peso²)
+    Productos        → parte8 metricas_site (marca × quarter × producto)
+    Principalidad    → parte9 principalidad_por_ola (Principales / Total)
+    Seguridad        → parte10 seguridad_por_ola (Seguros / Total)
+
+Para que el histórico cubra la ventana, ejecutar_modelo fija
+config['parametros']['ventana_quarters'] = N antes de parte4 (categorización,
+principalidad y seguridad usan max(5, N) quarters; ver
+utils_quarters.quarters_historico).
+
+Cada delta lleva SE / z / significativo (significancia.py), así el reporte
+distingue un driver que empeora de forma sostenida de uno que oscila dentro
+del ruido.
+
+Uso:
+    from ventana_quarters import analizar_ventana
+    ventana = analizar_ventana(resultados, config, n_quarters=5)
+    ventana['trayectoria']   # driver × par con delta, z, significativo
+"""
+
+import numpy as np
+import pandas as pd
+
+from parte8_productos import filtrar_productos_validos, resumen_productos_site
+from significancia import (
+    prueba_delta, se_proporcion, significancia_nps, significancia_productos, significancia_waterfall,
+)
+from utils_quarters import get_last_n_quarters
+
+# Tipos de driver en el orden del reporte
+TIPOS_DRIVER = ['NPS', 'Motivo', 'Producto', 'Principalidad', 'Seguridad']
+
+
+# ==============================================================================
+# QUARTERS Y PARES
+# ==============================================================================
+
+def quarters_ventana(disponibles, q_act, n):
+    """Últimos n quarters (ordenados) que terminan en q_act."""
+    return get_last_n_quarters([str(q) for q in disponibles], q_act, n=n)
+
+
+def etiqueta_par(q_ant, q_act):
+    return f'{q_ant}→{q_act}'
+
+
+def pares_adyacentes(quarters):
+    """[(q1, q2), (q2, q3), ...] de una lista ordenada de quarters."""
+    return list(zip(quarters[:-1], quarters[1:]))
+
+
+# ==============================================================================
+# TRAYECTORIAS POR FUENTE
+# ==============================================================================
+
+def ventana_nps(contribuciones, pares):
+    """
+    Δ NPS del player por par con SE / z.
+
+    Returns:
+        DataFrame indexado por par con nps_ant, nps_act, delta, se, z, significativo
+    """
+    nps = contribuciones['nps']
+    filas = []
+    for q_ant, q_act in pares:
+        sig = significancia_nps(contribuciones, q_ant, q_act).iloc[0]
+        filas.append({'par': etiqueta_par(q_ant, q_act),
+                      'nps_ant': float(nps.get(q_ant, np.nan)), 'nps_act': float(nps.get(q_act, np.nan)),
+                      'delta': sig['delta'], 'se': sig['se'], 'z': sig['z'],
+                      'significativo': bool(sig['significativo'])})
+    return pd.DataFrame(filas).set_index('par')
+
+
+def ventana_waterfall(contribuciones, pares):
+    """
+    Δ de la contribución de cada motivo (pp de NPS perdido; + = empeora) por par.
+
+    Los pares con algún quarter sin motivos categorizados quedan afuera
+    (sin desglose) en vez de mostrar la contribución completa como Δ.
+
+    Returns:
+        (DataFrame indexado por (par, Motivo) con Delta, SE_Delta, Z, Significativo,
+         lista de quarters sin desglose)
+    """
+    con_desglose = set(contribuciones['pesos'].index[contribuciones['pesos'].sum(axis=1) > 0])
+    sin_desglose = sorted({q for par in pares for q in par if q not in con_desglose})
+    tablas = {
+        etiqueta_par(q_ant, q_act): significancia_waterfall(contribuciones, q_ant, q_act)
+        for q_ant, q_act in pares
+        if q_ant in con_desglose and q_act in con_desglose
+    }
+    if not tablas:
+        return pd.DataFrame(columns=['Delta', 'SE_Delta', 'Z', 'Significativo']), sin_desglose
+    return pd.concat(tablas, names=['par']), sin_desglose
+
+
+def ventana_productos(metricas, mapeo_productos, site, player, pares):
+    """
+    Efecto total (Mix + NPS Effect) de cada producto válido del player por par.
+
+    Cada par es resumen_productos_site + filtrar_productos_validos (mismos
+    criterios que la tabla de parte8) + significancia_productos, sobre las
+    métricas del site ya calculadas.
+
+    Returns:
+        DataFrame indexado por (par, producto) con share_act, mix_effect,
+        nps_effect, total_effect, z_total_effect, significativo
+    """
+    lbl_producto = 'Produto' if site == 'MLB' else 'Producto'
+    columna_de = {nombre: col for col, nombre in reversed(list(mapeo_productos.items()))}
+    tablas = {}
+    for q_ant, q_act in pares:
+        summary = resumen_productos_site(metricas, mapeo_productos, site, q_ant, q_act)
+        if summary.empty:
+            continue
+        summary = summary[summary['MARCA'] == player].drop(columns='MARCA')
+        validos = filtrar_productos_validos(summary, q_act, lbl_producto)
+        if validos.empty:
+            continue
+        sig = significancia_productos(metricas, q_ant, q_act).reindex(
+            [(player, columna_de.get(nombre)) for nombre in validos[lbl_producto]]
+        )
+        tablas[etiqueta_par(q_ant, q_act)] = pd.DataFrame({
+            'share_act': validos[f'Share {q_act}'].to_numpy(),
+            'mix_effect': validos['Mix Effect'].to_numpy(),
+            'nps_effect': validos['NPS Effect'].to_numpy(),
+            'total_effect': validos['Total Effect'].to_numpy(),
+            'z_total_effect': sig['z_total_effect'].to_numpy(),
+            'significativo': sig['significativo'].fillna(False).astype(bool).to_numpy(),
+        }, index=pd.Index(validos[lbl_producto], name='producto'))
+    if not tablas:
+        return pd.DataFrame()
+    return pd.concat(tablas, names=['par'])
+
+
+def ventana_proporcion(por_ola, player, col_exitos, pares, col_periodo='OLA'):
+    """
+    Δ de un porcentaje del player (exitos / Total) por par, con z de dos
+    proporciones independientes.
+
+    Args:
+        por_ola: DataFrame por (quarter, MARCA) con Total y col_exitos
+            (principalidad_por_ola, seguridad_por_ola)
+        col_exitos: 'Principales' o 'Seguros'
+
+    Returns:
+        DataFrame indexado por par con pct_ant, pct_act, delta, z, significativo
+    """
+    if por_ola is None or por_ola.empty:
+        return pd.DataFrame()
+    del_player = por_ola[por_ola['MARCA'] == player]
+    del_player = del_player.assign(_Q=del_player[col_periodo].astype(str)).groupby('_Q')[['Total', col_exitos]].sum()
+    quarters = [q for par in pares for q in par]
+    total = del_player['Total'].reindex(quarters).to_numpy(dtype=float).reshape(-1, 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = np.where(total > 0, del_player[col_exitos].reindex(quarters).to_numpy(dtype=float).reshape(-1, 2)
+                       / total * 100, np.nan)
+    se = se_proporcion(pct, np.nan_to_num(total))
+    prueba = prueba_delta(pct[:, 1] - pct[:, 0], se[:, 0], se[:, 1])
+    return pd.DataFrame({
+        'pct_ant': pct[:, 0], 'pct_act': pct[:, 1], 'delta': pct[:, 1] - pct[:, 0],
+        'z': prueba['z'], 'significativo': prueba['significativo'],
+    }, index=pd.Index([etiqueta_par(a, b) for a, b in pares], name='par'))
+
+
+def _filas_trayectoria(tipo, tabla, col_delta, col_z, col_significativo):
+    """Pasa una tabla por par (o (par, driver)) al formato largo de la trayectoria."""
+    if tabla is None or tabla.empty:
+        return pd.DataFrame()
+    plana = tabla.reset_index()
+    driver = plana[plana.columns[1]] if isinstance(tabla.index, pd.MultiIndex) else tipo
+    return pd.DataFrame({
+        'tipo': tipo, 'driver': driver, 'par': plana['par'],
+        'delta': plana[col_delta].astype(float), 'z': plana[col_z].astype(float),
+        'significativo': plana[col_significativo].fillna(False).astype(bool),
+    })
+
+
+# ==============================================================================
+# FUNCIÓN PRINCIPAL
+# ==============================================================================
+
+def analizar_ventana(resultados, config, n_quarters=None, verbose=True):
+    """
+    NPS, waterfall, productos, principalidad y seguridad del player para cada
+    par de quarters adyacentes de la ventana que termina en periodo_2.
+
+    Args:
+        resultados: dict de ejecutar_modelo (usa waterfall, productos,
+            principalidad y seguridad)
+        config: Diccionario de configuración
+        n_quarters: Largo de la ventana; si None, config['parametros']['ventana_quarters']
+
+    Returns:
+        dict con quarters, pares, nps, waterfall, productos, principalidad,
+        seguridad (tablas por par), trayectoria (driver × par en formato largo)
+        y quarters_sin_desglose; o {'error': ...}
+    """
+    site, player, q_act = config['site'], config['player'], config['periodo_2']
+    n = n_quarters or (config.get('parametros') or {}).get('ventana_quarters')
+    if not n or n < 2:
+        return {'error': 'La ventana necesita al menos 2 quarters'}
+
+    contribuciones = (resultados.get('waterfall') or {}).get('contribuciones')
+    if contribuciones is None:
+        return {'error': 'Sin contribuciones del waterfall (parte6) para armar la ventana'}
+
+    quarters = quarters_ventana(contribuciones['total'].index, q_act, n)
+    if len(quarters) < 2:
+        return {'error': f'Menos de 2 quarters con datos hasta {q_act} para {player}'}
+    pares = pares_adyacentes(quarters)
+
+    nps = ventana_nps(contribuciones, pares)
+    waterfall, sin_desglose = ventana_waterfall(contribuciones, pares)
+
+    prod = resultados.get('productos') or {}
+    productos = pd.DataFrame()
+    if prod.get('metricas_site') and prod.get('mapeo_productos'):
+        productos = ventana_productos(prod['metricas_site'], prod['mapeo_productos'], site, player, pares)
+
+    principalidad = ventana_proporcion((resultados.get('principalidad') or {}).get('principalidad_por_ola'),
+                                       player, 'Principales', pares)
+    seguridad = ventana_proporcion((resultados.get('seguridad') or {}).get('seguridad_por_ola'),
+                                   player, 'Seguros', pares)
+
+    trayectoria = pd.concat([
+        _filas_trayectoria('NPS', nps, 'delta', 'z', 'significativo'),
+        _filas_trayectoria('Motivo', waterfall, 'Delta', 'Z', 'Significativo'),
+        _filas_trayectoria('Producto', productos, 'total_effect', 'z_total_effect', 'significativo'),
+        _filas_trayectoria('Principalidad', principalidad, 'delta', 'z', 'significativo'),
+        _filas_trayectoria('Seguridad', seguridad, 'delta', 'z', 'significativo'),
+    ], ignore_index=True)
+
+    if verbose:
+        print(f"   🪟 Ventana {quarters[0]} → {quarters[-1]}: {len(pares)} pares")
+        for par, fila in nps.iterrows():
+            marca = '✓' if fila['significativo'] else '·'
+            print(f"   • {par}: Δ NPS {fila['delta']:+.1f} (z {fila['z']:+.1f}) {marca}")
+        if sin_desglose:
+            print(f"   ⚠️ Sin desglose de motivos: {', '.join(sin_desglose)}")
+
+    return {
+        'quarters': quarters,
+        'pares': [etiqueta_par(a, b) for a, b in pares],
+        'nps': nps,
+        'waterfall': waterfall,
+        'productos': productos,
+        'principalidad': principalidad,
+        'seguridad': seguridad,
+        'trayectoria': trayectoria,
+        'quarters_sin_desglose': sin_desglose,
+    }
@@ -0,0 +1,322 @@
+/*
+ * Renderizadores Chart.js del reporte NPS (modo_graficos = "js").
+ *
+ * Cada gráfico se emite en el HTML como un <canvas> más un bloque
+ * <script type="application/json" class="grafico-data" data-canvas="..." data-tipo="...">
+ * con los datos compactos calculados en Python (grafico_*_data).
+ * Este script recorre esos bloques y dibuja cada uno cuando Chart.js está listo
+ * (window.NPS_CHARTJS es la promesa que resuelve la carga del Chart.js embebido).
+ */
+(function() {
+    'use strict';
+
+    var FUENTE = 'Inter';
+    var TOOLTIP = {
+        backgroundColor: 'rgba(15, 23, 42, 0.92)',
+        titleFont: { family: FUENTE, size: 13, weight: 'bold' },
+        bodyFont: { family: FUENTE, size: 12 },
+        padding: 12,
+        cornerRadius: 8
+    };
+
+    function truncar(texto, n) {
+        texto = String(texto);
+        return texto.length > n ? texto.slice(0, n) + '...' : texto;
+    }
+
+    function titulo(texto) {
+        return {
+            display: !!texto,
+            text: texto || '',
+            font: { family: FUENTE, size: 14, weight: 'bold' },
+            color: '#1e293b',
+            padding: { bottom: 16 }
+        };
+    }
+
+    function ejeX(extra) {
+        var eje = {
+            grid: { display: false },
+            ticks: { font: { family: FUENTE, size: 11, weight: '600' }, color: '#334155' },
+            border: { display: false }
+        };
+        return Object.assign(eje, extra || {});
+    }
+
+    function ejeY(d, extra) {
+        var eje = {
+            title: { display: !!d.y_titulo, text: d.y_titulo || '', font: { family: FUENTE, size: 11 }, color: '#64748b' },
+            grid: { color: 'rgba(0,0,0,0.05)' },
+            ticks: { font: { family: FUENTE, size: 10 }, color: '#64748b' },
+            border: { display: false }
+        };
+        if (d.y_min !== undefined && d.y_min !== null) eje.min = d.y_min;
+        if (d.y_max !== undefined && d.y_max !== null) eje.max = d.y_max;
+        return Object.assign(eje, extra || {});
+    }
+
+    function texto(ctx, valor, x, y, color, fuente) {
+        ctx.save();
+        ctx.fillStyle = color;
+        ctx.font = fuente;
+        ctx.textAlign = 'center';
+        ctx.textBaseline = 'middle';
+        ctx.fillText(valor, x, y);
+        ctx.restore();
+    }
+
+    // ═════════════════════════════════════════════════════════════════════
+    // WATERFALL NPS (barras flotantes: NPS → motivos → Full Potential)
+    // ═════════════════════════════════════════════════════════════════════
+    function waterfall(canvas, d) {
+        var labels = [d.etiqueta_inicio].concat(d.motivos, [d.etiqueta_fin]);
+        var rangos = [[0, d.nps]];
+        var acumulado = d.nps;
+        d.valores.forEach(function(v) {
+            rangos.push([acumulado, acumulado + (v || 0)]);
+            acumulado += (v || 0);
+        });
+        rangos.push([0, 100]);
+        var colores = ['#00a650'].concat(d.colores, ['#ffd93d']);
+        var claros = ['#c8b6ff', '#d1d8e0', '#ffd93d'];
+
+        return new Chart(canvas, {
+            type: 'bar',
+            data: {
+                labels: labels,
+                datasets: [{ data: rangos, backgroundColor: colores, borderColor: 'white', borderWidth: 1, barPercentage: 0.75 }]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                plugins: {
+                    legend: { display: false },
+                    title: titulo(d.titulo),
+                    tooltip: Object.assign({}, TOOLTIP, {
+                        callbacks: {
+                            label: function(ctx) {
+                                var r = ctx.raw;
+                                var linea = (r[1] - r[0]).toFixed(1) + ' pp';
+                                var i = ctx.dataIndex - 1;
+                                if (d.deltas && i >= 0 && i < d.deltas.length && d.deltas[i] !== null) {
+                                    linea += ' (Δ ' + (d.deltas[i] > 0 ? '+' : '') + d.deltas[i].toFixed(1) + ')';
+                                }
+                                return linea;
+                            }
+                        }
+                    })
+                },
+                scales: {
+                    x: ejeX({ ticks: { font: { family: FUENTE, size: 10 }, color: '#334155', maxRotation: 45, minRotation: 45 } }),
+                    y: ejeY({ y_min: 0, y_max: 110, y_titulo: 'NPS Score' })
+                },
+                animation: { duration: 600, easing: 'easeOutQuart' }
+            },
+            plugins: [{
+                afterDatasetsDraw: function(chart) {
+                    var ctx = chart.ctx;
+                    chart.getDatasetMeta(0).data.forEach(function(bar, i) {
+                        var r = rangos[i];
+                        var valor = r[1] - r[0];
+                        var props = bar.getProps(['x', 'y', 'base']);
+                        var medio = (props.y + props.base) / 2;
+                        var esExtremo = (i === 0 || i === rangos.length - 1);
+                        if (esExtremo) {
+                            texto(ctx, i === 0 ? valor.toFixed(1) : '100', props.x, medio,
+                                  i === 0 ? '#fff' : '#333', 'bold 14px ' + FUENTE);
+                            return;
+                        }
+                        if (valor > 2) {
+                            texto(ctx, valor.toFixed(1), props.x, medio,
+                                  claros.indexOf(colores[i]) >= 0 ? '#333' : '#fff', '600 10px ' + FUENTE);
+                        }
+                        var delta = d.deltas ? d.deltas[i - 1] : null;
+                        if (delta !== null && delta !== undefined && Math.abs(delta) >= 0.3) {
+                            texto(ctx, (delta > 0 ? '+' : '') + delta.toFixed(1), props.x, Math.min(props.y, props.base) - 10,
+                                  delta > 0 ? '#d63031' : '#00b894', 'bold 10px ' + FUENTE);
+                        }
+                    });
+                }
+            }]
+        });
+    }
+
+    // ═════════════════════════════════════════════════════════════════════
+    // LÍNEAS (evolución de seguridad / principalidad por marca)
+    // ═════════════════════════════════════════════════════════════════════
+    function lineas(canvas, d) {
+        var datasets = d.series.map(function(s) {
+            return {
+                label: s.label,
+                data: s.data,
+                borderColor: s.color,
+                backgroundColor: s.color,
+                borderWidth: s.destacada ? 3 : 2,
+                pointRadius: s.destacada ? 6 : 4,
+                pointBorderColor: '#fff',
+                pointBorderWidth: 2,
+                spanGaps: true,
+                tension: 0.2
+            };
+        });
+
+        return new Chart(canvas, {
+            type: 'line',
+            data: { labels: d.labels, datasets: datasets },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                plugins: {
+                    legend: {
+                        display: d.series.length > 1,
+                        position: 'right',
+                        labels: { font: { family: FUENTE, size: 11 }, usePointStyle: true, padding: 12 }
+                    },
+                    title: titulo(d.titulo),
+                    tooltip: Object.assign({}, TOOLTIP, {
+                        callbacks: {
+                            label: function(ctx) { return ctx.dataset.label + ': ' + ctx.parsed.y.toFixed(1) + '%'; }
+                        }
+                    })
+                },
+                scales: { x: ejeX(), y: ejeY(d) },
+                animation: { duration: 600, easing: 'easeOutQuart' }
+            },
+            plugins: [{
+                afterDatasetsDraw: function(chart) {
+                    var ctx = chart.ctx;
+                    chart.data.datasets.forEach(function(ds, i) {
+                        if (!chart.isDatasetVisible(i)) return;
+                        chart.getDatasetMeta(i).data.forEach(function(punto, j) {
+                            var v = ds.data[j];
+                            if (v === null || v === undefined) return;
+                            texto(ctx, v.toFixed(0) + '%', punto.x, punto.y - 12, ds.borderColor, 'bold 10px ' + FUENTE);
+                        });
+                    });
+                }
+            }]
+        });
+    }
+
+    // ═════════════════════════════════════════════════════════════════════
+    // BARRAS APILADAS + LÍNEA EN EJE DERECHO (motivos ponderados)
+    // ═════════════════════════════════════════════════════════════════════
+    function barrasLinea(canvas, d) {
+        var datasets = d.barras.map(function(b) {
+            return {
+                type: 'bar',
+                label: truncar(b.label, 35),
+                nombre: b.label,
+                data: b.data,
+                backgroundColor: b.color,
+                borderColor: 'white',
+                borderWidth: 0.5,
+                stack: 'motivos',
+                yAxisID: 'y',
+                order: 2
+            };
+        });
+        if (d.linea) {
+            datasets.push({
+                type: 'line',
+                label: d.linea.label,
+                data: d.linea.data,
+                borderColor: d.linea.color,
+                backgroundColor: d.linea.color,
+                borderWidth: 2.5,
+                borderDash: [6, 4],
+                pointStyle: 'rectRot',
+                pointRadius: 6,
+                spanGaps: true,
+                yAxisID: 'y1',
+                order: 1
+            });
+        }
+        var nBarras = d.barras.length;
+        var umbral = d.umbral_etiqueta || 0;
+        var escalas = {
+            x: ejeX({ stacked: true }),
+            y: ejeY(d, { stacked: true, min: 0 })
+        };
+        if (d.linea) {
+            escalas.y1 = {
+                position: 'right',
+                min: 0,
+                max: d.y2_max || 100,
+                title: { display: true, text: d.linea.label, font: { family: FUENTE, size: 11, weight: 'bold' }, color: d.linea.color },
+                ticks: { font: { family: FUENTE, size: 10 }, color: d.linea.color },
+                grid: { display: false },
+                border: { display: false }
+            };
+        }
+
+        return new Chart(canvas, {
+            data: { labels: d.labels, datasets: datasets },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                plugins: {
+                    legend: {
+                        position: 'right',
+                        labels: { font: { family: FUENTE, size: 10 }, usePointStyle: true, pointStyle: 'rectRounded', padding: 10 }
+                    },
+                    title: titulo(d.titulo),
+                    tooltip: Object.assign({}, TOOLTIP, {
+                        mode: 'index',
+                        intersect: false,
+                        callbacks: {
+                            label: function(ctx) {
+                                var v = ctx.parsed.y;
+                                if (v === null || v === undefined || (ctx.dataset.type === 'bar' && v <= 0)) return null;
+                                return (ctx.dataset.nombre || ctx.dataset.label) + ': ' + v.toFixed(1) + '%';
+                            }
+                        }
+                    })
+                },
+                scales: escalas,
+                animation: { duration: 600, easing: 'easeOutQuart' }
+            },
+            plugins: [{
+                afterDatasetsDraw: function(chart) {
+                    var ctx = chart.ctx;
+                    var totales = d.labels.map(function() { return { valor: 0, y: null, x: null }; });
+                    for (var i = 0; i < nBarras; i++) {
+                        if (!chart.isDatasetVisible(i)) continue;
+                        chart.getDatasetMeta(i).data.forEach(function(bar, j) {
+                            var v = chart.data.datasets[i].data[j] || 0;
+                            var props = bar.getProps(['x', 'y', 'base']);
+                            totales[j].valor += v;
+                            totales[j].x = props.x;
+                            totales[j].y = totales[j].y === null ? props.y : Math.min(totales[j].y, props.y);
+                            if (v >= umbral && v > 0) {
+                                texto(ctx, v.toFixed(1) + '%', props.x, (props.y + props.base) / 2, '#fff', 'bold 9px ' + FUENTE);
+                            }
+                        });
+                    }
+                    totales.forEach(function(t) {
+                        if (t.x === null) return;
+                        texto(ctx, t.valor.toFixed(1) + '%', t.x, t.y - 10, '#333', 'bold 11px ' + FUENTE);
+                    });
+                }
+            }]
+        });
+    }
+
+    var RENDERIZADORES = { waterfall: waterfall, lineas: lineas, barras_linea: barrasLinea };
+
+    function renderizarTodos() {
+        var bloques = document.querySelectorAll('script.grafico-data');
+        Array.prototype.forEach.call(bloques, function(bloque) {
+            var canvas = document.getElementById(bloque.getAttribute('data-canvas'));
+            var render = RENDERIZADORES[bloque.getAttribute('data-tipo')];
+            if (!canvas || !render) return;
+            try {
+                render(canvas, JSON.parse(bloque.textContent));
+            } catch (e) {
+                console.error('Error dibujando ' + bloque.getAttribute('data-canvas'), e);
+            }
+        });
+    }
+
+    (window.NPS_CHARTJS || Promise.resolve()).then(renderizarTodos);
+})();
@@ -0,0 +1,103 @@
+/*
+ * Widget del simulador what-if del reporte NPS.
+ *
+ * Lee la base embebida en <script type="application/json" id="simulador-data">
+ * (simulador_whatif.armar_base_simulacion) y recalcula el NPS en el navegador
+ * con las mismas fórmulas que simulador_whatif.simular_nps:
+ *   motivo:   efecto = −(contribución simulada − actual)
+ *   share:    efecto = Δ Share × (NPS usuario − NPS no usuario) / 100
+ */
+(function() {
+    'use strict';
+
+    var bloque = document.getElementById('simulador-data');
+    var raiz = document.getElementById('simulador-whatif');
+    if (!bloque || !raiz) return;
+    var base = JSON.parse(bloque.textContent);
+
+    var motivos = base.contrib_act.slice();
+    var shares = base.share_act.slice();
+    var restablecer = [];
+
+    // Productos con algún valor faltante (null) no se simulan
+    var finito = function(v) { return typeof v === 'number' && isFinite(v); };
+    var productosValidos = [];
+    base.productos.forEach(function(p, i) {
+        if ([base.share_act[i], base.share_ant[i], base.nps_usuario_act[i], base.nps_no_usuario_act[i]].every(finito)) {
+            productosValidos.push(i);
+        }
+    });
+
+    function clip(v, min, max) { return Math.min(max, Math.max(min, v)); }
+    function signo(v) { return (v >= 0 ? '+' : '') + v.toFixed(2); }
+
+    function recalcular() {
+        var efectoMotivos = 0, efectoMix = 0;
+        motivos.forEach(function(c, i) { efectoMotivos -= c - base.contrib_act[i]; });
+        productosValidos.forEach(function(i) {
+            efectoMix += (shares[i] - base.share_act[i]) * (base.nps_usuario_act[i] - base.nps_no_usuario_act[i]) / 100;
+        });
+        var nps = clip(base.nps_base + efectoMotivos + efectoMix, -100, 100);
+        var delta = nps - base.nps_base;
+        raiz.querySelector('.sim-nps').textContent = nps.toFixed(1);
+        var elDelta = raiz.querySelector('.sim-delta');
+        elDelta.textContent = signo(delta) + 'pp';
+        elDelta.style.color = delta > 0.005 ? '#16a34a' : delta < -0.005 ? '#dc2626' : '#64748b';
+        raiz.querySelector('.sim-desglose').textContent =
+            'Motivos ' + signo(efectoMotivos) + ' · Mix productos ' + signo(efectoMix);
+    }
+
+    function fila(nombre, valores, i, max, anterior, actual, unidad) {
+        var tr = document.createElement('tr');
+        tr.style.borderBottom = '1px solid #f1f5f9';
+        var td = function(estilo) {
+            var el = document.createElement('td');
+            el.style.cssText = 'padding: 6px 10px;' + (estilo || '');
+            tr.appendChild(el);
+            return el;
+        };
+        td('font-weight: 600;').textContent = nombre;
+        var slider = document.createElement('input');
+        slider.type = 'range';
+        slider.min = 0;
+        slider.max = max;
+        slider.step = 0.1;
+        slider.value = valores[i];
+        slider.style.width = '100%';
+        td('min-width: 160px;').appendChild(slider);
+        var valor = td('text-align: right; font-variant-numeric: tabular-nums;');
+        var boton = document.createElement('button');
+        boton.textContent = base.q_ant + ': ' + anterior.toFixed(1) + unidad;
+        boton.style.cssText = 'font-size: 11px; border: 1px solid #cbd5e1; background: #f8fafc; border-radius: 4px; cursor: pointer;';
+        td().appendChild(boton);
+
+        function actualizar(v) {
+            valores[i] = clip(parseFloat(v), 0, max);
+            slider.value = valores[i];
+            valor.textContent = valores[i].toFixed(1) + unidad;
+            recalcular();
+        }
+        slider.addEventListener('input', function() { actualizar(slider.value); });
+        boton.addEventListener('click', function() { actualizar(anterior); });
+        restablecer.push(function() { actualizar(actual); });
+        valor.textContent = valores[i].toFixed(1) + unidad;
+        return tr;
+    }
+
+    var tablaMotivos = raiz.querySelector('.sim-motivos');
+    base.motivos.forEach(function(m, i) {
+        var max = Math.ceil(Math.max(base.contrib_act[i], base.contrib_ant[i]) * 2 + 1);
+        tablaMotivos.appendChild(fila(m, motivos, i, max, base.contrib_ant[i], base.contrib_act[i], 'pp'));
+    });
+    var tablaProductos = raiz.querySelector('.sim-productos');
+    if (tablaProductos) {
+        productosValidos.forEach(function(i) {
+            tablaProductos.appendChild(fila(base.productos[i], shares, i, 100, base.share_ant[i], base.share_act[i], '%'));
+        });
+    }
+
+    raiz.querySelector('.sim-reset').addEventListener('click', function() {
+        restablecer.forEach(function(f) { f(); });
+    });
+    recalcular();
+})();